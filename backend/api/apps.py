@@ -0,0 +1,70 @@
+"""
+Static Apps Router
+シンプルデプロイの静的配信エンドポイント（全デプロイを1プロセスで配信）
+"""
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+import logging
+
+from deploy_service_simple import simple_deployment_service
+
+logger = logging.getLogger(__name__)
+
+static_host = simple_deployment_service.static_host
+
+# Create router
+router = APIRouter()
+
+
+def serve_static(site_id: str, path: str, request: Request) -> Response:
+    """静的ファイル応答生成（パスプレフィックス・ホスト名ルーティング共通）"""
+    # 圧縮表現のバイト範囲は扱わない
+    accept_encoding = None if "range" in request.headers else request.headers.get("accept-encoding")
+
+    result = static_host.open_file(
+        site_id,
+        path,
+        if_none_match=request.headers.get("if-none-match"),
+        accept_encoding=accept_encoding
+    )
+
+    if not result["success"]:
+        raise HTTPException(status_code=result["status_code"], detail=result["error"])
+
+    if result["status_code"] == 304:
+        return Response(status_code=304, headers=result["headers"])
+
+    return FileResponse(
+        result["path"],
+        media_type=result["mimetype"],
+        headers=result["headers"]
+    )
+
+
+async def static_host_middleware(request: Request, call_next):
+    """<site_id>.<host_suffix> 宛ての要求を静的ホストへ振り分け"""
+    site_id = static_host.site_for_host(request.headers.get("host"))
+    if site_id is None or request.method not in ("GET", "HEAD"):
+        return await call_next(request)
+
+    try:
+        return serve_static(site_id, request.url.path, request)
+    except HTTPException as e:
+        return Response(status_code=e.status_code, content=str(e.detail))
+
+
+@router.get("/{site_id}")
+def redirect_to_site_root(site_id: str) -> Response:
+    """相対パスを解決させるため末尾スラッシュ付きへリダイレクト"""
+    return Response(status_code=307, headers={"Location": f"{site_id}/"})
+
+
+@router.api_route("/{site_id}/{path:path}", methods=["GET", "HEAD"])
+def serve_app_file(site_id: str, path: str, request: Request) -> Response:
+    """
+    デプロイ済みアプリのファイル配信エンドポイント
+
+    事前圧縮済みファイルをsendfileで送出し、ETag一致時は304を返す
+    """
+    return serve_static(site_id, path, request)
@@ -14,6 +14,7 @@ import asyncio
 from code_generation.engine import CodeGenerationEngine, GenerationRequest, GenerationResult
 from code_generation.prompt_templates import PromptTemplateManager
 from code_generation.validators import CodeValidator
+from code_generation.code_corrector import CodeCorrector
 from code_generation.response_parser import CodeBlock
 
 logger = logging.getLogger(__name__)
@@ -22,6 +23,7 @@ logger = logging.getLogger(__name__)
 engine = CodeGenerationEngine()
 template_manager = PromptTemplateManager()
 validator = CodeValidator()
+corrector = CodeCorrector()
 
 # Create router
 router = APIRouter()
@@ -55,6 +57,7 @@ class GenerationResponseModel(BaseModel):
     errors: List[str] = []
     warnings: List[str] = []
     performance_metrics: Dict[str, Any] = {}
+    corrections: List[Dict[str, Any]] = []
 
 
 class ValidationResultModel(BaseModel):
@@ -72,6 +75,10 @@ class ValidationResponseModel(BaseModel):
     security_risks: List[Dict[str, Any]] = []
 
 
+class CorrectionResponseModel(BaseModel):
+    corrections: List[Dict[str, Any]] = []
+
+
 class TemplateModel(BaseModel):
     name: str
     description: str
@@ -128,7 +135,8 @@ async def generate_code(request: GenerationRequestModel) -> GenerationResponseMo
             generated_files=generated_files,
             errors=result.errors,
             warnings=result.warnings,
-            performance_metrics=result.performance_metrics
+            performance_metrics=result.performance_metrics,
+            corrections=result.corrections
         )
         
     except ValueError as e:
@@ -208,6 +216,36 @@ async def validate_code(request: ValidationRequestModel) -> ValidationResponseMo
         raise HTTPException(status_code=500, detail="Internal server error during code validation")
 
 
+@router.post("/correct", response_model=CorrectionResponseModel)
+async def correct_code(request: ValidationRequestModel) -> CorrectionResponseModel:
+    """
+    コード自動修正エンドポイント
+    
+    修正後のファイル全体ではなく、元コンテンツに対するパッチ（範囲+置換文字列）を返す
+    """
+    try:
+        logger.info(f"Code correction request for {len(request.code_blocks)} files")
+        
+        corrections = []
+        for block_data in request.code_blocks:
+            code_block = CodeBlock(
+                content=block_data["content"],
+                filename=block_data["filename"],
+                language=block_data.get("language", "typescript"),
+                description=block_data.get("description", "")
+            )
+            
+            patch_set = corrector.compute_patches(code_block)
+            if patch_set.has_changes():
+                corrections.append(patch_set.to_dict())
+        
+        return CorrectionResponseModel(corrections=corrections)
+        
+    except Exception as e:
+        logger.error(f"Error in code correction: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error during code correction")
+
+
 @router.get("/templates", response_model=TemplatesResponseModel)
 async def get_templates() -> TemplatesResponseModel:
     """
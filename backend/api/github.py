@@ -0,0 +1,55 @@
+"""
+GitHub Service Lifecycle
+アプリ起動時にGitHub連携サービスを生成して削除ワーカーを起動し、終了時に停止する
+稼働中サービスのAPIレイテンシ・レート制限状態・削除待ち件数を状態APIへ渡す
+"""
+
+from typing import Any, Dict, Optional
+import logging
+
+from github_service import GitHubService, github_service_from_env
+
+logger = logging.getLogger(__name__)
+
+# 起動時に生成（.env の読み込み後に環境変数を参照するため）
+github_service: Optional[GitHubService] = None
+
+
+async def start_github_service():
+    """
+    アプリ起動時: サービス生成と削除ワーカー起動
+
+    再起動前に登録されたリポジトリ削除予定は、GitHubを使うリクエストを待たずにここから処理される
+    """
+    global github_service
+    github_service = github_service_from_env()
+    if github_service is None:
+        logger.info("GitHub integration not configured (GITHUB_TOKEN / GITHUB_ORGANIZATION)")
+        return
+    await github_service.start()
+    logger.info(f"GitHub repository cleanup worker started for {github_service.organization}")
+
+
+async def stop_github_service():
+    """アプリ終了時: 削除ワーカー停止と接続クローズ"""
+    global github_service
+    if github_service is not None:
+        await github_service.close()
+        github_service = None
+
+
+def get_github_status() -> Dict[str, Any]:
+    """
+    GitHub連携の状態（/api/github/status 用）
+
+    Returns:
+        configured・organization と、設定済みなら GitHubService.get_stats()
+        （エンドポイント別レイテンシ・レート制限状態・削除待ちリポジトリ数）
+    """
+    if github_service is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "organization": github_service.organization,
+        **github_service.get_stats()
+    }
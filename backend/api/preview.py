@@ -0,0 +1,110 @@
+"""
+Preview API Router
+プレビューセッションのファイル配信エンドポイント
+"""
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
+import os
+import logging
+
+from code_generation.file_manager import FileManager
+from code_generation.preview_server import PreviewServer
+from code_generation.hot_reload import HotReloadHub
+from code_generation.transpiler import TranspileCache
+
+logger = logging.getLogger(__name__)
+
+# Initialize components
+file_manager = FileManager()
+transpile_cache = TranspileCache(os.path.join(file_manager.temp_root, ".transpile"))
+preview_server = PreviewServer(file_manager, transpiler=transpile_cache)
+hot_reload_hub = HotReloadHub(file_manager)
+
+# Create router
+router = APIRouter()
+
+
+# Request/Response models
+class PreviewFileModel(BaseModel):
+    filename: str
+    content: str
+    language: str = "text"
+
+
+class PreviewCreateRequestModel(BaseModel):
+    files: List[PreviewFileModel] = Field(..., min_length=1, description="Files to preview")
+    ttl: Optional[int] = Field(default=None, ge=60, le=24 * 3600, description="Session TTL in seconds")
+
+
+class PreviewCreateResponseModel(BaseModel):
+    session_id: str
+    preview_url: str
+    files_saved: int = 0
+    total_size: int = 0
+
+
+@router.post("/sessions", response_model=PreviewCreateResponseModel)
+def create_preview_session(request: PreviewCreateRequestModel) -> PreviewCreateResponseModel:
+    """
+    プレビューセッション作成エンドポイント
+
+    ファイルを保存し、配信URLを返す
+    """
+    session_id = file_manager.create_session(request.ttl)
+    result = file_manager.save_files(session_id, [file.model_dump() for file in request.files])
+
+    if not result.get("success"):
+        file_manager.delete_session(session_id)
+        raise HTTPException(status_code=400, detail=result["error"])
+
+    return PreviewCreateResponseModel(
+        session_id=session_id,
+        preview_url=preview_server.generate_preview_url(session_id),
+        files_saved=result["files_saved"],
+        total_size=result["total_size"]
+    )
+
+
+@router.get("/{session_id}")
+def list_preview_files(session_id: str) -> Dict[str, Any]:
+    """
+    プレビューセッションのファイル一覧エンドポイント
+    """
+    result = preview_server.list_session_files(session_id)
+    if not result["success"]:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+
+@router.api_route("/{session_id}/{filename:path}", methods=["GET", "HEAD"])
+def serve_preview_file(session_id: str, filename: str, request: Request) -> Response:
+    """
+    プレビューファイル配信エンドポイント
+
+    保存済みファイル（または事前圧縮済みファイル）をsendfileで送出する。
+    Range要求は非圧縮の本文に対して処理し、ETag一致時は304を返す。
+    """
+    # 圧縮表現のバイト範囲は扱わない
+    accept_encoding = None if "range" in request.headers else request.headers.get("accept-encoding")
+
+    result = preview_server.open_file(
+        session_id,
+        filename,
+        if_none_match=request.headers.get("if-none-match"),
+        accept_encoding=accept_encoding
+    )
+
+    if not result["success"]:
+        raise HTTPException(status_code=result["status_code"], detail=result["error"])
+
+    if result["status_code"] == 304:
+        return Response(status_code=304, headers=result["headers"])
+
+    return FileResponse(
+        result["path"],
+        media_type=result["mimetype"],
+        headers=result["headers"]
+    )
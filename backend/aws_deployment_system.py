@@ -3,18 +3,45 @@ Task 4.7: AWS リアルタイムデプロイシステム
 CloudFormationスタック実行・監視・コンテナデプロイ機能
 """
 import boto3
+import os
 import json
 import time
 import logging
+from pathlib import Path
 from typing import Dict, Any, List, Optional, Callable
 from datetime import datetime, timezone
 from dataclasses import dataclass
 from enum import Enum
 import asyncio
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from deployment_monitoring import (
+    FAILED_STACK_STATUSES,
+    AdaptivePollInterval,
+    CloudFormationEventMonitor,
+    DeploymentMonitor,
+    StackWatcher
+)
+from cloudformation_generator import canonical_json
+from stack_template_store import StackTemplateStore, deployment_hash, diff_templates
+from template_analyzer import TemplateAnalyzer
 
 logger = logging.getLogger(__name__)
 
+# 置換に時間がかかるリソース（変更セットの置換一覧で強調する）
+SLOW_REPLACEMENT_TYPES = {
+    'AWS::RDS::DBInstance', 'AWS::RDS::DBCluster',
+    'AWS::ElasticLoadBalancingV2::LoadBalancer', 'AWS::ECS::Service',
+    'AWS::ElastiCache::CacheCluster', 'AWS::CloudFront::Distribution'
+}
+
+# 変更セットに変更がないときの失敗理由
+_NO_CHANGE_REASONS = ("didn't contain changes", "No updates are to be performed")
+# 作成に失敗してロールバックされたスタック（更新できないため削除して作り直す）
+_FAILED_CREATE_STATUSES = ('ROLLBACK_COMPLETE',)
+
 class StackStatus(Enum):
     """CloudFormation スタック状態"""
     CREATE_IN_PROGRESS = "CREATE_IN_PROGRESS"
@@ -79,8 +106,12 @@ class AWSDeploymentService:
     """AWS デプロイメントサービス"""
     
     def __init__(self, region: str = "ap-northeast-1", aws_access_key_id: Optional[str] = None, 
-                 aws_secret_access_key: Optional[str] = None):
+                 aws_secret_access_key: Optional[str] = None, template_store_path: Optional[str] = None):
         self.region = region
+        self.template_store_path = template_store_path or os.getenv(
+            "AWS_TEMPLATE_STORE_PATH", str(Path.home() / ".altmx" / "aws_templates.db")
+        )
+        self._template_store: Optional[StackTemplateStore] = None
         self.session = boto3.Session(
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
@@ -90,34 +121,18 @@ class AWSDeploymentService:
         self.ecs_client = self.session.client('ecs')
         self.elbv2_client = self.session.client('elbv2')
         self.progress_tracker = DeploymentProgressTracker()
+        self.event_monitor = CloudFormationEventMonitor(region=region, cf_client=self.cf_client)
+        self.deployment_monitor = DeploymentMonitor()
         
     def create_stack(self, deployment_config: Dict[str, Any]) -> Dict[str, Any]:
         """CloudFormationスタック作成"""
         try:
-            # パラメータの変換
-            parameters = []
-            if 'parameters' in deployment_config:
-                for key, value in deployment_config['parameters'].items():
-                    parameters.append({
-                        'ParameterKey': key,
-                        'ParameterValue': str(value)
-                    })
-            
-            # タグの変換
-            tags = []
-            if 'tags' in deployment_config:
-                for key, value in deployment_config['tags'].items():
-                    tags.append({
-                        'Key': key,
-                        'Value': str(value)
-                    })
-            
             # CloudFormationスタック作成
             response = self.cf_client.create_stack(
                 StackName=deployment_config['stack_name'],
                 TemplateBody=json.dumps(deployment_config['template']),
-                Parameters=parameters,
-                Tags=tags,
+                Parameters=self._stack_parameters(deployment_config),
+                Tags=self._stack_tags(deployment_config),
                 Capabilities=[
                     'CAPABILITY_IAM',
                     'CAPABILITY_NAMED_IAM'
@@ -137,11 +152,245 @@ class AWSDeploymentService:
                 'error_message': str(e)
             }
     
+    @staticmethod
+    def _stack_parameters(deployment_config: Dict[str, Any]) -> List[Dict[str, str]]:
+        """パラメータの変換"""
+        return [
+            {'ParameterKey': key, 'ParameterValue': str(value)}
+            for key, value in deployment_config.get('parameters', {}).items()
+        ]
+    
+    @staticmethod
+    def _stack_tags(deployment_config: Dict[str, Any]) -> List[Dict[str, str]]:
+        """タグの変換"""
+        return [
+            {'Key': key, 'Value': str(value)}
+            for key, value in deployment_config.get('tags', {}).items()
+        ]
+    
+    @property
+    def template_store(self) -> StackTemplateStore:
+        """デプロイ済みテンプレートストア（差分デプロイを使うまでDBを作らない）"""
+        if self._template_store is None:
+            self._template_store = StackTemplateStore(self.template_store_path)
+        return self._template_store
+    
+    async def deploy_stack_incremental(self, deployment_config: Dict[str, Any], deployment_id: Optional[str] = None,
+                                       execute: bool = True, max_wait_time: int = 1800) -> Dict[str, Any]:
+        """
+        差分デプロイ（変更セット）
+        
+        1. テンプレート・パラメータ・タグのハッシュが前回の成功デプロイと同じならAWSを呼ばずにスキップ
+        2. 前回のテンプレートとのリソース差分を求め、変更セット（新規は CREATE、既存は UPDATE）を作成
+           作成失敗で ROLLBACK_COMPLETE のまま残ったスタックは削除してから CREATE する
+        3. 変更なしの変更セットは削除してスキップ、置換されるリソースを実行前に報告
+           それ以外で失敗した変更セットも削除し、CREATE なら空のスタックも削除する
+        4. execute=True なら実行して完了まで監視し、成功したらハッシュを記録
+        
+        Returns:
+            action（skipped / create / update / planned）・changes・replacements・template_diff 等
+        """
+        stack_name = deployment_config['stack_name']
+        template = deployment_config['template']
+        template_body = canonical_json(template)
+        template_hash = hashlib.sha256(template_body.encode('utf-8')).hexdigest()
+        parameters = self._stack_parameters(deployment_config)
+        tags = self._stack_tags(deployment_config)
+        current_hash = deployment_hash(template_hash, parameters, tags)
+        
+        result: Dict[str, Any] = {
+            'success': True,
+            'stack_name': stack_name,
+            'template_hash': template_hash,
+            'changes': [],
+            'replacements': []
+        }
+        
+        previous = self.template_store.get(stack_name)
+        if previous is not None and previous['deployment_hash'] == current_hash:
+            logger.info(f"Stack {stack_name} is up to date ({template_hash[:12]}), skipping deploy")
+            return {**result, 'action': 'skipped', 'template_diff': {'added': [], 'removed': [], 'modified': []}}
+        
+        previous_template = self.template_store.get_template(previous['template_hash']) if previous else None
+        result['template_diff'] = diff_templates(previous_template, template)
+        
+        change_set_id = None
+        change_set_type = 'CREATE'
+        try:
+            status = await asyncio.to_thread(self._stack_status, stack_name)
+            if status in _FAILED_CREATE_STATUSES:
+                logger.warning(f"Stack {stack_name} is in {status}, deleting it before re-creating")
+                await self._delete_stack_and_wait(stack_name)
+                result['deleted_failed_stack'] = True
+            elif status not in (None, 'REVIEW_IN_PROGRESS', 'DELETE_COMPLETE'):
+                change_set_type = 'UPDATE'
+            change_set = await asyncio.to_thread(
+                self.cf_client.create_change_set,
+                StackName=stack_name,
+                ChangeSetName=f"altmx-{template_hash[:12]}-{int(time.time())}",
+                ChangeSetType=change_set_type,
+                TemplateBody=template_body,
+                Parameters=parameters,
+                Tags=tags,
+                Capabilities=['CAPABILITY_IAM', 'CAPABILITY_NAMED_IAM']
+            )
+            change_set_id = change_set['Id']
+            description = await self._wait_for_change_set(change_set_id, stack_name)
+        except Exception as e:
+            logger.error(f"Change set creation failed for {stack_name}: {e}")
+            if change_set_id is not None:
+                await self._discard_change_set(change_set_id, stack_name, change_set_type)
+            return {**result, 'success': False, 'action': 'failed', 'error_message': str(e)}
+        
+        if description['Status'] == 'FAILED':
+            reason = description.get('StatusReason', '')
+            if any(marker in reason for marker in _NO_CHANGE_REASONS):
+                # AWS側は同じ内容（ローカルの記録がなかった・消えた）
+                await asyncio.to_thread(self.cf_client.delete_change_set, ChangeSetName=change_set_id, StackName=stack_name)
+                self.template_store.record(stack_name, template_hash, template_body, current_hash)
+                return {**result, 'action': 'skipped'}
+            logger.error(f"Change set {change_set_id} for {stack_name} failed: {reason}")
+            await self._discard_change_set(change_set_id, stack_name, change_set_type)
+            return {**result, 'success': False, 'action': 'failed', 'change_set_id': change_set_id, 'error_message': reason}
+        
+        result['change_set_id'] = change_set_id
+        result['changes'] = self._summarize_changes(description['Changes'])
+        result['replacements'] = [change for change in result['changes'] if change['replacement'] in ('True', 'Conditional')]
+        for replacement in result['replacements']:
+            logger.warning(
+                f"{stack_name}: {replacement['logical_id']} ({replacement['resource_type']}) will be replaced"
+                + (" - slow replacement" if replacement['slow'] else "")
+            )
+        
+        if not execute:
+            return {**result, 'action': 'planned', 'change_set_type': change_set_type}
+        
+        # 既存スタックは過去の履歴を読まないよう、実行前の最新イベントをカーソルにする
+        cursor = await asyncio.to_thread(self._latest_event_id, stack_name) if change_set_type == 'UPDATE' else None
+        await asyncio.to_thread(self.cf_client.execute_change_set, ChangeSetName=change_set_id, StackName=stack_name)
+        progress = await self.watch_stack_progress(
+            stack_name, deployment_id=deployment_id, max_wait_time=max_wait_time, after_event_id=cursor
+        )
+        
+        result['action'] = change_set_type.lower()
+        result['final_status'] = progress.get('final_status')
+        if not progress['success']:
+            return {**result, 'success': False, 'error_message': progress.get('error_message')}
+        
+        self.template_store.record(stack_name, template_hash, template_body, current_hash)
+        return result
+    
+    def _stack_status(self, stack_name: str) -> Optional[str]:
+        """スタックのステータス（存在しなければ None）"""
+        try:
+            stack = self.cf_client.describe_stacks(StackName=stack_name)['Stacks'][0]
+        except Exception as e:
+            if 'does not exist' in str(e):
+                return None
+            raise
+        return stack['StackStatus']
+    
+    async def _delete_stack_and_wait(self, stack_name: str, max_wait_time: int = 600):
+        """スタックを削除し、消えるまで待つ"""
+        await asyncio.to_thread(self.cf_client.delete_stack, StackName=stack_name)
+        poll_interval = AdaptivePollInterval(initial=1.0, maximum=5.0)
+        deadline = time.monotonic() + max_wait_time
+        
+        while True:
+            status = await asyncio.to_thread(self._stack_status, stack_name)
+            if status in (None, 'DELETE_COMPLETE'):
+                return
+            if status == 'DELETE_FAILED':
+                raise RuntimeError(f"Stack {stack_name} could not be deleted")
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Stack {stack_name} was not deleted after {max_wait_time} seconds")
+            await asyncio.sleep(poll_interval.next(False))
+    
+    async def _discard_change_set(self, change_set_id: str, stack_name: str, change_set_type: str):
+        """失敗した変更セットの後始末（CREATE なら REVIEW_IN_PROGRESS の空スタックも削除）"""
+        try:
+            await asyncio.to_thread(self.cf_client.delete_change_set, ChangeSetName=change_set_id, StackName=stack_name)
+            if change_set_type == 'CREATE':
+                await asyncio.to_thread(self.cf_client.delete_stack, StackName=stack_name)
+        except Exception as e:
+            logger.warning(f"Failed to clean up change set {change_set_id} for {stack_name}: {e}")
+    
+    def _latest_event_id(self, stack_name: str) -> Optional[str]:
+        events = self.cf_client.describe_stack_events(StackName=stack_name)['StackEvents']
+        return events[0]['EventId'] if events else None
+    
+    async def _wait_for_change_set(self, change_set_id: str, stack_name: str, max_wait_time: int = 300) -> Dict[str, Any]:
+        """変更セットの作成完了待ち（変更一覧は全ページ取得）"""
+        poll_interval = AdaptivePollInterval(initial=1.0, maximum=5.0)
+        deadline = time.monotonic() + max_wait_time
+        
+        while True:
+            description = await asyncio.to_thread(
+                self.cf_client.describe_change_set, ChangeSetName=change_set_id, StackName=stack_name
+            )
+            if description['Status'] in ('CREATE_COMPLETE', 'FAILED'):
+                break
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Change set {change_set_id} was not ready after {max_wait_time} seconds")
+            await asyncio.sleep(poll_interval.next(False))
+        
+        changes = list(description.get('Changes', []))
+        next_token = description.get('NextToken')
+        while next_token:
+            page = await asyncio.to_thread(
+                self.cf_client.describe_change_set,
+                ChangeSetName=change_set_id, StackName=stack_name, NextToken=next_token
+            )
+            changes.extend(page.get('Changes', []))
+            next_token = page.get('NextToken')
+        
+        description['Changes'] = changes
+        return description
+    
+    @staticmethod
+    def _summarize_changes(changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """変更セットのリソース変更一覧"""
+        summary = []
+        for change in changes:
+            resource_change = change.get('ResourceChange', {})
+            resource_type = resource_change.get('ResourceType', '')
+            summary.append({
+                'logical_id': resource_change.get('LogicalResourceId'),
+                'resource_type': resource_type,
+                'action': resource_change.get('Action'),
+                'replacement': resource_change.get('Replacement', 'False'),
+                'slow': resource_type in SLOW_REPLACEMENT_TYPES
+            })
+        return summary
+    
+    async def watch_stack_progress(self, stack_name: str, deployment_id: Optional[str] = None,
+                                   callback: Optional[Callable] = None, max_wait_time: int = 1800,
+                                   **watch_options) -> Dict[str, Any]:
+        """
+        スタック進捗監視（非同期）
+        
+        新着イベントだけを適応的な間隔で取得し、進捗を deployment_monitor のリスナーへ通知する。
+        watch_options は StackWatcher.watch へ渡す（after_event_id / since）。
+        """
+        watcher = StackWatcher(self.event_monitor, monitor=self.deployment_monitor)
+        return await watcher.watch(
+            stack_name,
+            deployment_id=deployment_id,
+            callback=callback,
+            max_wait_time=max_wait_time,
+            **watch_options
+        )
+    
     def monitor_stack_progress(self, stack_name: str, callback: Optional[Callable] = None, 
                              max_wait_time: int = 1800) -> Dict[str, Any]:
-        """スタック作成進捗監視"""
+        """
+        スタック作成進捗監視（同期）
+        
+        スレッドをブロックするため、イベントループ上では watch_stack_progress を使うこと
+        """
         start_time = time.time()
         previous_status = None
+        poll_interval = AdaptivePollInterval()
         
         while (time.time() - start_time) < max_wait_time:
             try:
@@ -174,8 +423,10 @@ class AWSDeploymentService:
                         'duration': time.time() - start_time
                     }
                 
+                # 状態が変わった直後は短く、変化がなければ徐々に間隔を伸ばす
+                activity = current_status != previous_status
                 previous_status = current_status
-                time.sleep(10)  # 10秒間隔でポーリング
+                time.sleep(min(poll_interval.next(activity), max(0, max_wait_time - (time.time() - start_time))))
                 
             except Exception as e:
                 logger.error(f"Stack monitoring error: {e}")
@@ -245,16 +496,7 @@ class AWSDeploymentService:
                 TargetGroupArn=target_group_arn
             )
             
-            target_health = response['TargetHealthDescriptions']
-            healthy_targets = len([t for t in target_health if t['TargetHealth']['State'] == 'healthy'])
-            total_targets = len(target_health)
-            
-            return {
-                'healthy_targets': healthy_targets,
-                'total_targets': total_targets,
-                'health_percentage': (healthy_targets / total_targets * 100) if total_targets > 0 else 0,
-                'target_details': target_health
-            }
+            return self.summarize_target_health(response['TargetHealthDescriptions'])
             
         except Exception as e:
             logger.error(f"Health check failed: {e}")
@@ -265,7 +507,20 @@ class AWSDeploymentService:
                 'error_message': str(e)
             }
     
-    def estimate_deployment_cost(self, deployment_config: Dict[str, Any]) -> Dict[str, float]:
+    @staticmethod
+    def summarize_target_health(target_health: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """describe_target_health の結果集計"""
+        healthy_targets = len([t for t in target_health if t['TargetHealth']['State'] == 'healthy'])
+        total_targets = len(target_health)
+        
+        return {
+            'healthy_targets': healthy_targets,
+            'total_targets': total_targets,
+            'health_percentage': (healthy_targets / total_targets * 100) if total_targets > 0 else 0,
+            'target_details': target_health
+        }
+    
+    def estimate_deployment_cost(self, deployment_config: Dict[str, Any]) -> Dict[str, Any]:
         """デプロイメントコスト見積もり"""
         # 基本的なコスト計算（概算）
         # 実際のプロジェクトでは AWS Pricing API を使用することを推奨
@@ -277,24 +532,366 @@ class AWSDeploymentService:
             'cloudwatch_logs_cost_per_gb': 0.50,
         }
         
-        # 1時間デモコスト見積もり（ライブデモ用）
-        demo_hours = 1  # 60分会議想定
-        estimated_demo_cost = (
+        hourly_cost = (
             cost_estimate['ecs_fargate_cost_per_hour'] + 
             cost_estimate['alb_cost_per_hour']
-        ) * demo_hours
+        )
+        
+        # テンプレートがあればリソースごとに価格表から積算（料金のかかるリソースがなければ上記の概算）
+        template = deployment_config.get('template')
+        if template:
+            analysis = TemplateAnalyzer().analyze(template)
+            cost_estimate['resource_costs'] = analysis.resource_costs
+            cost_estimate['unpriced_resources'] = analysis.unpriced_resources
+            cost_estimate['template_hourly_cost'] = analysis.hourly_cost
+            cost_estimate['critical_path'] = analysis.critical_path
+            cost_estimate['estimated_creation_minutes'] = round(analysis.critical_path_seconds / 60, 1)
+            if analysis.hourly_cost > 0:
+                hourly_cost = analysis.hourly_cost
+        
+        # 1時間デモコスト見積もり（ライブデモ用）
+        demo_hours = 1  # 60分会議想定
+        estimated_demo_cost = hourly_cost * demo_hours
         
         cost_estimate['estimated_demo_cost'] = round(estimated_demo_cost, 2)
         cost_estimate['estimated_monthly_cost'] = round(estimated_demo_cost * 24 * 30, 2)
         
         return cost_estimate
 
+class _AbandonedCall(Exception):
+    """相乗り元の呼び出しがキャンセルされた（相乗りしていた側は自分で呼び直す）"""
+
+class AWSDeploymentOrchestrator:
+    """
+    非同期デプロイオーケストレーター
+    
+    - CloudFormation / ECS / ELBv2 の describe 系呼び出しをスレッドプールで並列実行
+    - boto3 クライアントは AWSDeploymentService のものを共有（呼び出しごとに作らない）
+    - describe 結果は cache_ttl 秒キャッシュし、実行中の同じ呼び出しには相乗りする
+      （ダッシュボードの同時リフレッシュでもAPI呼び出しは1回）
+    - 呼び出し元がキャンセルされても相乗り側へはキャンセルを伝えず、相乗り側が呼び直す
+    - 期限切れのキャッシュは参照時に削除し、追加時にも cache_ttl ごとにまとめて削除する
+    - スタック・ECSサービス・ターゲットヘルスを1つのスナップショットに集約
+    """
+    
+    def __init__(self, deployment_service: AWSDeploymentService, max_workers: int = 8, cache_ttl: float = 5.0):
+        self.deployment_service = deployment_service
+        self.cache_ttl = cache_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aws-describe")
+        self._cache: Dict[tuple, tuple] = {}          # key -> (有効期限, 結果)
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+        self._next_sweep = time.monotonic() + cache_ttl
+        self._stats = {'api_calls': 0, 'cache_hits': 0, 'shared_calls': 0}
+    
+    async def _call(self, function: Callable, *args, **kwargs) -> Any:
+        """boto3 呼び出しをスレッドプールで実行"""
+        self._stats['api_calls'] += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(function, *args, **kwargs))
+    
+    async def _cached(self, key: tuple, function: Callable, **kwargs) -> Any:
+        """TTLキャッシュ付き呼び出し（実行中の同じ呼び出しは結果を共有）"""
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > now:
+                self._stats['cache_hits'] += 1
+                return cached[1]
+            del self._cache[key]
+        
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._stats['shared_calls'] += 1
+            try:
+                return await asyncio.shield(in_flight)
+            except _AbandonedCall:
+                # 相乗り元がキャンセルされた（自分のキャンセルではないため呼び直す）
+                return await self._cached(key, function, **kwargs)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await self._call(function, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            # 相乗りがいなくても「取得されなかった例外」の警告を出さない
+            future.exception()
+            raise
+        else:
+            self._store(key, result)
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
+            if not future.done():
+                # 呼び出し元のキャンセル（相乗り側へはキャンセルを伝えず、呼び直させる）
+                future.set_exception(_AbandonedCall())
+                future.exception()
+    
+    def _store(self, key: tuple, result: Any):
+        """キャッシュ追加（cache_ttl ごとに期限切れをまとめて削除）"""
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            for expired in [cached_key for cached_key, (expires_at, _) in self._cache.items() if expires_at <= now]:
+                del self._cache[expired]
+            self._next_sweep = now + self.cache_ttl
+        self._cache[key] = (now + self.cache_ttl, result)
+    
+    def invalidate(self, kind: Optional[str] = None):
+        """キャッシュ破棄（kind: 'stack' / 'service' / 'targets'、Noneは全て）"""
+        if kind is None:
+            self._cache.clear()
+            return
+        for key in [key for key in self._cache if key[0] == kind]:
+            del self._cache[key]
+    
+    async def describe_stack(self, stack_name: str) -> Dict[str, Any]:
+        response = await self._cached(
+            ('stack', stack_name),
+            self.deployment_service.cf_client.describe_stacks,
+            StackName=stack_name
+        )
+        return response['Stacks'][0]
+    
+    async def describe_service(self, cluster_name: str, service_name: str) -> Dict[str, Any]:
+        response = await self._cached(
+            ('service', cluster_name, service_name),
+            self.deployment_service.ecs_client.describe_services,
+            cluster=cluster_name,
+            services=[service_name]
+        )
+        services = response.get('services', [])
+        if not services:
+            raise LookupError(f"ECS service not found: {cluster_name}/{service_name}")
+        return services[0]
+    
+    async def describe_target_health(self, target_group_arn: str) -> Dict[str, Any]:
+        response = await self._cached(
+            ('targets', target_group_arn),
+            self.deployment_service.elbv2_client.describe_target_health,
+            TargetGroupArn=target_group_arn
+        )
+        return self.deployment_service.summarize_target_health(response['TargetHealthDescriptions'])
+    
+    async def get_status_snapshot(
+        self,
+        stack_name: str,
+        cluster_name: Optional[str] = None,
+        service_name: Optional[str] = None,
+        target_group_arn: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        スタック・ECSサービス・ターゲットヘルスの集約スナップショット
+        
+        取得に失敗した項目は error を持つ要素として返し、他の項目の取得は続ける
+        """
+        names = ['stack']
+        calls = [self.describe_stack(stack_name)]
+        if cluster_name and service_name:
+            names.append('service')
+            calls.append(self.describe_service(cluster_name, service_name))
+        if target_group_arn:
+            names.append('targets')
+            calls.append(self.describe_target_health(target_group_arn))
+        
+        results = dict(zip(names, await asyncio.gather(*calls, return_exceptions=True)))
+        
+        snapshot: Dict[str, Any] = {
+            'stack_name': stack_name,
+            'fetched_at': datetime.now(timezone.utc).isoformat()
+        }
+        
+        stack = results['stack']
+        if isinstance(stack, BaseException):
+            snapshot['stack'] = {'error': str(stack)}
+        else:
+            snapshot['stack'] = {
+                'status': stack['StackStatus'],
+                'reason': stack.get('StackStatusReason', ''),
+                'outputs': {output['OutputKey']: output['OutputValue'] for output in stack.get('Outputs', [])}
+            }
+        
+        service = results.get('service')
+        if isinstance(service, BaseException):
+            snapshot['service'] = {'error': str(service)}
+        elif service is not None:
+            primary = next(
+                (deployment for deployment in service.get('deployments', []) if deployment.get('status') == 'PRIMARY'),
+                {}
+            )
+            snapshot['service'] = {
+                'status': service.get('status'),
+                'desired_count': service.get('desiredCount', 0),
+                'running_count': service.get('runningCount', 0),
+                'pending_count': service.get('pendingCount', 0),
+                'deployments': len(service.get('deployments', [])),
+                'rollout_state': primary.get('rolloutState')
+            }
+        
+        targets = results.get('targets')
+        if isinstance(targets, BaseException):
+            snapshot['targets'] = {'error': str(targets)}
+        elif targets is not None:
+            snapshot['targets'] = {key: value for key, value in targets.items() if key != 'target_details'}
+        
+        snapshot['status'] = self._overall_status(snapshot)
+        return snapshot
+    
+    @staticmethod
+    def _overall_status(snapshot: Dict[str, Any]) -> str:
+        """全体状態（FAILED / DEPLOYING / HEALTHY / DEGRADED / UNKNOWN）"""
+        stack_status = snapshot['stack'].get('status')
+        if stack_status is None:
+            return 'UNKNOWN'
+        if stack_status in FAILED_STACK_STATUSES:
+            return 'FAILED'
+        if stack_status.endswith('_IN_PROGRESS'):
+            return 'DEPLOYING'
+        
+        service = snapshot.get('service')
+        if service is not None:
+            if 'error' in service:
+                return 'UNKNOWN'
+            if service['rollout_state'] == 'IN_PROGRESS' or service['deployments'] > 1:
+                return 'DEPLOYING'
+            if service['running_count'] < service['desired_count']:
+                return 'DEGRADED'
+        
+        targets = snapshot.get('targets')
+        if targets is not None:
+            if 'error' in targets:
+                return 'UNKNOWN'
+            if targets['total_targets'] == 0 or targets['healthy_targets'] < targets['total_targets']:
+                return 'DEGRADED'
+        
+        return 'HEALTHY'
+    
+    async def deploy_complete_stack(self, deployment_config: Dict[str, Any],
+                                    deployment_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        完全スタックデプロイメント（非同期）
+        
+        スタック作成 → StackWatcher で完了待ち → アウトプット取得・コンテナデプロイ・
+        ヘルスチェックを並列実行。戻り値は AWSDeploymentSystem.deploy_complete_stack と同じ形。
+        """
+        deployment_start = time.time()
+        stack_name = deployment_config['stack_name']
+        
+        try:
+            # 1. CloudFormation スタック作成
+            stack_result = await self._call(self.deployment_service.create_stack, deployment_config)
+            if not stack_result['success']:
+                return {
+                    'success': False,
+                    'error_message': f"Stack creation failed: {stack_result.get('error_message')}"
+                }
+            
+            # 2. スタック作成進捗監視
+            progress_result = await self.deployment_service.watch_stack_progress(
+                stack_name, deployment_id=deployment_id
+            )
+            if not progress_result['success']:
+                return {
+                    'success': False,
+                    'stack_created': False,
+                    'error_message': f"Stack creation failed: {progress_result.get('error_message')}",
+                    'deployment_time': time.time() - deployment_start
+                }
+            
+            # 3. アウトプット取得とコンテナデプロイを並列実行
+            self.invalidate('stack')
+            container_config = deployment_config.get('container_config')
+            calls = [self.describe_stack(stack_name)]
+            if container_config:
+                calls.append(self._call(self.deployment_service.deploy_container, container_config))
+            stack, *container = await asyncio.gather(*calls)
+            outputs = {output['OutputKey']: output['OutputValue'] for output in stack.get('Outputs', [])}
+            
+            container_deployed = True
+            if container:
+                container_deployed = container[0]['success']
+                self.invalidate('service')
+            
+            # 4. ALBヘルスチェック（ターゲットグループが分かる場合）
+            health_check_passed = True
+            target_group_arn = deployment_config.get('target_group_arn') or outputs.get('TargetGroupArn')
+            if target_group_arn:
+                health = await self.describe_target_health(target_group_arn)
+                health_check_passed = health['healthy_targets'] > 0
+            
+            return {
+                'success': True,
+                'stack_created': True,
+                'container_deployed': container_deployed,
+                'health_check_passed': health_check_passed,
+                'application_url': outputs.get('ApplicationURL', ''),
+                'deployment_time': time.time() - deployment_start,
+                'stack_outputs': outputs
+            }
+            
+        except Exception as e:
+            logger.error(f"Complete deployment failed: {e}")
+            return {
+                'success': False,
+                'error_message': str(e),
+                'deployment_time': time.time() - deployment_start
+            }
+    
+    async def deploy_incremental(self, deployment_config: Dict[str, Any], deployment_id: Optional[str] = None,
+                                 execute: bool = True) -> Dict[str, Any]:
+        """
+        差分デプロイ（変更セット）
+        
+        スタックは AWSDeploymentService.deploy_stack_incremental で更新する。テンプレートのタスク定義が
+        変われば CloudFormation がECSのローリング更新を行うため、コンテナの強制再デプロイは
+        container_config.force_new_deployment が指定された場合（同じタグのイメージ更新）だけ行う。
+        """
+        result = await self.deployment_service.deploy_stack_incremental(
+            deployment_config, deployment_id=deployment_id, execute=execute
+        )
+        if not result['success'] or not execute:
+            return result
+        if result['action'] != 'skipped':
+            self.invalidate('stack')
+        
+        container_config = deployment_config.get('container_config') or {}
+        result['container_deployed'] = False
+        if container_config.get('force_new_deployment'):
+            container_result = await self._call(self.deployment_service.deploy_container, container_config)
+            result['container_deployed'] = container_result['success']
+            self.invalidate('service')
+            if not container_result['success']:
+                result['success'] = False
+                result['error_message'] = container_result.get('error_message')
+        return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, 'cached_entries': len(self._cache), 'in_flight': len(self._in_flight)}
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
+
 class AWSDeploymentSystem:
     """完全なAWSデプロイメントシステム"""
     
     def __init__(self, region: str = "ap-northeast-1"):
         self.deployment_service = AWSDeploymentService(region=region)
+        self.orchestrator = AWSDeploymentOrchestrator(self.deployment_service)
         self.region = region
+    
+    async def deploy_complete_stack_async(self, deployment_config: Dict[str, Any],
+                                          deployment_id: Optional[str] = None) -> Dict[str, Any]:
+        """完全スタックデプロイメント（非同期・イベントループを止めない）"""
+        return await self.orchestrator.deploy_complete_stack(deployment_config, deployment_id=deployment_id)
+    
+    async def deploy_incremental(self, deployment_config: Dict[str, Any], deployment_id: Optional[str] = None,
+                                 execute: bool = True) -> Dict[str, Any]:
+        """差分デプロイ（変更がなければスキップ、置換されるリソースを報告）"""
+        return await self.orchestrator.deploy_incremental(deployment_config, deployment_id=deployment_id, execute=execute)
+    
+    async def get_status_snapshot(self, stack_name: str, **resources) -> Dict[str, Any]:
+        """デプロイ状態の集約スナップショット（resources: cluster_name / service_name / target_group_arn）"""
+        return await self.orchestrator.get_status_snapshot(stack_name, **resources)
         
     def deploy_complete_stack(self, deployment_config: Dict[str, Any]) -> Dict[str, Any]:
         """完全スタックデプロイメント"""
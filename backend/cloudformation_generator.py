@@ -2,20 +2,56 @@
 AWS CloudFormation テンプレート生成サービス - Task 4.6実装
 インフラコードを自動生成し、ECS Fargate環境を構築
 """
+import copy
 import json
 import yaml
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from datetime import datetime
+from collections import OrderedDict
+from dataclasses import dataclass
 import hashlib
 import logging
+import threading
+
+from template_analyzer import TemplateAnalyzer, TemplateAnalysis
 
 logger = logging.getLogger(__name__)
 
+
+def canonical_json(value: Any) -> str:
+    """正規化JSON（キー順固定・空白なし）。テンプレートハッシュとTemplateBodyに使用"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def _join_canonical(members: Dict[str, str]) -> str:
+    """正規化済みの値からオブジェクトの正規化JSONを組み立てる（canonical_json と同じ結果）"""
+    return "{" + ",".join(
+        f"{json.dumps(key, ensure_ascii=False)}:{members[key]}" for key in sorted(members)
+    ) + "}"
+
+
+def _pick(config: Dict[str, Any], keys: List[str]) -> Dict[str, Any]:
+    """フラグメントが参照する設定だけを抜き出す（未指定とNoneは区別する）"""
+    return {key: config[key] for key in keys if key in config}
+
+
+@dataclass
+class GeneratedTemplate:
+    """生成済みテンプレート"""
+    template: Dict[str, Any]
+    template_hash: str    # 正規化JSONのSHA-256（内容が同じなら常に同じ値）
+    template_body: str    # 正規化JSON（create_stack / update_stack の TemplateBody にそのまま使える）
+
 class CloudFormationGenerator:
     """CloudFormationテンプレート生成サービス"""
     
-    def __init__(self):
-        """初期化"""
+    def __init__(self, fragment_cache_size: int = 1024):
+        """
+        初期化
+        
+        Args:
+            fragment_cache_size: フラグメントキャッシュの上限件数（0でキャッシュしない）
+        """
         self.template_version = "2010-09-09"
         self.stack_prefix = "AltMX"
         
@@ -29,6 +65,16 @@ class CloudFormationGenerator:
         
         # ログ保持期間（日）
         self.log_retention_days = 30
+        
+        # フラグメントキャッシュ（参照する設定の部分集合 -> 生成済みリソースと正規化JSON）
+        self.fragment_cache_size = fragment_cache_size
+        self._fragment_cache: "OrderedDict[str, Dict[str, Tuple[Any, str]]]" = OrderedDict()
+        self._yaml_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_stats = {"hits": 0, "misses": 0, "yaml_hits": 0, "yaml_misses": 0}
+        
+        # 静的解析（リント・依存グラフ・クリティカルパス・コスト）
+        self.analyzer = TemplateAnalyzer()
     
     def generate_template(self, app_config: Dict[str, Any], aws_config: Dict[str, Any]) -> Dict[str, Any]:
         """テンプレート生成のエントリーポイント"""
@@ -43,7 +89,23 @@ class CloudFormationGenerator:
         }
         
         # ECSクラスター
-        template["Resources"]["ECSCluster"] = {
+        template["Resources"].update(self._generate_ecs_cluster(app_config))
+        
+        # タスク定義
+        template["Resources"]["ECSTaskDefinition"] = self.generate_task_definition(app_config)
+        
+        # ALB関連リソース
+        alb_resources = self.generate_alb_configuration(app_config, aws_config)
+        template["Resources"].update(alb_resources)
+        
+        # ECSサービス
+        template["Resources"].update(self._generate_ecs_service(app_config, aws_config))
+        
+        return template
+    
+    def _generate_ecs_cluster(self, app_config: Dict[str, Any]) -> Dict[str, Any]:
+        """ECSクラスター"""
+        cluster = {
             "Type": "AWS::ECS::Cluster",
             "Properties": {
                 "ClusterName": f"{self.stack_prefix}-{app_config['app_name']}-cluster",
@@ -64,15 +126,11 @@ class CloudFormationGenerator:
             }
         }
         
-        # タスク定義
-        template["Resources"]["ECSTaskDefinition"] = self.generate_task_definition(app_config)
-        
-        # ALB関連リソース
-        alb_resources = self.generate_alb_configuration(app_config, aws_config)
-        template["Resources"].update(alb_resources)
-        
-        # ECSサービス
-        template["Resources"]["ECSService"] = {
+        return {"ECSCluster": cluster}
+    
+    def _generate_ecs_service(self, app_config: Dict[str, Any], aws_config: Dict[str, Any]) -> Dict[str, Any]:
+        """ECSサービス"""
+        service = {
             "Type": "AWS::ECS::Service",
             "DependsOn": ["HTTPListener", "HTTPSListener"],
             "Properties": {
@@ -99,7 +157,7 @@ class CloudFormationGenerator:
             }
         }
         
-        return template
+        return {"ECSService": service}
     
     def generate_task_definition(self, app_config: Dict[str, Any]) -> Dict[str, Any]:
         """Fargateタスク定義の生成"""
@@ -368,11 +426,15 @@ class CloudFormationGenerator:
         
         # データベース設定があれば追加
         if "database" in app_config.get("features", []):
+            db_name = app_config.get("app_name", "app").replace("-", "_")
             env_vars.extend([
-                {"Name": "DATABASE_URL", "Value": {"Ref": "DatabaseURL"}},
+                # パスワードは Secrets Manager（DATABASE_PASSWORD）から渡す
+                {"Name": "DATABASE_URL", "Value": {
+                    "Fn::Sub": f"postgresql://${{DatabaseUsername}}@${{RDSInstance.Endpoint.Address}}:5432/{db_name}"
+                }},
                 {"Name": "DB_HOST", "Value": {"Fn::GetAtt": ["RDSInstance", "Endpoint.Address"]}},
                 {"Name": "DB_PORT", "Value": "5432"},
-                {"Name": "DB_NAME", "Value": app_config.get("app_name", "app").replace("-", "_")}
+                {"Name": "DB_NAME", "Value": db_name}
             ])
         
         # Redis/Cache設定
@@ -596,8 +658,110 @@ class CloudFormationGenerator:
         return db_resources
     
     def generate_complete_stack(self, app_config: Dict[str, Any], aws_config: Dict[str, Any]) -> Dict[str, Any]:
-        """完全なCloudFormationスタック生成"""
-        stack = {
+        """
+        完全なCloudFormationスタック生成
+        """
+        return self.render_stack(app_config, aws_config).template
+    
+    def render_stack(self, app_config: Dict[str, Any], aws_config: Dict[str, Any]) -> GeneratedTemplate:
+        """
+        完全なスタックの生成（ハッシュ・TemplateBody付き）
+        
+        テンプレートをフラグメント（IAM・SG・ログ・ECS・ALB・スケーリング・DB・パラメータ等）に分け、
+        各フラグメントが参照する設定の部分集合をキーにメモ化する。変わっていないフラグメントは
+        生成も正規化JSONへの変換も再利用し、テンプレート全体のハッシュは正規化JSONの連結から求める。
+        返すテンプレートはキャッシュのコピーのため、呼び出し側で変更してよい。
+        """
+        features = app_config.get("features", [])
+        feature_flags = {"database": "database" in features, "cache": "cache" in features}
+        app_name = _pick(app_config, ["app_name"])
+        
+        # 出力順は従来と同じ（Parameters → Resources → Outputs → Conditions）
+        sections = [
+            self._fragment(
+                "skeleton",
+                {"app": _pick(app_config, ["app_name", "port"]), "aws": _pick(aws_config, ["vpc_id", "subnet_ids"])},
+                lambda: self._generate_stack_skeleton(app_config, aws_config)
+            )
+        ]
+        resource_fragments = [
+            # IAMロール
+            self._fragment("iam_roles", app_name, lambda: self.generate_iam_roles(app_config)),
+            # セキュリティグループ
+            self._fragment("security_groups", _pick(aws_config, ["vpc_id"]), lambda: self.generate_security_groups(aws_config)),
+            # CloudWatchログ
+            self._fragment("cloudwatch_logs", app_name, lambda: self.generate_cloudwatch_logs(app_config)),
+            # ECS関連
+            self._fragment("ecs_cluster", app_name, lambda: self._generate_ecs_cluster(app_config)),
+            self._fragment(
+                "task_definition",
+                {"app": _pick(app_config, ["app_name", "cpu", "memory", "port", "environment", "runtime"]), "features": feature_flags},
+                lambda: {"ECSTaskDefinition": self.generate_task_definition(app_config)}
+            ),
+            self._fragment(
+                "alb",
+                {"app": _pick(app_config, ["app_name", "environment", "port"]),
+                 "aws": _pick(aws_config, ["subnet_ids", "vpc_id", "certificate_arn"])},
+                lambda: self.generate_alb_configuration(app_config, aws_config)
+            ),
+            self._fragment(
+                "ecs_service",
+                {"app": _pick(app_config, ["app_name", "port"]), "aws": _pick(aws_config, ["subnet_ids"])},
+                lambda: self._generate_ecs_service(app_config, aws_config)
+            ),
+            # オートスケーリング
+            self._fragment(
+                "auto_scaling",
+                _pick(app_config, ["min_capacity", "max_capacity", "target_cpu"]),
+                lambda: self.generate_auto_scaling(app_config)
+            )
+        ]
+        
+        # Route53 - Skip for live demos (DNS propagation risk)
+        # if aws_config.get("domain_name"):
+        # Route53 DNS は ライブデモでは不要（DNS伝搬時間がかかるため）
+        
+        # データベース（オプション）
+        if feature_flags["database"]:
+            resource_fragments.append(self._fragment(
+                "database",
+                {"app": app_name, "aws": _pick(aws_config, ["subnet_ids", "vpc_id"])},
+                lambda: self.generate_database_resources(app_config, aws_config)
+            ))
+        
+        # 出力値・条件（Conditions）
+        sections.append(self._fragment("outputs", {}, self._generate_stack_outputs))
+        sections.append(self._fragment(
+            "conditions", _pick(aws_config, ["certificate_arn"]), lambda: self._generate_stack_conditions(aws_config)
+        ))
+        
+        resources: Dict[str, Any] = {}
+        resource_json: Dict[str, str] = {}
+        for fragment in resource_fragments:
+            for logical_id, (resource, encoded) in fragment.items():
+                resources[logical_id] = copy.deepcopy(resource)
+                resource_json[logical_id] = encoded
+        
+        template: Dict[str, Any] = {}
+        template_json: Dict[str, str] = {}
+        for fragment in sections:
+            for key, (value, encoded) in fragment.items():
+                if key == "Outputs":
+                    template["Resources"] = resources
+                    template_json["Resources"] = _join_canonical(resource_json)
+                template[key] = copy.deepcopy(value)
+                template_json[key] = encoded
+        
+        template_body = _join_canonical(template_json)
+        return GeneratedTemplate(
+            template=template,
+            template_hash=hashlib.sha256(template_body.encode("utf-8")).hexdigest(),
+            template_body=template_body
+        )
+    
+    def _generate_stack_skeleton(self, app_config: Dict[str, Any], aws_config: Dict[str, Any]) -> Dict[str, Any]:
+        """スタックの先頭部分（バージョン・説明・メタデータ・パラメータ）"""
+        skeleton = {
             "AWSTemplateFormatVersion": self.template_version,
             "Description": f"Complete infrastructure stack for {app_config['app_name']} - Generated by AltMX",
             "Metadata": {
@@ -655,38 +819,14 @@ class CloudFormationGenerator:
                     "AllowedPattern": "[a-zA-Z0-9]*",
                     "Default": "TempPassword123"
                 }
-            },
-            "Resources": {},
-            "Outputs": {}
+            }
         }
         
-        # リソース追加
-        # IAMロール
-        stack["Resources"].update(self.generate_iam_roles(app_config))
-        
-        # セキュリティグループ
-        stack["Resources"].update(self.generate_security_groups(aws_config))
-        
-        # CloudWatchログ
-        stack["Resources"].update(self.generate_cloudwatch_logs(app_config))
-        
-        # ECS関連
-        ecs_template = self.generate_ecs_template(app_config, aws_config)
-        stack["Resources"].update(ecs_template["Resources"])
-        
-        # オートスケーリング
-        stack["Resources"].update(self.generate_auto_scaling(app_config))
-        
-        # Route53 - Skip for live demos (DNS propagation risk)
-        # if aws_config.get("domain_name"):
-        # Route53 DNS は ライブデモでは不要（DNS伝搬時間がかかるため）
-        
-        # データベース（オプション）
-        if "database" in app_config.get("features", []):
-            stack["Resources"].update(self.generate_database_resources(app_config, aws_config))
-        
-        # 出力値
-        stack["Outputs"] = {
+        return skeleton
+    
+    def _generate_stack_outputs(self) -> Dict[str, Any]:
+        """出力値"""
+        outputs = {
             "ApplicationURL": {
                 "Description": "URL of the application - Ready for immediate use",
                 "Value": {"Fn::Sub": "https://${ALB.DNSName}"},
@@ -717,23 +857,95 @@ class CloudFormationGenerator:
             }
         }
         
-        # 条件（Conditions） - Simplified for live demos
-        stack["Conditions"] = {
+        return {"Outputs": outputs}
+    
+    def _generate_stack_conditions(self, aws_config: Dict[str, Any]) -> Dict[str, Any]:
+        """条件（Conditions） - Simplified for live demos"""
+        conditions = {
             "HasCertificate": {"Fn::Not": [{"Fn::Equals": [aws_config.get("certificate_arn", ""), ""]}]}
         }
         
-        return stack
+        return {"Conditions": conditions}
+    
+    def _fragment(self, name: str, dependencies: Dict[str, Any],
+                  builder: Callable[[], Dict[str, Any]]) -> Dict[str, Tuple[Any, str]]:
+        """
+        フラグメントのメモ化
+        
+        Args:
+            name: フラグメント名
+            dependencies: フラグメントが参照する設定（これと生成器の既定値が同じなら再利用）
+            builder: 生成関数（{キー: 値} を返す）
+        
+        Returns:
+            {キー: (値, 値の正規化JSON)}（値は共有されるため変更しないこと）
+        """
+        key = f"{name}:{canonical_json([self._settings_key(), dependencies])}"
+        with self._cache_lock:
+            cached = self._fragment_cache.get(key)
+            if cached is not None:
+                self._fragment_cache.move_to_end(key)
+                self._cache_stats["hits"] += 1
+                return cached
+        
+        fragment = {item_key: (value, canonical_json(value)) for item_key, value in builder().items()}
+        
+        with self._cache_lock:
+            self._cache_stats["misses"] += 1
+            if self.fragment_cache_size > 0:
+                self._fragment_cache[key] = fragment
+                while len(self._fragment_cache) > self.fragment_cache_size:
+                    self._fragment_cache.popitem(last=False)
+        return fragment
+    
+    def _settings_key(self) -> List[Any]:
+        """フラグメントに影響する生成器の設定"""
+        return [
+            self.template_version, self.stack_prefix, self.default_cpu, self.default_memory,
+            self.default_port, self.default_min_capacity, self.default_max_capacity,
+            self.default_target_cpu, self.log_retention_days
+        ]
+    
+    @staticmethod
+    def template_hash(template: Dict[str, Any]) -> str:
+        """テンプレートのハッシュ（render_stack の template_hash と同じ定義）"""
+        return hashlib.sha256(canonical_json(template).encode("utf-8")).hexdigest()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            return {
+                **self._cache_stats,
+                "fragments": len(self._fragment_cache),
+                "yaml_entries": len(self._yaml_cache)
+            }
     
     def export_to_yaml(self, template: Dict[str, Any]) -> str:
-        """テンプレートをYAML形式でエクスポート"""
-        return yaml.dump(template, default_flow_style=False, sort_keys=False)
+        """テンプレートをYAML形式でエクスポート（yaml.dump は遅いため同じ内容の出力は再利用）"""
+        # キー順も出力に影響するため、ハッシュはキー順を保ったJSONから求める
+        key = hashlib.sha256(json.dumps(template, ensure_ascii=False).encode("utf-8")).hexdigest()
+        with self._cache_lock:
+            cached = self._yaml_cache.get(key)
+            if cached is not None:
+                self._yaml_cache.move_to_end(key)
+                self._cache_stats["yaml_hits"] += 1
+                return cached
+        
+        exported = yaml.dump(template, default_flow_style=False, sort_keys=False)
+        
+        with self._cache_lock:
+            self._cache_stats["yaml_misses"] += 1
+            if self.fragment_cache_size > 0:
+                self._yaml_cache[key] = exported
+                while len(self._yaml_cache) > 64:
+                    self._yaml_cache.popitem(last=False)
+        return exported
     
     def export_to_json(self, template: Dict[str, Any]) -> str:
         """テンプレートをJSON形式でエクスポート"""
         return json.dumps(template, indent=2)
     
     def validate_template(self, template: Dict[str, Any]) -> bool:
-        """テンプレートの基本的な検証"""
+        """テンプレートの検証（必須セクション + 静的解析でエラーがないこと）"""
         required_sections = ["AWSTemplateFormatVersion", "Resources"]
         for section in required_sections:
             if section not in template:
@@ -744,4 +956,16 @@ class CloudFormationGenerator:
             logger.error("Template has no resources defined")
             return False
         
-        return True
\ No newline at end of file
+        # 未解決の参照・循環依存・クォータ超過などのリント
+        analysis = self.analyze_template(template)
+        for issue in analysis.issues:
+            if issue.severity == "error":
+                logger.error(f"Template lint error [{issue.code}]: {issue.message}")
+            elif issue.severity == "warning":
+                logger.warning(f"Template lint warning [{issue.code}]: {issue.message}")
+        
+        return analysis.is_valid
+    
+    def analyze_template(self, template: Dict[str, Any]) -> TemplateAnalysis:
+        """テンプレートの静的解析（デプロイ前に遅い・高いリソースを把握する）"""
+        return self.analyzer.analyze(template)
\ No newline at end of file
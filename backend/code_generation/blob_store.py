@@ -0,0 +1,201 @@
+"""
+Blob Store - コンテンツアドレス型ファイルストア
+内容ハッシュ → ファイルの重複排除ストレージ（参照カウント付き）
+"""
+
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """
+    コンテンツアドレス型ストア
+
+    同一内容は1つのblobとして保存し、セッションディレクトリへはハードリンクで
+    配置する（ハードリンク不可の環境ではコピー）。書き込みは一時ファイル + rename
+    で原子的に行い、参照カウントが0になったblobを削除する。
+    ルートは複数プロセスで共有されうるため、他インスタンスのblob・一時ファイルには触れない。
+    クラッシュしたプロセスの残骸は reclaim_orphans で回収する（どこからもリンクされず、
+    猶予時間より古いものだけ。put は既存blobの更新時刻を進めるため、配置中のblobは対象外）。
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._tmp_dir = self.root / "tmp"
+        self._tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        self._refcounts: Dict[str, int] = {}
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._total_references = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        """内容ハッシュ（SHA-256）"""
+        return hashlib.sha256(data).hexdigest()
+
+    def path_for(self, digest: str) -> Path:
+        """blobの保存パス（先頭2文字でシャーディング）"""
+        return self.root / digest[:2] / digest
+
+    def put(self, data: bytes) -> str:
+        """
+        blob保存（既存なら書き込まない）と参照カウント加算
+
+        Args:
+            data: 保存内容
+
+        Returns:
+            内容ハッシュ
+        """
+        digest = self.hash_bytes(data)
+        path = self.path_for(digest)
+
+        with self._lock:
+            # 参照中でも別インスタンスの release・回収で消えている場合があるため、存在しなければ書き直す
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                self._atomic_write(path, data)
+            else:
+                # 配置（link_into）までの間に他インスタンスの回収対象にならないよう更新時刻を進める
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    self._atomic_write(path, data)
+            if digest not in self._refcounts:
+                self._refcounts[digest] = 0
+                self._sizes[digest] = len(data)
+                self._total_bytes += len(data)
+            self._refcounts[digest] += 1
+            self._total_references += 1
+
+        return digest
+
+    def release(self, digest: str) -> None:
+        """参照カウント減算（0になったblobは削除）"""
+        with self._lock:
+            count = self._refcounts.get(digest)
+            if count is None:
+                return
+            self._total_references -= 1
+            if count > 1:
+                self._refcounts[digest] = count - 1
+                return
+
+            del self._refcounts[digest]
+            self._total_bytes -= self._sizes.pop(digest, 0)
+            path = self.path_for(digest)
+
+            # 確認と削除はロック内で行う（同じ内容の put が存在確認後に消されないように）
+            try:
+                # 同じルートを共有する別インスタンスのハードリンクが残っていれば消さない
+                if path.exists() and path.stat().st_nlink <= 1:
+                    path.unlink()
+            except OSError as e:
+                logger.warning(f"Failed to remove blob {digest[:12]}: {e}")
+
+    def link_into(self, digest: str, dest: Path) -> None:
+        """
+        blobを配置先パスへ原子的に配置（ハードリンク、不可ならコピー）
+
+        Args:
+            digest: 内容ハッシュ
+            dest: 配置先パス
+        """
+        source = self.path_for(digest)
+        tmp_path = dest.parent / f".{dest.name}.{uuid.uuid4().hex}.tmp"
+
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+
+        os.replace(tmp_path, dest)
+
+    def read_bytes(self, digest: str) -> bytes:
+        """blob内容取得"""
+        return self.path_for(digest).read_bytes()
+
+    def get_refcount(self, digest: str) -> int:
+        """参照カウント取得"""
+        with self._lock:
+            return self._refcounts.get(digest, 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """統計情報"""
+        with self._lock:
+            return {
+                "blob_count": len(self._refcounts),
+                "total_bytes": self._total_bytes,
+                "total_references": self._total_references
+            }
+
+    def reclaim_orphans(self, min_age: float) -> int:
+        """
+        前回プロセスの残骸（どこからもリンクされていないblob・書きかけの一時ファイル）を削除
+
+        他インスタンスが書き込み・配置中のものを消さないよう、更新から min_age 秒以上
+        経ったものだけを対象にする。自インスタンスが参照中のblobは残す。
+
+        Args:
+            min_age: 猶予時間（秒）
+
+        Returns:
+            削除したファイル数
+        """
+        cutoff = time.time() - min_age
+        removed = 0
+
+        try:
+            for tmp_file in self._tmp_dir.iterdir():
+                if self._remove_if_stale(tmp_file, cutoff):
+                    removed += 1
+
+            for shard in self.root.iterdir():
+                if shard == self._tmp_dir or not shard.is_dir():
+                    continue
+                for blob in shard.iterdir():
+                    with self._lock:
+                        if blob.name in self._refcounts:
+                            continue
+                        if self._remove_if_stale(blob, cutoff, unlinked_only=True):
+                            removed += 1
+        except OSError as e:
+            logger.warning(f"Blob store orphan sweep failed: {e}")
+
+        if removed:
+            logger.info(f"Reclaimed {removed} orphaned blob store files")
+        return removed
+
+    @staticmethod
+    def _remove_if_stale(path: Path, cutoff: float, unlinked_only: bool = False) -> bool:
+        """更新時刻が cutoff より古ければ削除（unlinked_only ならハードリンクが残っていないものだけ）"""
+        try:
+            stat = path.stat()
+            if stat.st_mtime >= cutoff or (unlinked_only and stat.st_nlink > 1):
+                return False
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _atomic_write(self, path: Path, data: bytes) -> None:
+        """一時ファイルへ書き込み後 rename"""
+        tmp_path = self._tmp_dir / f"{path.name}.{uuid.uuid4().hex}"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            raise
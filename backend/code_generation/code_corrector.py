@@ -4,8 +4,10 @@ Code Corrector - テストを通すための最小実装（Green段階）
 """
 
 import re
-from typing import List, Dict, Any, Optional, Set
-from dataclasses import dataclass
+from bisect import bisect_right
+from collections import Counter
+from typing import List, Dict, Any, Optional, Set, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
 
 from .response_parser import CodeBlock
@@ -25,6 +27,110 @@ class CorrectionSuggestion:
     confidence: float = 0.8  # 0.0 - 1.0
 
 
+@dataclass(frozen=True)
+class CorrectionPatch:
+    """修正パッチ（元コンテンツ上の [start, end) を replacement で置換）"""
+    start: int
+    end: int
+    replacement: str
+    correction_type: str
+    line: int = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """辞書形式変換"""
+        return {
+            "start": self.start,
+            "end": self.end,
+            "replacement": self.replacement,
+            "correction_type": self.correction_type,
+            "line": self.line
+        }
+
+
+@dataclass
+class CorrectionPatchSet:
+    """1ファイル分の修正パッチ集合"""
+    filename: str
+    patches: List[CorrectionPatch] = field(default_factory=list)
+    
+    def has_changes(self) -> bool:
+        """修正有無"""
+        return bool(self.patches)
+    
+    def apply(self, content: str) -> str:
+        """元コンテンツへパッチを一括適用"""
+        return _apply_patch_list(content, self.patches)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """辞書形式変換"""
+        return {
+            "filename": self.filename,
+            "patches": [patch.to_dict() for patch in self.patches]
+        }
+
+
+_VAR_DECLARATION_PATTERN = re.compile(r'\bvar\s+(\w+)\s*=')
+_ASSIGNMENT_PATTERN = re.compile(r'\b(\w+)\s*=')
+_COMPONENT_PATTERN = re.compile(r'\b(const|var)\s+(\w+)\s*=\s*\(\s*\{\s*([^}]+)\s*\}\s*\)\s*=>')
+
+
+class _CorrectionScan:
+    """
+    修正用の1回スキャン結果
+    行オフセットと識別子ごとの代入回数を一度だけ計算して各修正で共有する
+    """
+    
+    def __init__(self, content: str):
+        self.content = content
+        
+        self.line_starts = [0]
+        self.line_spans: List[Tuple[int, int]] = []
+        for line in content.split('\n'):
+            start = self.line_starts[-1]
+            self.line_spans.append((start, start + len(line)))
+            self.line_starts.append(start + len(line) + 1)
+        self.line_starts.pop()
+        
+        # 識別子ごとの `name =` 出現回数（再代入判定用）
+        self.assignment_counts = Counter(
+            match.group(1) for match in _ASSIGNMENT_PATTERN.finditer(content)
+        )
+    
+    def line_of(self, offset: int) -> int:
+        """オフセットから行番号（1始まり）"""
+        return bisect_right(self.line_starts, offset)
+
+
+def _resolve_overlaps(patches: List[CorrectionPatch]) -> List[CorrectionPatch]:
+    """開始位置順に整列し、先行パッチと重なるものを除外"""
+    resolved: List[CorrectionPatch] = []
+    last_end = 0
+    
+    for patch in sorted(patches, key=lambda p: p.start):
+        if patch.start < last_end:
+            continue
+        resolved.append(patch)
+        last_end = max(last_end, patch.end)
+    
+    return resolved
+
+
+def _apply_patch_list(content: str, patches: List[CorrectionPatch]) -> str:
+    """ソート済み・非重複パッチを1パスで適用"""
+    if not patches:
+        return content
+    
+    parts = []
+    cursor = 0
+    for patch in patches:
+        parts.append(content[cursor:patch.start])
+        parts.append(patch.replacement)
+        cursor = patch.end
+    parts.append(content[cursor:])
+    
+    return ''.join(parts)
+
+
 class CodeCorrector:
     """
     コード自動修正システム
@@ -76,32 +182,11 @@ class CodeCorrector:
         Returns:
             修正されたコードブロック（修正不要の場合はNone）
         """
-        corrected_content = block.content
-        has_changes = False
+        patch_set = self.compute_patches(block)
         
-        # React/TypeScript固有修正
-        corrected_content, react_changes = self._apply_react_fixes(corrected_content)
-        has_changes |= react_changes
-        
-        # 一般的な修正
-        for fix_type, pattern_config in self.correction_patterns.items():
-            if fix_type == "semicolons":
-                new_content, changed = self._fix_semicolons(corrected_content)
-                corrected_content = new_content
-                has_changes |= changed
-            elif fix_type == "var_to_const":
-                new_content, changed = self._fix_var_declarations(corrected_content)
-                corrected_content = new_content
-                has_changes |= changed
-        
-        # 型注釈修正
-        new_content, type_changes = self._add_basic_type_annotations(corrected_content)
-        corrected_content = new_content
-        has_changes |= type_changes
-        
-        if has_changes:
+        if patch_set.has_changes():
             return CodeBlock(
-                content=corrected_content,
+                content=patch_set.apply(block.content),
                 filename=block.filename,
                 language=block.language,
                 description=block.description
@@ -109,26 +194,63 @@ class CodeCorrector:
         
         return None
     
+    def compute_patches(self, block: CodeBlock) -> CorrectionPatchSet:
+        """
+        修正パッチ計算（コンテンツは書き換えない）
+        
+        1回のスキャン結果から各修正の (範囲, 置換文字列) を元コンテンツ上の
+        座標で収集する。クライアントはファイル全体ではなく差分だけを受け取れる。
+        
+        Args:
+            block: 修正対象コードブロック
+            
+        Returns:
+            元コンテンツに対するパッチセット
+        """
+        content = block.content
+        scan = _CorrectionScan(content)
+        
+        patches: List[CorrectionPatch] = []
+        # React/TypeScript固有修正
+        patches.extend(self._collect_react_import_patches(content, scan))
+        # 一般的な修正
+        patches.extend(self._collect_semicolon_patches(scan))
+        patches.extend(self._collect_var_patches(scan))
+        # 型注釈修正
+        patches.extend(self._collect_type_annotation_patches(scan))
+        
+        return CorrectionPatchSet(
+            filename=block.filename,
+            patches=_resolve_overlaps(patches)
+        )
+    
+    def _collect_react_import_patches(self, content: str, scan: '_CorrectionScan') -> List[CorrectionPatch]:
+        """React import修正パッチ"""
+        needs_react = self.react_fixes["missing_react_import"]["condition"](content)
+        needs_use_state = self.react_fixes["missing_usestate_import"]["condition"](content)
+        
+        if needs_react and not content.startswith("import React"):
+            import_line = "import React, { useState } from 'react';" if needs_use_state else "import React from 'react';"
+            return [CorrectionPatch(0, 0, import_line + "\n\n", "missing_react_import", line=1)]
+        
+        if not needs_use_state:
+            return []
+        
+        # 既存のReact importへの追記、なければ先頭に挿入
+        for line_no, (start, end) in enumerate(scan.line_spans, 1):
+            line = content[start:end]
+            if line.startswith("import React") and "from 'react'" in line:
+                new_line = self._add_react_hook_import(line, "useState")
+                if new_line == line:
+                    return []
+                return [CorrectionPatch(start, end, new_line, "missing_usestate_import", line=line_no)]
+        
+        return [CorrectionPatch(0, 0, "import React, { useState } from 'react';\n", "missing_usestate_import", line=1)]
+    
     def _apply_react_fixes(self, content: str) -> tuple[str, bool]:
         """React固有の修正適用"""
-        corrected = content
-        has_changes = False
-        
-        # React import追加
-        if self.react_fixes["missing_react_import"]["condition"](content):
-            if not corrected.startswith("import React"):
-                corrected = self.react_fixes["missing_react_import"]["fix"] + corrected
-                has_changes = True
-        
-        # useState import追加
-        if self.react_fixes["missing_usestate_import"]["condition"](content):
-            if callable(self.react_fixes["missing_usestate_import"]["fix"]):
-                new_content = self.react_fixes["missing_usestate_import"]["fix"](corrected)
-                if new_content != corrected:
-                    corrected = new_content
-                    has_changes = True
-        
-        return corrected, has_changes
+        patches = self._collect_react_import_patches(content, _CorrectionScan(content))
+        return _apply_patch_list(content, patches), bool(patches)
     
     def _add_react_hook_import(self, content: str, hook: str) -> str:
         """React Hook import追加"""
@@ -158,12 +280,13 @@ class CodeCorrector:
         
         return content
     
-    def _fix_semicolons(self, content: str) -> tuple[str, bool]:
-        """セミコロン不足修正"""
-        lines = content.split('\n')
-        has_changes = False
+    def _collect_semicolon_patches(self, scan: '_CorrectionScan') -> List[CorrectionPatch]:
+        """セミコロン不足修正パッチ"""
+        patches = []
+        content = scan.content
         
-        for i, line in enumerate(lines):
+        for line_no, (start, end) in enumerate(scan.line_spans, 1):
+            line = content[start:end]
             stripped = line.strip()
             
             # セミコロンが必要な行パターン
@@ -176,34 +299,35 @@ class CodeCorrector:
             )
             
             if needs_semicolon:
-                lines[i] = line.rstrip() + ';'
-                has_changes = True
+                # 行末の空白ごと置換（rstrip + ';' と同等）
+                patches.append(CorrectionPatch(start + len(line.rstrip()), end, ';', "semicolons", line=line_no))
         
-        return '\n'.join(lines), has_changes
+        return patches
     
-    def _fix_var_declarations(self, content: str) -> tuple[str, bool]:
-        """var宣言をconst/letに修正"""
-        has_changes = False
-        
-        # var を const に置換（再代入がない場合）
-        var_pattern = re.compile(r'\bvar\s+(\w+)\s*=')
-        matches = var_pattern.finditer(content)
+    def _fix_semicolons(self, content: str) -> tuple[str, bool]:
+        """セミコロン不足修正"""
+        patches = self._collect_semicolon_patches(_CorrectionScan(content))
+        return _apply_patch_list(content, patches), bool(patches)
+    
+    def _collect_var_patches(self, scan: '_CorrectionScan') -> List[CorrectionPatch]:
+        """var宣言をconst/letに修正するパッチ"""
+        patches = []
         
-        corrected = content
-        for match in matches:
+        for match in _VAR_DECLARATION_PATTERN.finditer(scan.content):
             var_name = match.group(1)
-            
-            # 再代入チェック（簡易）
-            assignment_count = len(re.findall(rf'\b{var_name}\s*=', content))
-            
-            if assignment_count == 1:  # 宣言のみ
-                corrected = corrected.replace(f'var {var_name}', f'const {var_name}')
-                has_changes = True
-            else:  # 再代入がある
-                corrected = corrected.replace(f'var {var_name}', f'let {var_name}')
-                has_changes = True
-        
-        return corrected, has_changes
+            # 宣言のみならconst、再代入があればlet
+            keyword = "const" if scan.assignment_counts[var_name] == 1 else "let"
+            patches.append(CorrectionPatch(
+                match.start(), match.start() + 3, keyword, "var_to_const",
+                line=scan.line_of(match.start())
+            ))
+        
+        return patches
+    
+    def _fix_var_declarations(self, content: str) -> tuple[str, bool]:
+        """var宣言をconst/letに修正"""
+        patches = self._collect_var_patches(_CorrectionScan(content))
+        return _apply_patch_list(content, patches), bool(patches)
     
     def get_correction_suggestions(self, block: CodeBlock) -> List[CorrectionSuggestion]:
         """
@@ -347,40 +471,46 @@ class CodeCorrector:
         
         return '\n'.join(lines[start:end])
     
-    def _add_basic_type_annotations(self, content: str) -> tuple[str, bool]:
-        """基本的な型注釈追加"""
-        corrected = content
-        has_changes = False
+    def _collect_type_annotation_patches(self, scan: '_CorrectionScan') -> List[CorrectionPatch]:
+        """基本的な型注釈追加パッチ"""
+        patches = []
         
         # React.FC型注釈追加（関数コンポーネント）
-        component_pattern = r'const\s+(\w+)\s*=\s*\(\s*\{\s*([^}]+)\s*\}\s*\)\s*=>'
-        matches = re.finditer(component_pattern, content)
-        
-        for match in matches:
-            component_name = match.group(1)
-            props = match.group(2)
+        for match in _COMPONENT_PATTERN.finditer(scan.content):
+            keyword, component_name, props = match.group(1), match.group(2), match.group(3)
             
-            # 既に型注釈がある場合はスキップ
-            if ': React.FC' not in match.group(0) and 'React.FC' not in match.group(0):
-                # プロパティから型を推測
-                prop_types = []
-                for prop in props.split(','):
-                    prop_name = prop.strip()
-                    if prop_name:
-                        # 簡易的な型推測
-                        if 'name' in prop_name.lower():
-                            prop_types.append(f'{prop_name}: string')
-                        elif 'age' in prop_name.lower() or 'id' in prop_name.lower():
-                            prop_types.append(f'{prop_name}: number')
-                        elif 'on' in prop_name.lower():
-                            prop_types.append(f'{prop_name}: () => void')
-                        else:
-                            prop_types.append(f'{prop_name}: any')
-                
-                if prop_types:
-                    type_def = f'{{ {", ".join(prop_types)} }}'
-                    new_signature = f'const {component_name}: React.FC<{type_def}> = ({{ {props} }}) =>'
-                    corrected = corrected.replace(match.group(0), new_signature)
-                    has_changes = True
-        
-        return corrected, has_changes
\ No newline at end of file
+            # 再代入のあるvarはletになるため対象外
+            if keyword == "var" and scan.assignment_counts[component_name] != 1:
+                continue
+            
+            # プロパティから型を推測
+            prop_types = []
+            for prop in props.split(','):
+                prop_name = prop.strip()
+                if prop_name:
+                    # 簡易的な型推測
+                    if 'name' in prop_name.lower():
+                        prop_types.append(f'{prop_name}: string')
+                    elif 'age' in prop_name.lower() or 'id' in prop_name.lower():
+                        prop_types.append(f'{prop_name}: number')
+                    elif 'on' in prop_name.lower():
+                        prop_types.append(f'{prop_name}: () => void')
+                    else:
+                        prop_types.append(f'{prop_name}: any')
+            
+            if prop_types:
+                # キーワード部分はvar修正パッチと重ならないよう名前の直後から置換
+                type_def = f'{{ {", ".join(prop_types)} }}'
+                patches.append(CorrectionPatch(
+                    match.end(2), match.end(),
+                    f': React.FC<{type_def}> = ({{ {props} }}) =>',
+                    "type_annotations",
+                    line=scan.line_of(match.start())
+                ))
+        
+        return patches
+    
+    def _add_basic_type_annotations(self, content: str) -> tuple[str, bool]:
+        """基本的な型注釈追加"""
+        patches = self._collect_type_annotation_patches(_CorrectionScan(content))
+        return _apply_patch_list(content, patches), bool(patches)
@@ -0,0 +1,211 @@
+"""
+Dependency Cache - 生成アプリ用 node_modules 共有キャッシュ
+正規化した package.json の依存集合をキーに、インストール済み node_modules を再利用する
+"""
+
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+import platform
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Union
+
+logger = logging.getLogger(__name__)
+
+# キャッシュへ含めないディレクトリ（ビルドツールの書き込み先）
+_EXCLUDED_DIRS = {".cache"}
+
+
+class DependencyCache:
+    """
+    node_modules キャッシュ
+
+    - キー: dependencies / devDependencies のみを正規化したJSON + プラットフォームのハッシュ
+      （name・version・scripts の違いではキャッシュを分けない）
+    - 格納: root/<key>/node_modules（インストール完了後に一時ディレクトリから rename）
+    - 展開: ハードリンクでプロジェクトへ配置（リンク不可ならコピー）
+    - キャッシュミス時のnpmには共有の --cache ディレクトリを渡し、tarballを再利用する
+    - 展開中のエントリは prune の対象外（削除は展開と同じロック下で退避用の名前へ rename してから行う）
+    """
+
+    def __init__(self, root: str, max_entries: int = 20):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.npm_cache_dir = self.root / "_npm_cache"
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._in_use: Dict[str, int] = {}  # 展開中のエントリ（キー → 展開数）
+        self._stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def normalize(package_json: Union[str, Dict[str, Any]]) -> Dict[str, Dict[str, str]]:
+        """依存集合の正規化（キー順ソート）"""
+        if isinstance(package_json, str):
+            package_json = json.loads(package_json)
+
+        return {
+            section: dict(sorted((package_json.get(section) or {}).items()))
+            for section in ("dependencies", "devDependencies")
+        }
+
+    def key_for(self, package_json: Union[str, Dict[str, Any]]) -> str:
+        """
+        キャッシュキー算出
+
+        Args:
+            package_json: package.json の内容（FileOrganizer._generate_package_json の出力も可）
+        """
+        canonical = json.dumps(
+            {"deps": self.normalize(package_json), "platform": [platform.system(), platform.machine()]},
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.root / key
+
+    def has(self, key: str) -> bool:
+        return (self.entry_path(key) / "node_modules").is_dir()
+
+    def materialize(self, key: str, project_path: Path) -> bool:
+        """
+        キャッシュ済み node_modules をプロジェクトへ展開
+
+        Returns:
+            キャッシュヒットしたか
+        """
+        entry = self.entry_path(key)
+        with self._lock:
+            if not self.has(key):
+                self._stats["misses"] += 1
+                return False
+            # 展開が終わるまで prune で消されないよう使用中にする
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        try:
+            project_path = Path(project_path)
+            self._link_tree(entry / "node_modules", project_path / "node_modules")
+
+            lock_file = entry / "package-lock.json"
+            if lock_file.exists() and not (project_path / "package-lock.json").exists():
+                shutil.copy2(lock_file, project_path / "package-lock.json")
+
+            # LRU判定用に最終利用時刻を更新
+            os.utime(entry, None)
+        finally:
+            with self._lock:
+                if self._in_use[key] > 1:
+                    self._in_use[key] -= 1
+                else:
+                    del self._in_use[key]
+
+        with self._lock:
+            self._stats["hits"] += 1
+        logger.info(f"node_modules restored from cache {key[:12]}")
+        return True
+
+    def populate(self, key: str, project_path: Path) -> bool:
+        """
+        インストール済み node_modules をキャッシュへ登録
+
+        Returns:
+            登録したか（既に登録済み・node_modulesがない場合はFalse）
+        """
+        project_path = Path(project_path)
+        source = project_path / "node_modules"
+        if self.has(key) or not source.is_dir():
+            return False
+
+        staging = self.root / f".staging-{uuid.uuid4().hex}"
+        try:
+            self._link_tree(source, staging / "node_modules")
+            lock_file = project_path / "package-lock.json"
+            if lock_file.exists():
+                shutil.copy2(lock_file, staging / "package-lock.json")
+
+            try:
+                os.rename(staging, self.entry_path(key))
+            except OSError:
+                # 同じキーを別のデプロイが先に登録した
+                shutil.rmtree(staging, ignore_errors=True)
+                return False
+        except OSError as e:
+            logger.warning(f"Failed to populate dependency cache {key[:12]}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+
+        logger.info(f"node_modules cached as {key[:12]}")
+        self.prune()
+        return True
+
+    def npm_install_args(self) -> List[str]:
+        """キャッシュミス時のnpm installオプション（共有tarballストアを優先使用）"""
+        return ["--prefer-offline", "--no-audit", "--no-fund", "--cache", str(self.npm_cache_dir)]
+
+    def prune(self) -> int:
+        """
+        最終利用が古いエントリから削除（max_entries を超えた分、展開中のエントリは除く）
+
+        対象の選定と退避用の名前への rename はロック下で行い、materialize と競合しないようにする。
+        展開済みのプロジェクトはハードリンクで同じ実体を持つため、キャッシュ側の削除では壊れない。
+        """
+        doomed: List[Path] = []
+        with self._lock:
+            entries = [
+                path for path in self.root.iterdir()
+                if path.is_dir() and not path.name.startswith((".", "_"))
+            ]
+            excess = len(entries) - self.max_entries
+            if excess <= 0:
+                return 0
+
+            entries.sort(key=lambda path: path.stat().st_mtime)
+            for path in entries:
+                if len(doomed) >= excess:
+                    break
+                if path.name in self._in_use:
+                    continue
+                trash = self.root / f".trash-{uuid.uuid4().hex}"
+                try:
+                    os.rename(path, trash)
+                except OSError as e:
+                    logger.warning(f"Failed to evict dependency cache {path.name[:12]}: {e}")
+                    continue
+                doomed.append(trash)
+
+        for trash in doomed:
+            shutil.rmtree(trash, ignore_errors=True)
+        return len(doomed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["entries"] = sum(
+            1 for path in self.root.iterdir()
+            if path.is_dir() and not path.name.startswith((".", "_"))
+        )
+        return stats
+
+    @staticmethod
+    def _link_tree(source: Path, dest: Path):
+        """ディレクトリツリーをハードリンクで複製（シンボリックリンクはそのまま）"""
+        def link_or_copy(src, dst):
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+            return dst
+
+        shutil.copytree(
+            source,
+            dest,
+            symlinks=True,
+            copy_function=link_or_copy,
+            dirs_exist_ok=True,
+            ignore=lambda directory, names: [name for name in names if name in _EXCLUDED_DIRS]
+        )
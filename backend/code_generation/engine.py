@@ -42,6 +42,7 @@ class GenerationResult:
     errors: List[str] = field(default_factory=list)
     warnings: List[str] = field(default_factory=list)
     performance_metrics: Dict[str, Any] = field(default_factory=dict)
+    corrections: List[Dict[str, Any]] = field(default_factory=list)
     
     def add_error(self, error: str):
         """エラー追加"""
@@ -183,7 +184,8 @@ class CodeGenerationEngine:
                 generated_files=cached_result["generated_files"],
                 errors=cached_result["errors"],
                 warnings=cached_result["warnings"],
-                performance_metrics=cached_result.get("performance_metrics", {})
+                performance_metrics=cached_result.get("performance_metrics", {}),
+                corrections=cached_result.get("corrections", [])
             )
             result.performance_metrics["cache_hit"] = True
             return result
@@ -199,7 +201,8 @@ class CodeGenerationEngine:
                 "generated_files": result.generated_files,
                 "errors": result.errors,
                 "warnings": result.warnings,
-                "performance_metrics": result.performance_metrics
+                "performance_metrics": result.performance_metrics,
+                "corrections": result.corrections
             }
             
             # TTL計算（複雑度に基づく）
@@ -410,9 +413,15 @@ class CodeGenerationEngine:
                 
                 # 自動修正
                 if self.config['enable_auto_correction'] and not validation_result.is_valid:
-                    corrected_block = self.corrector.fix_common_issues(block)
-                    if corrected_block:
-                        validated_blocks.append(corrected_block)
+                    patch_set = self.corrector.compute_patches(block)
+                    if patch_set.has_changes():
+                        validated_blocks.append(CodeBlock(
+                            content=patch_set.apply(block.content),
+                            filename=block.filename,
+                            language=block.language,
+                            description=block.description
+                        ))
+                        result.corrections.append(patch_set.to_dict())
                         result.add_warning(f"Auto-corrected issues in {block.filename}")
                     else:
                         validated_blocks.append(block)
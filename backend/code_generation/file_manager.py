@@ -6,28 +6,42 @@ File Manager - Green段階（テストを通すための実装）
 import os
 import time
 import uuid
+import heapq
 import shutil
+import asyncio
 import logging
+import weakref
+import itertools
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
 import threading
 
+from .blob_store import BlobStore
+
 logger = logging.getLogger(__name__)
 
+# セッションディレクトリの有効期限マーカー（更新時刻 = 有効期限）
+SESSION_LEASE_NAME = ".lease"
+
 
 @dataclass
 class FileEntry:
-    """ファイルエントリ"""
+    """
+    ファイルエントリ（セッションマニフェストの1行）
+    内容はメモリに保持せず、blobへのハッシュと配置パスのみを持つ
+    """
     filename: str
-    content: str
+    content_hash: str
     language: str
     size: int = 0
+    path: str = ""
     created_at: float = field(default_factory=time.time)
     
-    def __post_init__(self):
-        if self.size == 0:
-            self.size = len(self.content.encode('utf-8'))
+    @property
+    def content(self) -> str:
+        """内容（ディスクから読み込み）"""
+        return Path(self.path).read_text(encoding='utf-8')
 
 
 @dataclass
@@ -37,16 +51,151 @@ class PreviewSession:
     files: List[FileEntry] = field(default_factory=list)
     created_at: float = field(default_factory=time.time)
     ttl: int = 3600  # デフォルト1時間
+    # 期限変更通知（FileManagerが期限ヒープへ再登録する）
+    _deadline_listener: Optional[Callable[["PreviewSession"], None]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    
+    def __setattr__(self, name: str, value: Any):
+        super().__setattr__(name, value)
+        if name in ("created_at", "ttl"):
+            listener = getattr(self, "_deadline_listener", None)
+            if listener is not None:
+                listener(self)
+    
+    @property
+    def expires_at(self) -> float:
+        """有効期限（UNIX時刻）"""
+        return self.created_at + self.ttl
     
     def is_expired(self) -> bool:
         """有効期限切れチェック"""
-        return time.time() > (self.created_at + self.ttl)
+        return time.time() > self.expires_at
     
     def get_total_size(self) -> int:
         """総ファイルサイズ"""
         return sum(file_entry.size for file_entry in self.files)
 
 
+class ExpiryScheduler:
+    """
+    セッション有効期限スケジューラー
+    
+    期限を最小ヒープで管理し、専用スレッドのイベントループ上のasyncioタスクが
+    最も近い期限まで待機して期限切れ処理を呼び出す。登録・取り出しは O(log n)。
+    期限処理は resolution 秒単位でまとめて実行する。
+    """
+    
+    def __init__(self, on_due: Callable[[], Any], resolution: float = 1.0):
+        self._heap: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._resolution = resolution
+        
+        # 呼び出し元（FileManager）を生存させ続けないよう弱参照で保持
+        self._on_due = weakref.WeakMethod(on_due) if hasattr(on_due, "__self__") else (lambda: on_due)
+        
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+    
+    def schedule(self, deadline: float, session_id: str):
+        """期限登録（最短期限が早まった場合は待機中のタスクを起こす）"""
+        with self._lock:
+            earliest = self._heap[0][0] if self._heap else None
+            heapq.heappush(self._heap, (deadline, next(self._counter), session_id))
+        
+        if earliest is None or deadline < earliest:
+            self._wake()
+    
+    def pop_due(self, now: float) -> List[Tuple[float, str]]:
+        """期限到来済みエントリの取り出し"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] < now:
+                deadline, _, session_id = heapq.heappop(self._heap)
+                due.append((deadline, session_id))
+        return due
+    
+    def next_deadline(self) -> Optional[float]:
+        """最短期限"""
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._heap)
+    
+    def start(self):
+        """スケジューラースレッド開始"""
+        self._thread = threading.Thread(target=self._run_loop, name="session-expiry", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+    
+    def stop(self):
+        """スケジューラー停止"""
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass
+    
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _wake(self):
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass
+    
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        try:
+            self._task = loop.create_task(self._worker())
+            loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+    
+    async def _worker(self):
+        self._wakeup = asyncio.Event()
+        self._ready.set()
+        last_run = time.time()
+        
+        while True:
+            deadline = self.next_deadline()
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - time.time(), last_run + self._resolution - time.time(), 0)
+            
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+                self._wakeup.clear()
+                continue
+            except asyncio.TimeoutError:
+                pass
+            
+            on_due = self._on_due()
+            if on_due is None:
+                return
+            
+            last_run = time.time()
+            try:
+                # ディスク削除はイベントループ外で実行
+                await asyncio.to_thread(on_due)
+            except Exception as e:
+                logger.error(f"Expiry task error: {e}")
+            del on_due
+
+
 class FileManager:
     """
     一時ファイル管理システム
@@ -61,12 +210,26 @@ class FileManager:
         self._sessions: Dict[str, PreviewSession] = {}
         self._lock = threading.RLock()
         
+        # 集計値（保存・削除時に増分更新）
+        self._total_files = 0
+        self._total_size = 0
+        
+        # 保存・削除通知（プレビュー配信物の事前計算等）
+        self._save_listeners: List[Callable[[str, List[FileEntry]], None]] = []
+        self._cleanup_listeners: List[Callable[[str], None]] = []
+        
         # 一時ディレクトリ初期化
         self._init_temp_directory()
         
-        # クリーンアップスケジューラー
-        self._cleanup_timer = None
-        self._start_cleanup_scheduler()
+        # コンテンツアドレス型ストア（セッション間で同一内容を共有）
+        self.blob_store = BlobStore(os.path.join(self.temp_root, ".blobs"))
+        
+        # 前回プロセスの残骸（期限切れのセッションディレクトリ・どこからもリンクされないblob）を回収
+        self.reclaim_orphans()
+        
+        # 有効期限スケジューラー
+        self._expiry = ExpiryScheduler(self.cleanup_expired, self.config["expiry_resolution"])
+        self._expiry.start()
         
         logger.info(f"FileManager initialized with temp_root: {self.temp_root}")
     
@@ -78,7 +241,9 @@ class FileManager:
             "max_file_size": 10 * 1024 * 1024,  # 10MB
             "max_session_size": 100 * 1024 * 1024,  # 100MB
             "max_files_per_session": 100,
-            "cleanup_interval": 300,  # 5分
+            "cleanup_interval": 300,  # 5分（旧設定・未使用）
+            "expiry_resolution": 1.0,  # 期限処理の最小間隔（秒）
+            "orphan_grace": 300,  # 起動時の残骸回収で、期限切れ・更新からこの秒数を過ぎたものだけ消す
             "allowed_extensions": [".tsx", ".ts", ".jsx", ".js", ".css", ".json", ".html", ".md", ".txt"]
         }
         
@@ -96,28 +261,21 @@ class FileManager:
             logger.error(f"Failed to create temp directory: {e}")
             raise
     
-    def _start_cleanup_scheduler(self):
-        """クリーンアップスケジューラー開始"""
-        def cleanup_task():
+    def add_save_listener(self, callback: Callable[[str, List[FileEntry]], None]):
+        """ファイル保存リスナー追加（session_id, 保存されたエントリ）"""
+        self._save_listeners.append(callback)
+    
+    def add_cleanup_listener(self, callback: Callable[[str], None]):
+        """セッション削除リスナー追加（session_id）"""
+        self._cleanup_listeners.append(callback)
+    
+    def _notify(self, listeners: List[Callable], *args):
+        """リスナー通知（例外は記録のみ）"""
+        for callback in listeners:
             try:
-                self.cleanup_expired()
+                callback(*args)
             except Exception as e:
-                logger.error(f"Cleanup task error: {e}")
-            finally:
-                # 次回実行をスケジュール
-                self._cleanup_timer = threading.Timer(
-                    self.config["cleanup_interval"],
-                    cleanup_task
-                )
-                self._cleanup_timer.daemon = True
-                self._cleanup_timer.start()
-        
-        self._cleanup_timer = threading.Timer(
-            self.config["cleanup_interval"],
-            cleanup_task
-        )
-        self._cleanup_timer.daemon = True
-        self._cleanup_timer.start()
+                logger.error(f"FileManager listener error: {e}")
     
     def create_session(self, ttl: Optional[int] = None) -> str:
         """
@@ -138,13 +296,17 @@ class FileManager:
             ttl=ttl
         )
         
-        with self._lock:
-            self._sessions[session_id] = session
-        
         # セッション用ディレクトリ作成
         session_dir = Path(self.temp_root) / session_id
         session_dir.mkdir(parents=True, exist_ok=True)
         
+        with self._lock:
+            self._sessions[session_id] = session
+        
+        # 期限登録（以後の created_at / ttl 変更も再登録される）
+        session._deadline_listener = self._schedule_expiry
+        self._schedule_expiry(session)
+        
         logger.info(f"Session created: {session_id} (TTL: {ttl}s)")
         return session_id
     
@@ -165,11 +327,73 @@ class FileManager:
                 return None
             
             # 有効期限チェック
-            if session.is_expired():
-                self._cleanup_session(session_id)
-                return None
-            
-            return session
+            if not session.is_expired():
+                return session
+        
+        # ディスク削除はロック外で実行
+        self._cleanup_session(session_id)
+        return None
+    
+    def _schedule_expiry(self, session: PreviewSession):
+        """期限ヒープへ登録（他プロセスの残骸回収向けに、ディレクトリの期限マーカーも更新）"""
+        self._expiry.schedule(session.expires_at, session.session_id)
+        
+        lease = Path(self.temp_root) / session.session_id / SESSION_LEASE_NAME
+        try:
+            lease.touch()
+            os.utime(lease, (session.expires_at, session.expires_at))
+        except OSError as e:
+            logger.warning(f"Failed to update session lease {session.session_id}: {e}")
+    
+    def reclaim_orphans(self) -> Dict[str, int]:
+        """
+        前回プロセスの残骸回収
+        
+        このインスタンスに存在せず、期限マーカー（なければディレクトリ更新時刻 + 既定TTL）から
+        猶予時間を過ぎたセッションディレクトリを削除し、その後どこからもリンクされなくなったblobを回収する。
+        同じ temp_root を共有する他プロセスの有効なセッションは期限マーカーで保護される。
+        
+        Returns:
+            削除したセッションディレクトリ数・blob store のファイル数
+        """
+        grace = self.config["orphan_grace"]
+        cutoff = time.time() - grace
+        removed_sessions = 0
+        
+        for session_dir in Path(self.temp_root).iterdir():
+            if not session_dir.is_dir() or not self._is_session_dir_name(session_dir.name):
+                continue
+            with self._lock:
+                if session_dir.name in self._sessions:
+                    continue
+            try:
+                lease = session_dir / SESSION_LEASE_NAME
+                if lease.exists():
+                    expires_at = lease.stat().st_mtime
+                else:
+                    expires_at = session_dir.stat().st_mtime + self.config["default_ttl"]
+                if expires_at >= cutoff:
+                    continue
+                shutil.rmtree(session_dir)
+                removed_sessions += 1
+            except OSError as e:
+                logger.warning(f"Failed to reclaim session directory {session_dir.name}: {e}")
+        
+        if removed_sessions:
+            logger.info(f"Reclaimed {removed_sessions} orphaned session directories")
+        
+        return {
+            "sessions": removed_sessions,
+            "blob_files": self.blob_store.reclaim_orphans(grace)
+        }
+    
+    @staticmethod
+    def _is_session_dir_name(name: str) -> bool:
+        """セッションディレクトリ名（UUID）か"""
+        try:
+            return str(uuid.UUID(name)) == name
+        except ValueError:
+            return False
     
     def save_files(self, session_id: str, files: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -195,7 +419,7 @@ class FileManager:
                 }
             
             total_size = 0
-            file_entries = []
+            prepared = []
             
             for file_data in files:
                 # ファイル名検証
@@ -206,11 +430,11 @@ class FileManager:
                         "error": f"Invalid filename: {file_data['filename']}"
                     }
                 
-                content = file_data["content"]
+                data = file_data["content"].encode('utf-8')
                 language = file_data.get("language", "text")
                 
                 # サイズチェック
-                file_size = len(content.encode('utf-8'))
+                file_size = len(data)
                 if file_size > self.config["max_file_size"]:
                     return {
                         "success": False,
@@ -218,15 +442,7 @@ class FileManager:
                     }
                 
                 total_size += file_size
-                
-                # ファイルエントリ作成
-                file_entry = FileEntry(
-                    filename=filename,
-                    content=content,
-                    language=language,
-                    size=file_size
-                )
-                file_entries.append(file_entry)
+                prepared.append((filename, data, language))
             
             # セッション総サイズチェック
             current_size = session.get_total_size()
@@ -236,18 +452,40 @@ class FileManager:
                     "error": f"Session size limit exceeded ({current_size + total_size} bytes)"
                 }
             
-            # ファイル保存
+            # ファイル保存（blob格納 → セッションディレクトリへリンク）
             session_dir = Path(self.temp_root) / session_id
+            file_entries = []
+            
+            try:
+                for filename, data, language in prepared:
+                    digest = self.blob_store.put(data)
+                    file_path = session_dir / filename
+                    try:
+                        self.blob_store.link_into(digest, file_path)
+                    except OSError:
+                        self.blob_store.release(digest)
+                        raise
+                    file_entries.append(FileEntry(
+                        filename=filename,
+                        content_hash=digest,
+                        language=language,
+                        size=len(data),
+                        path=str(file_path)
+                    ))
+            except OSError:
+                # 途中失敗時は取得済みのblob参照を返却
+                for file_entry in file_entries:
+                    self.blob_store.release(file_entry.content_hash)
+                raise
             
             with self._lock:
                 for file_entry in file_entries:
-                    # ディスクに保存
-                    file_path = session_dir / file_entry.filename
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(file_entry.content)
-                    
-                    # セッションに追加
-                    session.files.append(file_entry)
+                    # 同名ファイルはマニフェスト上で置き換え
+                    replaced = self._replace_entry(session, file_entry)
+                    if replaced is not None:
+                        self.blob_store.release(replaced.content_hash)
+            
+            self._notify(self._save_listeners, session_id, file_entries)
             
             logger.info(f"Saved {len(file_entries)} files to session {session_id}")
             
@@ -262,6 +500,18 @@ class FileManager:
             logger.error(f"Error saving files to session {session_id}: {e}")
             return {"success": False, "error": str(e)}
     
+    def _replace_entry(self, session: PreviewSession, file_entry: FileEntry) -> Optional[FileEntry]:
+        """マニフェストへエントリ追加（同名エントリがあれば置換して返す）"""
+        for i, existing in enumerate(session.files):
+            if existing.filename == file_entry.filename:
+                session.files[i] = file_entry
+                self._total_size += file_entry.size - existing.size
+                return existing
+        session.files.append(file_entry)
+        self._total_files += 1
+        self._total_size += file_entry.size
+        return None
+    
     def _sanitize_filename(self, filename: str) -> str:
         """
         ファイル名サニタイズ
@@ -322,14 +572,21 @@ class FileManager:
         try:
             with self._lock:
                 # セッション削除
-                if session_id in self._sessions:
-                    del self._sessions[session_id]
+                session = self._sessions.pop(session_id, None)
+                if session is not None:
+                    self._total_files -= len(session.files)
+                    self._total_size -= session.get_total_size()
             
-            # ディスクからファイル削除
+            # ディスクからファイル削除（リンク解除後にblob参照を返却）
             session_dir = Path(self.temp_root) / session_id
             if session_dir.exists():
                 shutil.rmtree(session_dir)
             
+            if session is not None:
+                for file_entry in session.files:
+                    self.blob_store.release(file_entry.content_hash)
+                self._notify(self._cleanup_listeners, session_id)
+            
             logger.info(f"Session cleaned up: {session_id}")
             return True
             
@@ -340,6 +597,7 @@ class FileManager:
     def cleanup_expired(self) -> int:
         """
         期限切れセッションクリーンアップ
+        期限ヒープから到来済みのエントリのみ取り出す（O(k log n)）
         
         Returns:
             クリーンアップしたセッション数
@@ -348,10 +606,16 @@ class FileManager:
         expired_sessions = []
         
         # 期限切れセッション特定
-        with self._lock:
-            for session_id, session in self._sessions.items():
+        for deadline, session_id in self._expiry.pop_due(time.time()):
+            with self._lock:
+                session = self._sessions.get(session_id)
+                # 削除済み・期限変更済み（新しいエントリが別にある）は読み捨て
+                if session is None or session.expires_at != deadline:
+                    continue
                 if session.is_expired():
                     expired_sessions.append(session_id)
+                else:
+                    self._schedule_expiry(session)
         
         # クリーンアップ実行
         for session_id in expired_sessions:
@@ -365,31 +629,26 @@ class FileManager:
     
     def get_stats(self) -> Dict[str, Any]:
         """
-        統計情報取得
+        統計情報取得（増分集計値を返すのみ・O(1)）
         
         Returns:
             統計情報
         """
         with self._lock:
             active_sessions = len(self._sessions)
-            total_files = sum(len(session.files) for session in self._sessions.values())
-            total_size = sum(session.get_total_size() for session in self._sessions.values())
-            
-            # ディスク使用量
-            disk_usage = 0
-            try:
-                for session_id in self._sessions:
-                    session_dir = Path(self.temp_root) / session_id
-                    if session_dir.exists():
-                        disk_usage += sum(f.stat().st_size for f in session_dir.rglob('*') if f.is_file())
-            except Exception as e:
-                logger.error(f"Error calculating disk usage: {e}")
+            total_files = self._total_files
+            total_size = self._total_size
+        
+        # ディスク使用量（重複排除後の実体サイズ）
+        blob_stats = self.blob_store.get_stats()
         
         return {
             "active_sessions": active_sessions,
             "total_files": total_files,
             "total_size_bytes": total_size,
-            "disk_usage_bytes": disk_usage,
+            "disk_usage_bytes": blob_stats["total_bytes"],
+            "blob_store": blob_stats,
+            "scheduled_expiries": len(self._expiry),
             "temp_root": self.temp_root,
             "config": self.config
         }
@@ -420,7 +679,7 @@ class FileManager:
             return {
                 "status": "healthy",
                 "stats": stats,
-                "cleanup_timer_active": self._cleanup_timer.is_alive() if self._cleanup_timer else False
+                "cleanup_timer_active": self._expiry.is_running()
             }
             
         except Exception as e:
@@ -431,5 +690,6 @@ class FileManager:
     
     def __del__(self):
         """デストラクタ"""
-        if self._cleanup_timer:
-            self._cleanup_timer.cancel()
\ No newline at end of file
+        expiry = getattr(self, "_expiry", None)
+        if expiry is not None:
+            expiry.stop()
\ No newline at end of file
@@ -14,6 +14,10 @@ from collections import defaultdict, deque
 from .response_parser import CodeBlock, ParsedCode
 
 
+# ローカルimportパターン（./ ../ @/）
+_LOCAL_IMPORT_PATTERN = re.compile(r"import.*from ['\"]((?:\./|\.\./|@/)[^'\"]*)['\"]")
+
+
 @dataclass
 class FileStructure:
     """
@@ -22,6 +26,7 @@ class FileStructure:
     directories: List[str] = field(default_factory=list)
     file_paths: List[str] = field(default_factory=list)
     file_mapping: Dict[str, CodeBlock] = field(default_factory=dict)
+    import_index: Optional['ImportGraphIndex'] = field(default=None, repr=False)
 
 
 @dataclass
@@ -46,60 +51,170 @@ class CompletedStructure:
 class DependencyGraph:
     """
     依存関係グラフ
+    
+    ビルド順序と循環依存（強連結成分）は辺が変わるまでキャッシュする（辺が同じ更新では破棄しない）。
+    キャッシュが無効な間の影響範囲クエリは、全体を再計算せず影響を受ける部分グラフだけを並べる。
     """
     
     def __init__(self):
         self.dependencies: Dict[str, Set[str]] = defaultdict(set)
         self.reverse_dependencies: Dict[str, Set[str]] = defaultdict(set)
+        self._build_order: Optional[List[str]] = None
+        self._build_position: Dict[str, int] = {}
+        self._cycles: Optional[List[List[str]]] = None
     
     def add_dependency(self, file: str, depends_on: str):
         """依存関係追加"""
+        if depends_on in self.dependencies.get(file, ()):
+            return
         self.dependencies[file].add(depends_on)
         self.reverse_dependencies[depends_on].add(file)
+        self._invalidate()
     
-    def detect_circular_dependencies(self) -> List[List[str]]:
-        """循環依存検知"""
-        visited = set()
-        rec_stack = set()
-        cycles = []
-        
-        def dfs(node: str, path: List[str]) -> bool:
-            if node in rec_stack:
-                # 循環発見
-                cycle_start = path.index(node)
-                cycles.append(path[cycle_start:] + [node])
-                return True
-            
-            if node in visited:
-                return False
-            
-            visited.add(node)
-            rec_stack.add(node)
+    def remove_dependencies(self, file: str):
+        """ファイルの依存（出力辺）を全て削除"""
+        removed = self.dependencies.pop(file, set())
+        for depends_on in removed:
+            dependents = self.reverse_dependencies.get(depends_on)
+            if dependents is not None:
+                dependents.discard(file)
+                if not dependents:
+                    del self.reverse_dependencies[depends_on]
+        if removed:
+            self._invalidate()
+    
+    def set_dependencies(self, file: str, depends_on: Set[str]) -> bool:
+        """
+        ファイルの依存（出力辺）を置き換え
+        
+        Returns:
+            辺が変わったか（変わらなければビルド順序のキャッシュを残す）
+        """
+        if set(self.dependencies.get(file, ())) == depends_on:
+            return False
+        self.remove_dependencies(file)
+        for target in depends_on:
+            self.add_dependency(file, target)
+        return True
+    
+    def _invalidate(self):
+        self._build_order = None
+        self._build_position = {}
+        self._cycles = None
+    
+    def _all_nodes(self) -> List[str]:
+        """全ノード（初出順）"""
+        nodes = dict.fromkeys(self.dependencies)
+        for deps in self.dependencies.values():
+            nodes.update(dict.fromkeys(deps))
+        return list(nodes)
+    
+    def get_strongly_connected_components(self) -> List[List[str]]:
+        """強連結成分取得（反復版Tarjan法、O(V+E)）"""
+        index_of: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        on_stack: Set[str] = set()
+        stack: List[str] = []
+        components: List[List[str]] = []
+        next_index = 0
+        
+        for root in self._all_nodes():
+            if root in index_of:
+                continue
             
-            for dependency in self.dependencies.get(node, []):
-                if dfs(dependency, path + [node]):
-                    return True
+            # (ノード, 未処理の隣接ノードイテレータ) の明示スタックで再帰を置き換える
+            work = [(root, iter(self.dependencies.get(root, ())))]
+            index_of[root] = lowlink[root] = next_index
+            next_index += 1
+            stack.append(root)
+            on_stack.add(root)
             
-            rec_stack.remove(node)
-            return False
+            while work:
+                node, neighbors = work[-1]
+                advanced = False
+                
+                for neighbor in neighbors:
+                    if neighbor not in index_of:
+                        index_of[neighbor] = lowlink[neighbor] = next_index
+                        next_index += 1
+                        stack.append(neighbor)
+                        on_stack.add(neighbor)
+                        work.append((neighbor, iter(self.dependencies.get(neighbor, ()))))
+                        advanced = True
+                        break
+                    if neighbor in on_stack:
+                        lowlink[node] = min(lowlink[node], index_of[neighbor])
+                
+                if advanced:
+                    continue
+                
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+        
+        return components
+    
+    def detect_circular_dependencies(self) -> List[List[str]]:
+        """
+        循環依存検知
         
-        for node in self.dependencies:
-            if node not in visited:
-                dfs(node, [])
+        循環を含む強連結成分ごとに1つの循環パス（始点で閉じたリスト）を返す。
+        """
+        if self._cycles is None:
+            cycles = []
+            for component in self.get_strongly_connected_components():
+                start = min(component)
+                if len(component) > 1 or start in self.dependencies.get(start, ()):
+                    cycles.append(self._find_cycle(start, set(component)))
+            self._cycles = cycles
+        return [list(cycle) for cycle in self._cycles]
+    
+    def _find_cycle(self, start: str, component: Set[str]) -> List[str]:
+        """強連結成分内で start に戻る最短パスをBFSで探索"""
+        parent: Dict[str, str] = {}
+        queue = deque([start])
         
-        return cycles
+        while queue:
+            node = queue.popleft()
+            for neighbor in sorted(self.dependencies.get(node, ())):
+                if neighbor not in component:
+                    continue
+                if neighbor == start:
+                    path = [node]
+                    while path[-1] != start:
+                        path.append(parent[path[-1]])
+                    return list(reversed(path)) + [start]
+                if neighbor not in parent:
+                    parent[neighbor] = node
+                    queue.append(neighbor)
+        
+        return [start, start]
     
     def get_build_order(self) -> List[str]:
-        """ビルド順序取得（トポロジカルソート）"""
+        """ビルド順序取得（トポロジカルソート、結果はキャッシュ）"""
+        if self._build_order is None:
+            self._build_order = self._compute_build_order()
+            self._build_position = {node: i for i, node in enumerate(self._build_order)}
+        return list(self._build_order)
+    
+    def _compute_build_order(self) -> List[str]:
         in_degree = defaultdict(int)
-        all_nodes = set()
+        all_nodes = self._all_nodes()
         
-        # 全ノードと入次数計算
+        # 入次数計算
         for file, deps in self.dependencies.items():
-            all_nodes.add(file)
-            for dep in deps:
-                all_nodes.add(dep)
-                in_degree[file] += 1
+            in_degree[file] += len(deps)
         
         # 入次数0のノードから開始
         queue = deque([node for node in all_nodes if in_degree[node] == 0])
@@ -116,10 +231,129 @@ class DependencyGraph:
                     queue.append(dependent)
         
         # 循環依存がある場合は残りのノードを追加
-        remaining = all_nodes - set(result)
+        remaining = set(all_nodes) - set(result)
         result.extend(sorted(remaining))
         
         return result
+    
+    def get_dependents(self, file: str) -> Set[str]:
+        """ファイルに（推移的に）依存している全ファイル"""
+        affected: Set[str] = set()
+        queue = deque([file])
+        
+        while queue:
+            current = queue.popleft()
+            for dependent in self.reverse_dependencies.get(current, ()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    queue.append(dependent)
+        
+        affected.discard(file)
+        return affected
+    
+    def get_affected_files(self, changed_files: List[str]) -> List[str]:
+        """
+        変更ファイルの影響範囲（変更ファイル自身を含む）をビルド順で返す
+        
+        コストは影響を受けるファイル数に比例する（ビルド順序のキャッシュがあれば利用し、
+        なければ影響を受ける部分グラフだけをトポロジカルソートする）
+        """
+        affected = set(changed_files)
+        for file in changed_files:
+            affected |= self.get_dependents(file)
+        
+        if self._build_order is None:
+            return self._order_subgraph(affected)
+        fallback = len(self._build_position)
+        return sorted(affected, key=lambda node: (self._build_position.get(node, fallback), node))
+    
+    def _order_subgraph(self, nodes: Set[str]) -> List[str]:
+        """
+        部分グラフのビルド順序（nodes 内の辺だけでトポロジカルソート）
+        
+        nodes は依存元について閉じている（影響範囲）ため、nodes の外から nodes 内への辺はなく、
+        全体のビルド順序と矛盾しない。循環が残る場合は名前順で末尾に追加する。
+        """
+        in_degree = {node: len(self.dependencies.get(node, set()) & nodes) for node in nodes}
+        queue = deque(sorted(node for node, degree in in_degree.items() if degree == 0))
+        result = []
+        
+        while queue:
+            current = queue.popleft()
+            result.append(current)
+            for dependent in sorted(self.reverse_dependencies.get(current, ())):
+                if dependent in in_degree:
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        queue.append(dependent)
+        
+        if len(result) < len(nodes):
+            result.extend(sorted(nodes - set(result)))
+        return result
+
+
+class ImportGraphIndex:
+    """
+    import グラフインデックス
+    
+    生成結果ごとに1回だけ各ファイルのimportを抽出・解決して保持し、
+    構造検証・プレビュー再ビルド・デプロイ時のバンドルで再利用する。
+    """
+    
+    def __init__(self, organizer: 'FileOrganizer', blocks: List[CodeBlock]):
+        self._organizer = organizer
+        self.file_mapping: Dict[str, CodeBlock] = {block.filename: block for block in blocks}
+        self.local_imports: Dict[str, List[str]] = {}
+        self.unresolved_imports: Dict[str, List[str]] = {}
+        self.graph = DependencyGraph()
+        
+        for block in blocks:
+            self._index_file(block)
+    
+    def _index_file(self, block: CodeBlock):
+        """1ファイル分のimport抽出と辺追加"""
+        filename = block.filename
+        imports = self._organizer._extract_local_imports(block.content)
+        self.local_imports[filename] = imports
+        
+        unresolved = []
+        depends_on = set()
+        for import_path in imports:
+            resolved = self._organizer._resolve_import_path(import_path, filename, self.file_mapping)
+            if not resolved:
+                unresolved.append(import_path)
+            elif resolved in self.file_mapping:
+                depends_on.add(resolved)
+        self.graph.set_dependencies(filename, depends_on)
+        
+        if unresolved:
+            self.unresolved_imports[filename] = unresolved
+        else:
+            self.unresolved_imports.pop(filename, None)
+    
+    def update_file(self, block: CodeBlock) -> List[str]:
+        """
+        ファイル追加・更新の反映
+        
+        変更ファイルのimportのみ再抽出し、影響を受けるファイルをビルド順で返す。
+        importが変わらなければ全体のビルド順序のキャッシュを残し、変わった場合も
+        全体は再計算せず影響範囲だけを並べる（全体の順序は次に必要になるまで遅延）。
+        """
+        is_new = block.filename not in self.file_mapping
+        self.file_mapping[block.filename] = block
+        self._index_file(block)
+        
+        # 新規ファイルは他ファイルの未解決importを解決しうる
+        if is_new:
+            for filename in list(self.unresolved_imports):
+                if filename != block.filename:
+                    self._index_file(self.file_mapping[filename])
+        
+        return self.graph.get_affected_files([block.filename])
+    
+    def get_affected_files(self, changed_files: List[str]) -> List[str]:
+        """変更ファイルの影響範囲（ビルド順）"""
+        return self.graph.get_affected_files(changed_files)
 
 
 class FileOrganizer:
@@ -174,6 +408,9 @@ class FileOrganizer:
         
         structure.directories = sorted(directories)
         
+        # 3. importグラフインデックス（プレビュー再ビルド・デプロイで再利用）
+        structure.import_index = self.build_import_index(blocks)
+        
         return structure
     
     def _determine_file_path(self, block: CodeBlock) -> str:
@@ -210,6 +447,18 @@ class FileOrganizer:
         # デフォルト：src/
         return f'src/{filename}'
     
+    def build_import_index(self, blocks: List[CodeBlock]) -> ImportGraphIndex:
+        """
+        importグラフインデックス構築（生成結果ごとに1回）
+        
+        Args:
+            blocks: コードブロックのリスト
+            
+        Returns:
+            importグラフインデックス
+        """
+        return ImportGraphIndex(self, blocks)
+    
     def create_dependency_graph(self, blocks: List[CodeBlock]) -> DependencyGraph:
         """
         依存関係グラフ作成
@@ -220,39 +469,11 @@ class FileOrganizer:
         Returns:
             依存関係グラフ
         """
-        graph = DependencyGraph()
-        
-        # ファイル名マッピング作成
-        file_mapping = {block.filename: block for block in blocks}
-        
-        # 各ファイルの依存関係解析
-        for block in blocks:
-            dependencies = self._extract_local_imports(block.content)
-            
-            for dep_path in dependencies:
-                # 相対パスを解決
-                resolved_dep = self._resolve_import_path(dep_path, block.filename, file_mapping)
-                if resolved_dep and resolved_dep in file_mapping:
-                    graph.add_dependency(block.filename, resolved_dep)
-        
-        return graph
+        return self.build_import_index(blocks).graph
     
     def _extract_local_imports(self, content: str) -> List[str]:
         """ローカルimport抽出"""
-        imports = []
-        
-        # import文のパターン
-        import_patterns = [
-            re.compile(r"import.*from ['\"](\./[^'\"]*)['\"]"),
-            re.compile(r"import.*from ['\"](\.\./[^'\"]*)['\"]"),
-            re.compile(r"import.*from ['\"](@/[^'\"]*)['\"]")
-        ]
-        
-        for pattern in import_patterns:
-            matches = pattern.findall(content)
-            imports.extend(matches)
-        
-        return imports
+        return _LOCAL_IMPORT_PATTERN.findall(content)
     
     def _resolve_import_path(self, import_path: str, current_file: str, file_mapping: Dict[str, CodeBlock]) -> Optional[str]:
         """import パス解決"""
@@ -296,12 +517,12 @@ class FileOrganizer:
             result.errors.extend(syntax_errors)
         
         # 2. 依存関係検証
-        dependency_errors = self._validate_dependencies(blocks)
+        index = self.build_import_index(blocks)
+        dependency_errors = self._validate_dependencies(blocks, index)
         result.errors.extend(dependency_errors)
         
         # 3. 循環依存検証
-        graph = self.create_dependency_graph(blocks)
-        circular_deps = graph.detect_circular_dependencies()
+        circular_deps = index.graph.detect_circular_dependencies()
         if circular_deps:
             for cycle in circular_deps:
                 result.errors.append(f"Circular dependency detected: {' -> '.join(cycle)}")
@@ -340,18 +561,14 @@ class FileOrganizer:
         
         return errors
     
-    def _validate_dependencies(self, blocks: List[CodeBlock]) -> List[str]:
+    def _validate_dependencies(self, blocks: List[CodeBlock], index: Optional[ImportGraphIndex] = None) -> List[str]:
         """依存関係検証"""
         errors = []
-        file_mapping = {block.filename: block for block in blocks}
+        index = index or self.build_import_index(blocks)
         
         for block in blocks:
-            local_imports = self._extract_local_imports(block.content)
-            
-            for import_path in local_imports:
-                resolved = self._resolve_import_path(import_path, block.filename, file_mapping)
-                if not resolved:
-                    errors.append(f"Unresolved import '{import_path}' in {block.filename}")
+            for import_path in index.unresolved_imports.get(block.filename, []):
+                errors.append(f"Unresolved import '{import_path}' in {block.filename}")
         
         return errors
     
@@ -0,0 +1,195 @@
+"""
+Hot Reload Hub - プレビューセッションの変更プッシュ
+ファイル保存時に変更ファイルと内容ハッシュ、影響を受ける依存元を購読者へ配信する
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+from .file_manager import FileManager, FileEntry
+from .file_organizer import FileOrganizer, ImportGraphIndex
+from .response_parser import CodeBlock
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _SessionState:
+    """セッションごとの配信状態"""
+    hashes: Dict[str, str] = field(default_factory=dict)
+    index: Optional[ImportGraphIndex] = None
+    version: int = 0
+    subscribers: Set[Tuple[asyncio.Queue, asyncio.AbstractEventLoop]] = field(default_factory=set)
+
+
+class HotReloadHub:
+    """
+    ホットリロード配信ハブ
+
+    FileManagerの保存通知から内容ハッシュが変わったファイルだけを抽出し、
+    importグラフの逆依存から再評価が必要なファイルを求めて購読キューへ送る。
+    購読キューは各購読者のイベントループ上で更新する（保存はどのスレッドからでもよい）。
+    """
+
+    def __init__(self, file_manager: FileManager, organizer: Optional[FileOrganizer] = None, queue_size: int = 64):
+        self.file_manager = file_manager
+        self.organizer = organizer or FileOrganizer()
+        self.queue_size = queue_size
+
+        self._states: Dict[str, _SessionState] = {}
+        self._lock = threading.Lock()
+
+        self.file_manager.add_save_listener(self._on_files_saved)
+        self.file_manager.add_cleanup_listener(self._on_session_cleanup)
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        """
+        セッション購読（イベントループ内から呼び出す）
+
+        Returns:
+            変更メッセージのキュー
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+
+        session = self.file_manager.get_session(session_id)
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is None:
+                state = self._states[session_id] = _SessionState()
+                if session is not None:
+                    state.hashes = {entry.filename: entry.content_hash for entry in session.files}
+            state.subscribers.add((queue, loop))
+
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        """購読解除"""
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is None:
+                return
+            state.subscribers = {item for item in state.subscribers if item[0] is not queue}
+
+    def snapshot(self, session_id: str) -> Dict[str, Any]:
+        """接続直後に送る現在のファイル一覧（パスと内容ハッシュ）"""
+        with self._lock:
+            state = self._states.get(session_id)
+            hashes = dict(state.hashes) if state else {}
+            version = state.version if state else 0
+
+        return {
+            "type": "snapshot",
+            "session_id": session_id,
+            "version": version,
+            "files": [{"path": path, "hash": digest} for path, digest in sorted(hashes.items())],
+            "timestamp": time.time()
+        }
+
+    def get_subscriber_count(self, session_id: str) -> int:
+        with self._lock:
+            state = self._states.get(session_id)
+            return len(state.subscribers) if state else 0
+
+    def _on_files_saved(self, session_id: str, file_entries: List[FileEntry]):
+        """保存通知（変更ファイル抽出と配信）"""
+        with self._lock:
+            state = self._states.setdefault(session_id, _SessionState())
+            changed = [
+                entry for entry in file_entries
+                if state.hashes.get(entry.filename) != entry.content_hash
+            ]
+            if not changed:
+                return
+            for entry in changed:
+                state.hashes[entry.filename] = entry.content_hash
+            state.version += 1
+            version = state.version
+            subscribers = list(state.subscribers)
+
+        affected = self._update_index(session_id, state, changed)
+        changed_paths = {entry.filename for entry in changed}
+
+        message = {
+            "type": "files_changed",
+            "session_id": session_id,
+            "version": version,
+            "changed": [{"path": entry.filename, "hash": entry.content_hash} for entry in changed],
+            # 変更ファイルをimportしている（再評価が必要な）ファイル、ビルド順
+            "affected": [path for path in affected if path not in changed_paths],
+            "timestamp": time.time()
+        }
+        self._publish(subscribers, message)
+
+    def _on_session_cleanup(self, session_id: str):
+        """セッション削除通知"""
+        with self._lock:
+            state = self._states.pop(session_id, None)
+        if state is None:
+            return
+
+        self._publish(list(state.subscribers), {
+            "type": "session_closed",
+            "session_id": session_id,
+            "timestamp": time.time()
+        })
+
+    def _update_index(self, session_id: str, state: _SessionState, changed: List[FileEntry]) -> List[str]:
+        """importグラフの増分更新と影響範囲算出（購読者がいる間だけ保持）"""
+        with self._lock:
+            if not state.subscribers:
+                state.index = None
+                return []
+            index = state.index
+
+        try:
+            if index is None:
+                # 初回は現在のセッション全体から構築
+                session = self.file_manager.get_session(session_id)
+                entries = session.files if session is not None else changed
+                index = ImportGraphIndex(self.organizer, [self._to_block(entry) for entry in entries])
+                with self._lock:
+                    state.index = index
+            else:
+                blocks = [self._to_block(entry) for entry in changed]
+                with self._lock:
+                    for block in blocks:
+                        index.update_file(block)
+        except OSError as e:
+            logger.warning(f"Hot reload index update skipped for session {session_id}: {e}")
+            return []
+
+        with self._lock:
+            return index.get_affected_files([entry.filename for entry in changed])
+
+    @staticmethod
+    def _to_block(entry: FileEntry) -> CodeBlock:
+        return CodeBlock(content=entry.content, filename=entry.filename, language=entry.language)
+
+    def _publish(self, subscribers: List[Tuple[asyncio.Queue, asyncio.AbstractEventLoop]], message: Dict[str, Any]):
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._enqueue, queue, message)
+            except RuntimeError:
+                # 購読者のイベントループが終了済み
+                pass
+
+    @staticmethod
+    def _enqueue(queue: asyncio.Queue, message: Dict[str, Any]):
+        """キュー投入（溢れた場合は差分を捨てて全体再読込を要求）"""
+        if queue.full() and message["type"] == "files_changed":
+            while not queue.empty():
+                queue.get_nowait()
+            message = {
+                "type": "full_reload",
+                "session_id": message["session_id"],
+                "version": message["version"],
+                "timestamp": message["timestamp"]
+            }
+        elif queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
@@ -4,16 +4,56 @@ Preview Server - Green段階（テストを通すための実装）
 """
 
 import os
+import gzip
+import uuid
 import mimetypes
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List, Tuple
 from urllib.parse import quote
 import logging
 
-from .file_manager import FileManager, PreviewSession
+from .file_manager import FileManager, FileEntry, PreviewSession
+from .blob_store import BlobStore
+from .transpiler import TranspileCache, TranspileError
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 logger = logging.getLogger(__name__)
 
+# 事前圧縮対象のMIME型（text/* 以外）
+_COMPRESSIBLE_TYPES = {
+    "application/javascript", "application/json", "application/xml",
+    "image/svg+xml", "text/javascript"
+}
+
+
+@dataclass
+class ServedFile:
+    """
+    配信用に事前計算したファイル
+    同一内容・同一MIME型のファイルはセッション間で共有する
+    本文はメモリに保持せず、path のファイル（blob・派生ファイル）から配信する
+    """
+    content_hash: str
+    mimetype: str
+    body_digest: str
+    path: Path
+    size: int
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    escaped: bool = False
+    compressible: bool = False
+    # encoding -> (パス, サイズ, ETag)。圧縮しても小さくならない場合はNone
+    variants: Dict[str, Optional[Tuple[Path, int, str]]] = field(default_factory=dict, repr=False)
+    
+    def read_body(self) -> bytes:
+        return self.path.read_bytes()
+
 
 class PreviewServer:
     """
@@ -21,9 +61,31 @@ class PreviewServer:
     セキュアなファイル配信とプレビュー環境提供
     """
     
-    def __init__(self, file_manager: FileManager, config: Optional[Dict[str, Any]] = None):
+    def __init__(
+        self,
+        file_manager: FileManager,
+        config: Optional[Dict[str, Any]] = None,
+        transpiler: Optional[TranspileCache] = None
+    ):
         self.file_manager = file_manager
         self.config = self._init_config(config)
+        # TSX/TS/JSX の変換済みJS（"<ファイル名>.js" として配信）
+        self.transpiler = transpiler
+        
+        # session_id -> filename -> 配信物
+        self._session_index: Dict[str, Dict[str, ServedFile]] = {}
+        # (content_hash, mimetype) -> (配信物, 参照数)
+        self._artifacts: Dict[Tuple[str, str], List[Any]] = {}
+        self._index_lock = threading.Lock()
+        
+        # エスケープ済み本文・圧縮済み本文の置き場（本文ハッシュで共有）
+        self._variant_root = Path(self.file_manager.temp_root) / ".variants"
+        self._variant_root.mkdir(parents=True, exist_ok=True)
+        self._variant_refs: Dict[str, int] = {}
+        
+        # 保存時に配信物を事前計算し、セッション削除時に破棄
+        self.file_manager.add_save_listener(self._on_files_saved)
+        self.file_manager.add_cleanup_listener(self._on_session_cleanup)
         
         logger.info("PreviewServer initialized")
     
@@ -35,7 +97,10 @@ class PreviewServer:
             "max_file_size": 10 * 1024 * 1024,  # 10MB
             "security_headers": True,
             "content_escaping": True,
-            "cache_control": "no-cache, no-store, must-revalidate"
+            # ETagで再検証させる（no-storeだと304が使えない）
+            "cache_control": "no-cache, must-revalidate",
+            # 事前圧縮（gzip / brotli）の最小サイズ
+            "compression_min_size": 1024
         }
         
         if custom_config:
@@ -67,98 +132,389 @@ class PreviewServer:
         logger.info(f"Generated preview URL for session: {session_id}")
         return preview_url
     
-    def serve_file(self, session_id: str, filename: str) -> Dict[str, Any]:
+    def serve_file(self, session_id: str, filename: str, if_none_match: Optional[str] = None) -> Dict[str, Any]:
         """
         ファイル配信
         
         Args:
             session_id: セッションID
             filename: ファイル名
+            if_none_match: クライアントのIf-None-Matchヘッダー値
             
         Returns:
-            配信結果
+            配信結果（ETag一致時は本文なしの304）
         """
         try:
-            # セッション取得
-            session = self.file_manager.get_session(session_id)
-            if session is None:
-                return {
-                    "success": False,
-                    "error": "Session not found or expired",
-                    "status_code": 404
-                }
+            served, error = self._lookup_file(session_id, filename)
+            if error is not None:
+                return error
             
-            # ファイル名セキュリティチェック
-            if not self._is_safe_filename(filename):
+            if if_none_match is not None and self._etag_matches(if_none_match, served.etag):
                 return {
-                    "success": False,
-                    "error": "Invalid filename",
-                    "status_code": 403
+                    "success": True,
+                    "not_modified": True,
+                    "etag": served.etag,
+                    "headers": served.headers,
+                    "filename": filename,
+                    "status_code": 304
                 }
             
-            # ファイル検索
-            file_entry = None
-            for f in session.files:
-                if f.filename == filename:
-                    file_entry = f
-                    break
+            logger.debug(f"Served file: {filename} for session: {session_id}")
             
-            if file_entry is None:
-                return {
-                    "success": False,
-                    "error": "File not found",
-                    "status_code": 404
-                }
+            body = served.read_body()
+            return {
+                "success": True,
+                "content": body.decode('utf-8'),
+                "body": body,
+                "mimetype": served.mimetype,
+                "headers": served.headers,
+                "filename": filename,
+                "size": served.size,
+                "etag": served.etag,
+                "escaped": served.escaped,
+                "sanitized": served.escaped,
+                "status_code": 200
+            }
             
-            # MIME型判定
-            mimetype, _ = mimetypes.guess_type(filename)
-            if mimetype is None:
-                mimetype = "text/plain"
+        except Exception as e:
+            logger.error(f"Error serving file {filename} for session {session_id}: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "status_code": 500
+            }
+    
+    def open_file(
+        self,
+        session_id: str,
+        filename: str,
+        if_none_match: Optional[str] = None,
+        accept_encoding: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        ファイル配信（HTTPルート用）
+        本文の代わりに配信するファイルのパスを返し、sendfileで送出させる
+        
+        Args:
+            session_id: セッションID
+            filename: ファイル名
+            if_none_match: クライアントのIf-None-Matchヘッダー値
+            accept_encoding: クライアントのAccept-Encodingヘッダー値（Range要求時はNone）
             
-            # コンテンツ処理
-            content = file_entry.content
-            escaped = False
-            sanitized = False
+        Returns:
+            配信結果（path / content_encoding / etag 等）
+        """
+        try:
+            served, error = self._lookup_file(session_id, filename)
+            if error is not None:
+                return error
             
-            # セキュリティ処理
-            if self.config["content_escaping"]:
-                if self._needs_escaping(content, mimetype):
-                    content = self._escape_content(content, mimetype)
-                    escaped = True
-                    sanitized = True
+            path, size, etag, encoding = served.path, served.size, served.etag, None
+            for candidate in self._accepted_encodings(accept_encoding, served):
+                variant = self._get_variant(served, candidate)
+                if variant is not None:
+                    path, size, etag = variant
+                    encoding = candidate
+                    break
             
-            # セキュリティヘッダー
-            headers = {}
-            if self.config["security_headers"]:
-                headers.update({
-                    "Cache-Control": self.config["cache_control"],
-                    "X-Content-Type-Options": "nosniff",
-                    "X-Frame-Options": "SAMEORIGIN",
-                    "Content-Security-Policy": "default-src 'self'; script-src 'none';"
-                })
+            headers = dict(served.headers)
+            headers["ETag"] = etag
+            if served.compressible:
+                headers["Vary"] = "Accept-Encoding"
+            if encoding is not None:
+                headers["Content-Encoding"] = encoding
             
-            logger.info(f"Served file: {filename} for session: {session_id}")
+            if if_none_match is not None and self._etag_matches(if_none_match, etag):
+                return {
+                    "success": True,
+                    "not_modified": True,
+                    "etag": etag,
+                    "headers": headers,
+                    "filename": filename,
+                    "status_code": 304
+                }
             
             return {
                 "success": True,
-                "content": content,
-                "mimetype": mimetype,
+                "path": str(path),
+                "mimetype": served.mimetype,
                 "headers": headers,
                 "filename": filename,
-                "size": len(content.encode('utf-8')),
-                "escaped": escaped,
-                "sanitized": sanitized,
+                "size": size,
+                "etag": etag,
+                "content_encoding": encoding,
                 "status_code": 200
             }
             
         except Exception as e:
-            logger.error(f"Error serving file {filename} for session {session_id}: {e}")
+            logger.error(f"Error opening file {filename} for session {session_id}: {e}")
             return {
                 "success": False,
                 "error": str(e),
                 "status_code": 500
             }
     
+    def _lookup_file(self, session_id: str, filename: str) -> Tuple[Optional[ServedFile], Optional[Dict[str, Any]]]:
+        """配信物検索（失敗時はエラー応答を返す）"""
+        # セッション取得
+        session = self.file_manager.get_session(session_id)
+        if session is None:
+            return None, {
+                "success": False,
+                "error": "Session not found or expired",
+                "status_code": 404
+            }
+        
+        # ファイル名セキュリティチェック
+        if not self._is_safe_filename(filename):
+            return None, {
+                "success": False,
+                "error": "Invalid filename",
+                "status_code": 403
+            }
+        
+        # ファイル検索（インデックス参照）
+        served = self._get_session_index(session).get(filename)
+        if served is None:
+            return None, {
+                "success": False,
+                "error": "File not found",
+                "status_code": 404
+            }
+        
+        return served, None
+    
+    def _accepted_encodings(self, accept_encoding: Optional[str], served: ServedFile) -> List[str]:
+        """Accept-Encodingから利用可能な圧縮形式を優先順に列挙"""
+        if not accept_encoding or not served.compressible:
+            return []
+        
+        accepted = set()
+        for token in accept_encoding.split(','):
+            name, _, params = token.strip().partition(';')
+            if params.strip().replace(' ', '') in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(name.strip().lower())
+        
+        candidates = []
+        if brotli is not None and "br" in accepted:
+            candidates.append("br")
+        if "gzip" in accepted:
+            candidates.append("gzip")
+        return candidates
+    
+    def _get_variant(self, served: ServedFile, encoding: str) -> Optional[Tuple[Path, int, str]]:
+        """圧縮済み本文取得（初回要求時に圧縮してディスクへ保存）"""
+        with self._index_lock:
+            if encoding in served.variants:
+                return served.variants[encoding]
+        
+        body = served.read_body()
+        if encoding == "br":
+            compressed = brotli.compress(body)
+        else:
+            compressed = gzip.compress(body, mtime=0)
+        
+        variant = None
+        if len(compressed) < served.size:
+            suffix = "br" if encoding == "br" else "gz"
+            path = self._variant_path(served.body_digest, suffix)
+            if not path.exists():
+                self._write_variant(path, compressed)
+            variant = (path, len(compressed), f'"{served.body_digest[:32]}-{encoding}"')
+        
+        with self._index_lock:
+            return served.variants.setdefault(encoding, variant)
+    
+    def _variant_path(self, body_digest: str, suffix: str) -> Path:
+        return self._variant_root / body_digest[:2] / f"{body_digest}.{suffix}"
+    
+    def _write_variant(self, path: Path, data: bytes):
+        """一時ファイル + rename で原子的に書き込み"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    
+    def _remove_variants(self, body_digest: str):
+        """本文ハッシュに紐づく派生ファイル削除"""
+        for suffix in ("body", "gz", "br"):
+            try:
+                self._variant_path(body_digest, suffix).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove preview variant {body_digest[:12]}.{suffix}: {e}")
+    
+    def _get_session_index(self, session: PreviewSession) -> Dict[str, ServedFile]:
+        """セッションの配信インデックス取得（未構築なら構築）"""
+        with self._index_lock:
+            index = self._session_index.get(session.session_id)
+        if index is None:
+            # PreviewServer生成前に保存されたセッション
+            self._on_files_saved(session.session_id, list(session.files))
+            with self._index_lock:
+                index = self._session_index.get(session.session_id, {})
+        return index
+    
+    def _on_files_saved(self, session_id: str, file_entries: List[FileEntry]):
+        """保存時の配信物事前計算"""
+        built = []
+        for entry in file_entries:
+            content = entry.content
+            mimetype = mimetypes.guess_type(entry.filename)[0] or "text/plain"
+            built.append((entry.filename, self._acquire_artifact(
+                entry.content_hash, lambda: content, mimetype,
+                self.file_manager.blob_store.path_for(entry.content_hash)
+            )))
+            
+            compiled = self._acquire_compiled_artifact(entry.filename, content)
+            if compiled is not None:
+                built.append((self.compiled_filename(entry.filename), compiled))
+        
+        with self._index_lock:
+            index = self._session_index.setdefault(session_id, {})
+            for filename, served in built:
+                previous = index.get(filename)
+                index[filename] = served
+                if previous is not None:
+                    self._release_artifact_locked(previous)
+    
+    def _on_session_cleanup(self, session_id: str):
+        """セッション削除時の配信物破棄"""
+        with self._index_lock:
+            index = self._session_index.pop(session_id, {})
+            for served in index.values():
+                self._release_artifact_locked(served)
+    
+    @staticmethod
+    def compiled_filename(filename: str) -> str:
+        """変換済みJSの配信ファイル名"""
+        return f"{filename}.js"
+    
+    def _acquire_compiled_artifact(self, filename: str, content: str) -> Optional[ServedFile]:
+        """TSX/TS/JSX を変換した配信物（変換はキャッシュ済みなら再実行しない）"""
+        if self.transpiler is None or not self.transpiler.available or not self.transpiler.can_transpile(filename):
+            return None
+        
+        try:
+            result = self.transpiler.transpile(content, filename)
+        except TranspileError as e:
+            logger.warning(f"Transpile failed for {filename}: {e}")
+            return None
+        
+        # 変換器の出力はそのまま配信（行単位のコメントアウトは function( を含むバンドルを壊す）
+        return self._acquire_artifact(
+            result.cache_key, lambda: result.code, "application/javascript",
+            self.transpiler.path_for(result.cache_key), escape=False
+        )
+    
+    def _acquire_artifact(
+        self,
+        content_hash: str,
+        load_content: Callable[[], str],
+        mimetype: str,
+        source_path: Path,
+        escape: bool = True
+    ) -> ServedFile:
+        """配信物取得（共有キャッシュになければ構築）"""
+        key = (content_hash, mimetype)
+        
+        with self._index_lock:
+            cached = self._artifacts.get(key)
+            if cached is not None:
+                cached[1] += 1
+                return cached[0]
+        
+        served = self._build_artifact(content_hash, load_content(), mimetype, source_path, escape)
+        
+        with self._index_lock:
+            cached = self._artifacts.get(key)
+            if cached is None:
+                cached = self._artifacts[key] = [served, 0]
+                self._variant_refs[served.body_digest] = self._variant_refs.get(served.body_digest, 0) + 1
+            cached[1] += 1
+            return cached[0]
+    
+    def _release_artifact_locked(self, served: ServedFile):
+        key = (served.content_hash, served.mimetype)
+        cached = self._artifacts.get(key)
+        if cached is None:
+            return
+        cached[1] -= 1
+        if cached[1] <= 0:
+            del self._artifacts[key]
+            
+            remaining = self._variant_refs.get(served.body_digest, 1) - 1
+            if remaining > 0:
+                self._variant_refs[served.body_digest] = remaining
+            else:
+                self._variant_refs.pop(served.body_digest, None)
+                self._remove_variants(served.body_digest)
+    
+    def _build_artifact(
+        self,
+        content_hash: str,
+        content: str,
+        mimetype: str,
+        source_path: Path,
+        escape: bool = True
+    ) -> ServedFile:
+        """エスケープ・エンコード・ヘッダー生成（1内容につき1回）"""
+        escaped = False
+        
+        # セキュリティ処理
+        if escape and self.config["content_escaping"]:
+            if self._needs_escaping(content, mimetype):
+                content = self._escape_content(content, mimetype)
+                escaped = True
+        
+        body = content.encode('utf-8')
+        if escaped:
+            # エスケープ後の本文はsendfile用に派生ファイルとして保存
+            body_digest = BlobStore.hash_bytes(body)
+            path = self._variant_path(body_digest, "body")
+            if not path.exists():
+                self._write_variant(path, body)
+        else:
+            body_digest = content_hash
+            path = source_path
+        
+        # 強いETag（送出する本文のハッシュ）
+        etag = f'"{body_digest[:32]}"'
+        
+        # セキュリティヘッダー
+        headers = {"ETag": etag}
+        if self.config["security_headers"]:
+            headers.update({
+                "Cache-Control": self.config["cache_control"],
+                "X-Content-Type-Options": "nosniff",
+                "X-Frame-Options": "SAMEORIGIN",
+                "Content-Security-Policy": "default-src 'self'; script-src 'none';"
+            })
+        
+        return ServedFile(
+            content_hash=content_hash,
+            mimetype=mimetype,
+            body_digest=body_digest,
+            path=path,
+            size=len(body),
+            etag=etag,
+            headers=headers,
+            escaped=escaped,
+            compressible=(
+                (mimetype.startswith("text/") or mimetype in _COMPRESSIBLE_TYPES)
+                and len(body) >= self.config["compression_min_size"]
+            )
+        )
+    
+    @staticmethod
+    def _etag_matches(if_none_match: str, etag: str) -> bool:
+        """If-None-Match評価（カンマ区切り・ワイルドカード対応）"""
+        candidates = [value.strip() for value in if_none_match.split(',')]
+        return "*" in candidates or etag in candidates
+    
     def get_session_info(self, session_id: str) -> Dict[str, Any]:
         """
         セッション情報取得
@@ -315,10 +671,12 @@ class PreviewServer:
                     "error": "Session not found or expired"
                 }
             
+            index = self._get_session_index(session)
             files = []
             for file_entry in session.files:
                 # ファイル配信URL生成
                 file_url = f"{self.config['base_preview_url']}/{quote(session_id)}/{quote(file_entry.filename)}"
+                served = index.get(file_entry.filename)
                 
                 files.append({
                     "filename": file_entry.filename,
@@ -326,7 +684,7 @@ class PreviewServer:
                     "size": file_entry.size,
                     "created_at": file_entry.created_at,
                     "preview_url": file_url,
-                    "mimetype": mimetypes.guess_type(file_entry.filename)[0] or "text/plain"
+                    "mimetype": served.mimetype if served else (mimetypes.guess_type(file_entry.filename)[0] or "text/plain")
                 })
             
             return {
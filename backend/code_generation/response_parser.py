@@ -6,22 +6,94 @@ AI生成レスポンスの解析とコードブロック抽出
 import re
 import ast
 import json
-from typing import List, Dict, Any, Optional, Set
+from bisect import bisect_right
+from typing import List, Dict, Any, Optional, Set, FrozenSet, Tuple
 from dataclasses import dataclass, field
 
 
-@dataclass
+# コードフェンス走査パターン（任意の **filename** ヘッダ + ```lang ... ```）
+_FENCE_PATTERN = re.compile(
+    r'(?:\*\*(?P<header>[^*\n]+\.(?P<ext>tsx?|jsx?|css|html|json))\*\*\s*)?'
+    r'```(?P<language>\w+)?\s*\n(?P<content>.*?)\n[ \t]*```',
+    re.DOTALL | re.IGNORECASE
+)
+
+_FILENAME_EXTENSIONS = ('.tsx', '.ts', '.jsx', '.js', '.css', '.json', '.html')
+_CONTENT_EXTENSIONS = ('.tsx', '.ts', '.jsx', '.js', '.css', '.json')
+
+_LANGUAGE_MAP = {
+    'tsx': 'typescript',
+    'ts': 'typescript',
+    'jsx': 'javascript',
+    'js': 'javascript',
+    'typescript': 'typescript',
+    'javascript': 'javascript',
+    'css': 'css',
+    'json': 'json',
+    'html': 'html'
+}
+
+_EXTENSION_MAP = {
+    'typescript': '.tsx',
+    'javascript': '.jsx',
+    'css': '.css',
+    'json': '.json',
+    'html': '.html'
+}
+
+_HOOK_KEYWORDS = ("useState", "useEffect", "useCallback", "useMemo", "useContext")
+_FORM_KEYWORDS = ("<form", "onSubmit", "input", "required")
+_TAILWIND_KEYWORDS = ("bg-", "text-", "p-", "m-", "flex", "grid", "w-", "h-", "border")
+_RESPONSIVE_KEYWORDS = ("@media", "sm:", "md:", "lg:", "xl:", "grid-cols")
+_API_KEYWORDS = ("fetch(", "axios", "api", "endpoint")
+
+
+# 変更時にキャッシュを無効化するフィールド
+_CACHE_SOURCE_FIELDS = frozenset({"content", "filename", "language"})
+
+# import元モジュール抽出パターン
+_IMPORT_SOURCE_PATTERN = re.compile(r"from ['\"]([^'\"]*)['\"]")
+
+
+@dataclass(slots=True)
 class CodeBlock:
     """
     コードブロック表現
+    
+    言語判定・特徴・import一覧・行インデックスは初回参照時に計算してキャッシュし、
+    content / filename / language が変更されたときだけ破棄する。
     """
     content: str
     filename: str = ""
     language: str = ""
     description: str = ""
+    _detected_language: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _features: Optional[FrozenSet[str]] = field(default=None, init=False, repr=False, compare=False)
+    _imports: Optional[Tuple[str, ...]] = field(default=None, init=False, repr=False, compare=False)
+    _lines: Optional[Tuple[str, ...]] = field(default=None, init=False, repr=False, compare=False)
+    _line_offsets: Optional[Tuple[int, ...]] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        # slots=True では新クラスが生成されるため super() ではなく object を直接使う
+        object.__setattr__(self, name, value)
+        if name in _CACHE_SOURCE_FIELDS:
+            self._invalidate_cache()
+    
+    def _invalidate_cache(self) -> None:
+        """キャッシュ破棄"""
+        object.__setattr__(self, "_detected_language", None)
+        object.__setattr__(self, "_features", None)
+        object.__setattr__(self, "_imports", None)
+        object.__setattr__(self, "_lines", None)
+        object.__setattr__(self, "_line_offsets", None)
     
     def detect_language(self) -> str:
         """言語自動判定"""
+        if self._detected_language is None:
+            object.__setattr__(self, "_detected_language", self._compute_language())
+        return self._detected_language
+    
+    def _compute_language(self) -> str:
         if self.language:
             return self.language
         
@@ -54,6 +126,11 @@ class CodeBlock:
     
     def get_features(self) -> Set[str]:
         """コードブロック特徴抽出"""
+        if self._features is None:
+            object.__setattr__(self, "_features", frozenset(self._compute_features()))
+        return set(self._features)
+    
+    def _compute_features(self) -> Set[str]:
         features = set()
         
         # React関連
@@ -81,6 +158,28 @@ class CodeBlock:
             features.add("component_imports")
         
         return features
+    
+    def get_imports(self) -> Tuple[str, ...]:
+        """import/export元モジュール一覧（`from '...'` の出現順）"""
+        if self._imports is None:
+            object.__setattr__(self, "_imports", tuple(_IMPORT_SOURCE_PATTERN.findall(self.content)))
+        return self._imports
+    
+    @property
+    def lines(self) -> Tuple[str, ...]:
+        """行一覧"""
+        if self._lines is None:
+            object.__setattr__(self, "_lines", tuple(self.content.split('\n')))
+        return self._lines
+    
+    def line_of(self, offset: int) -> int:
+        """文字オフセットから行番号（1始まり）"""
+        if self._line_offsets is None:
+            offsets = [0]
+            for line in self.lines[:-1]:
+                offsets.append(offsets[-1] + len(line) + 1)
+            object.__setattr__(self, "_line_offsets", tuple(offsets))
+        return bisect_right(self._line_offsets, offset)
 
 
 @dataclass
@@ -111,22 +210,16 @@ class ResponseParser:
     """
     
     def __init__(self):
-        # コードブロック抽出パターン
-        self.code_block_pattern = re.compile(
-            r'```(\w+)?\s*\n(.*?)\n```',
-            re.DOTALL | re.MULTILINE
-        )
-        
-        # ファイル名抽出パターン
-        self.filename_pattern = re.compile(
-            r'\*\*([^*]+\.(tsx?|jsx?|css|html|json))\*\*|//\s*([^/\n]+\.(tsx?|jsx?|css|html|json))',
-            re.IGNORECASE
-        )
+        # コードブロック抽出パターン（モジュールレベルでコンパイル済み）
+        self.code_block_pattern = _FENCE_PATTERN
     
     def extract_code_blocks(self, response: str) -> List[CodeBlock]:
         """
         AIレスポンスからコードブロック抽出
         
+        フェンス位置・ファイル名ヘッダ・言語タグを1回の走査でまとめて記録する。
+        各フェンスは一度しかマッチしないため、重複は同一内容のハッシュでのみ除外する。
+        
         Args:
             response: AI生成レスポンステキスト
             
@@ -134,72 +227,48 @@ class ResponseParser:
             抽出されたコードブロックのリスト
         """
         blocks = []
+        seen_contents: Set[str] = set()
         
-        # ファイル名付きブロックパターン
-        filename_blocks = re.findall(
-            r'\*\*([^*]+\.(tsx?|jsx?|css|html|json))\*\*\s*```(\w+)?\n(.*?)```',
-            response,
-            re.DOTALL | re.IGNORECASE
-        )
-        
-        # 処理済み位置記録
-        processed_positions = set()
-        
-        # ファイル名付きブロック処理
-        for match in filename_blocks:
-            filename, ext, language, content = match
-            if content.strip():
-                block = CodeBlock(
-                    content=content.strip(),
-                    filename=filename.strip(),
-                    language=self._normalize_language(language or ext)
-                )
-                blocks.append(block)
-        
-        # 通常のMarkdownコードブロック抽出
-        matches = self.code_block_pattern.findall(response)
-        
-        for i, (language, content) in enumerate(matches):
-            if not content.strip():
-                continue
-            
-            # 既に処理済みかチェック
-            if any(content.strip() in block.content for block in blocks):
+        for index, match in enumerate(self.code_block_pattern.finditer(response)):
+            content = match.group('content').strip()
+            if not content or content in seen_contents:
                 continue
+            seen_contents.add(content)
             
-            # ファイル名検出
-            filename = self._extract_filename_from_content(content) or self._generate_filename(content, language, i)
+            language = match.group('language') or ""
+            header = match.group('header')
             
-            # 言語正規化
-            normalized_language = self._normalize_language(language)
+            if header:
+                filename = header.strip()
+                normalized_language = self._normalize_language(language or match.group('ext'))
+            else:
+                # ファイル名検出
+                filename = (self._extract_filename_from_content(match.group('content'))
+                            or self._generate_filename(match.group('content'), language, index))
+                normalized_language = self._normalize_language(language)
             
-            block = CodeBlock(
-                content=content.strip(),
+            blocks.append(CodeBlock(
+                content=content,
                 filename=filename,
                 language=normalized_language
-            )
-            
-            blocks.append(block)
+            ))
         
         return blocks
     
     def _extract_filename_from_content(self, content: str) -> Optional[str]:
         """コンテンツからファイル名抽出"""
-        lines = content.split('\n')
-        
         # 最初の数行をチェック
-        for line in lines[:3]:
+        for line in content.split('\n', 3)[:3]:
             # コメント形式のファイル名
             if line.strip().startswith('//') and '.' in line:
                 filename = line.replace('//', '').strip()
-                if any(ext in filename for ext in ['.tsx', '.ts', '.jsx', '.js', '.css', '.json', '.html']):
+                if any(ext in filename for ext in _FILENAME_EXTENSIONS):
                     return filename
             
             # ファイル拡張子を含む行
-            if any(ext in line for ext in ['.tsx', '.ts', '.jsx', '.js', '.css', '.json']):
-                parts = line.split()
-                for part in parts:
-                    if '.' in part and any(ext in part for ext in ['.tsx', '.ts', '.jsx', '.js', '.css', '.json']):
+            if any(ext in line for ext in _CONTENT_EXTENSIONS):
+                for part in line.split():
+                    if '.' in part and any(ext in part for ext in _CONTENT_EXTENSIONS):
                         return part.strip('(),"\' ')
         
         return None
@@ -223,29 +292,11 @@ class ResponseParser:
     
     def _normalize_language(self, language: str) -> str:
         """言語名正規化"""
-        lang_map = {
-            'tsx': 'typescript',
-            'ts': 'typescript', 
-            'jsx': 'javascript',
-            'js': 'javascript',
-            'typescript': 'typescript',
-            'javascript': 'javascript',
-            'css': 'css',
-            'json': 'json',
-            'html': 'html'
-        }
-        return lang_map.get(language.lower(), 'typescript')
+        return _LANGUAGE_MAP.get(language.lower(), 'typescript')
     
     def _get_extension_from_language(self, language: str) -> str:
         """言語から拡張子取得"""
-        ext_map = {
-            'typescript': '.tsx',
-            'javascript': '.jsx',
-            'css': '.css',
-            'json': '.json',
-            'html': '.html'
-        }
-        return ext_map.get(language.lower(), '.tsx')
+        return _EXTENSION_MAP.get(language.lower(), '.tsx')
     
     def detect_main_component(self, blocks: List[CodeBlock]) -> str:
         """メインコンポーネント判定"""
@@ -275,13 +326,9 @@ class ResponseParser:
         """依存関係検出"""
         dependencies = set()
         
-        # npm package patterns
-        npm_package_pattern = re.compile(r"from ['\"]([^'\"./][^'\"]*)['\"]")
-        relative_import_pattern = re.compile(r"import.*from ['\"]([^'\"]*)['\"]")
-        
         for block in blocks:
             # npm packages
-            npm_matches = npm_package_pattern.findall(block.content)
+            npm_matches = [source for source in block.get_imports() if source and source[0] not in './']
             for match in npm_matches:
                 # スコープパッケージも対応
                 if match.startswith('@'):
@@ -306,23 +353,24 @@ class ResponseParser:
         """機能特徴検出"""
         features = set()
         
-        all_content = " ".join(block.content for block in blocks)
+        # ブロックを連結せず、ブロック単位でキーワードを探索
+        def contains_any(keywords) -> bool:
+            return any(keyword in block.content for block in blocks for keyword in keywords)
         
         # React Hooks
-        if any(hook in all_content for hook in ["useState", "useEffect", "useCallback", "useMemo", "useContext"]):
+        if contains_any(_HOOK_KEYWORDS):
             features.add("react_hooks")
         
         # Form関連
-        if any(form_keyword in all_content for form_keyword in ["<form", "onSubmit", "input", "required"]):
+        if contains_any(_FORM_KEYWORDS):
             features.add("form_validation")
         
         # Tailwind CSS
-        tailwind_classes = ["bg-", "text-", "p-", "m-", "flex", "grid", "w-", "h-", "border"]
-        if any(tw_class in all_content for tw_class in tailwind_classes):
+        if contains_any(_TAILWIND_KEYWORDS):
             features.add("tailwind_css")
         
         # レスポンシブデザイン
-        if any(responsive in all_content for responsive in ["@media", "sm:", "md:", "lg:", "xl:", "grid-cols"]):
+        if contains_any(_RESPONSIVE_KEYWORDS):
             features.add("responsive_design")
         
         # TypeScript
@@ -330,7 +378,7 @@ class ResponseParser:
             features.add("typescript")
         
         # API呼び出し
-        if any(api_keyword in all_content for api_keyword in ["fetch(", "axios", "api", "endpoint"]):
+        if contains_any(_API_KEYWORDS):
             features.add("api_integration")
         
         return sorted(list(features))
@@ -0,0 +1,147 @@
+"""
+Secret Scanner - 認証情報の検出・マスク
+全種別の検出範囲を集め、マスク後の内容は1回の連結で組み立てる（パターンごとの置換で内容を何度も作り直さない）
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Pattern, Tuple
+
+# (種別, リテラル接頭辞, パターン)
+SECRET_PATTERNS: List[Tuple[str, str, str]] = [
+    ("openai_api_key", "sk-", r"sk-[a-zA-Z0-9_-]{10,}"),          # OpenAI API keys（最小10文字）
+    ("github_token", "ghp_", r"ghp_[a-zA-Z0-9_-]{36}"),           # GitHub tokens
+    ("gitlab_token", "glpat-", r"glpat-[a-zA-Z0-9_-]{20}"),       # GitLab tokens
+    ("slack_token", "xox", r"xox[baprs]-[a-zA-Z0-9_-]{10,}"),     # Slack tokens
+]
+
+REDACTION_MARKER = "[REDACTED-SENSITIVE-DATA]"
+
+
+@dataclass
+class SecretMatch:
+    """検出結果（位置は元の内容に対するもの）"""
+    kind: str
+    start: int
+    end: int
+    line: int
+    column: int
+
+
+class SecretScanner:
+    """
+    認証情報スキャナー
+
+    - 接頭辞の先頭文字が同じパターンは「先頭文字 + (残りの選択)」の1つの正規表現にまとめ、走査回数を減らす
+      （ghp_ と glpat- は g から1回で走査する。種別は検出位置で各パターンを match して決める）
+    - 検出位置だけを集め、置換文字列はパターンごとに作らない
+    - 全種別の検出範囲を位置順にまとめ、マスク後の内容は1回の連結で組み立てる（重なりは左端優先）
+
+    接頭辞が固定の正規表現は re 自身が接頭辞で読み飛ばすため、str.find による事前判定は
+    出現しない種別で内容全体をもう1回走査するだけになる。has_candidates は呼び出し側の
+    早期判定用に残すが、redact / scan では使わない。
+    先頭文字が異なるパターンを1つの選択（a|b|c）にまとめると先頭文字の集合でしか絞り込めず、
+    s や x を多く含む大きなバンドルでは逆に遅くなるため、先頭文字ごとに走査する。
+    """
+
+    def __init__(self, patterns: Optional[List[Tuple[str, str, str]]] = None, replacement: str = REDACTION_MARKER):
+        self.patterns = patterns or SECRET_PATTERNS
+        self.replacement = replacement
+        self.prefixes = tuple(dict.fromkeys(prefix for _, prefix, _ in self.patterns))
+        self._compiled = [(kind, prefix, re.compile(pattern)) for kind, prefix, pattern in self.patterns]
+        self._groups = self._group_by_first_char()
+
+    def has_candidates(self, content: str) -> bool:
+        """接頭辞の事前判定（部分文字列検索のみ）"""
+        return any(prefix in content for prefix in self.prefixes)
+
+    def scan(self, content: str) -> List[SecretMatch]:
+        """検出のみ"""
+        return self._locate(content, self._find_spans(content))
+
+    def redact(self, content: str) -> Tuple[str, List[SecretMatch]]:
+        """
+        マスク
+
+        Returns:
+            (マスク後の内容, 検出結果)
+        """
+        spans = self._find_spans(content)
+        if not spans:
+            return content, []
+
+        parts: List[str] = []
+        position = 0
+        for start, end, _ in spans:
+            parts.append(content[position:start])
+            parts.append(self.replacement)
+            position = end
+        parts.append(content[position:])
+
+        return "".join(parts), self._locate(content, spans)
+
+    def _group_by_first_char(self) -> List[Tuple[Pattern[str], List[Tuple[str, Pattern[str]]]]]:
+        """接頭辞の先頭文字ごとの走査用正規表現と、その中の種別"""
+        by_char: Dict[str, List[Tuple[str, str, Pattern[str]]]] = {}
+        groups: List[Tuple[Pattern[str], List[Tuple[str, Pattern[str]]]]] = []
+        for kind, prefix, regex in self._compiled:
+            head = re.escape(prefix[:1])
+            if prefix and regex.pattern.startswith(head):
+                by_char.setdefault(head, []).append((kind, regex.pattern[len(head):], regex))
+            else:
+                groups.append((regex, [(kind, regex)]))
+
+        for head, members in by_char.items():
+            if len(members) == 1:
+                kind, _, regex = members[0]
+                groups.append((regex, [(kind, regex)]))
+            else:
+                combined = re.compile(head + "(?:" + "|".join(f"(?:{rest})" for _, rest, _ in members) + ")")
+                groups.append((combined, [(kind, regex) for kind, _, regex in members]))
+        return groups
+
+    def _find_spans(self, content: str) -> List[Tuple[int, int, str]]:
+        """検出範囲（位置順・重なりなし）"""
+        spans: List[Tuple[int, int, str]] = []
+        for scanner, members in self._groups:
+            if len(members) == 1:
+                kind = members[0][0]
+                spans.extend((match.start(), match.end(), kind) for match in scanner.finditer(content))
+                continue
+            for match in scanner.finditer(content):
+                # 同じ位置で一致する種別のうち最長のもの
+                start = match.start()
+                candidates = [(found.end(), kind) for kind, regex in members if (found := regex.match(content, start))]
+                end, kind = max(candidates, key=lambda candidate: candidate[0])
+                spans.append((start, end, kind))
+
+        if len(spans) <= 1:
+            return spans
+
+        # 左端優先、同じ開始位置なら長い方
+        spans.sort(key=lambda span: (span[0], -span[1]))
+        merged = [spans[0]]
+        for span in spans[1:]:
+            if span[0] >= merged[-1][1]:
+                merged.append(span)
+        return merged
+
+    @staticmethod
+    def _locate(content: str, spans: List[Tuple[int, int, str]]) -> List[SecretMatch]:
+        """行・列の算出（前回の検出位置からの改行数で進めるため全体で1回の走査）"""
+        matches: List[SecretMatch] = []
+        position, line, line_start = 0, 1, 0
+
+        for start, end, kind in spans:
+            newlines = content.count("\n", position, start)
+            if newlines:
+                line += newlines
+                line_start = content.rfind("\n", position, start) + 1
+            matches.append(SecretMatch(kind=kind, start=start, end=end, line=line, column=start - line_start))
+            position = start
+
+        return matches
+
+
+# 共有インスタンス（正規表現のコンパイルは1回）
+default_secret_scanner = SecretScanner()
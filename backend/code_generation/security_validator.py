@@ -9,6 +9,7 @@ from dataclasses import dataclass
 from enum import Enum
 
 from .response_parser import CodeBlock
+from .secret_scanner import SecretScanner, default_secret_scanner
 
 
 class RiskSeverity(Enum):
@@ -41,7 +42,10 @@ class SecurityValidator:
     セキュリティリスク検証システム
     """
     
-    def __init__(self):
+    def __init__(self, secret_scanner: SecretScanner = default_secret_scanner):
+        # ハードコードされた認証情報（GitHubService のマスク処理と共通のスキャナー）
+        self.secret_scanner = secret_scanner
+        
         # 危険なパターン定義
         self.dangerous_patterns = {
             "xss": {
@@ -121,12 +125,30 @@ class SecurityValidator:
         # 偽陽性除去
         risks = self._filter_false_positives(risks, block)
         
+        # 認証情報はコメント内でも漏洩になるため偽陽性除去の対象外
+        risks.extend(self._detect_secrets(block))
+        
         return risks
     
+    def _detect_secrets(self, block: CodeBlock) -> List[SecurityRisk]:
+        """ハードコードされた認証情報の検出"""
+        return [
+            SecurityRisk(
+                risk_type="hardcoded_secret",
+                severity=RiskSeverity.CRITICAL.value,
+                description=f"Hardcoded credential detected ({match.kind})",
+                filename=block.filename,
+                line=match.line,
+                column=match.column,
+                recommendation=self._get_recommendation("hardcoded_secret")
+            )
+            for match in self.secret_scanner.scan(block.content)
+        ]
+    
     def _detect_risk_pattern(self, block: CodeBlock, risk_type: str, config: Dict[str, Any]) -> List[SecurityRisk]:
         """特定リスクパターンの検出"""
         risks = []
-        lines = block.content.split('\n')
+        lines = block.lines
         
         for pattern in config["patterns"]:
             regex = re.compile(pattern, re.IGNORECASE | re.MULTILINE)
@@ -151,18 +173,20 @@ class SecurityValidator:
     def _filter_false_positives(self, risks: List[SecurityRisk], block: CodeBlock) -> List[SecurityRisk]:
         """偽陽性フィルタリング"""
         filtered_risks = []
+        if not risks:
+            return filtered_risks
+        
+        # セーフパターンはブロック全体に対する判定なのでリスクごとに再検索しない
+        has_safe_pattern = any(
+            re.search(safe_pattern, block.content, re.IGNORECASE)
+            for safe_pattern in self.safe_patterns
+        )
+        lines = block.lines
         
         for risk in risks:
-            is_false_positive = False
-            
-            # セーフパターンチェック
-            for safe_pattern in self.safe_patterns:
-                if re.search(safe_pattern, block.content, re.IGNORECASE):
-                    is_false_positive = True
-                    break
+            is_false_positive = has_safe_pattern
             
             # コメント内かチェック
-            lines = block.content.split('\n')
             if risk.line <= len(lines):
                 line = lines[risk.line - 1]
                 if '//' in line:
@@ -182,7 +206,8 @@ class SecurityValidator:
             "code_injection": "Avoid dynamic code execution. Use safer alternatives like JSON parsing or predefined function maps",
             "sql_injection": "Use parameterized queries or prepared statements instead of string interpolation",
             "path_traversal": "Validate and sanitize file paths. Use path.resolve() and check against allowed directories",
-            "unsafe_redirect": "Validate redirect URLs against a whitelist of allowed domains"
+            "unsafe_redirect": "Validate redirect URLs against a whitelist of allowed domains",
+            "hardcoded_secret": "Load credentials from environment variables or a secret manager instead of source code"
         }
         
         return recommendations.get(risk_type, "Review code for potential security implications")
@@ -0,0 +1,347 @@
+"""
+Transpiler - サーバーサイドTSX→JS変換
+esbuildでTypeScript/JSXをブラウザ実行可能なJSへ変換し、内容ハッシュ単位でディスクへキャッシュする
+"""
+
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 拡張子 → esbuild loader
+_LOADERS = {
+    ".tsx": "tsx",
+    ".ts": "ts",
+    ".jsx": "jsx",
+    ".js": "js"
+}
+
+# ブラウザでそのまま評価できる形式（importはrequire()に変換、exportはグローバル変数に集約）
+_TRANSFORM_OPTIONS = {
+    "format": "iife",
+    "globalName": "__altmx_module",
+    "jsx": "transform",
+    "target": "es2018",
+    "minify": False
+}
+
+# 永続ワーカー（1行1リクエストのNDJSONで transformSync を呼ぶ）
+_WORKER_SCRIPT = r"""
+const esbuild = require('esbuild');
+const readline = require('readline');
+const rl = readline.createInterface({ input: process.stdin });
+rl.on('line', (line) => {
+  const request = JSON.parse(line);
+  let response;
+  try {
+    const result = esbuild.transformSync(request.source, request.options);
+    response = { id: request.id, code: result.code, warnings: result.warnings.map((w) => w.text) };
+  } catch (e) {
+    const errors = (e.errors || []).map((err) => err.location ? `${err.location.line}:${err.location.column} ${err.text}` : err.text);
+    response = { id: request.id, error: errors.join('\n') || String(e) };
+  }
+  process.stdout.write(JSON.stringify(response) + '\n');
+});
+"""
+
+
+class TranspileError(Exception):
+    """変換エラー"""
+    pass
+
+
+@dataclass
+class TranspileResult:
+    """変換結果"""
+    filename: str
+    code: str
+    cache_key: str
+    cached: bool = False
+    backend: str = ""
+    warnings: List[str] = field(default_factory=list)
+
+
+class EsbuildWorker:
+    """
+    esbuild 永続ワーカー
+    Node.js上でesbuildのJS APIを常駐させ、プロセス起動コストを1回に抑える
+    """
+
+    name = "esbuild-worker"
+
+    def __init__(self, node_path: str = "node", module_paths: Optional[List[str]] = None):
+        self.node_path = node_path
+        self.module_paths = module_paths or []
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    @classmethod
+    def is_available(cls, node_path: str = "node", module_paths: Optional[List[str]] = None) -> bool:
+        """nodeとesbuildモジュールが解決できるか"""
+        if shutil.which(node_path) is None:
+            return False
+        try:
+            result = subprocess.run(
+                [node_path, "-e", "require.resolve('esbuild')"],
+                env=cls._build_env(module_paths or []),
+                capture_output=True,
+                timeout=10
+            )
+            return result.returncode == 0
+        except (OSError, subprocess.SubprocessError):
+            return False
+
+    def transform(self, source: str, loader: str) -> Dict[str, Any]:
+        """
+        変換実行
+
+        Returns:
+            {"code": ..., "warnings": [...]}
+        """
+        with self._lock:
+            process = self._ensure_process()
+            self._counter += 1
+            request = {"id": self._counter, "source": source, "options": dict(_TRANSFORM_OPTIONS, loader=loader)}
+
+            try:
+                process.stdin.write(json.dumps(request) + "\n")
+                process.stdin.flush()
+                line = process.stdout.readline()
+            except (OSError, ValueError) as e:
+                self._terminate()
+                raise TranspileError(f"esbuild worker failed: {e}")
+
+            if not line:
+                self._terminate()
+                raise TranspileError("esbuild worker exited unexpectedly")
+
+        response = json.loads(line)
+        if "error" in response:
+            raise TranspileError(response["error"])
+        return {"code": response["code"], "warnings": response.get("warnings", [])}
+
+    def close(self):
+        """ワーカー停止"""
+        with self._lock:
+            self._terminate()
+
+    def _ensure_process(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                [self.node_path, "-e", _WORKER_SCRIPT],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                env=self._build_env(self.module_paths),
+                text=True,
+                encoding="utf-8"
+            )
+            logger.info("esbuild worker started")
+        return self._process
+
+    def _terminate(self):
+        if self._process is not None:
+            try:
+                self._process.kill()
+                self._process.wait(timeout=5)
+            except (OSError, subprocess.SubprocessError):
+                pass
+            self._process = None
+
+    @staticmethod
+    def _build_env(module_paths: List[str]) -> Dict[str, str]:
+        env = dict(os.environ)
+        if module_paths:
+            env["NODE_PATH"] = os.pathsep.join(module_paths + [env.get("NODE_PATH", "")]).rstrip(os.pathsep)
+        return env
+
+
+class EsbuildCli:
+    """
+    esbuild 単体バイナリ
+    Node.jsがない環境向け（変換ごとにプロセス起動、結果はキャッシュされる）
+    """
+
+    name = "esbuild-cli"
+
+    def __init__(self, binary: str = "esbuild", timeout: float = 30.0):
+        self.binary = binary
+        self.timeout = timeout
+
+    @classmethod
+    def is_available(cls, binary: str = "esbuild") -> bool:
+        return shutil.which(binary) is not None
+
+    def transform(self, source: str, loader: str) -> Dict[str, Any]:
+        args = [self.binary, f"--loader={loader}", "--log-level=error"]
+        for key, value in _TRANSFORM_OPTIONS.items():
+            if value is True:
+                args.append(f"--{self._cli_flag(key)}")
+            elif value is not False:
+                args.append(f"--{self._cli_flag(key)}={value}")
+
+        try:
+            result = subprocess.run(
+                args,
+                input=source,
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                timeout=self.timeout
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            raise TranspileError(f"esbuild failed: {e}")
+
+        if result.returncode != 0:
+            raise TranspileError(result.stderr.strip() or "esbuild failed")
+        return {"code": result.stdout, "warnings": []}
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _cli_flag(key: str) -> str:
+        return "global-name" if key == "globalName" else key
+
+
+class TranspileCache:
+    """
+    変換キャッシュ
+
+    キー = (変換器, 変換オプション, loader, ソース) のハッシュ。
+    同一ソースの変換は初回のみ実行し、以降はディスク上の結果を返す。
+    """
+
+    def __init__(self, cache_dir: str, backend: Optional[Any] = None, max_memory_entries: int = 256):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.backend = backend if backend is not None else self._detect_backend()
+        # 直近の変換結果（LRU、溢れた分はディスクから読み直す）
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "errors": 0}
+
+    @staticmethod
+    def _detect_backend() -> Optional[Any]:
+        """利用可能な変換器検出（永続ワーカー優先）"""
+        frontend_modules = str(Path(__file__).resolve().parents[2] / "frontend" / "node_modules")
+        if EsbuildWorker.is_available(module_paths=[frontend_modules]):
+            return EsbuildWorker(module_paths=[frontend_modules])
+        if EsbuildCli.is_available():
+            return EsbuildCli()
+        logger.warning("esbuild not found, server-side transpile disabled")
+        return None
+
+    @property
+    def available(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def can_transpile(filename: str) -> bool:
+        """TypeScript/JSXファイルか"""
+        return os.path.splitext(filename)[1].lower() in (".tsx", ".ts", ".jsx")
+
+    def cache_key(self, source: str, filename: str) -> str:
+        loader = _LOADERS.get(os.path.splitext(filename)[1].lower(), "tsx")
+        digest = hashlib.sha256()
+        digest.update(json.dumps([getattr(self.backend, "name", ""), _TRANSFORM_OPTIONS, loader]).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def transpile(self, source: str, filename: str) -> TranspileResult:
+        """
+        TSX/TS/JSX → JS 変換（キャッシュ付き）
+
+        Raises:
+            TranspileError: 変換器がない・構文エラー
+        """
+        if self.backend is None:
+            raise TranspileError("No transpiler backend available")
+
+        key = self.cache_key(source, filename)
+
+        with self._lock:
+            code = self._memory.get(key)
+            if code is not None:
+                self._memory.move_to_end(key)
+        if code is None:
+            path = self.path_for(key)
+            if path.exists():
+                code = path.read_text(encoding="utf-8")
+                self._remember(key, code)
+
+        if code is not None:
+            with self._lock:
+                self._stats["hits"] += 1
+            return TranspileResult(filename=filename, code=code, cache_key=key, cached=True, backend=self.backend.name)
+
+        loader = _LOADERS.get(os.path.splitext(filename)[1].lower(), "tsx")
+        try:
+            output = self.backend.transform(source, loader)
+        except TranspileError:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+
+        self._atomic_write(self.path_for(key), output["code"])
+        self._remember(key, output["code"])
+        with self._lock:
+            self._stats["misses"] += 1
+
+        return TranspileResult(
+            filename=filename,
+            code=output["code"],
+            cache_key=key,
+            cached=False,
+            backend=self.backend.name,
+            warnings=output.get("warnings", [])
+        )
+
+    def _remember(self, key: str, code: str):
+        with self._lock:
+            self._memory[key] = code
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, backend=getattr(self.backend, "name", None), memory_entries=len(self._memory))
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+
+    def path_for(self, key: str) -> Path:
+        """変換結果のキャッシュパス"""
+        return self.cache_dir / key[:2] / f"{key}.js"
+
+    def _atomic_write(self, path: Path, data: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+        tmp_path.write_text(data, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+# ブラウザ側 require() の代替（UMD版React等のグローバルへ対応付け）
+BROWSER_REQUIRE_SHIM = """
+window.require = function (name) {
+  if (name === 'react') return window.React;
+  if (name === 'react-dom' || name === 'react-dom/client') return window.ReactDOM;
+  if (/\\.(css|svg|png|jpe?g|gif)$/.test(name)) return {};
+  throw new Error('Module not available in preview: ' + name);
+};
+"""
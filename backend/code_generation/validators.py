@@ -134,7 +134,7 @@ class CodeValidator:
     def _check_basic_syntax(self, block: CodeBlock) -> List[ValidationError]:
         """基本構文チェック"""
         errors = []
-        lines = block.content.split('\n')
+        lines = block.lines
         
         # 括弧バランスチェック
         brace_count = block.content.count('{') - block.content.count('}')
@@ -197,8 +197,8 @@ class CodeValidator:
             ))
         
         # useState未import検知
-        if "useState" in block.content and "useState" not in block.content.split('\n')[0]:
-            if not any("import" in line and "useState" in line for line in block.content.split('\n')[:5]):
+        if "useState" in block.content and "useState" not in block.lines[0]:
+            if not any("import" in line and "useState" in line for line in block.lines[:5]):
                 errors.append(ValidationError(
                     filename=block.filename,
                     line=1,
@@ -243,7 +243,7 @@ class CodeValidator:
     def _check_eslint_rules(self, block: CodeBlock) -> List[ValidationError]:
         """ESLintルールチェック"""
         errors = []
-        lines = block.content.split('\n')
+        lines = block.lines
         
         # セミコロンチェック
         for i, line in enumerate(lines, 1):
@@ -333,7 +333,7 @@ class CodeValidator:
             ))
         
         # 毎回新しい関数/オブジェクトを作成
-        lines = block.content.split('\n')
+        lines = block.lines
         for i, line in enumerate(lines, 1):
             if 'onClick={() => ' in line or 'onChange={() => ' in line:
                 warnings.append(ValidationError(
@@ -6,57 +6,127 @@ EC2デプロイサービス
 import os
 import json
 import shutil
-import subprocess
 import uuid
+import signal
+import logging
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Deque
 from datetime import datetime
 import asyncio
 
+from code_generation.dependency_cache import DependencyCache
+from port_allocator import PortAllocator
+from deployment_registry import DeploymentRegistry
+
+logger = logging.getLogger(__name__)
+
+# 保持するビルドログの最大行数（デプロイごと）
+MAX_LOG_LINES = 500
+
+# ビルドジョブ実行中のステータス（再起動時は中断扱い）
+_BUILD_STATUSES = ("queued", "preparing", "installing", "building", "starting")
+
+
 class DeploymentService:
     """デプロイメント管理サービス"""
     
-    def __init__(self):
-        self.base_deploy_path = Path("/home/AltMX-admin/deployments")
+    service_name = "ec2"
+    
+    def __init__(
+        self,
+        base_deploy_path: Optional[str] = None,
+        max_concurrent_builds: int = 2,
+        registry: Optional[DeploymentRegistry] = None
+    ):
+        self.base_deploy_path = Path(base_deploy_path or os.getenv("DEPLOY_BASE_PATH", "/home/AltMX-admin/deployments"))
         self.base_deploy_path.mkdir(exist_ok=True)
         self.port_range = range(3000, 3100)
+        self.port_allocator = PortAllocator(self.port_range)
+        self._leased_ports: Dict[str, int] = {}  # deployment_id -> port（返却は1回のみ）
         self.deployments = {}  # deployment_id -> deployment_info
         
-    def _get_next_available_port(self) -> int:
-        """利用可能な次のポートを取得"""
-        used_ports = set()
+        # ビルドはバックグラウンドジョブとして同時実行数を制限
+        self.max_concurrent_builds = max_concurrent_builds
+        self._build_slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._logs: Dict[str, Deque[str]] = {}
+        self._log_counts: Dict[str, int] = {}
+        
+        # 依存関係キャッシュ（同じ依存集合の node_modules を再利用）
+        self.dependency_cache = DependencyCache(str(self.base_deploy_path / ".dependency_cache"))
+        
+        # 実行コマンド（タイムアウト秒）
+        self.install_command = ["npm", "install", *self.dependency_cache.npm_install_args()]
+        self.install_timeout = 120
+        self.build_command = ["npm", "run", "build"]
+        self.build_timeout = 180
+        self.serve_command = ["npx", "serve", "-s", "build", "-l", "{port}"]
         
-        # 既存のデプロイメントのポートを収集
-        for deployment in self.deployments.values():
-            if deployment.get("port"):
-                used_ports.add(deployment["port"])
+        # デプロイ情報の永続化（再起動時に稼働中プロセスを引き継ぐ）
+        self.registry = registry or DeploymentRegistry(str(self.base_deploy_path / "deployments.db"))
+        self._recover()
         
-        # netstatで実際に使用中のポートを確認
+    def _recover(self):
+        """
+        起動時の突き合わせ
+        
+        - 稼働中のserveプロセス: 引き継ぎ（ポートを割り当て済みとして登録）
+        - 終了済みのプロセス: 停止扱い（ポートは空きのまま）
+        - ビルド途中のデプロイ: 失敗扱い（起動済みのserveプロセスがあれば停止）
+        """
+        adopted = reaped = 0
+        for deployment in self.registry.list(self.service_name):
+            deployment_id = deployment["id"]
+            alive = self.registry.is_process_alive(deployment.get("process_pid"), deployment.get("project_path"))
+            
+            if deployment["status"] == "completed":
+                if alive and deployment.get("port") and self.port_allocator.reserve(deployment["port"]):
+                    self._leased_ports[deployment_id] = deployment["port"]
+                    adopted += 1
+                else:
+                    deployment.update({
+                        "status": "stopped",
+                        "message": "サーバープロセスが終了していました",
+                        "stopped_at": datetime.now().isoformat()
+                    })
+                    self.registry.save(self.service_name, deployment)
+                    reaped += 1
+            elif deployment["status"] in _BUILD_STATUSES:
+                if alive:
+                    self._kill_process(deployment["process_pid"])
+                deployment.update({
+                    "status": "failed",
+                    "message": "デプロイ失敗: バックエンド再起動により中断されました",
+                    "error": "Interrupted by backend restart"
+                })
+                self.registry.save(self.service_name, deployment)
+                reaped += 1
+            
+            self.deployments[deployment_id] = deployment
+            self._logs[deployment_id] = deque(maxlen=MAX_LOG_LINES)
+            self._log_counts[deployment_id] = 0
+        
+        if adopted or reaped:
+            logger.info(f"Recovered deployments: {adopted} adopted, {reaped} reaped")
+    
+    def _persist(self, deployment_id: str):
+        self.registry.save(self.service_name, self.deployments[deployment_id])
+    
+    @staticmethod
+    def _kill_process(pid: int):
         try:
-            result = subprocess.run(
-                ["ss", "-tuln"], 
-                capture_output=True, 
-                text=True
-            )
-            for line in result.stdout.split('\n'):
-                if ':' in line:
-                    parts = line.split()
-                    for part in parts:
-                        if ':' in part:
-                            try:
-                                port = int(part.split(':')[-1])
-                                used_ports.add(port)
-                            except ValueError:
-                                pass
-        except Exception:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
             pass
-            
-        # 利用可能なポートを探す
-        for port in self.port_range:
-            if port not in used_ports:
-                return port
-                
-        raise RuntimeError("No available ports in range 3000-3099")
+        
+    def _get_next_available_port(self) -> int:
+        """利用可能な次のポートを取得"""
+        return self.port_allocator.allocate()
+    
+    def _release_port(self, deployment_id: str):
+        """デプロイに割り当てたポートを空きリストへ返却（重複返却しない）"""
+        self.port_allocator.release(self._leased_ports.pop(deployment_id, None))
     
     def _create_react_project(self, app_name: str, files: List[Dict[str, str]]) -> Path:
         """Reactプロジェクトを作成"""
@@ -176,98 +246,201 @@ code {
         instance_type: str = "local",
         region: str = "ap-northeast-1"
     ) -> Dict[str, Any]:
-        """アプリケーションをデプロイ"""
+        """
+        アプリケーションをデプロイ
+        
+        ビルドはバックグラウンドで実行し、deployment_idを即座に返す。
+        進捗は get_deployment_status / get_deployment_logs で取得する。
+        """
         
         deployment_id = f"dep_{uuid.uuid4().hex[:8]}"
         
+        # デプロイメント情報を初期化
+        self.deployments[deployment_id] = {
+            "id": deployment_id,
+            "app_name": app_name,
+            "status": "queued",
+            "progress": 0,
+            "message": "ビルド待ち...",
+            "created_at": datetime.now().isoformat()
+        }
+        self._logs[deployment_id] = deque(maxlen=MAX_LOG_LINES)
+        self._log_counts[deployment_id] = 0
+        self._persist(deployment_id)
+        
+        task = asyncio.create_task(self._run_deployment(deployment_id, app_name, files))
+        self._tasks[deployment_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(deployment_id, None))
+        
+        return {
+            "deployment_id": deployment_id,
+            "status": "queued",
+            "message": "デプロイを受け付けました"
+        }
+    
+    async def wait_for_deployment(self, deployment_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """バックグラウンドデプロイの完了待ち"""
+        task = self._tasks.get(deployment_id)
+        if task is not None:
+            await asyncio.wait_for(asyncio.shield(task), timeout)
+        return self.get_deployment_status(deployment_id)
+    
+    async def _run_deployment(self, deployment_id: str, app_name: str, files: List[Dict[str, str]]):
+        """デプロイジョブ本体"""
+        deployment = self.deployments[deployment_id]
+        
+        if self._build_slots is None:
+            self._build_slots = asyncio.Semaphore(self.max_concurrent_builds)
+        
         try:
-            # デプロイメント情報を初期化
-            self.deployments[deployment_id] = {
-                "id": deployment_id,
-                "app_name": app_name,
-                "status": "preparing",
-                "progress": 10,
-                "message": "プロジェクトを準備中...",
-                "created_at": datetime.now().isoformat()
-            }
-            
-            # プロジェクト作成
-            project_path = self._create_react_project(app_name, files)
-            self.deployments[deployment_id]["project_path"] = str(project_path)
-            self.deployments[deployment_id]["progress"] = 30
-            self.deployments[deployment_id]["message"] = "依存関係をインストール中..."
-            
-            # npm install実行
-            install_result = subprocess.run(
-                ["npm", "install"],
-                cwd=project_path,
-                capture_output=True,
-                text=True,
-                timeout=120
-            )
-            
-            if install_result.returncode != 0:
-                raise RuntimeError(f"npm install failed: {install_result.stderr}")
+            async with self._build_slots:
+                self._update(deployment_id, "preparing", 10, "プロジェクトを準備中...")
                 
-            self.deployments[deployment_id]["progress"] = 60
-            self.deployments[deployment_id]["message"] = "アプリケーションをビルド中..."
-            
-            # ビルド実行
-            build_result = subprocess.run(
-                ["npm", "run", "build"],
-                cwd=project_path,
-                capture_output=True,
-                text=True,
-                timeout=180
-            )
-            
-            if build_result.returncode != 0:
-                raise RuntimeError(f"Build failed: {build_result.stderr}")
+                # プロジェクト作成
+                project_path = await asyncio.to_thread(self._create_react_project, app_name, files)
+                deployment["project_path"] = str(project_path)
+                
+                # 依存関係: キャッシュヒット時はnpm installを省略
+                self._update(deployment_id, "installing", 30, "依存関係をインストール中...")
+                with open(project_path / "package.json") as f:
+                    cache_key = self.dependency_cache.key_for(json.load(f))
+                
+                if await asyncio.to_thread(self.dependency_cache.materialize, cache_key, project_path):
+                    deployment["dependency_cache"] = "hit"
+                    self._append_log(deployment_id, f"node_modules restored from cache ({cache_key[:12]})")
+                else:
+                    deployment["dependency_cache"] = "miss"
+                    await self._run_command(deployment_id, self.install_command, project_path, self.install_timeout)
+                    await asyncio.to_thread(self.dependency_cache.populate, cache_key, project_path)
+                
+                # ビルド実行
+                self._update(deployment_id, "building", 60, "アプリケーションをビルド中...")
+                await self._run_command(deployment_id, self.build_command, project_path, self.build_timeout)
             
-            self.deployments[deployment_id]["progress"] = 80
-            self.deployments[deployment_id]["message"] = "サーバーを起動中..."
+            self._update(deployment_id, "starting", 80, "サーバーを起動中...")
             
             # 利用可能なポートを取得
             port = self._get_next_available_port()
-            self.deployments[deployment_id]["port"] = port
+            self._leased_ports[deployment_id] = port
+            deployment["port"] = port
             
             # serveコマンドでアプリを起動
-            serve_process = subprocess.Popen(
-                ["npx", "serve", "-s", "build", "-l", str(port)],
+            serve_process = await asyncio.create_subprocess_exec(
+                *[part.format(port=port) for part in self.serve_command],
                 cwd=project_path,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
             )
-            
-            self.deployments[deployment_id]["process_pid"] = serve_process.pid
+            deployment["process_pid"] = serve_process.pid
+            self._persist(deployment_id)
             
             # 少し待ってサーバーが起動するのを確認
             await asyncio.sleep(2)
             
             # デプロイ完了
             deployment_url = f"http://13.158.137.20:{port}/"
-            self.deployments[deployment_id].update({
+            deployment.update({
                 "status": "completed",
                 "progress": 100,
                 "message": "デプロイ完了！",
                 "url": deployment_url,
                 "completed_at": datetime.now().isoformat()
             })
+            self._persist(deployment_id)
+            logger.info(f"Deployment {deployment_id} completed: {deployment_url}")
             
-            return {
-                "deployment_id": deployment_id,
-                "status": "completed",
-                "url": deployment_url,
-                "message": f"アプリケーションが {deployment_url} でデプロイされました！"
-            }
-            
+        except asyncio.CancelledError:
+            self._release_port(deployment_id)
+            deployment.update({
+                "status": "stopped",
+                "message": "デプロイを中止しました",
+                "stopped_at": datetime.now().isoformat()
+            })
+            self._persist(deployment_id)
+            raise
         except Exception as e:
-            self.deployments[deployment_id].update({
+            self._release_port(deployment_id)
+            deployment.update({
                 "status": "failed",
                 "message": f"デプロイ失敗: {str(e)}",
                 "error": str(e)
             })
+            self._persist(deployment_id)
+            logger.error(f"Deployment {deployment_id} failed: {e}")
+    
+    async def _run_command(self, deployment_id: str, command: List[str], cwd: Path, timeout: float):
+        """コマンド実行（stdout/stderrを1行ずつログへ流す）"""
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        
+        async def stream_output():
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                self._append_log(deployment_id, line.decode("utf-8", errors="replace").rstrip())
+            return await process.wait()
+        
+        try:
+            returncode = await asyncio.wait_for(stream_output(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise RuntimeError(f"{' '.join(command)} timed out after {timeout}s")
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
             raise
+        
+        if returncode != 0:
+            tail = "\n".join(list(self._logs[deployment_id])[-20:])
+            raise RuntimeError(f"{' '.join(command)} failed (exit {returncode}): {tail}")
+    
+    def _update(self, deployment_id: str, status: str, progress: int, message: str):
+        self.deployments[deployment_id].update({
+            "status": status,
+            "progress": progress,
+            "message": message
+        })
+        self._persist(deployment_id)
+    
+    def _append_log(self, deployment_id: str, line: str):
+        self._logs[deployment_id].append(line)
+        self._log_counts[deployment_id] += 1
+        self.deployments[deployment_id]["last_output"] = line
+    
+    def get_deployment_logs(self, deployment_id: str, since: int = 0) -> Dict[str, Any]:
+        """
+        ビルドログ取得
+        
+        Args:
+            deployment_id: デプロイメントID
+            since: 取得済みの行数（この行以降を返す）
+            
+        Returns:
+            {"lines": [...], "next": 次回のsince}
+        """
+        if deployment_id not in self._logs:
+            return {
+                "error": "Deployment not found",
+                "deployment_id": deployment_id
+            }
+        
+        logs = self._logs[deployment_id]
+        total = self._log_counts[deployment_id]
+        first_kept = total - len(logs)
+        start = max(since, first_kept)
+        
+        return {
+            "deployment_id": deployment_id,
+            "lines": list(logs)[start - first_kept:],
+            "next": total,
+            "truncated": since < first_kept
+        }
     
     def get_deployment_status(self, deployment_id: str) -> Dict[str, Any]:
         """デプロイメントステータスを取得"""
@@ -279,9 +452,19 @@ code {
         
         return self.deployments[deployment_id]
     
-    def list_deployments(self) -> List[Dict[str, Any]]:
-        """全デプロイメントをリスト"""
-        return list(self.deployments.values())
+    def list_deployments(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        デプロイメント一覧
+        
+        Args:
+            status: 絞り込むステータス（レジストリのインデックスで検索）
+        """
+        if status is None:
+            return list(self.deployments.values())
+        return [
+            self.deployments.get(deployment["id"], deployment)
+            for deployment in self.registry.list(self.service_name, [status])
+        ]
     
     def stop_deployment(self, deployment_id: str) -> bool:
         """デプロイメントを停止"""
@@ -290,16 +473,22 @@ code {
             
         deployment = self.deployments[deployment_id]
         
+        # ビルド中のジョブを中止
+        task = self._tasks.get(deployment_id)
+        if task is not None:
+            task.cancel()
+        
         # プロセスを停止
         if "process_pid" in deployment:
-            try:
-                subprocess.run(["kill", str(deployment["process_pid"])])
-            except Exception:
-                pass
+            self._kill_process(deployment["process_pid"])
+        
+        # ポート返却
+        self._release_port(deployment_id)
         
         # ステータス更新
         deployment["status"] = "stopped"
         deployment["stopped_at"] = datetime.now().isoformat()
+        self._persist(deployment_id)
         
         return True
 
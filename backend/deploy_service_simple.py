@@ -4,40 +4,65 @@
 """
 
 import os
+import re
 import json
-import subprocess
 import uuid
+import logging
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 import asyncio
 
+from code_generation.transpiler import TranspileCache, TranspileError, BROWSER_REQUIRE_SHIM
+from static_host import StaticHost
+from deployment_registry import DeploymentRegistry
+
+logger = logging.getLogger(__name__)
+
+# 変換済みバンドルで描画できる App.tsx（default または App の export がある）
+_APP_EXPORT = re.compile(r'export\s+(?:default\b|(?:const|let|function|class)\s+App\b)')
+
 class SimpleDeploymentService:
     """シンプルなデプロイメント管理サービス"""
     
-    def __init__(self):
-        self.base_deploy_path = Path("/home/AltMX-admin/deployments")
+    service_name = "simple"
+    
+    def __init__(
+        self,
+        base_deploy_path: Optional[str] = None,
+        static_host: Optional[StaticHost] = None,
+        registry: Optional[DeploymentRegistry] = None
+    ):
+        self.base_deploy_path = Path(base_deploy_path or os.getenv("DEPLOY_BASE_PATH", "/home/AltMX-admin/deployments"))
         self.base_deploy_path.mkdir(exist_ok=True)
-        self.port_range = range(3000, 3100)
+        # 全デプロイをバックエンドプロセス内で配信（/apps/<deployment_id>/）
+        self.static_host = static_host or StaticHost()
         self.deployments = {}
+        self._transpile_cache: Optional[TranspileCache] = None
         
-    def _get_next_available_port(self) -> int:
-        """利用可能な次のポートを取得"""
-        used_ports = {d.get("port") for d in self.deployments.values() if d.get("port")}
-        
-        for port in self.port_range:
-            if port not in used_ports:
-                # 実際にポートが使用されていないか確認
-                result = subprocess.run(
-                    ["ss", "-tuln"], 
-                    capture_output=True, 
-                    text=True
-                )
-                if f":{port}" not in result.stdout:
-                    return port
-                    
-        raise RuntimeError("No available ports")
+        # デプロイ情報の永続化（再起動時に配信を再開）
+        self.registry = registry or DeploymentRegistry(str(self.base_deploy_path / "deployments.db"))
+        self._recover()
+    
+    def _recover(self):
+        """起動時の突き合わせ（完了済みデプロイを静的ホストへ再登録、ディレクトリがなければ停止扱い）"""
+        for deployment in self.registry.list(self.service_name):
+            if deployment["status"] == "completed":
+                project_path = deployment.get("project_path")
+                if project_path and Path(project_path).is_dir():
+                    deployment["url"] = self.static_host.mount(deployment["id"], Path(project_path))
+                else:
+                    deployment["status"] = "stopped"
+                self.registry.save(self.service_name, deployment)
+            self.deployments[deployment["id"]] = deployment
     
+    @property
+    def transpile_cache(self) -> TranspileCache:
+        """TSX→JS変換キャッシュ（初回利用時に変換器を検出）"""
+        if self._transpile_cache is None:
+            self._transpile_cache = TranspileCache(str(self.base_deploy_path / ".transpile_cache"))
+        return self._transpile_cache
+        
     async def deploy_simple_app(
         self, 
         app_name: str, 
@@ -58,79 +83,33 @@ class SimpleDeploymentService:
             app_tsx = next((f["content"] for f in files if f["filename"] == "App.tsx"), "")
             app_css = next((f["content"] for f in files if f["filename"] == "App.css"), "")
             
-            # TypeScript型アノテーションを削除してJSXに変換
-            import re
-            # import文とexport文を削除（ブラウザでは不要）
-            app_jsx = re.sub(r'import.*?;', '', app_tsx, flags=re.MULTILINE)
-            app_jsx = re.sub(r'export\s+default\s+\w+;?', '', app_jsx, flags=re.MULTILINE)
+            # サーバー側でTSX→JS変換（同一内容は変換済みキャッシュを使用、変換器の起動を含めイベントループ外で実行）
+            index_html = None
+            compiled_code = await asyncio.to_thread(self._transpile_app, app_tsx)
+            if compiled_code is not None:
+                with open(project_path / "app.js", "w") as f:
+                    f.write(compiled_code)
+                index_html = self._render_compiled_html(app_name, app_css)
             
-            # 基本的な型アノテーション削除
-            app_jsx = re.sub(r': React\.FC\s*=', ' =', app_jsx)
-            app_jsx = re.sub(r'<Todo\[\]>', '', app_jsx)
-            app_jsx = re.sub(r'\(id: number\)', '(id)', app_jsx)
-            app_jsx = re.sub(r'useState<[^>]+>', 'useState', app_jsx)
-            # interface定義をコメント化
-            app_jsx = re.sub(r'interface\s+\w+\s*{[^}]*}', '// TypeScript interface removed for browser compatibility', app_jsx, flags=re.DOTALL)
-            # 変数の型アノテーション削除
-            app_jsx = re.sub(r':\s*\w+\s*=', ' =', app_jsx)  # `: Todo =` -> ` =`
-            app_jsx = re.sub(r'const\s+(\w+):\s*\w+\s*=', r'const \1 =', app_jsx)  # `const newTodo: Todo =` -> `const newTodo =`
-            # 改行の修正と空行削除
-            app_jsx = app_jsx.replace('useState // }', 'useState')
-            app_jsx = re.sub(r'\n\s*\n\s*\n', '\n\n', app_jsx)  # 複数の空行を削除
-            app_jsx = app_jsx.strip()  # 先頭と末尾の空白削除
-            
-            index_html = f"""<!DOCTYPE html>
-<html lang="ja">
-<head>
-    <meta charset="utf-8" />
-    <meta name="viewport" content="width=device-width, initial-scale=1" />
-    <title>{app_name} - AltMX Generated</title>
-    <script crossorigin src="https://unpkg.com/react@18/umd/react.production.min.js"></script>
-    <script crossorigin src="https://unpkg.com/react-dom@18/umd/react-dom.production.min.js"></script>
-    <script src="https://unpkg.com/@babel/standalone/babel.min.js"></script>
-    <style>
-        {app_css}
-    </style>
-</head>
-<body>
-    <div id="root"></div>
-    <script type="text/babel">
-        const {{ useState }} = React;
-        
-        {app_jsx}
-        
-        const root = ReactDOM.createRoot(document.getElementById('root'));
-        root.render(<App />);
-    </script>
-</body>
-</html>"""
+            if index_html is None:
+                index_html = self._render_babel_html(app_name, app_tsx, app_css)
             
             with open(project_path / "index.html", "w") as f:
                 f.write(index_html)
             
-            # ポート取得
-            port = self._get_next_available_port()
-            
-            # Python HTTPサーバーで起動
-            serve_process = subprocess.Popen(
-                ["python3", "-m", "http.server", str(port)],
-                cwd=project_path,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
+            # 静的ホストへ登録（事前圧縮・ETag計算）
+            deployment_url = self.static_host.mount(deployment_id, project_path)
             
             # デプロイ情報を保存
-            deployment_url = f"http://18.180.87.189:{port}/"
             self.deployments[deployment_id] = {
                 "id": deployment_id,
                 "app_name": app_name,
                 "status": "completed",
                 "url": deployment_url,
-                "port": port,
-                "process_pid": serve_process.pid,
                 "project_path": str(project_path),
                 "created_at": datetime.now().isoformat()
             }
+            self.registry.save(self.service_name, self.deployments[deployment_id])
             
             return {
                 "deployment_id": deployment_id,
@@ -147,6 +126,90 @@ class SimpleDeploymentService:
                 "error": str(e)
             }
     
+    def _transpile_app(self, app_tsx: str) -> Optional[str]:
+        """App.tsx の変換済みJS（変換器がない・変換失敗・exportがない場合は None でBabelにフォールバック）"""
+        if not _APP_EXPORT.search(app_tsx) or not self.transpile_cache.available:
+            return None
+        try:
+            return self.transpile_cache.transpile(app_tsx, "App.tsx").code
+        except TranspileError as e:
+            logger.warning(f"Transpile failed, falling back to in-browser Babel: {e}")
+            return None
+    
+    def _render_compiled_html(self, app_name: str, app_css: str) -> str:
+        """変換済み app.js を読み込むHTML（ブラウザ側の変換なし）"""
+        return f"""<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="utf-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1" />
+    <title>{app_name} - AltMX Generated</title>
+    <script crossorigin src="https://unpkg.com/react@18/umd/react.production.min.js"></script>
+    <script crossorigin src="https://unpkg.com/react-dom@18/umd/react-dom.production.min.js"></script>
+    <style>
+        {app_css}
+    </style>
+</head>
+<body>
+    <div id="root"></div>
+    <script>{BROWSER_REQUIRE_SHIM}</script>
+    <script src="app.js"></script>
+    <script>
+        const root = ReactDOM.createRoot(document.getElementById('root'));
+        const App = __altmx_module.default || __altmx_module.App;
+        root.render(React.createElement(App));
+    </script>
+</body>
+</html>"""
+    
+    def _render_babel_html(self, app_name: str, app_tsx: str, app_css: str) -> str:
+        """ブラウザ側Babel変換のHTML（esbuildがない環境向けのフォールバック）"""
+        # TypeScript型アノテーションを削除してJSXに変換
+        # import文とexport文を削除（ブラウザでは不要）
+        app_jsx = re.sub(r'import.*?;', '', app_tsx, flags=re.MULTILINE)
+        app_jsx = re.sub(r'export\s+default\s+\w+;?', '', app_jsx, flags=re.MULTILINE)
+        
+        # 基本的な型アノテーション削除
+        app_jsx = re.sub(r': React\.FC\s*=', ' =', app_jsx)
+        app_jsx = re.sub(r'<Todo\[\]>', '', app_jsx)
+        app_jsx = re.sub(r'\(id: number\)', '(id)', app_jsx)
+        app_jsx = re.sub(r'useState<[^>]+>', 'useState', app_jsx)
+        # interface定義をコメント化
+        app_jsx = re.sub(r'interface\s+\w+\s*{[^}]*}', '// TypeScript interface removed for browser compatibility', app_jsx, flags=re.DOTALL)
+        # 変数の型アノテーション削除
+        app_jsx = re.sub(r':\s*\w+\s*=', ' =', app_jsx)  # `: Todo =` -> ` =`
+        app_jsx = re.sub(r'const\s+(\w+):\s*\w+\s*=', r'const \1 =', app_jsx)  # `const newTodo: Todo =` -> `const newTodo =`
+        # 改行の修正と空行削除
+        app_jsx = app_jsx.replace('useState // }', 'useState')
+        app_jsx = re.sub(r'\n\s*\n\s*\n', '\n\n', app_jsx)  # 複数の空行を削除
+        app_jsx = app_jsx.strip()  # 先頭と末尾の空白削除
+        
+        return f"""<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="utf-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1" />
+    <title>{app_name} - AltMX Generated</title>
+    <script crossorigin src="https://unpkg.com/react@18/umd/react.production.min.js"></script>
+    <script crossorigin src="https://unpkg.com/react-dom@18/umd/react-dom.production.min.js"></script>
+    <script src="https://unpkg.com/@babel/standalone/babel.min.js"></script>
+    <style>
+        {app_css}
+    </style>
+</head>
+<body>
+    <div id="root"></div>
+    <script type="text/babel">
+        const {{ useState }} = React;
+        
+        {app_jsx}
+        
+        const root = ReactDOM.createRoot(document.getElementById('root'));
+        root.render(<App />);
+    </script>
+</body>
+</html>"""
+    
     def get_deployment_status(self, deployment_id: str) -> Dict[str, Any]:
         """デプロイメントステータスを取得"""
         return self.deployments.get(deployment_id, {
@@ -154,9 +217,19 @@ class SimpleDeploymentService:
             "deployment_id": deployment_id
         })
     
-    def list_deployments(self) -> List[Dict[str, Any]]:
-        """全デプロイメントをリスト"""
-        return list(self.deployments.values())
+    def list_deployments(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        デプロイメント一覧
+        
+        Args:
+            status: 絞り込むステータス（レジストリのインデックスで検索）
+        """
+        if status is None:
+            return list(self.deployments.values())
+        return [
+            self.deployments.get(deployment["id"], deployment)
+            for deployment in self.registry.list(self.service_name, [status])
+        ]
     
     def stop_deployment(self, deployment_id: str) -> bool:
         """デプロイメントを停止"""
@@ -165,13 +238,11 @@ class SimpleDeploymentService:
             
         deployment = self.deployments[deployment_id]
         
-        if "process_pid" in deployment:
-            try:
-                subprocess.run(["kill", str(deployment["process_pid"])])
-            except Exception:
-                pass
+        # 配信停止
+        self.static_host.unmount(deployment_id)
         
         deployment["status"] = "stopped"
+        self.registry.save(self.service_name, deployment)
         return True
 
 # シングルトンインスタンス
@@ -8,13 +8,22 @@ import time
 import logging
 from typing import Dict, Any, List, Optional, Callable
 from datetime import datetime, timezone, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 import asyncio
 import hashlib
+import threading
 
 logger = logging.getLogger(__name__)
 
+# スタックの最終状態
+SUCCESS_STACK_STATUSES = {'CREATE_COMPLETE', 'UPDATE_COMPLETE', 'IMPORT_COMPLETE', 'DELETE_COMPLETE'}
+FAILED_STACK_STATUSES = {
+    'CREATE_FAILED', 'UPDATE_FAILED', 'DELETE_FAILED',
+    'ROLLBACK_COMPLETE', 'ROLLBACK_FAILED',
+    'UPDATE_ROLLBACK_COMPLETE', 'UPDATE_ROLLBACK_FAILED'
+}
+
 class DeploymentPhase(Enum):
     """デプロイメントフェーズ"""
     STACK_CREATION = "STACK_CREATION"
@@ -39,17 +48,182 @@ class DeploymentProgress:
     resources_created: List[Dict[str, str]]
     error_details: Optional[str] = None
 
+class DeploymentSubscription:
+    """
+    デプロイイベントの購読（1購読者につき1キュー）
+    
+    キューは上限付きで、満杯のときは最も古いイベントを捨てて新しいイベントを入れる
+    （遅い購読者が配信元を待たせない）。配信終了後の get は None を返す。
+    """
+    
+    _CLOSED = object()
+    
+    def __init__(self, hub: 'DeploymentEventHub', deployment_id: str, max_queue_size: int,
+                 event_types: Optional[set] = None):
+        self.hub = hub
+        self.deployment_id = deployment_id
+        self.event_types = event_types
+        self.dropped = 0
+        self.closed = False
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+    
+    def publish(self, event: Dict[str, Any]):
+        """イベント投入（別スレッドからも呼べる）"""
+        if self.event_types is not None and event['type'] not in self.event_types:
+            return
+        self._call_in_loop(self._put, event)
+    
+    def close(self):
+        self._call_in_loop(self._put, self._CLOSED)
+    
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """次のイベント（配信終了ならNone）"""
+        item = await self._queue.get()
+        if item is self._CLOSED:
+            # 後続の get も終了を返す
+            self._queue.put_nowait(self._CLOSED)
+            return None
+        return item
+    
+    def unsubscribe(self):
+        self.hub.unsubscribe(self)
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> Dict[str, Any]:
+        item = await self.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+    
+    def _call_in_loop(self, function: Callable, *args):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            function(*args)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(function, *args)
+    
+    def _put(self, item: Any):
+        if self.closed:
+            return
+        if item is self._CLOSED:
+            self.closed = True
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(item)
+
+class DeploymentEventHub:
+    """
+    デプロイイベントの配信ハブ（デプロイIDごとのpub/sub）
+    
+    - publish は購読者のキューへ入れるだけで待たない
+    - 購読開始時に現在の状態スナップショットを先頭に入れる（途中参加でも履歴の再送が不要）
+    - close でそのデプロイの購読を全て終了し、登録を削除する
+    """
+    
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._subscriptions: Dict[str, List[DeploymentSubscription]] = {}
+        self._lock = threading.Lock()
+        self._published = 0
+        self._dropped = 0  # 購読終了分の破棄件数
+    
+    def subscribe(self, deployment_id: str, snapshot: Optional[Dict[str, Any]] = None,
+                  closed: bool = False, max_queue_size: Optional[int] = None,
+                  event_types: Optional[set] = None) -> DeploymentSubscription:
+        """
+        購読開始（イベントループ上で呼ぶ）
+        
+        Args:
+            deployment_id: デプロイID
+            snapshot: 現在の状態（先頭に type=snapshot として入る）
+            closed: 配信済みのデプロイ（スナップショットだけ返して終了）
+            max_queue_size: キュー上限（Noneはハブの既定値）
+            event_types: 受け取るイベント種別（Noneは全て）
+        """
+        subscription = DeploymentSubscription(
+            self, deployment_id, max_queue_size or self.max_queue_size, event_types
+        )
+        if snapshot is not None:
+            subscription.publish({'type': 'snapshot', 'deployment_id': deployment_id, 'data': snapshot})
+        
+        if closed:
+            subscription.close()
+            return subscription
+        
+        with self._lock:
+            self._subscriptions.setdefault(deployment_id, []).append(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: DeploymentSubscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.deployment_id, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.deployment_id]
+        self._dropped += subscription.dropped
+        subscription.close()
+    
+    def publish(self, deployment_id: str, event_type: str, data: Dict[str, Any]):
+        """イベント配信（購読者がいなければ何もしない）"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(deployment_id, ()))
+        if not subscriptions:
+            return
+        
+        event = {'type': event_type, 'deployment_id': deployment_id, 'data': data}
+        for subscription in subscriptions:
+            subscription.publish(event)
+        self._published += 1
+    
+    def close(self, deployment_id: str):
+        """デプロイの配信終了"""
+        with self._lock:
+            subscriptions = self._subscriptions.pop(deployment_id, [])
+        for subscription in subscriptions:
+            self._dropped += subscription.dropped
+            subscription.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscriptions = [item for items in self._subscriptions.values() for item in items]
+        return {
+            'deployments': len({subscription.deployment_id for subscription in subscriptions}),
+            'subscribers': len(subscriptions),
+            'published': self._published,
+            'dropped': self._dropped + sum(subscription.dropped for subscription in subscriptions)
+        }
+
 class DeploymentMonitor:
-    """デプロイメント監視システム"""
+    """
+    デプロイメント監視システム
     
-    def __init__(self):
+    - 同期関数のリスナーはその場で呼び出す（軽い処理用）
+    - コルーチン関数のリスナーはハブの購読として登録し、別タスクで順に実行する
+      （WebSocket送信などの遅い処理が監視ループを止めない）
+    - 完了・失敗したデプロイのリスナーと購読は自動で削除し、状態だけを max_finished 件まで保持する
+    """
+    
+    def __init__(self, max_queue_size: int = 100, max_finished: int = 100):
         self._deployment_states: Dict[str, Dict[str, Any]] = {}
         self._progress_listeners: Dict[str, List[Callable]] = {}
         self._error_listeners: Dict[str, List[Callable]] = {}
         self._completion_listeners: Dict[str, List[Callable]] = {}
+        self.hub = DeploymentEventHub(max_queue_size=max_queue_size)
+        self.max_finished = max_finished
+        self._finished: Dict[str, None] = {}  # 終了順（古い状態から削除）
+        self._listener_tasks: set = set()
     
     def start_monitoring(self, deployment_id: str, stack_name: str) -> Dict[str, Any]:
         """デプロイメント監視開始"""
+        self._finished.pop(deployment_id, None)
         self._deployment_states[deployment_id] = {
             'deployment_id': deployment_id,
             'stack_name': stack_name,
@@ -60,14 +234,6 @@ class DeploymentMonitor:
             'resources_created': []
         }
         
-        # 進捗リスナー初期化
-        if deployment_id not in self._progress_listeners:
-            self._progress_listeners[deployment_id] = []
-        if deployment_id not in self._error_listeners:
-            self._error_listeners[deployment_id] = []
-        if deployment_id not in self._completion_listeners:
-            self._completion_listeners[deployment_id] = []
-        
         return {
             'success': True,
             'monitoring_started': True,
@@ -84,23 +250,60 @@ class DeploymentMonitor:
         
         return self._deployment_states[deployment_id]
     
+    def subscribe(self, deployment_id: str, max_queue_size: Optional[int] = None,
+                  event_types: Optional[set] = None) -> DeploymentSubscription:
+        """
+        デプロイイベントの購読（イベントループ上で呼ぶ）
+        
+        先頭に現在の状態スナップショットが入り、以降は progress / error / complete を受け取る。
+        終了済みのデプロイはスナップショットだけで購読が終わる。
+        """
+        state = self._deployment_states.get(deployment_id)
+        return self.hub.subscribe(
+            deployment_id,
+            snapshot=dict(state) if state is not None else None,
+            closed=deployment_id in self._finished,
+            max_queue_size=max_queue_size,
+            event_types=event_types
+        )
+    
     def add_progress_listener(self, deployment_id: str, callback: Callable):
         """進捗リスナー追加"""
-        if deployment_id not in self._progress_listeners:
-            self._progress_listeners[deployment_id] = []
-        self._progress_listeners[deployment_id].append(callback)
+        self._add_listener(self._progress_listeners, 'progress', deployment_id, callback)
     
     def add_error_listener(self, deployment_id: str, callback: Callable):
         """エラーリスナー追加"""
-        if deployment_id not in self._error_listeners:
-            self._error_listeners[deployment_id] = []
-        self._error_listeners[deployment_id].append(callback)
+        self._add_listener(self._error_listeners, 'error', deployment_id, callback)
     
     def add_completion_listener(self, deployment_id: str, callback: Callable):
         """完了リスナー追加"""
-        if deployment_id not in self._completion_listeners:
-            self._completion_listeners[deployment_id] = []
-        self._completion_listeners[deployment_id].append(callback)
+        self._add_listener(self._completion_listeners, 'complete', deployment_id, callback)
+    
+    def _add_listener(self, listeners: Dict[str, List[Callable]], event_type: str,
+                      deployment_id: str, callback: Callable):
+        if deployment_id in self._finished:
+            # 終了済みのデプロイには以降のイベントがないため登録しない（登録すると解放されない）
+            logger.debug(f"Ignoring {event_type} listener for finished deployment {deployment_id}")
+            return
+        
+        if asyncio.iscoroutinefunction(callback):
+            subscription = self.hub.subscribe(deployment_id, event_types={event_type})
+            task = asyncio.get_running_loop().create_task(self._run_listener(subscription, callback))
+            self._listener_tasks.add(task)
+            task.add_done_callback(self._listener_tasks.discard)
+            return
+        
+        if deployment_id not in listeners:
+            listeners[deployment_id] = []
+        listeners[deployment_id].append(callback)
+    
+    async def _run_listener(self, subscription: DeploymentSubscription, callback: Callable):
+        """非同期リスナーの実行（配信終了まで）"""
+        async for event in subscription:
+            try:
+                await callback(event['data'])
+            except Exception as e:
+                logger.error(f"Async {event['type']} listener error: {e}")
     
     def update_progress(self, deployment_id: str, update_data: Dict[str, Any]):
         """進捗更新"""
@@ -118,19 +321,14 @@ class DeploymentMonitor:
         state['last_updated'] = datetime.now(timezone.utc)
         
         # 進捗リスナー通知
-        for listener in self._progress_listeners.get(deployment_id, []):
-            try:
-                listener(update_data)
-            except Exception as e:
-                logger.error(f"Progress listener error: {e}")
-        
-        # エラー検出
-        if update_data.get('status') in ['CREATE_FAILED', 'UPDATE_FAILED', 'DELETE_FAILED']:
-            for listener in self._error_listeners.get(deployment_id, []):
-                try:
-                    listener(update_data)
-                except Exception as e:
-                    logger.error(f"Error listener error: {e}")
+        self._notify(self._progress_listeners, deployment_id, update_data, "Progress")
+        self.hub.publish(deployment_id, 'progress', update_data)
+        
+        # エラー検出（スタックの失敗は最終状態のため監視終了）
+        if update_data.get('status') in FAILED_STACK_STATUSES:
+            self._notify(self._error_listeners, deployment_id, update_data, "Error")
+            self.hub.publish(deployment_id, 'error', update_data)
+            self._finish(deployment_id)
     
     def mark_deployment_complete(self, deployment_id: str, completion_data: Dict[str, Any]):
         """デプロイメント完了マーク"""
@@ -139,11 +337,58 @@ class DeploymentMonitor:
             self._deployment_states[deployment_id]['completed_at'] = datetime.now(timezone.utc)
         
         # 完了リスナー通知
-        for listener in self._completion_listeners.get(deployment_id, []):
+        self._notify(self._completion_listeners, deployment_id, completion_data, "Completion")
+        self.hub.publish(deployment_id, 'complete', completion_data)
+        self._finish(deployment_id)
+    
+    def mark_deployment_failed(self, deployment_id: str, error_data: Dict[str, Any]):
+        """
+        デプロイメント失敗マーク（監視側の打ち切り: ポーリング失敗の継続・タイムアウト等）
+        
+        スタックの失敗ステータスを経由しない終了でも、エラーリスナー・購読者へ通知して監視を終える
+        """
+        if deployment_id in self._deployment_states:
+            self._deployment_states[deployment_id].update(error_data)
+            self._deployment_states[deployment_id]['failed_at'] = datetime.now(timezone.utc)
+        
+        self._notify(self._error_listeners, deployment_id, error_data, "Error")
+        self.hub.publish(deployment_id, 'error', error_data)
+        self._finish(deployment_id)
+    
+    def _notify(self, listeners: Dict[str, List[Callable]], deployment_id: str,
+                data: Dict[str, Any], kind: str):
+        for listener in listeners.get(deployment_id, []):
             try:
-                listener(completion_data)
+                listener(data)
             except Exception as e:
-                logger.error(f"Completion listener error: {e}")
+                logger.error(f"{kind} listener error: {e}")
+    
+    def _finish(self, deployment_id: str):
+        """終了したデプロイのリスナー・購読を削除（状態は max_finished 件まで保持）"""
+        self._progress_listeners.pop(deployment_id, None)
+        self._error_listeners.pop(deployment_id, None)
+        self._completion_listeners.pop(deployment_id, None)
+        self.hub.close(deployment_id)
+        
+        self._finished.pop(deployment_id, None)
+        self._finished[deployment_id] = None
+        while len(self._finished) > self.max_finished:
+            oldest = next(iter(self._finished))
+            del self._finished[oldest]
+            self._deployment_states.pop(oldest, None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'deployments': len(self._deployment_states),
+            'active': len(self._deployment_states) - len(self._finished),
+            'listeners': sum(
+                len(listeners)
+                for registry in (self._progress_listeners, self._error_listeners, self._completion_listeners)
+                for listeners in registry.values()
+            ),
+            'async_listeners': len(self._listener_tasks),
+            'hub': self.hub.get_stats()
+        }
     
     def get_live_progress(self, deployment_id: str) -> Dict[str, Any]:
         """ライブ進捗取得"""
@@ -181,10 +426,12 @@ class DeploymentMonitor:
 class CloudFormationEventMonitor:
     """CloudFormationイベント監視"""
     
-    def __init__(self, region: str = "ap-northeast-1"):
+    def __init__(self, region: str = "ap-northeast-1", cf_client=None):
         self.region = region
-        self.session = boto3.Session(region_name=region)
-        self.cf_client = self.session.client('cloudformation')
+        if cf_client is None:
+            self.session = boto3.Session(region_name=region)
+            cf_client = self.session.client('cloudformation')
+        self.cf_client = cf_client
     
     def get_stack_events(self, stack_name: str, limit: int = 50) -> List[Dict[str, Any]]:
         """スタックイベント取得"""
@@ -197,10 +444,62 @@ class CloudFormationEventMonitor:
         except Exception as e:
             logger.error(f"Failed to get stack events: {e}")
             return []
+    
+    def get_new_stack_events(self, stack_name: str, after_event_id: Optional[str] = None,
+                             since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        新着スタックイベント取得（古い順）
+        
+        describe_stack_events は新しい順に返るため、前回の最新イベントID（カーソル）に
+        到達した時点でページングを打ち切る。通常は1ページで済む。
+        
+        Args:
+            stack_name: スタック名（またはスタックID）
+            after_event_id: 前回取得した最新のEventId（Noneは全件）
+            since: この時刻より前のイベントは読まない（既存スタックの過去の履歴を除外）
+        
+        Raises:
+            botocore の例外（呼び出し側で再試行を判断する）
+        """
+        new_events: List[Dict[str, Any]] = []
+        request = {'StackName': stack_name}
+        
+        while True:
+            response = self.cf_client.describe_stack_events(**request)
+            for event in response['StackEvents']:
+                if after_event_id is not None and event['EventId'] == after_event_id:
+                    new_events.reverse()
+                    return new_events
+                if since is not None and event['Timestamp'] < since:
+                    new_events.reverse()
+                    return new_events
+                new_events.append(event)
+            
+            next_token = response.get('NextToken')
+            if not next_token:
+                break
+            request['NextToken'] = next_token
+        
+        new_events.reverse()
+        return new_events
+
+@dataclass
+class DeploymentPhaseState:
+    """フェーズ計算の途中状態（イベントを1件ずつ反映する）"""
+    resources: Dict[str, str] = field(default_factory=dict)        # 論理ID -> 最新ステータス
+    weights: Dict[str, int] = field(default_factory=dict)          # 論理ID -> 重み
+    in_progress: Dict[str, str] = field(default_factory=dict)      # 論理ID -> リソースタイプ（開始順）
+    failures: Dict[str, str] = field(default_factory=dict)         # 論理ID -> 失敗理由
+    total_weight: int = 0
+    completed_weight: int = 0
+    events_applied: int = 0
 
 class DeploymentPhaseCalculator:
     """デプロイメントフェーズ計算"""
     
+    ACTIVE_STATUSES = {'CREATE_IN_PROGRESS', 'UPDATE_IN_PROGRESS'}
+    DONE_STATUSES = {'CREATE_COMPLETE', 'UPDATE_COMPLETE'}
+    
     def __init__(self):
         # リソース作成の順序と重み
         self.resource_weights = {
@@ -224,55 +523,68 @@ class DeploymentPhaseCalculator:
         }
     
     def calculate_current_phase(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """現在のフェーズ計算"""
-        completed_resources = [
-            event for event in events 
-            if event.get('ResourceStatus') == 'CREATE_COMPLETE'
-        ]
-        
-        in_progress_resources = [
-            event for event in events 
-            if event.get('ResourceStatus') == 'CREATE_IN_PROGRESS'
-        ]
-        
-        # 進捗パーセンテージ計算
-        # ResourceType がない場合は LogicalResourceId から推定
-        all_events = completed_resources + in_progress_resources
-        total_weight = 0
-        completed_weight = 0
-        
-        for event in all_events:
-            # ResourceType があれば使用、なければ LogicalResourceId から推定
-            resource_type = event.get('ResourceType')
-            if not resource_type:
-                logical_id = event.get('LogicalResourceId', '')
-                if 'ECS' in logical_id:
-                    resource_type = 'AWS::ECS::Cluster' if 'Cluster' in logical_id else 'AWS::ECS::Service'
-                elif 'ALB' in logical_id:
-                    resource_type = 'AWS::ElasticLoadBalancingV2::LoadBalancer'
-                elif 'TargetGroup' in logical_id:
-                    resource_type = 'AWS::ElasticLoadBalancingV2::TargetGroup'
-            
-            weight = self.resource_weights.get(resource_type, 10)  # デフォルト重み
-            total_weight += weight
-            
-            if event.get('ResourceStatus') == 'CREATE_COMPLETE':
-                completed_weight += weight
-        
-        progress_percentage = min(int((completed_weight / total_weight) * 100), 100) if total_weight > 0 else 0
+        """
+        現在のフェーズ計算（イベント一覧から一括計算）
+        
+        events は describe_stack_events と同じ新しい順を想定する。
+        監視中は apply_event で新着分だけを反映すること。
+        """
+        state = DeploymentPhaseState()
+        for event in reversed(events):
+            self.apply_event(state, event)
+        return self.summarize(state)
+    
+    def apply_event(self, state: DeploymentPhaseState, event: Dict[str, Any]) -> bool:
+        """
+        イベント1件の反映（古い順に渡す）
+        
+        Returns:
+            進捗に影響する変化があったか
+        """
+        state.events_applied += 1
+        
+        # スタック自体のイベントはリソース進捗に含めない
+        if event.get('ResourceType') == 'AWS::CloudFormation::Stack':
+            return False
+        
+        logical_id = event.get('LogicalResourceId', '')
+        status = event.get('ResourceStatus', '')
+        previous = state.resources.get(logical_id)
+        if previous == status:
+            return False
+        
+        resource_type = self._resolve_resource_type(event)
+        weight = state.weights.setdefault(logical_id, self.resource_weights.get(resource_type, 10))  # デフォルト重み
+        
+        # 前のステータスの寄与を取り消してから新しいステータスを加算
+        if previous in self.ACTIVE_STATUSES or previous in self.DONE_STATUSES:
+            state.total_weight -= weight
+        if previous in self.DONE_STATUSES:
+            state.completed_weight -= weight
+        state.in_progress.pop(logical_id, None)
+        
+        state.resources[logical_id] = status
+        if status in self.ACTIVE_STATUSES or status in self.DONE_STATUSES:
+            state.total_weight += weight
+        if status in self.DONE_STATUSES:
+            state.completed_weight += weight
+        if status in self.ACTIVE_STATUSES:
+            state.in_progress[logical_id] = resource_type
+        if status.endswith('_FAILED'):
+            state.failures[logical_id] = event.get('ResourceStatusReason', '')
+        
+        return True
+    
+    def summarize(self, state: DeploymentPhaseState) -> Dict[str, Any]:
+        """途中状態からフェーズ・進捗を算出"""
+        total_weight = state.total_weight
+        progress_percentage = min(int((state.completed_weight / total_weight) * 100), 100) if total_weight > 0 else 0
         
-        # 現在のフェーズ決定
+        # 現在のフェーズ決定（直近に作成が始まったリソース）
         current_phase = 'STACK_CREATION'
-        if in_progress_resources:
-            # LogicalResourceId から判断（テストケース対応）
-            logical_id = in_progress_resources[0].get('LogicalResourceId', '')
-            if 'ALB' in logical_id or 'LoadBalancer' in logical_id:
-                current_phase = 'ALB_CREATION'
-            elif 'ECS' in logical_id:
-                current_phase = 'ECS_SERVICE_CREATION'
-            else:
-                resource_type = in_progress_resources[0].get('ResourceType', '')
-                current_phase = self.phase_mappings.get(resource_type, 'STACK_CREATION')
+        if state.in_progress:
+            logical_id = next(reversed(state.in_progress))
+            current_phase = self._phase_for(logical_id, state.in_progress[logical_id])
         elif progress_percentage >= 95:
             current_phase = 'COMPLETE'
         elif progress_percentage >= 80:
@@ -286,9 +598,229 @@ class DeploymentPhaseCalculator:
             'current_phase': current_phase,
             'progress_percentage': progress_percentage,
             'estimated_remaining_time': estimated_remaining_time,
-            'completed_resources': len(completed_resources),
-            'total_resources': len(events)
+            'completed_resources': sum(1 for status in state.resources.values() if status in self.DONE_STATUSES),
+            'total_resources': len(state.resources)
+        }
+    
+    def _resolve_resource_type(self, event: Dict[str, Any]) -> Optional[str]:
+        """ResourceType があれば使用、なければ LogicalResourceId から推定"""
+        resource_type = event.get('ResourceType')
+        if resource_type:
+            return resource_type
+        
+        logical_id = event.get('LogicalResourceId', '')
+        if 'ECS' in logical_id:
+            return 'AWS::ECS::Cluster' if 'Cluster' in logical_id else 'AWS::ECS::Service'
+        elif 'ALB' in logical_id:
+            return 'AWS::ElasticLoadBalancingV2::LoadBalancer'
+        elif 'TargetGroup' in logical_id:
+            return 'AWS::ElasticLoadBalancingV2::TargetGroup'
+        return None
+    
+    def _phase_for(self, logical_id: str, resource_type: Optional[str]) -> str:
+        # LogicalResourceId から判断（テストケース対応）
+        if 'ALB' in logical_id or 'LoadBalancer' in logical_id:
+            return 'ALB_CREATION'
+        elif 'ECS' in logical_id:
+            return 'ECS_SERVICE_CREATION'
+        return self.phase_mappings.get(resource_type or '', 'STACK_CREATION')
+
+class AdaptivePollInterval:
+    """
+    適応的ポーリング間隔
+    
+    新着イベントがあった直後は短い間隔で、変化のないポーリングが続くほど
+    backoff 倍ずつ maximum まで間隔を伸ばす。
+    """
+    
+    def __init__(self, initial: float = 2.0, maximum: float = 15.0, backoff: float = 1.5):
+        self.initial = initial
+        self.maximum = maximum
+        self.backoff = backoff
+        self._idle_polls = 0
+    
+    def next(self, activity: bool) -> float:
+        """次の待機秒数（activity: 直前のポーリングで変化があったか）"""
+        self._idle_polls = 0 if activity else self._idle_polls + 1
+        return min(self.initial * (self.backoff ** self._idle_polls), self.maximum)
+    
+    def reset(self):
+        self._idle_polls = 0
+
+class StackWatcher:
+    """
+    非同期スタック監視
+    
+    - EventId カーソルで新着イベントだけを取得（boto3 呼び出しはスレッドで実行し、イベントループを止めない）
+    - フェーズ・進捗は DeploymentPhaseCalculator.apply_event で新着分だけ反映
+    - 変化があったポーリングごとに DeploymentMonitor のリスナーへ通知
+    - スタック自体のイベントが最終状態になったら終了（完了は mark_deployment_complete）
+    - ポーリング失敗の継続・タイムアウトで打ち切る場合は mark_deployment_failed で監視を終える
+    """
+    
+    def __init__(
+        self,
+        event_monitor: CloudFormationEventMonitor,
+        monitor: Optional[DeploymentMonitor] = None,
+        calculator: Optional[DeploymentPhaseCalculator] = None,
+        poll_interval: Optional[AdaptivePollInterval] = None,
+        max_consecutive_errors: int = 3
+    ):
+        self.event_monitor = event_monitor
+        self.monitor = monitor
+        self.calculator = calculator or DeploymentPhaseCalculator()
+        self.poll_interval = poll_interval or AdaptivePollInterval()
+        self.max_consecutive_errors = max_consecutive_errors
+    
+    async def watch(
+        self,
+        stack_name: str,
+        deployment_id: Optional[str] = None,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        after_event_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        max_wait_time: float = 1800
+    ) -> Dict[str, Any]:
+        """
+        スタックが最終状態になるまで監視
+        
+        Args:
+            stack_name: スタック名（またはスタックID）
+            deployment_id: DeploymentMonitor のデプロイID（Noneは stack_name）
+            callback: 進捗更新ごとのコールバック
+            after_event_id: 監視開始時点のカーソル（既存スタックの更新時に指定）
+            since: この時刻より前のイベントを無視（タイムゾーン付き）
+            max_wait_time: タイムアウト秒数
+        
+        Returns:
+            監視結果（success / final_status / 最終の進捗情報）
+        """
+        deployment_id = deployment_id or stack_name
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        state = DeploymentPhaseState()
+        cursor = after_event_id
+        stack_status: Optional[str] = None
+        status_reason = ''
+        polls = 0
+        errors = 0
+        self.poll_interval.reset()
+        
+        if self.monitor is not None and self.monitor.get_deployment_status(deployment_id).get('success') is False:
+            self.monitor.start_monitoring(deployment_id, stack_name)
+        
+        while True:
+            polls += 1
+            try:
+                events = await asyncio.to_thread(
+                    self.event_monitor.get_new_stack_events, stack_name, cursor, since
+                )
+                errors = 0
+            except Exception as e:
+                errors += 1
+                logger.warning(f"Stack event polling failed ({errors}/{self.max_consecutive_errors}): {e}")
+                if errors >= self.max_consecutive_errors:
+                    return self._abort(deployment_id, stack_status, f'Stack event polling failed: {e}',
+                                       state, loop.time() - start_time, polls)
+                events = []
+            
+            changed = False
+            for event in events:
+                changed = self.calculator.apply_event(state, event) or changed
+                if self._is_stack_event(event, stack_name):
+                    stack_status = event.get('ResourceStatus')
+                    status_reason = event.get('ResourceStatusReason', '') or status_reason
+                    changed = True
+            if events:
+                cursor = events[-1]['EventId']
+            
+            if changed:
+                self._notify(deployment_id, stack_status, state, events, callback)
+            
+            if stack_status in SUCCESS_STACK_STATUSES or stack_status in FAILED_STACK_STATUSES:
+                break
+            
+            elapsed = loop.time() - start_time
+            if elapsed >= max_wait_time:
+                return self._abort(
+                    deployment_id, stack_status, f'Stack operation timed out after {max_wait_time} seconds',
+                    state, elapsed, polls
+                )
+            
+            await asyncio.sleep(min(self.poll_interval.next(bool(events)), max_wait_time - elapsed))
+        
+        success = stack_status in SUCCESS_STACK_STATUSES
+        error_message = None
+        if not success:
+            # スタックの理由より、最初に失敗したリソースの理由の方が原因に近い
+            error_message = next(iter(state.failures.values()), '') or status_reason
+        
+        result = self._result(success, stack_status, error_message, state, loop.time() - start_time, polls)
+        if self.monitor is not None and success:
+            self.monitor.mark_deployment_complete(deployment_id, {
+                'status': stack_status,
+                'current_phase': 'COMPLETE',
+                'progress_percentage': 100,
+                'deployment_time': result['duration']
+            })
+        return result
+    
+    def _notify(self, deployment_id: str, stack_status: Optional[str], state: DeploymentPhaseState,
+                events: List[Dict[str, Any]], callback: Optional[Callable]):
+        """進捗通知（DeploymentMonitor リスナー・コールバック）"""
+        update = self.calculator.summarize(state)
+        update['status'] = stack_status or 'CREATE_IN_PROGRESS'
+        update['resources'] = [
+            {'name': logical_id, 'status': status} for logical_id, status in state.resources.items()
+        ]
+        if events:
+            latest = events[-1]
+            update['message'] = f"{latest.get('LogicalResourceId', '')}: {latest.get('ResourceStatus', '')}"
+        if state.failures:
+            update['error_details'] = next(iter(state.failures.values()))
+        
+        if self.monitor is not None:
+            self.monitor.update_progress(deployment_id, update)
+        if callback is not None:
+            try:
+                callback(update)
+            except Exception as e:
+                logger.error(f"Progress callback error: {e}")
+    
+    def _abort(self, deployment_id: str, stack_status: Optional[str], error_message: str,
+               state: DeploymentPhaseState, duration: float, polls: int) -> Dict[str, Any]:
+        """監視の打ち切り（DeploymentMonitor のデプロイも失敗として終了させる）"""
+        result = self._result(False, stack_status, error_message, state, duration, polls)
+        if self.monitor is not None:
+            self.monitor.mark_deployment_failed(deployment_id, {
+                **self.calculator.summarize(state),
+                'status': stack_status or 'UNKNOWN',
+                'error_details': error_message,
+                'deployment_time': duration
+            })
+        return result
+    
+    @staticmethod
+    def _is_stack_event(event: Dict[str, Any], stack_name: str) -> bool:
+        """スタック自体のイベントか（ネストしたスタックのリソースイベントは除く）"""
+        return (
+            event.get('ResourceType') == 'AWS::CloudFormation::Stack'
+            and event.get('LogicalResourceId') in (event.get('StackName'), stack_name)
+        )
+    
+    def _result(self, success: bool, final_status: Optional[str], error_message: Optional[str],
+                state: DeploymentPhaseState, duration: float, polls: int) -> Dict[str, Any]:
+        result = {
+            'success': success,
+            'final_status': final_status,
+            'duration': duration,
+            'polls': polls,
+            'events_processed': state.events_applied,
+            **self.calculator.summarize(state)
         }
+        if error_message:
+            result['error_message'] = error_message
+        return result
 
 class DeploymentCostTracker:
     """デプロイメントコスト追跡"""
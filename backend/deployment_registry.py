@@ -0,0 +1,133 @@
+"""
+デプロイメントレジストリ
+デプロイ情報（PID・ポート・パス）をSQLiteへ永続化し、バックエンド再起動後に引き継ぐ
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deployments (
+    id TEXT PRIMARY KEY,
+    service TEXT NOT NULL,
+    status TEXT NOT NULL,
+    port INTEGER,
+    pid INTEGER,
+    project_path TEXT,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deployments_service_created ON deployments (service, created_at);
+CREATE INDEX IF NOT EXISTS idx_deployments_service_status ON deployments (service, status);
+"""
+
+
+class DeploymentRegistry:
+    """
+    デプロイメントレジストリ
+
+    - 1デプロイ1行（検索用の列 + デプロイ情報全体のJSON）
+    - service 列でデプロイサービスごとに区別（同じDBファイルを共有できる）
+    - WALモードで書き込み中も読み取りをブロックしない
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def save(self, service: str, deployment: Dict[str, Any]):
+        """デプロイ情報の登録・更新"""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO deployments (id, service, status, port, pid, project_path, created_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    status = excluded.status,
+                    port = excluded.port,
+                    pid = excluded.pid,
+                    project_path = excluded.project_path,
+                    data = excluded.data
+                """,
+                (
+                    deployment["id"],
+                    service,
+                    deployment.get("status", "unknown"),
+                    deployment.get("port"),
+                    deployment.get("process_pid"),
+                    deployment.get("project_path"),
+                    deployment.get("created_at", ""),
+                    json.dumps(deployment, ensure_ascii=False, default=str)
+                )
+            )
+
+    def get(self, deployment_id: str) -> Optional[Dict[str, Any]]:
+        """デプロイ情報取得（主キー検索）"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM deployments WHERE id = ?", (deployment_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def list(self, service: str, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        デプロイ一覧（作成順）
+
+        Args:
+            service: デプロイサービス名
+            statuses: 絞り込むステータス（Noneは全件）
+        """
+        query = "SELECT data FROM deployments WHERE service = ?"
+        params: List[Any] = [service]
+        if statuses:
+            query += f" AND status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        query += " ORDER BY created_at"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def delete(self, deployment_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM deployments WHERE id = ?", (deployment_id,))
+        return cursor.rowcount > 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def is_process_alive(pid: Optional[int], project_path: Optional[str] = None) -> bool:
+        """
+        プロセス生存確認
+
+        /proc が使える場合は作業ディレクトリも照合し、PID再利用による誤判定を避ける
+        """
+        if not pid:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # 他ユーザーのプロセス（PIDが再利用された）
+            return False
+
+        if project_path and os.path.isdir("/proc"):
+            try:
+                return os.path.realpath(os.readlink(f"/proc/{pid}/cwd")) == os.path.realpath(project_path)
+            except OSError:
+                return False
+        return True
@@ -8,11 +8,17 @@ import json
 import re
 import base64
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Set, Tuple
 from dataclasses import dataclass
 import logging
 import hashlib
 import os
+from pathlib import Path
+import time
+import random
+from collections import deque
+
+from code_generation.secret_scanner import SecretMatch, default_secret_scanner
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -29,6 +35,10 @@ class GitHubRateLimitError(GitHubAPIError):
     """GitHub API レート制限エラー"""
     pass
 
+class GitHubNotFoundError(GitHubAPIError):
+    """GitHub リソース未検出エラー"""
+    pass
+
 @dataclass
 class GitHubRepository:
     """GitHubリポジトリ情報"""
@@ -52,44 +62,269 @@ class DeploymentResult:
     cleanup_scheduled: bool
     error_message: Optional[str] = None
 
+class GitHubRateLimiter:
+    """
+    クライアント側レート制限
+    
+    レスポンスの X-RateLimit-Remaining / X-RateLimit-Reset を記録し、
+    残りが reserve 以下になったらリセット時刻まで次のリクエストを待たせる。
+    Retry-After（セカンダリレート制限）を受けた場合はその秒数だけ全リクエストを止める。
+    """
+    
+    def __init__(self, reserve: int = 5, max_wait: float = 120.0):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None  # epoch秒
+        self._paused_until = 0.0  # epoch秒
+        self.waits = 0
+    
+    def update(self, headers: Any):
+        """レスポンスヘッダーから残量を更新"""
+        try:
+            if "X-RateLimit-Remaining" in headers:
+                self.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Limit" in headers:
+                self.limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Reset" in headers:
+                self.reset_at = float(headers["X-RateLimit-Reset"])
+        except (TypeError, ValueError):
+            pass
+    
+    def pause(self, seconds: float):
+        """指定秒数だけ後続リクエストを止める"""
+        self._paused_until = max(self._paused_until, time.time() + seconds)
+    
+    def delay(self) -> float:
+        """次のリクエストまでに待つべき秒数"""
+        now = time.time()
+        wait = max(0.0, self._paused_until - now)
+        if self.remaining is not None and self.remaining <= self.reserve and self.reset_at and self.reset_at > now:
+            wait = max(wait, self.reset_at - now)
+        return wait
+    
+    async def acquire(self):
+        """
+        リクエスト前の待機
+        
+        Raises:
+            GitHubRateLimitError: 待機時間が max_wait を超える
+        """
+        wait = self.delay()
+        if wait <= 0:
+            return
+        if wait > self.max_wait:
+            raise GitHubRateLimitError(f"Rate limit exhausted, resets in {wait:.0f}s")
+        self.waits += 1
+        logger.info(f"GitHub rate limit: waiting {wait:.1f}s")
+        await asyncio.sleep(wait)
+        
+        # リセット時刻を過ぎたら残量は未知として扱う（次のレスポンスで更新）
+        if self.reset_at and self.reset_at <= time.time():
+            self.remaining = None
+    
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_at": self.reset_at,
+            "waits": self.waits
+        }
+
 class GitHubAPI:
     """GitHub API Client - Low level API wrapper"""
     
-    def __init__(self, token: str):
+    # セカンダリレート制限・一時的なエラーの再試行回数
+    max_retries = 3
+    retry_base_delay = 1.0
+    # 通信エラー・5xxで再送してよいメソッド（POSTは重複作成を避けるため再送しない）
+    idempotent_methods = ("GET", "HEAD", "PUT", "PATCH", "DELETE")
+    # エンドポイントごとに保持するレイテンシ計測数
+    latency_samples = 200
+    
+    def __init__(self, token: str, base_url: str = "https://api.github.com", rate_limiter: Optional[GitHubRateLimiter] = None):
         self.token = token
-        self.base_url = "https://api.github.com"
+        self.base_url = base_url.rstrip('/')
         self.headers = {
             "Authorization": f"token {token}",
             "Accept": "application/vnd.github.v3+json",
             "Content-Type": "application/json"
         }
+        self.rate_limiter = rate_limiter or GitHubRateLimiter()
+        
+        # keep-alive で接続を再利用する共有セッション（イベントループごと）
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing_tasks: Set[asyncio.Task] = set()
+        
+        # "METHOD /path/template" -> 計測値
+        self._latencies: Dict[str, deque] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """共有セッション取得（未作成・別ループなら作成）"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._discard_session()
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+            self._session_loop = loop
+        return self._session
+    
+    def _discard_session(self):
+        """
+        前のループのセッション破棄
+        ループ稼働中（別スレッド）ならそのループで close、終了済みなら現在のループで close する
+        （終了済みループのコネクタは接続を閉じた状態にするだけで待機は発生しない）
+        """
+        session, loop = self._session, self._session_loop
+        self._session = None
+        self._session_loop = None
+        if session is None or session.closed:
+            return
+        
+        if loop is not None and loop.is_running() and loop is not asyncio.get_running_loop():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        
+        task = asyncio.get_running_loop().create_task(session.close())
+        self._closing_tasks.add(task)
+        task.add_done_callback(self._closing_tasks.discard)
+    
+    async def close(self):
+        """共有セッションを閉じる"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
     
     async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
-        """GitHub API リクエスト実行"""
+        """GitHub API リクエスト実行（レート制限待機・再試行付き）"""
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        metric_key = self._metric_key(method, endpoint)
+        retryable = method.upper() in self.idempotent_methods
         
-        async with aiohttp.ClientSession() as session:
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            
+            start_time = time.perf_counter()
             try:
-                async with session.request(
-                    method=method,
-                    url=url,
-                    headers=self.headers,
-                    json=data,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    response_data = await response.json()
-                    
-                    if response.status == 401:
-                        raise GitHubAuthenticationError(f"Authentication failed: {response_data}")
-                    elif response.status == 403:
-                        raise GitHubRateLimitError(f"Rate limit exceeded: {response_data}")
-                    elif response.status >= 400:
-                        raise GitHubAPIError(f"GitHub API error ({response.status}): {response_data}")
-                    
-                    return response_data
-                    
-            except aiohttp.ClientError as e:
+                async with self._get_session().request(method=method, url=url, json=data) as response:
+                    if response.status == 204:
+                        response_data = {}
+                    else:
+                        response_data = await response.json(content_type=None)
+                    status = response.status
+                    headers = response.headers
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._record(metric_key, time.perf_counter() - start_time, error=True)
+                if retryable and attempt < self.max_retries:
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
                 raise GitHubAPIError(f"Network error: {str(e)}")
+            except ValueError:
+                # JSON以外の本文
+                response_data, status, headers = {}, response.status, response.headers
+            
+            self._record(metric_key, time.perf_counter() - start_time, error=status >= 400)
+            self.rate_limiter.update(headers)
+            
+            if status in (403, 429):
+                retry_delay = self._rate_limit_delay(status, headers, response_data, attempt)
+                if retry_delay is None:
+                    raise GitHubAPIError(f"GitHub API error ({status}): {response_data}")
+                if attempt >= self.max_retries or retry_delay > self.rate_limiter.max_wait:
+                    raise GitHubRateLimitError(f"Rate limit exceeded: {response_data}")
+                self.rate_limiter.pause(retry_delay)
+                self._counters[metric_key]["rate_limited"] += 1
+                continue
+            
+            if status >= 500 and retryable and attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            
+            if status == 401:
+                raise GitHubAuthenticationError(f"Authentication failed: {response_data}")
+            elif status == 404:
+                raise GitHubNotFoundError(f"Not found: {response_data}")
+            elif status >= 400:
+                raise GitHubAPIError(f"GitHub API error ({status}): {response_data}")
+            
+            return response_data
+    
+    def _rate_limit_delay(self, status: int, headers: Any, response_data: Any, attempt: int = 0) -> Optional[float]:
+        """
+        403/429 のレート制限判定
+        
+        Returns:
+            再試行までの秒数（レート制限でない403はNone）
+        """
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return float(retry_after) + random.uniform(0, self.retry_base_delay)
+            except ValueError:
+                pass
+        
+        if headers.get("X-RateLimit-Remaining") == "0":
+            reset_at = self.rate_limiter.reset_at or time.time()
+            return max(0.0, reset_at - time.time()) + random.uniform(0, self.retry_base_delay)
+        
+        message = str(response_data.get("message", "") if isinstance(response_data, dict) else response_data).lower()
+        if status == 429 or "rate limit" in message:
+            # セカンダリレート制限（ヘッダーなし）: 1分を基準に指数バックオフ + ジッター
+            return 60.0 * (2 ** attempt) + self._backoff(attempt)
+        
+        return None
+    
+    def _backoff(self, attempt: int) -> float:
+        """指数バックオフ（フルジッター）"""
+        return random.uniform(0, self.retry_base_delay * (2 ** attempt))
+    
+    @staticmethod
+    def _metric_key(method: str, endpoint: str) -> str:
+        """計測用のエンドポイント名（オーナー・リポジトリ名等を伏せる）"""
+        path = "/" + endpoint.lstrip('/')
+        path = re.sub(r'^/repos/[^/]+/[^/]+', '/repos/:owner/:repo', path)
+        path = re.sub(r'^/orgs/[^/]+', '/orgs/:org', path)
+        path = re.sub(r'/(contents|branches|refs/heads)/.+$', r'/\1/:name', path)
+        return f"{method.upper()} {path}"
+    
+    def _record(self, metric_key: str, elapsed: float, error: bool = False):
+        samples = self._latencies.get(metric_key)
+        if samples is None:
+            samples = self._latencies[metric_key] = deque(maxlen=self.latency_samples)
+            self._counters[metric_key] = {"requests": 0, "errors": 0, "rate_limited": 0}
+        samples.append(elapsed)
+        self._counters[metric_key]["requests"] += 1
+        if error:
+            self._counters[metric_key]["errors"] += 1
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """エンドポイント別レイテンシ（ミリ秒）・エラー数・レート制限状態"""
+        endpoints = {}
+        for metric_key, samples in self._latencies.items():
+            ordered = sorted(samples)
+            endpoints[metric_key] = {
+                **self._counters[metric_key],
+                "avg_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2)
+            }
+        return {
+            "endpoints": endpoints,
+            "rate_limit": self.rate_limiter.get_state()
+        }
     
     async def get_user(self) -> Dict:
         """認証済みユーザー情報取得"""
@@ -118,6 +353,47 @@ class GitHubAPI:
             
         return await self._make_request("PUT", endpoint, data)
     
+    async def get_branch(self, org: str, repo: str, branch: str) -> Dict:
+        """ブランチ情報取得（先頭コミットとツリーのSHAを含む）"""
+        endpoint = f"/repos/{org}/{repo}/branches/{branch}"
+        return await self._make_request("GET", endpoint)
+    
+    async def create_blob(self, org: str, repo: str, content: str) -> Dict:
+        """Blob作成（Git Data API）"""
+        endpoint = f"/repos/{org}/{repo}/git/blobs"
+        data = {
+            "content": base64.b64encode(content.encode('utf-8')).decode('utf-8'),
+            "encoding": "base64"
+        }
+        return await self._make_request("POST", endpoint, data)
+    
+    async def create_tree(self, org: str, repo: str, tree: List[Dict], base_tree: Optional[str] = None) -> Dict:
+        """Tree作成（Git Data API）"""
+        endpoint = f"/repos/{org}/{repo}/git/trees"
+        data = {"tree": tree}
+        if base_tree:
+            data["base_tree"] = base_tree
+        return await self._make_request("POST", endpoint, data)
+    
+    async def create_commit(self, org: str, repo: str, message: str, tree: str, parents: List[str]) -> Dict:
+        """Commit作成（Git Data API）"""
+        endpoint = f"/repos/{org}/{repo}/git/commits"
+        data = {
+            "message": message,
+            "tree": tree,
+            "parents": parents
+        }
+        return await self._make_request("POST", endpoint, data)
+    
+    async def update_ref(self, org: str, repo: str, ref: str, sha: str, force: bool = False) -> Dict:
+        """Ref更新（例: ref="heads/main"）"""
+        endpoint = f"/repos/{org}/{repo}/git/refs/{ref}"
+        data = {
+            "sha": sha,
+            "force": force
+        }
+        return await self._make_request("PATCH", endpoint, data)
+    
     async def delete_repository(self, org: str, repo: str) -> Dict:
         """リポジトリ削除"""
         endpoint = f"/repos/{org}/{repo}"
@@ -141,18 +417,45 @@ class GitHubService:
         self.organization = config["organization"]
         self.base_template = config.get("base_template", "altmx-template")
         self.cleanup_days = config.get("cleanup_days", 30)
-        self.api = GitHubAPI(self.token)
+        self.api = GitHubAPI(
+            self.token,
+            config.get("api_url", "https://api.github.com"),
+            GitHubRateLimiter(reserve=config.get("rate_limit_reserve", 5))
+        )
+        
+        # Push mode: "contents" (1ファイル1コミット) / "bulk" (Git Data APIで1コミット)
+        self.push_mode = config.get("push_mode", "contents")
+        self.default_branch = config.get("default_branch", "main")
+        self.blob_concurrency = config.get("blob_concurrency", 8)
+        
+        # 一時リポジトリの削除予定（SQLite、初回利用時に開く）
+        self.cleanup_db_path = config.get(
+            "cleanup_db_path",
+            os.getenv("GITHUB_CLEANUP_DB_PATH", str(Path.home() / ".altmx" / "github_cleanup.db"))
+        )
+        self._cleanup_scheduler = None
         
         # Repository name pattern
         self.repo_name_pattern = re.compile(r'^[a-zA-Z0-9._-]+$')
         
-        # Dangerous content patterns
-        self.dangerous_patterns = [
-            re.compile(r'sk-[a-zA-Z0-9_-]{10,}'),  # OpenAI API keys (更新：最小10文字)
-            re.compile(r'ghp_[a-zA-Z0-9_-]{36}'),   # GitHub tokens
-            re.compile(r'glpat-[a-zA-Z0-9_-]{20}'), # GitLab tokens
-            re.compile(r'xox[baprs]-[a-zA-Z0-9_-]{10,}'),  # Slack tokens
-        ]
+        # Secret redaction (先頭文字が同じパターンはまとめて走査し、マスクは1回の連結で組み立てる)
+        self.secret_scanner = default_secret_scanner
+    
+    async def start(self):
+        """削除ワーカー起動（アプリ起動時に呼ぶ。再起動前に登録された削除予定もここから処理される）"""
+        self.cleanup_scheduler.start()
+    
+    async def close(self):
+        """削除ワーカーを止め、APIクライアントの接続を閉じる"""
+        if self._cleanup_scheduler is not None:
+            await self._cleanup_scheduler.stop()
+        await self.api.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """API呼び出しのレイテンシ・レート制限状態・削除待ちリポジトリ数"""
+        stats = self.api.get_metrics()
+        stats["cleanup"] = self.cleanup_scheduler.get_stats()
+        return stats
     
     async def validate_authentication(self) -> bool:
         """GitHub認証を検証"""
@@ -176,11 +479,16 @@ class GitHubService:
     
     def sanitize_file_content(self, content: str, file_path: str) -> str:
         """ファイルコンテンツのサニタイゼーション"""
-        sanitized = content
-        
+        return self._sanitize(content, file_path)[0]
+    
+    def _sanitize(self, content: str, file_path: str) -> Tuple[str, List[SecretMatch]]:
+        """サニタイゼーション（マスクした認証情報の位置も返す）"""
         # Remove dangerous patterns
-        for pattern in self.dangerous_patterns:
-            sanitized = pattern.sub('[REDACTED-SENSITIVE-DATA]', sanitized)
+        sanitized, redactions = self.secret_scanner.redact(content)
+        
+        if redactions:
+            logger.warning(f"Redacted {len(redactions)} secret(s) in {file_path}: "
+                           + ", ".join(f"{m.kind}@{m.line}:{m.column}" for m in redactions))
         
         # Add warning comment for certain files
         if file_path.endswith(('.js', '.ts', '.py')):
@@ -189,7 +497,7 @@ class GitHubService:
                 header_comment = f"# Generated by AltMX - {datetime.now().isoformat()}\n"
             sanitized = header_comment + sanitized
             
-        return sanitized
+        return sanitized, redactions
     
     def generate_commit_message(self, code_data: Dict[str, Any]) -> str:
         """コミットメッセージ自動生成"""
@@ -256,11 +564,14 @@ class GitHubService:
     
     async def push_generated_code(self, repository: GitHubRepository, code_data: Dict[str, Any]) -> Dict[str, Any]:
         """生成されたコードをリポジトリにプッシュ"""
+        if self.push_mode == "bulk":
+            return await self.push_generated_code_bulk(repository, code_data)
+        
+        pushed_files = []
         try:
             commit_message = self.generate_commit_message(code_data)
             files = code_data.get("files", [])
             
-            pushed_files = []
             last_commit_sha = None
             
             for file_info in files:
@@ -268,7 +579,7 @@ class GitHubService:
                 file_content = file_info["content"]
                 
                 # Sanitize content
-                sanitized_content = self.sanitize_file_content(file_content, file_path)
+                sanitized_content, redactions = self._sanitize(file_content, file_path)
                 
                 # Push file
                 response = await self.api.create_or_update_file(
@@ -282,7 +593,8 @@ class GitHubService:
                 pushed_files.append({
                     "path": file_path,
                     "sha": response["commit"]["sha"],
-                    "size": len(sanitized_content)
+                    "size": len(sanitized_content),
+                    "redactions": [{"kind": m.kind, "line": m.line, "column": m.column} for m in redactions]
                 })
                 
                 last_commit_sha = response["commit"]["sha"]
@@ -312,30 +624,115 @@ class GitHubService:
                     logger.warning(f"Failed to rollback repository: {repository.name}")
             raise
     
+    async def push_generated_code_bulk(self, repository: GitHubRepository, code_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        生成されたコードを1コミットでプッシュ（Git Data API）
+        
+        ブランチ取得 → Blob作成（並列、同時数制限あり） → Tree作成 → Commit作成 → Ref更新
+        """
+        commit_message = self.generate_commit_message(code_data)
+        files = code_data.get("files", [])
+        org, repo = self.organization, repository.name
+        
+        try:
+            branch = await self.api.get_branch(org, repo, self.default_branch)
+            parent_sha = branch["commit"]["sha"]
+            base_tree_sha = branch["commit"]["commit"]["tree"]["sha"]
+            
+            semaphore = asyncio.Semaphore(self.blob_concurrency)
+            
+            async def upload(file_info: Dict[str, Any]) -> Dict[str, Any]:
+                sanitized_content, redactions = self._sanitize(file_info["content"], file_info["path"])
+                async with semaphore:
+                    blob = await self.api.create_blob(org, repo, sanitized_content)
+                return {
+                    "path": file_info["path"],
+                    "sha": blob["sha"],
+                    "size": len(sanitized_content),
+                    "redactions": [{"kind": m.kind, "line": m.line, "column": m.column} for m in redactions]
+                }
+            
+            tasks = [asyncio.ensure_future(upload(file_info)) for file_info in files]
+            try:
+                pushed_files = await asyncio.gather(*tasks)
+            except BaseException:
+                # 残りのアップロードを止めてからロールバックする
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            
+            tree = await self.api.create_tree(
+                org, repo,
+                [{"path": f["path"], "mode": "100644", "type": "blob", "sha": f["sha"]} for f in pushed_files],
+                base_tree=base_tree_sha
+            )
+            commit = await self.api.create_commit(org, repo, commit_message, tree["sha"], [parent_sha])
+        
+        except GitHubAPIError as e:
+            logger.error(f"Failed to push code: {e}")
+            # Ref更新前の失敗はリポジトリに何も反映されていないためロールバック
+            try:
+                await self.api.delete_repository(org, repo)
+                logger.info(f"Rolled back repository: {repo}")
+            except GitHubAPIError:
+                logger.warning(f"Failed to rollback repository: {repo}")
+            raise
+        
+        try:
+            await self.api.update_ref(org, repo, f"heads/{self.default_branch}", commit["sha"])
+        except GitHubAPIError as e:
+            # Ref更新はエラー応答でも反映済みの場合があるため、リポジトリは削除しない
+            logger.error(f"Failed to update {self.default_branch} to {commit['sha']} in {repo}: {e}")
+            raise
+        
+        result = {
+            "success": True,
+            "commit_sha": commit["sha"],
+            "files_pushed": len(pushed_files),
+            "commit_message": commit_message,
+            "pushed_files": list(pushed_files)
+        }
+        
+        logger.info(f"Pushed {len(pushed_files)} files to {repository.html_url} in one commit")
+        return result
+    
+    @property
+    def cleanup_scheduler(self):
+        """
+        リポジトリ削除スケジューラー（循環importを避けるため遅延生成）
+        イベントループ上で参照されたら削除ワーカーを起動する（再起動前の予定もここから処理される）
+        """
+        if self._cleanup_scheduler is None:
+            from repository_cleanup import RepositoryCleanupScheduler
+            self._cleanup_scheduler = RepositoryCleanupScheduler(self.cleanup_db_path, self.api)
+        self._cleanup_scheduler.ensure_started()
+        return self._cleanup_scheduler
+    
     async def schedule_repository_cleanup(self, repository: GitHubRepository) -> datetime:
-        """リポジトリクリーンアップのスケジューリング"""
+        """リポジトリクリーンアップのスケジューリング（再起動後も保持される）"""
         cleanup_date = datetime.now() + timedelta(days=self.cleanup_days)
         
-        # In a real implementation, this would schedule a background job
-        # For now, we'll simulate this with a simple storage mechanism
-        cleanup_info = {
-            "repository_id": repository.id,
-            "repository_name": repository.name,
-            "organization": self.organization,
-            "cleanup_date": cleanup_date.isoformat(),
-            "created_at": datetime.now().isoformat()
-        }
+        self.cleanup_scheduler.schedule(
+            self.organization,
+            repository.name,
+            cleanup_date,
+            repository_id=repository.id
+        )
+        repository.cleanup_scheduled = cleanup_date
         
-        # Store cleanup schedule (mock implementation)
         logger.info(f"Scheduled cleanup for {repository.name} at {cleanup_date}")
-        
-        # TODO: Integrate with Redis/Database for persistent scheduling
         return cleanup_date
     
     def schedule_cleanup(self, repo_data: Dict[str, Any]) -> None:
-        """クリーンアップジョブのスケジューリング (mock)"""
-        # Mock implementation - in real system would use Celery/Redis
-        logger.info(f"Cleanup scheduled for repo {repo_data['id']}")
+        """クリーンアップジョブのスケジューリング"""
+        schedule_cleanup_job(
+            repo_id=repo_data["id"],
+            cleanup_date=datetime.now() + timedelta(days=self.cleanup_days),
+            scheduler=self.cleanup_scheduler,
+            organization=self.organization,
+            repository_name=repo_data.get("name")
+        )
     
     async def create_from_template(self, template_repo: str, new_repo_name: str) -> Dict[str, Any]:
         """テンプレートリポジトリからの作成"""
@@ -407,7 +804,22 @@ class GitHubService:
             logger.error(f"Deployment failed: {e}")
             return result
 
-# Mock function for scheduling (used in tests)
-def schedule_cleanup_job(repo_id: int, cleanup_date: datetime, **kwargs):
-    """Mock cleanup job scheduler"""
-    logger.info(f"Mock: Scheduled cleanup job for repo {repo_id} at {cleanup_date}")
\ No newline at end of file
+def schedule_cleanup_job(repo_id: int, cleanup_date: datetime, scheduler=None,
+                         organization: Optional[str] = None, repository_name: Optional[str] = None, **kwargs):
+    """クリーンアップジョブ登録（スケジューラー・リポジトリ名がない場合はログのみ）"""
+    if scheduler is None or not organization or not repository_name:
+        logger.info(f"Cleanup job for repo {repo_id} at {cleanup_date} not persisted (no scheduler)")
+        return
+    scheduler.schedule(organization, repository_name, cleanup_date, repository_id=repo_id)
+
+def github_service_from_env() -> Optional[GitHubService]:
+    """環境変数（GITHUB_TOKEN / GITHUB_ORGANIZATION）からサービス生成（未設定なら None）"""
+    token = os.getenv("GITHUB_TOKEN")
+    organization = os.getenv("GITHUB_ORGANIZATION")
+    if not token or not organization:
+        return None
+    return GitHubService({
+        "token": token,
+        "organization": organization,
+        "push_mode": os.getenv("GITHUB_PUSH_MODE", "contents")
+    })
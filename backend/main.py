@@ -13,6 +13,10 @@ from deploy_service_simple import simple_deployment_service
 from prompts.live_coding_prompts import get_prompt_for_context, enhance_for_production_quality
 from agent_modes import agent_state_manager, AgentMode, QualityLevel, AgentPersonality
 from natural_mode_commands import smart_mode_handler
+from api.preview import router as preview_router
+from websocket.preview import router as preview_websocket_router
+from api.apps import router as apps_router, static_host_middleware
+from api.github import start_github_service, stop_github_service, get_github_status
 
 # Load environment variables
 load_dotenv()
@@ -32,6 +36,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Preview file serving
+app.include_router(preview_router, prefix="/preview", tags=["preview"])
+app.include_router(preview_websocket_router, prefix="/ws", tags=["preview"])
+
+# Deployed app static hosting (path prefix and <site_id>.<host_suffix>)
+app.include_router(apps_router, prefix="/apps", tags=["apps"])
+app.middleware("http")(static_host_middleware)
+
+# GitHub連携（リポジトリ削除ワーカーを起動時に開始し、終了時に停止）
+app.add_event_handler("startup", start_github_service)
+app.add_event_handler("shutdown", stop_github_service)
+
 # Initialize AltMX Agent
 altmx = AltMXAgent()
 
@@ -846,9 +862,9 @@ async def get_deployment_status(deployment_id: str):
 
 
 @app.get("/api/deploy/list")
-async def list_deployments():
-    """全デプロイメントをリスト"""
-    return simple_deployment_service.list_deployments()
+async def list_deployments(status: Optional[str] = None):
+    """全デプロイメントをリスト（statusで絞り込み可）"""
+    return simple_deployment_service.list_deployments(status)
 
 
 @app.delete("/api/deploy/{deployment_id}")
@@ -913,6 +929,12 @@ async def get_code_generation_health():
     }
 
 
+@app.get("/api/github/status")
+async def get_github_integration_status():
+    """GitHub連携の状態（APIレイテンシ・レート制限・リポジトリ削除キュー）"""
+    return get_github_status()
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -0,0 +1,112 @@
+"""
+ポート割り当て
+デプロイ用ポートをメモリ上の空きリストで管理し、ソケットのbindで使用可否を確認する
+"""
+
+import socket
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, Any, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class PortAllocator:
+    """
+    ポートアロケーター
+
+    - 起動時に範囲内の各ポートを1回だけbindで確認し、既存のリスナーがいるポートを使用中として扱う
+    - 割り当ては空きリストの先頭から取り出し、bindで確認してから返す（サブプロセス不要）
+    - 解放されたポートは空きリストの末尾へ戻す（直前まで使われていたポートの即再利用を避ける）
+    """
+
+    def __init__(self, port_range: Iterable[int] = range(3000, 3100), host: str = "0.0.0.0"):
+        self.host = host
+        self._ports = list(port_range)
+        self._free: Deque[int] = deque()
+        self._allocated: Set[int] = set()
+        self._busy: Set[int] = set()  # 他プロセスが使用中
+        self._lock = threading.Lock()
+
+        self._recover()
+
+    def _recover(self):
+        """起動時に既存リスナーを検出"""
+        for port in self._ports:
+            if self.is_port_free(port):
+                self._free.append(port)
+            else:
+                self._busy.add(port)
+
+        if self._busy:
+            logger.info(f"Ports already in use at startup: {sorted(self._busy)}")
+
+    def is_port_free(self, port: int) -> bool:
+        """bindできるか（TIME_WAITは空きとみなす）"""
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind((self.host, port))
+            except OSError:
+                return False
+        return True
+
+    def allocate(self) -> int:
+        """
+        ポート割り当て
+
+        Raises:
+            RuntimeError: 空きポートがない
+        """
+        with self._lock:
+            while self._free:
+                port = self._free.popleft()
+                if self.is_port_free(port):
+                    self._allocated.add(port)
+                    return port
+                self._busy.add(port)
+
+            # 空きリストが尽きたら、他プロセス使用中だったポートを1巡だけ再確認
+            for port in sorted(self._busy):
+                if self.is_port_free(port):
+                    self._busy.discard(port)
+                    self._allocated.add(port)
+                    return port
+
+        raise RuntimeError(f"No available ports in range {self._ports[0]}-{self._ports[-1]}")
+
+    def release(self, port: Optional[int]):
+        """ポート返却"""
+        if port is None:
+            return
+        with self._lock:
+            if port in self._allocated:
+                self._allocated.discard(port)
+                self._free.append(port)
+
+    def reserve(self, port: int) -> bool:
+        """
+        特定ポートを割り当て済みとして登録（再起動時に既存デプロイを引き継ぐ場合）
+
+        Returns:
+            登録できたか（範囲外・割り当て済みはFalse）
+        """
+        with self._lock:
+            if port not in self._ports or port in self._allocated:
+                return False
+            self._busy.discard(port)
+            try:
+                self._free.remove(port)
+            except ValueError:
+                pass
+            self._allocated.add(port)
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "free": len(self._free),
+                "allocated": len(self._allocated),
+                "busy": len(self._busy)
+            }
@@ -0,0 +1,305 @@
+"""
+一時リポジトリ削除スケジューラー
+削除予定をSQLiteの時刻インデックスに永続化し、期限が来たリポジトリを非同期ワーカーがバッチ削除する
+"""
+
+import time
+import random
+import sqlite3
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from github_service import GitHubAPI, GitHubNotFoundError, GitHubRateLimitError, GitHubAPIError
+
+logger = logging.getLogger(__name__)
+
+# ワーカー自体のエラー（DB障害等）が続くときの待ち時間の上限（秒）
+MAX_ERROR_BACKOFF = 900.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS repository_cleanup (
+    organization TEXT NOT NULL,
+    repository TEXT NOT NULL,
+    repository_id INTEGER,
+    due_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (organization, repository)
+);
+CREATE INDEX IF NOT EXISTS idx_repository_cleanup_due ON repository_cleanup (status, due_at);
+"""
+
+
+class RepositoryCleanupScheduler:
+    """
+    リポジトリ削除スケジューラー
+
+    - 予定は (organization, repository) 単位で1行（再登録は期限の上書き）
+    - ワーカーは (status, due_at) インデックスで期限到来分だけを取り出し、batch_size 件ずつ削除
+    - 削除済み（404）は成功扱い（再実行しても安全）
+    - 失敗は指数バックオフで再試行し、max_attempts 回で failed として残す
+    - レート制限に達したらバッチを打ち切り、制限解除後に再開
+    - ワーカー自体が失敗し続ける間は poll_interval から倍々に待つ（上限 MAX_ERROR_BACKOFF）
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        api: GitHubAPI,
+        batch_size: int = 10,
+        delete_interval: float = 1.0,
+        poll_interval: float = 60.0,
+        max_attempts: int = 5,
+        retry_delay: float = 300.0
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.api = api
+        self.batch_size = batch_size
+        self.delete_interval = delete_interval
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._paused_until = 0.0  # レート制限による一時停止（epoch秒）
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stats = {"deleted": 0, "already_deleted": 0, "retries": 0, "failed": 0, "worker_errors": 0}
+
+    def schedule(self, organization: str, repository: str, due_at: datetime, repository_id: Optional[int] = None):
+        """削除予定の登録（登録済みなら期限を更新し、再試行状態をリセット）"""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO repository_cleanup (organization, repository, repository_id, due_at, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(organization, repository) DO UPDATE SET
+                    repository_id = excluded.repository_id,
+                    due_at = excluded.due_at,
+                    status = 'pending',
+                    attempts = 0,
+                    last_error = NULL
+                """,
+                (organization, repository, repository_id, due_at.timestamp(), time.time())
+            )
+
+        # 実行中のワーカーが長く眠っている場合に起こす
+        if self._wakeup is not None and self._task is not None and not self._task.done():
+            self._task.get_loop().call_soon_threadsafe(self._wakeup.set)
+
+    def cancel(self, organization: str, repository: str) -> bool:
+        """削除予定の取り消し"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM repository_cleanup WHERE organization = ? AND repository = ?",
+                (organization, repository)
+            )
+        return cursor.rowcount > 0
+
+    def get(self, organization: str, repository: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM repository_cleanup WHERE organization = ? AND repository = ?",
+                (organization, repository)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def due_jobs(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """期限到来分（期限順）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM repository_cleanup WHERE status = 'pending' AND due_at <= ? ORDER BY due_at LIMIT ?",
+                (now if now is not None else time.time(), limit or self.batch_size)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def next_due_at(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(due_at) AS due_at FROM repository_cleanup WHERE status = 'pending'"
+            ).fetchone()
+        return row["due_at"]
+
+    async def run_once(self, now: Optional[float] = None) -> int:
+        """
+        期限到来分を1バッチ削除
+
+        Returns:
+            処理した件数
+        """
+        if time.time() < self._paused_until:
+            return 0
+        
+        jobs = self.due_jobs(now)
+        processed = 0
+
+        for index, job in enumerate(jobs):
+            if index > 0 and self.delete_interval > 0:
+                await asyncio.sleep(self.delete_interval)
+
+            organization, repository = job["organization"], job["repository"]
+            try:
+                await self.api.delete_repository(organization, repository)
+                self._finish(organization, repository)
+                self._stats["deleted"] += 1
+                logger.info(f"Deleted temporary repository {organization}/{repository}")
+            except GitHubNotFoundError:
+                # 手動削除済み・前回の削除後に記録前で停止した
+                self._finish(organization, repository)
+                self._stats["already_deleted"] += 1
+            except GitHubRateLimitError as e:
+                # 残りは制限解除後へ（試行回数は増やさない）
+                logger.warning(f"Repository cleanup paused by rate limit: {e}")
+                self._paused_until = time.time() + self.retry_delay
+                break
+            except GitHubAPIError as e:
+                self._fail(job, str(e))
+            processed += 1
+
+        return processed
+
+    def _finish(self, organization: str, repository: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM repository_cleanup WHERE organization = ? AND repository = ?",
+                (organization, repository)
+            )
+
+    def _fail(self, job: Dict[str, Any], error: str):
+        """失敗記録（指数バックオフ + ジッターで再予定、上限到達で failed）"""
+        attempts = job["attempts"] + 1
+        if attempts >= self.max_attempts:
+            status, due_at = "failed", job["due_at"]
+            self._stats["failed"] += 1
+            logger.error(f"Giving up deleting {job['organization']}/{job['repository']}: {error}")
+        else:
+            status = "pending"
+            due_at = time.time() + self.retry_delay * (2 ** (attempts - 1)) * random.uniform(1.0, 1.5)
+            self._stats["retries"] += 1
+
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE repository_cleanup SET status = ?, attempts = ?, due_at = ?, last_error = ?
+                WHERE organization = ? AND repository = ?
+                """,
+                (status, attempts, due_at, error, job["organization"], job["repository"])
+            )
+
+    def start(self):
+        """ワーカー起動（実行中のイベントループ上）"""
+        if not self.ensure_started():
+            raise RuntimeError("RepositoryCleanupScheduler.start() requires a running event loop")
+
+    def ensure_started(self) -> bool:
+        """
+        実行中のイベントループがあればワーカーを起動（起動済みなら何もしない）
+
+        Returns:
+            ワーカーが動いているか（ループ外から呼ばれた場合は False）
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+        if self._task is not None and not self._task.done():
+            # 終了したループに残ったタスクは動かないため、現在のループで起動し直す
+            if not self._task.get_loop().is_closed():
+                return True
+
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._worker())
+        return True
+
+    async def stop(self):
+        """ワーカー停止"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _worker(self):
+        consecutive_errors = 0
+        while True:
+            try:
+                processed = await self.run_once()
+                now = time.time()
+                next_due = self.next_due_at()
+            except Exception as e:
+                # DB障害等で毎回失敗する間は、期限から待ち時間を求めず指数バックオフで待つ
+                consecutive_errors += 1
+                self._stats["worker_errors"] += 1
+                timeout = min(self.poll_interval * 2 ** (consecutive_errors - 1), MAX_ERROR_BACKOFF)
+                logger.error(f"Repository cleanup worker error (retrying in {timeout:.0f}s): {e}")
+                await asyncio.sleep(timeout)
+                continue
+            consecutive_errors = 0
+
+            if processed >= self.batch_size:
+                # 残りがある可能性（次のバッチへ）
+                continue
+
+            timeout = self.poll_interval
+            if next_due is not None:
+                timeout = min(timeout, max(0.0, next_due - now))
+            if self._paused_until > now:
+                timeout = max(timeout, self._paused_until - now)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def get_queue_depth(self) -> int:
+        """削除待ちの件数"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS depth FROM repository_cleanup WHERE status = 'pending'"
+            ).fetchone()
+        return row["depth"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            counts = self._conn.execute(
+                """
+                SELECT
+                    SUM(status = 'pending') AS pending,
+                    SUM(status = 'pending' AND due_at <= ?) AS due,
+                    SUM(status = 'failed') AS failed
+                FROM repository_cleanup
+                """,
+                (now,)
+            ).fetchone()
+        return {
+            "queue_depth": counts["pending"] or 0,
+            "due": counts["due"] or 0,
+            "failed_jobs": counts["failed"] or 0,
+            "worker_running": self.is_running(),
+            "paused": time.time() < self._paused_until,
+            **self._stats
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
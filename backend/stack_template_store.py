@@ -0,0 +1,118 @@
+"""
+デプロイ済みテンプレートストア
+スタックごとに最後にデプロイしたテンプレートを内容ハッシュで記録し、差分デプロイの比較元にする
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    hash TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stacks (
+    stack_name TEXT PRIMARY KEY,
+    template_hash TEXT NOT NULL,
+    deployment_hash TEXT NOT NULL,
+    deployed_at REAL NOT NULL
+);
+"""
+
+
+class StackTemplateStore:
+    """
+    デプロイ済みテンプレートストア
+
+    - テンプレート本文は内容ハッシュをキーに1回だけ保存（同じ内容の複数スタックで共有）
+    - スタックごとに最後に成功したデプロイのテンプレートハッシュと、
+      パラメータ・タグを含めたデプロイハッシュを記録
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def record(self, stack_name: str, template_hash: str, template_body: str, deployment_hash: str):
+        """デプロイ成功の記録"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO templates (hash, body, created_at) VALUES (?, ?, ?)",
+                (template_hash, template_body, now)
+            )
+            self._conn.execute(
+                """
+                INSERT INTO stacks (stack_name, template_hash, deployment_hash, deployed_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(stack_name) DO UPDATE SET
+                    template_hash = excluded.template_hash,
+                    deployment_hash = excluded.deployment_hash,
+                    deployed_at = excluded.deployed_at
+                """,
+                (stack_name, template_hash, deployment_hash, now)
+            )
+
+    def get(self, stack_name: str) -> Optional[Dict[str, Any]]:
+        """最後のデプロイ（template_hash / deployment_hash / deployed_at）"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM stacks WHERE stack_name = ?", (stack_name,)).fetchone()
+        return dict(row) if row else None
+
+    def get_template(self, template_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM templates WHERE hash = ?", (template_hash,)).fetchone()
+        return json.loads(row["body"]) if row else None
+
+    def forget(self, stack_name: str) -> bool:
+        """スタック削除時の記録削除（テンプレート本文は他のスタックと共有のため残す）"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM stacks WHERE stack_name = ?", (stack_name,))
+        return cursor.rowcount > 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def deployment_hash(template_hash: str, parameters: List[Dict[str, str]], tags: List[Dict[str, str]]) -> str:
+    """テンプレート・パラメータ・タグをまとめたハッシュ（どれかが変われば再デプロイが必要）"""
+    payload = json.dumps([template_hash, parameters, tags], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def diff_templates(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    リソース単位のテンプレート差分（論理ID）
+
+    Returns:
+        added / removed / modified の論理ID一覧（previous が None なら全て added）
+    """
+    old_resources = (previous or {}).get("Resources", {})
+    new_resources = current.get("Resources", {})
+
+    def encode(resource: Any) -> str:
+        return json.dumps(resource, sort_keys=True, separators=(",", ":"))
+
+    return {
+        "added": [logical_id for logical_id in new_resources if logical_id not in old_resources],
+        "removed": [logical_id for logical_id in old_resources if logical_id not in new_resources],
+        "modified": [
+            logical_id for logical_id, resource in new_resources.items()
+            if logical_id in old_resources and encode(resource) != encode(old_resources[logical_id])
+        ]
+    }
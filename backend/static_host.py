@@ -0,0 +1,306 @@
+"""
+静的ホスティング
+全シンプルデプロイをバックエンドプロセス内で配信する（デプロイごとのHTTPサーバープロセスを使わない）
+"""
+
+import os
+import re
+import gzip
+import shutil
+import hashlib
+import logging
+import mimetypes
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 事前圧縮対象のMIME型（text/* 以外）
+_COMPRESSIBLE_TYPES = {
+    "application/javascript", "application/json", "application/xml",
+    "image/svg+xml", "text/javascript"
+}
+
+# 事前圧縮ファイルの置き場（プロジェクト内、配信対象外）
+_VARIANT_DIR = ".static"
+
+# ファイル名に内容ハッシュを含むビルド成果物（例: index-3f2a9c1b.js）
+_HASHED_NAME = re.compile(r"[.-][0-9a-fA-F]{8,}\.[A-Za-z0-9]+$")
+
+
+@dataclass
+class StaticAsset:
+    """配信用に事前計算した静的ファイル"""
+    path: Path
+    size: int
+    mimetype: str
+    etag: str
+    cache_control: str
+    # encoding -> (パス, サイズ, ETag)
+    variants: Dict[str, Tuple[Path, int, str]] = field(default_factory=dict)
+
+
+@dataclass
+class StaticSite:
+    """デプロイ1件分の配信インデックス"""
+    site_id: str
+    root: Path
+    assets: Dict[str, StaticAsset] = field(default_factory=dict)
+
+    @property
+    def total_size(self) -> int:
+        return sum(asset.size for asset in self.assets.values())
+
+
+class StaticHost:
+    """
+    静的ホスト
+
+    - mount時にプロジェクトディレクトリを走査し、ETag・Cache-Control・gzip/brotli圧縮版を事前計算
+    - 配信はパスを返してsendfileで送出（1プロセスで全デプロイを配信）
+    - パスプレフィックス（/apps/<site_id>/...）とホスト名（<site_id>.<host_suffix>）の両方で解決
+    - 拡張子のないパスは index.html へフォールバック（SPAのクライアントルーティング用）
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = self._init_config(config)
+        self._sites: Dict[str, StaticSite] = {}
+        self._lock = threading.Lock()
+
+    def _init_config(self, custom_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """設定初期化"""
+        default_config = {
+            "base_url": os.getenv("STATIC_HOST_BASE_URL", "http://18.180.87.189:8000/apps"),
+            # 例: "apps.example.com" → <site_id>.apps.example.com で配信
+            "host_suffix": os.getenv("STATIC_HOST_SUFFIX"),
+            "index_file": "index.html",
+            "compression_min_size": 1024,
+            "html_cache_control": "no-cache",
+            "asset_cache_control": "public, max-age=300",
+            "immutable_cache_control": "public, max-age=31536000, immutable"
+        }
+
+        if custom_config:
+            default_config.update(custom_config)
+
+        return default_config
+
+    def mount(self, site_id: str, root: Path) -> str:
+        """
+        デプロイの配信開始
+
+        Args:
+            site_id: デプロイID
+            root: 配信するディレクトリ
+
+        Returns:
+            配信URL
+        """
+        site = self._build_site(site_id, Path(root))
+
+        with self._lock:
+            self._sites[site_id] = site
+
+        logger.info(f"Static site {site_id} mounted ({len(site.assets)} files, {site.total_size} bytes)")
+        return self.url_for(site_id)
+
+    def unmount(self, site_id: str) -> bool:
+        """デプロイの配信停止（圧縮版ファイルも削除）"""
+        with self._lock:
+            site = self._sites.pop(site_id, None)
+
+        if site is None:
+            return False
+
+        shutil.rmtree(site.root / _VARIANT_DIR, ignore_errors=True)
+        return True
+
+    def url_for(self, site_id: str) -> str:
+        return f"{self.config['base_url'].rstrip('/')}/{site_id}/"
+
+    def site_for_host(self, host: Optional[str]) -> Optional[str]:
+        """Hostヘッダーからデプロイを特定（host_suffix 未設定・不一致はNone）"""
+        suffix = self.config["host_suffix"]
+        if not host or not suffix:
+            return None
+
+        hostname = host.split(":", 1)[0].lower()
+        suffix = "." + suffix.lower().lstrip(".")
+        if not hostname.endswith(suffix):
+            return None
+
+        site_id = hostname[:-len(suffix)]
+        with self._lock:
+            return next((known for known in self._sites if known.lower() == site_id), None)
+
+    def open_file(
+        self,
+        site_id: str,
+        path: str,
+        if_none_match: Optional[str] = None,
+        accept_encoding: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        ファイル配信（HTTPルート用）
+
+        Args:
+            site_id: デプロイID
+            path: サイト内パス（空・ディレクトリは index.html）
+            if_none_match: クライアントのIf-None-Matchヘッダー値
+            accept_encoding: クライアントのAccept-Encodingヘッダー値（Range要求時はNone）
+
+        Returns:
+            配信結果（path / headers / status_code 等）
+        """
+        with self._lock:
+            site = self._sites.get(site_id)
+
+        if site is None:
+            return {"success": False, "error": "Deployment not found", "status_code": 404}
+
+        asset = self._lookup(site, path)
+        if asset is None:
+            return {"success": False, "error": "File not found", "status_code": 404}
+
+        file_path, size, etag, encoding = asset.path, asset.size, asset.etag, None
+        for candidate in self._accepted_encodings(accept_encoding):
+            variant = asset.variants.get(candidate)
+            if variant is not None:
+                file_path, size, etag = variant
+                encoding = candidate
+                break
+
+        headers = {
+            "ETag": etag,
+            "Cache-Control": asset.cache_control,
+            "X-Content-Type-Options": "nosniff"
+        }
+        if asset.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+
+        if if_none_match is not None and self._etag_matches(if_none_match, etag):
+            return {"success": True, "headers": headers, "status_code": 304}
+
+        return {
+            "success": True,
+            "path": str(file_path),
+            "mimetype": asset.mimetype,
+            "headers": headers,
+            "size": size,
+            "content_encoding": encoding,
+            "status_code": 200
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sites = list(self._sites.values())
+        return {
+            "sites": len(sites),
+            "files": sum(len(site.assets) for site in sites),
+            "total_size": sum(site.total_size for site in sites)
+        }
+
+    def _lookup(self, site: StaticSite, path: str) -> Optional[StaticAsset]:
+        """パス解決（ディレクトリは index.html、拡張子なしの未知パスはSPAフォールバック）"""
+        normalized = path.strip("/")
+        if ".." in normalized.split("/"):
+            return None
+
+        index_file = self.config["index_file"]
+        candidates = [normalized] if normalized else []
+        candidates.append(f"{normalized}/{index_file}" if normalized else index_file)
+        if not os.path.splitext(normalized)[1]:
+            candidates.append(index_file)
+
+        for candidate in candidates:
+            asset = site.assets.get(candidate)
+            if asset is not None:
+                return asset
+        return None
+
+    def _build_site(self, site_id: str, root: Path) -> StaticSite:
+        """ディレクトリ走査・事前圧縮"""
+        site = StaticSite(site_id=site_id, root=root)
+        variant_root = root / _VARIANT_DIR
+
+        for directory, dirnames, filenames in os.walk(root):
+            # 隠しディレクトリ（圧縮版の置き場を含む）と node_modules は配信しない
+            dirnames[:] = [name for name in dirnames if not name.startswith(".") and name != "node_modules"]
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = Path(directory) / filename
+                relative = path.relative_to(root).as_posix()
+                site.assets[relative] = self._build_asset(path, relative, variant_root)
+
+        return site
+
+    def _build_asset(self, path: Path, relative: str, variant_root: Path) -> StaticAsset:
+        """ETag・Cache-Control・圧縮版生成（1ファイルにつき1回）"""
+        body = path.read_bytes()
+        digest = hashlib.sha256(body).hexdigest()
+        mimetype = mimetypes.guess_type(relative)[0] or "application/octet-stream"
+
+        if mimetype == "text/html":
+            cache_control = self.config["html_cache_control"]
+        elif _HASHED_NAME.search(relative):
+            cache_control = self.config["immutable_cache_control"]
+        else:
+            cache_control = self.config["asset_cache_control"]
+
+        asset = StaticAsset(
+            path=path,
+            size=len(body),
+            mimetype=mimetype,
+            etag=f'"{digest[:32]}"',
+            cache_control=cache_control
+        )
+
+        compressible = mimetype.startswith("text/") or mimetype in _COMPRESSIBLE_TYPES
+        if not compressible or len(body) < self.config["compression_min_size"]:
+            return asset
+
+        encoders = [("gzip", "gz", lambda data: gzip.compress(data, mtime=0))]
+        if brotli is not None:
+            encoders.insert(0, ("br", "br", brotli.compress))
+
+        for encoding, suffix, compress in encoders:
+            compressed = compress(body)
+            if len(compressed) >= len(body):
+                continue
+            variant_path = variant_root / f"{relative}.{suffix}"
+            variant_path.parent.mkdir(parents=True, exist_ok=True)
+            variant_path.write_bytes(compressed)
+            asset.variants[encoding] = (variant_path, len(compressed), f'"{digest[:32]}-{encoding}"')
+
+        return asset
+
+    @staticmethod
+    def _accepted_encodings(accept_encoding: Optional[str]) -> List[str]:
+        """Accept-Encodingから利用可能な圧縮形式を優先順に列挙"""
+        if not accept_encoding:
+            return []
+
+        accepted = set()
+        for token in accept_encoding.split(','):
+            name, _, params = token.strip().partition(';')
+            if params.strip().replace(' ', '') in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(name.strip().lower())
+
+        return [encoding for encoding in ("br", "gzip") if encoding in accepted]
+
+    @staticmethod
+    def _etag_matches(if_none_match: str, etag: str) -> bool:
+        """If-None-Match評価（カンマ区切り・ワイルドカード対応）"""
+        candidates = [value.strip() for value in if_none_match.split(',')]
+        return "*" in candidates or etag in candidates
@@ -0,0 +1,379 @@
+"""
+CloudFormation テンプレート静的解析
+リソースを1回走査して Ref / GetAtt / Sub / DependsOn の依存グラフを作り、
+サイズ・複雑度のリント、作成時間のクリティカルパス、ローカル価格表による時間当たりコストを算出する
+"""
+
+import re
+import json
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# CloudFormation のクォータ
+MAX_TEMPLATE_BODY_BYTES = 51200       # TemplateBody で直接渡せる上限（超えるとS3経由）
+MAX_TEMPLATE_URL_BYTES = 1000000      # S3経由の上限
+MAX_RESOURCES = 500
+MAX_PARAMETERS = 200
+MAX_OUTPUTS = 200
+
+PSEUDO_PARAMETERS = {
+    "AWS::AccountId", "AWS::NotificationARNs", "AWS::NoValue", "AWS::Partition",
+    "AWS::Region", "AWS::StackId", "AWS::StackName", "AWS::URLSuffix"
+}
+
+# リソース作成の目安時間（秒）。未登録のタイプは DEFAULT_CREATION_SECONDS
+CREATION_SECONDS = {
+    "AWS::IAM::Role": 20,
+    "AWS::IAM::Policy": 10,
+    "AWS::EC2::SecurityGroup": 5,
+    "AWS::EC2::VPC": 15,
+    "AWS::EC2::Subnet": 10,
+    "AWS::EC2::NatGateway": 120,
+    "AWS::EC2::Instance": 60,
+    "AWS::Logs::LogGroup": 2,
+    "AWS::ECS::Cluster": 5,
+    "AWS::ECS::TaskDefinition": 3,
+    "AWS::ECS::Service": 180,                          # サービス安定化待ちを含む
+    "AWS::ElasticLoadBalancingV2::LoadBalancer": 180,
+    "AWS::ElasticLoadBalancingV2::TargetGroup": 5,
+    "AWS::ElasticLoadBalancingV2::Listener": 3,
+    "AWS::ApplicationAutoScaling::ScalableTarget": 30,
+    "AWS::ApplicationAutoScaling::ScalingPolicy": 5,
+    "AWS::RDS::DBSubnetGroup": 5,
+    "AWS::RDS::DBInstance": 600,
+    "AWS::ElastiCache::CacheCluster": 420,
+    "AWS::Route53::RecordSet": 60,
+    "AWS::CloudFront::Distribution": 900,
+}
+DEFAULT_CREATION_SECONDS = 10
+
+# 時間当たり料金（USD、ap-northeast-1 のオンデマンド概算）
+PRICING = {
+    "fargate_vcpu_hour": 0.05056,
+    "fargate_gb_hour": 0.00553,
+    "alb_hour": 0.0243,
+    "nlb_hour": 0.0243,
+    "nat_gateway_hour": 0.062,
+    "rds_storage_gb_month": 0.138,
+    "rds_instance_hour": {"db.t3.micro": 0.026, "db.t3.small": 0.052, "db.t3.medium": 0.104, "db.t4g.micro": 0.025},
+    "elasticache_node_hour": {"cache.t3.micro": 0.026, "cache.t3.small": 0.052, "cache.t4g.micro": 0.025},
+    "ec2_instance_hour": {"t3.micro": 0.0136, "t3.small": 0.0272, "t3.medium": 0.0544},
+}
+
+# 料金のかからないリソース（未見積もり扱いにしない）
+FREE_RESOURCE_TYPES = {
+    "AWS::IAM::Role", "AWS::IAM::Policy", "AWS::EC2::SecurityGroup", "AWS::EC2::VPC", "AWS::EC2::Subnet",
+    "AWS::ECS::Cluster", "AWS::ECS::TaskDefinition", "AWS::ElasticLoadBalancingV2::TargetGroup",
+    "AWS::ElasticLoadBalancingV2::Listener", "AWS::ApplicationAutoScaling::ScalableTarget",
+    "AWS::ApplicationAutoScaling::ScalingPolicy", "AWS::RDS::DBSubnetGroup", "AWS::Logs::LogGroup",
+}
+
+HOURS_PER_MONTH = 730
+
+_SUB_VARIABLE = re.compile(r"\$\{(?!!)([^}]+)\}")
+
+
+@dataclass
+class LintIssue:
+    """リント結果"""
+    severity: str    # error / warning / info
+    code: str
+    message: str
+    resource: Optional[str] = None
+
+
+@dataclass
+class TemplateAnalysis:
+    """テンプレート解析結果"""
+    resource_count: int
+    body_size: int
+    issues: List[LintIssue] = field(default_factory=list)
+    dependencies: Dict[str, List[str]] = field(default_factory=dict)   # 論理ID -> 依存先の論理ID
+    critical_path: List[str] = field(default_factory=list)
+    critical_path_seconds: int = 0
+    resource_costs: Dict[str, float] = field(default_factory=dict)     # 論理ID -> 時間当たりUSD
+    unpriced_resources: List[str] = field(default_factory=list)
+
+    @property
+    def is_valid(self) -> bool:
+        return not any(issue.severity == "error" for issue in self.issues)
+
+    @property
+    def hourly_cost(self) -> float:
+        return round(sum(self.resource_costs.values()), 4)
+
+    @property
+    def monthly_cost(self) -> float:
+        return round(self.hourly_cost * HOURS_PER_MONTH, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "valid": self.is_valid,
+            "resource_count": self.resource_count,
+            "body_size": self.body_size,
+            "issues": [issue.__dict__ for issue in self.issues],
+            "dependencies": self.dependencies,
+            "critical_path": self.critical_path,
+            "critical_path_seconds": self.critical_path_seconds,
+            "resource_costs": self.resource_costs,
+            "hourly_cost": self.hourly_cost,
+            "monthly_cost": self.monthly_cost,
+            "unpriced_resources": self.unpriced_resources
+        }
+
+
+class TemplateAnalyzer:
+    """
+    テンプレート静的解析エンジン
+
+    - Resources / Outputs を1回ずつ走査し、参照（Ref・GetAtt・Sub・DependsOn）を収集
+    - 未解決の参照・依存の循環・クォータ超過・未使用パラメータ・既定値付きの秘密パラメータを検出
+    - 作成時間を重みにした最長経路（クリティカルパス）でスタック作成時間を見積もる
+    - 価格表からリソースごとの時間当たりコストを算出（ECSサービスはタスク定義のCPU・メモリ × タスク数）
+    """
+
+    def __init__(self, pricing: Optional[Dict[str, Any]] = None,
+                 creation_seconds: Optional[Dict[str, int]] = None):
+        self.pricing = {**PRICING, **(pricing or {})}
+        self.creation_seconds = {**CREATION_SECONDS, **(creation_seconds or {})}
+
+    def analyze(self, template: Dict[str, Any]) -> TemplateAnalysis:
+        resources = template.get("Resources") or {}
+        parameters = template.get("Parameters") or {}
+        outputs = template.get("Outputs") or {}
+        conditions = template.get("Conditions") or {}
+
+        analysis = TemplateAnalysis(
+            resource_count=len(resources),
+            body_size=len(json.dumps(template, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        )
+        issues = analysis.issues
+        self._lint_quotas(analysis, parameters, outputs)
+
+        used_parameters: Set[str] = set()
+        for logical_id, resource in resources.items():
+            if not isinstance(resource, dict) or "Type" not in resource:
+                issues.append(LintIssue("error", "missing_type", f"{logical_id} has no Type", logical_id))
+                analysis.dependencies[logical_id] = []
+                continue
+
+            refs: List[Tuple[str, str]] = []
+            self._collect_references(resource.get("Properties", {}), refs)
+            depends_on = resource.get("DependsOn", [])
+            refs.extend(("DependsOn", name) for name in ([depends_on] if isinstance(depends_on, str) else depends_on))
+
+            condition = resource.get("Condition")
+            if condition is not None and condition not in conditions:
+                issues.append(LintIssue("error", "unknown_condition", f"{logical_id} uses undefined condition {condition}", logical_id))
+
+            analysis.dependencies[logical_id] = self._resolve(
+                logical_id, refs, resources, parameters, used_parameters, issues
+            )
+
+        for output_name, output in outputs.items():
+            refs = []
+            self._collect_references(output, refs)
+            self._resolve(f"Outputs.{output_name}", refs, resources, parameters, used_parameters, issues)
+
+        for name, parameter in parameters.items():
+            if name not in used_parameters:
+                issues.append(LintIssue("info", "unused_parameter", f"Parameter {name} is never referenced"))
+            if isinstance(parameter, dict) and parameter.get("NoEcho") and "Default" in parameter:
+                issues.append(LintIssue(
+                    "warning", "secret_default", f"NoEcho parameter {name} has a default value stored in the template"
+                ))
+
+        self._critical_path(analysis, resources)
+        self._estimate_costs(analysis, resources, parameters)
+        return analysis
+
+    def _lint_quotas(self, analysis: TemplateAnalysis, parameters: Dict[str, Any], outputs: Dict[str, Any]):
+        """サイズ・件数のクォータ"""
+        issues = analysis.issues
+        if analysis.body_size > MAX_TEMPLATE_URL_BYTES:
+            issues.append(LintIssue("error", "template_too_large", f"Template is {analysis.body_size} bytes (limit {MAX_TEMPLATE_URL_BYTES})"))
+        elif analysis.body_size > MAX_TEMPLATE_BODY_BYTES:
+            issues.append(LintIssue(
+                "warning", "template_body_too_large",
+                f"Template is {analysis.body_size} bytes; bodies over {MAX_TEMPLATE_BODY_BYTES} bytes must be uploaded to S3"
+            ))
+
+        for count, limit, code, label in (
+            (analysis.resource_count, MAX_RESOURCES, "too_many_resources", "resources"),
+            (len(parameters), MAX_PARAMETERS, "too_many_parameters", "parameters"),
+            (len(outputs), MAX_OUTPUTS, "too_many_outputs", "outputs"),
+        ):
+            if count > limit:
+                issues.append(LintIssue("error", code, f"Template has {count} {label} (limit {limit})"))
+
+        if analysis.resource_count == 0:
+            issues.append(LintIssue("error", "no_resources", "Template has no resources defined"))
+
+    def _collect_references(self, node: Any, refs: List[Tuple[str, str]]):
+        """組み込み関数の参照を収集（(種類, 名前)）"""
+        stack = [node]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, list):
+                stack.extend(value)
+                continue
+            if not isinstance(value, dict):
+                continue
+
+            if len(value) == 1:
+                (function, argument), = value.items()
+                if function == "Ref" and isinstance(argument, str):
+                    refs.append(("Ref", argument))
+                    continue
+                if function == "Fn::GetAtt":
+                    name = argument[0] if isinstance(argument, list) else str(argument).split(".", 1)[0]
+                    refs.append(("Fn::GetAtt", name))
+                    continue
+                if function == "Fn::Sub":
+                    text, variables = (argument[0], argument[1]) if isinstance(argument, list) else (argument, {})
+                    for variable in _SUB_VARIABLE.findall(text):
+                        name = variable.split(".", 1)[0]
+                        if name not in variables:
+                            refs.append(("Fn::Sub", name))
+                    stack.append(variables)
+                    continue
+
+            stack.extend(value.values())
+
+    def _resolve(self, owner: str, refs: List[Tuple[str, str]], resources: Dict[str, Any],
+                 parameters: Dict[str, Any], used_parameters: Set[str], issues: List[LintIssue]) -> List[str]:
+        """参照の解決（リソースへの依存を返し、未解決はエラー）"""
+        dependencies: List[str] = []
+        for kind, name in refs:
+            if name in resources:
+                if name == owner:
+                    issues.append(LintIssue("error", "self_reference", f"{owner} references itself", owner))
+                elif name not in dependencies:
+                    dependencies.append(name)
+            elif kind in ("Ref", "Fn::Sub") and (name in parameters or name in PSEUDO_PARAMETERS):
+                used_parameters.add(name)
+            else:
+                issues.append(LintIssue(
+                    "error", "unresolved_reference", f"{owner}: {kind} to undefined {name}",
+                    owner if owner in resources else None
+                ))
+        return dependencies
+
+    def _critical_path(self, analysis: TemplateAnalysis, resources: Dict[str, Any]):
+        """作成時間で重み付けした最長経路（トポロジカル順に1回走査）"""
+        dependencies = analysis.dependencies
+        dependents: Dict[str, List[str]] = {logical_id: [] for logical_id in dependencies}
+        remaining = {logical_id: len(required) for logical_id, required in dependencies.items()}
+        for logical_id, required in dependencies.items():
+            for dependency in required:
+                dependents[dependency].append(logical_id)
+
+        finish: Dict[str, int] = {}
+        previous: Dict[str, Optional[str]] = {}
+        ready = deque(logical_id for logical_id, count in remaining.items() if count == 0)
+        while ready:
+            logical_id = ready.popleft()
+            start, parent = 0, None
+            for dependency in dependencies[logical_id]:
+                if finish[dependency] > start:
+                    start, parent = finish[dependency], dependency
+            finish[logical_id] = start + self._creation_seconds(resources.get(logical_id))
+            previous[logical_id] = parent
+            for dependent in dependents[logical_id]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        cyclic = [logical_id for logical_id in dependencies if logical_id not in finish]
+        if cyclic:
+            analysis.issues.append(LintIssue(
+                "error", "circular_dependency", f"Circular dependency between: {', '.join(sorted(cyclic))}"
+            ))
+
+        if not finish:
+            return
+        last = max(finish, key=finish.get)
+        analysis.critical_path_seconds = finish[last]
+        path = []
+        while last is not None:
+            path.append(last)
+            last = previous[last]
+        analysis.critical_path = list(reversed(path))
+
+    def _creation_seconds(self, resource: Any) -> int:
+        resource_type = resource.get("Type") if isinstance(resource, dict) else None
+        return self.creation_seconds.get(resource_type, DEFAULT_CREATION_SECONDS)
+
+    def _estimate_costs(self, analysis: TemplateAnalysis, resources: Dict[str, Any], parameters: Dict[str, Any]):
+        """リソースごとの時間当たりコスト"""
+        for logical_id, resource in resources.items():
+            if not isinstance(resource, dict):
+                continue
+            resource_type = resource.get("Type")
+            properties = resource.get("Properties", {})
+            try:
+                cost = self._resource_cost(resource_type, properties, resources, parameters)
+            except (TypeError, ValueError):
+                # Fn::If・Fn::FindInMap 等、静的に決まらない値は見積もらない
+                cost = None
+
+            if cost is None:
+                analysis.unpriced_resources.append(logical_id)
+            else:
+                analysis.resource_costs[logical_id] = round(cost, 5)
+
+    def _resource_cost(self, resource_type: Any, properties: Dict[str, Any], resources: Dict[str, Any],
+                       parameters: Dict[str, Any]) -> Optional[float]:
+        """価格表による1リソースの時間当たりコスト（価格表にない・値が解決できなければ None）"""
+        pricing = self.pricing
+        cost: Optional[float] = None
+
+        if resource_type == "AWS::ECS::Service":
+            cost = self._fargate_service_cost(properties, resources, parameters)
+        elif resource_type == "AWS::ElasticLoadBalancingV2::LoadBalancer":
+            cost = pricing["nlb_hour"] if properties.get("Type") == "network" else pricing["alb_hour"]
+        elif resource_type == "AWS::EC2::NatGateway":
+            cost = pricing["nat_gateway_hour"]
+        elif resource_type == "AWS::RDS::DBInstance":
+            instance = pricing["rds_instance_hour"].get(self._scalar(properties.get("DBInstanceClass"), parameters))
+            if instance is not None:
+                storage = float(self._scalar(properties.get("AllocatedStorage"), parameters) or 0)
+                multi_az = 2 if self._scalar(properties.get("MultiAZ"), parameters) in (True, "true") else 1
+                cost = instance * multi_az + storage * pricing["rds_storage_gb_month"] / HOURS_PER_MONTH
+        elif resource_type == "AWS::ElastiCache::CacheCluster":
+            node = pricing["elasticache_node_hour"].get(self._scalar(properties.get("CacheNodeType"), parameters))
+            if node is not None:
+                cost = node * int(self._scalar(properties.get("NumCacheNodes"), parameters) or 1)
+        elif resource_type == "AWS::EC2::Instance":
+            cost = pricing["ec2_instance_hour"].get(self._scalar(properties.get("InstanceType"), parameters))
+        elif resource_type in FREE_RESOURCE_TYPES:
+            cost = 0.0
+        return cost
+
+    def _fargate_service_cost(self, properties: Dict[str, Any], resources: Dict[str, Any],
+                              parameters: Dict[str, Any]) -> Optional[float]:
+        """Fargateサービス: タスク定義の vCPU・メモリ × タスク数"""
+        task_definition = properties.get("TaskDefinition")
+        if not (isinstance(task_definition, dict) and task_definition.get("Ref") in resources):
+            return None
+        task_properties = resources[task_definition["Ref"]].get("Properties", {})
+        try:
+            vcpu = float(self._scalar(task_properties.get("Cpu"), parameters)) / 1024
+            memory_gb = float(self._scalar(task_properties.get("Memory"), parameters)) / 1024
+            desired_count = int(self._scalar(properties.get("DesiredCount", 1), parameters))
+        except (TypeError, ValueError):
+            return None
+        return (vcpu * self.pricing["fargate_vcpu_hour"] + memory_gb * self.pricing["fargate_gb_hour"]) * desired_count
+
+    @staticmethod
+    def _scalar(value: Any, parameters: Dict[str, Any]) -> Any:
+        """パラメータ参照は既定値に解決（それ以外の組み込み関数・リストは TypeError）"""
+        if isinstance(value, dict) and set(value) == {"Ref"}:
+            value = (parameters.get(value["Ref"]) or {}).get("Default")
+        if isinstance(value, (dict, list)):
+            raise TypeError(f"Unresolvable value: {value!r}")
+        return value
@@ -0,0 +1,68 @@
+"""
+Static Apps API Tests
+デプロイ済みアプリ静的配信ルート（パスプレフィックス・ホスト名・事前圧縮）テスト
+"""
+
+import os
+import tempfile
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# モジュール読み込み時のシングルトン生成先を一時ディレクトリへ
+os.environ.setdefault("DEPLOY_BASE_PATH", tempfile.mkdtemp())
+
+import api.apps as apps_api
+from static_host import StaticHost
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """サンプルサイトを登録したテストクライアント"""
+    (tmp_path / "index.html").write_text("<html>app</html>")
+    (tmp_path / "app.js").write_text("console.log('app');\n" * 200)
+
+    host = StaticHost({"host_suffix": "apps.test"})
+    host.mount("dep_1", tmp_path)
+    monkeypatch.setattr(apps_api, "static_host", host)
+
+    app = FastAPI()
+    app.include_router(apps_api.router, prefix="/apps")
+    app.middleware("http")(apps_api.static_host_middleware)
+    return TestClient(app)
+
+
+class TestAppsRoute:
+    """静的配信ルートテスト"""
+
+    def test_path_prefix(self, client):
+        """パスプレフィックス配信テスト"""
+        response = client.get("/apps/dep_1/")
+
+        assert response.status_code == 200
+        assert response.text == "<html>app</html>"
+        assert response.headers["cache-control"] == "no-cache"
+
+    def test_redirect_to_trailing_slash(self, client):
+        """末尾スラッシュへのリダイレクトテスト"""
+        response = client.get("/apps/dep_1", follow_redirects=False)
+
+        assert response.status_code == 307
+        assert response.headers["location"] == "dep_1/"
+
+    def test_precompressed_and_etag(self, client):
+        """事前圧縮配信・304テスト"""
+        response = client.get("/apps/dep_1/app.js", headers={"Accept-Encoding": "gzip"})
+        cached = client.get("/apps/dep_1/app.js", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.text == "console.log('app');\n" * 200
+        assert cached.status_code == 304
+
+    def test_host_routing(self, client):
+        """ホスト名ルーティングテスト"""
+        response = client.get("/app.js", headers={"Host": "dep_1.apps.test", "Accept-Encoding": "identity"})
+
+        assert response.status_code == 200
+        assert response.text == "console.log('app');\n" * 200
+        assert client.get("/missing.js", headers={"Host": "dep_1.apps.test"}).status_code == 404
@@ -337,7 +337,29 @@ class TestAWSDeploymentSystem:
         assert 'estimated_demo_cost' in cost_estimate  # 1時間デモ用
         assert 'estimated_monthly_cost' in cost_estimate
         assert cost_estimate['estimated_demo_cost'] > 0
-    
+
+    @patch('aws_deployment_system.boto3.Session')
+    def test_cost_estimation_from_template(self, mock_session, mock_boto3_session):
+        """生成テンプレートのリソースごとのコストとクリティカルパスを返すテスト"""
+        from aws_deployment_system import AWSDeploymentService
+        from cloudformation_generator import CloudFormationGenerator
+
+        session_mock, cf_client_mock = mock_boto3_session
+        mock_session.return_value = session_mock
+
+        template = CloudFormationGenerator().generate_complete_stack(
+            {"app_name": "altmx-demo-app", "port": 3000, "features": ["database"]},
+            {"vpc_id": "vpc-12345678", "subnet_ids": ["subnet-1234"], "certificate_arn": "arn:aws:acm:cert"}
+        )
+        service = AWSDeploymentService(region="ap-northeast-1")
+        cost_estimate = service.estimate_deployment_cost({"template": template})
+
+        assert set(cost_estimate['resource_costs']) == set(template["Resources"])
+        assert cost_estimate['resource_costs']['RDSInstance'] > 0
+        assert cost_estimate['estimated_demo_cost'] == round(cost_estimate['template_hourly_cost'], 2)
+        assert "RDSInstance" in cost_estimate['critical_path']
+        assert cost_estimate['estimated_creation_minutes'] > 10
+
     @patch('aws_deployment_system.boto3.Session')
     def test_complete_deployment_workflow(self, mock_session, deployment_config, mock_boto3_session):
         """完全なデプロイメントワークフロー"""
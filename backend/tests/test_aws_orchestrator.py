@@ -0,0 +1,248 @@
+"""
+非同期デプロイオーケストレーターテスト
+describe系呼び出しの並列実行・短期キャッシュ・状態スナップショットの集約を検証
+（AWSはmotoで代替）
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+import pytest
+
+import boto3
+from moto import mock_aws
+
+from aws_deployment_system import AWSDeploymentService, AWSDeploymentOrchestrator, AWSDeploymentSystem
+
+REGION = "ap-northeast-1"
+
+QUEUE_TEMPLATE = {
+    "AWSTemplateFormatVersion": "2010-09-09",
+    "Resources": {
+        "DemoQueue": {"Type": "AWS::SQS::Queue", "Properties": {"QueueName": "altmx-demo-queue"}}
+    },
+    "Outputs": {
+        "ApplicationURL": {"Value": "https://demo-alb-123.ap-northeast-1.elb.amazonaws.com"}
+    }
+}
+
+
+@pytest.fixture
+def aws():
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        yield
+
+
+@pytest.fixture
+def demo_resources(aws):
+    """スタック・ECSサービス・ターゲットグループを作成"""
+    boto3.client("cloudformation", region_name=REGION).create_stack(
+        StackName="altmx-demo-stack", TemplateBody=json.dumps(QUEUE_TEMPLATE)
+    )
+
+    ecs = boto3.client("ecs", region_name=REGION)
+    ecs.create_cluster(clusterName="altmx-demo-cluster")
+    ecs.register_task_definition(
+        family="altmx-demo",
+        containerDefinitions=[{"name": "app", "image": "nginx:latest", "memory": 512}]
+    )
+    ecs.create_service(
+        cluster="altmx-demo-cluster", serviceName="altmx-demo-service",
+        taskDefinition="altmx-demo", desiredCount=1
+    )
+
+    vpc_id = boto3.client("ec2", region_name=REGION).create_vpc(CidrBlock="10.0.0.0/16")["Vpc"]["VpcId"]
+    target_group = boto3.client("elbv2", region_name=REGION).create_target_group(
+        Name="altmx-demo-tg", Protocol="HTTP", Port=80, VpcId=vpc_id, TargetType="ip"
+    )["TargetGroups"][0]
+
+    return {
+        "cluster_name": "altmx-demo-cluster",
+        "service_name": "altmx-demo-service",
+        "target_group_arn": target_group["TargetGroupArn"]
+    }
+
+
+class SlowClient:
+    """呼び出しごとに delay 秒かかるクライアント（呼び出し回数・同時実行数を記録）"""
+
+    def __init__(self, responses, delay=0.1):
+        self.responses = responses
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name not in self.responses:
+            raise AttributeError(name)
+
+        def call(**kwargs):
+            with self._lock:
+                self.calls.append(name)
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            try:
+                time.sleep(self.delay)
+                return self.responses[name]
+            finally:
+                with self._lock:
+                    self.active -= 1
+        return call
+
+
+def slow_service(aws_service, delay=0.1):
+    """describe系を遅いクライアントに差し替えたサービス"""
+    aws_service.cf_client = SlowClient({
+        "describe_stacks": {"Stacks": [{"StackStatus": "CREATE_COMPLETE", "Outputs": []}]}
+    }, delay)
+    aws_service.ecs_client = SlowClient({
+        "describe_services": {"services": [{
+            "status": "ACTIVE", "desiredCount": 1, "runningCount": 1, "pendingCount": 0,
+            "deployments": [{"status": "PRIMARY", "rolloutState": "COMPLETED"}]
+        }]}
+    }, delay)
+    aws_service.elbv2_client = SlowClient({
+        "describe_target_health": {"TargetHealthDescriptions": [{"TargetHealth": {"State": "healthy"}}]}
+    }, delay)
+    return aws_service
+
+
+SNAPSHOT_ARGS = {
+    "cluster_name": "altmx-demo-cluster",
+    "service_name": "altmx-demo-service",
+    "target_group_arn": "arn:aws:elasticloadbalancing:ap-northeast-1:123456789012:targetgroup/demo/1"
+}
+
+
+class TestAWSDeploymentOrchestrator:
+    """非同期デプロイオーケストレーターのテスト"""
+
+    def test_snapshot_aggregates_moto_resources(self, demo_resources):
+        """スタック・サービス・ターゲットヘルスを1つのスナップショットに集約するテスト"""
+        orchestrator = AWSDeploymentOrchestrator(AWSDeploymentService(region=REGION))
+        snapshot = asyncio.run(orchestrator.get_status_snapshot("altmx-demo-stack", **demo_resources))
+
+        assert snapshot["stack"]["status"] == "CREATE_COMPLETE"
+        assert snapshot["stack"]["outputs"]["ApplicationURL"].startswith("https://")
+        assert snapshot["service"]["status"] == "ACTIVE"
+        assert snapshot["service"]["desired_count"] == 1
+        assert snapshot["targets"]["total_targets"] == 0
+        assert snapshot["status"] in ("HEALTHY", "DEGRADED", "DEPLOYING")
+        assert orchestrator.get_stats()["api_calls"] == 3
+
+    def test_describe_calls_run_concurrently(self, aws):
+        """3種類の describe が並列に実行されるテスト"""
+        orchestrator = AWSDeploymentOrchestrator(slow_service(AWSDeploymentService(region=REGION)))
+
+        start = time.perf_counter()
+        snapshot = asyncio.run(orchestrator.get_status_snapshot("altmx-demo-stack", **SNAPSHOT_ARGS))
+        elapsed = time.perf_counter() - start
+
+        assert snapshot["status"] == "HEALTHY"
+        # 逐次なら 3 × 0.1 = 0.3秒
+        assert elapsed < 0.25
+
+    def test_cache_and_in_flight_sharing(self, aws):
+        """同時リフレッシュは1回の呼び出しを共有し、TTL内はキャッシュを返すテスト"""
+        service = slow_service(AWSDeploymentService(region=REGION), delay=0.05)
+        orchestrator = AWSDeploymentOrchestrator(service, cache_ttl=60)
+
+        async def refresh():
+            await asyncio.gather(*[
+                orchestrator.get_status_snapshot("altmx-demo-stack", **SNAPSHOT_ARGS) for _ in range(5)
+            ])
+            await orchestrator.get_status_snapshot("altmx-demo-stack", **SNAPSHOT_ARGS)
+
+        asyncio.run(refresh())
+
+        assert service.cf_client.calls == ["describe_stacks"]
+        assert service.ecs_client.calls == ["describe_services"]
+        assert service.elbv2_client.calls == ["describe_target_health"]
+        stats = orchestrator.get_stats()
+        assert stats["api_calls"] == 3
+        assert stats["shared_calls"] == 12
+        assert stats["cache_hits"] == 3
+
+    def test_expired_cache_is_refetched(self, aws):
+        """TTL経過後は再取得するテスト"""
+        service = slow_service(AWSDeploymentService(region=REGION), delay=0)
+        orchestrator = AWSDeploymentOrchestrator(service, cache_ttl=0.05)
+
+        async def refresh():
+            await orchestrator.describe_stack("altmx-demo-stack")
+            await asyncio.sleep(0.1)
+            await orchestrator.describe_stack("altmx-demo-stack")
+
+        asyncio.run(refresh())
+        assert service.cf_client.calls == ["describe_stacks", "describe_stacks"]
+
+    def test_cancelled_owner_does_not_cancel_sharers(self, aws):
+        """呼び出し元のキャンセルは相乗り側へ伝わらず、相乗り側が呼び直すテスト"""
+        service = slow_service(AWSDeploymentService(region=REGION), delay=0.1)
+        orchestrator = AWSDeploymentOrchestrator(service, cache_ttl=60)
+
+        async def refresh():
+            owner = asyncio.create_task(orchestrator.describe_stack("altmx-demo-stack"))
+            await asyncio.sleep(0.01)
+            sharer = asyncio.create_task(orchestrator.get_status_snapshot("altmx-demo-stack", **SNAPSHOT_ARGS))
+            await asyncio.sleep(0.01)
+            owner.cancel()
+            return await sharer
+
+        snapshot = asyncio.run(refresh())
+
+        assert snapshot["stack"]["status"] == "CREATE_COMPLETE"
+        assert orchestrator.get_stats()["shared_calls"] == 1
+        assert len(service.cf_client.calls) == 2
+
+    def test_expired_entries_are_evicted(self, aws):
+        """期限切れのキャッシュが参照時・追加時に削除されるテスト"""
+        service = slow_service(AWSDeploymentService(region=REGION), delay=0)
+        orchestrator = AWSDeploymentOrchestrator(service, cache_ttl=0.05)
+
+        async def refresh():
+            for index in range(3):
+                await orchestrator.describe_stack(f"altmx-demo-stack-{index}")
+            await asyncio.sleep(0.1)
+            await orchestrator.describe_stack("altmx-demo-stack-new")
+
+        asyncio.run(refresh())
+        assert len(orchestrator._cache) == 1
+
+    def test_component_error_does_not_hide_others(self, aws):
+        """一部の取得失敗をエラー要素として返すテスト"""
+        service = slow_service(AWSDeploymentService(region=REGION), delay=0)
+        service.ecs_client = SlowClient({"describe_services": {"services": []}}, delay=0)
+        orchestrator = AWSDeploymentOrchestrator(service)
+
+        snapshot = asyncio.run(orchestrator.get_status_snapshot("altmx-demo-stack", **SNAPSHOT_ARGS))
+
+        assert "error" in snapshot["service"]
+        assert snapshot["stack"]["status"] == "CREATE_COMPLETE"
+        assert snapshot["targets"]["healthy_targets"] == 1
+        assert snapshot["status"] == "UNKNOWN"
+
+    def test_async_complete_deployment_with_moto(self, demo_resources):
+        """非同期の完全デプロイメントワークフローのテスト"""
+        system = AWSDeploymentSystem(region=REGION)
+        config = {
+            "stack_name": "altmx-demo-app-stack",
+            "template": QUEUE_TEMPLATE,
+            "container_config": {
+                "cluster_name": demo_resources["cluster_name"],
+                "service_name": demo_resources["service_name"]
+            }
+        }
+
+        result = asyncio.run(system.deploy_complete_stack_async(config, deployment_id="demo-1"))
+
+        assert result["success"] is True
+        assert result["stack_created"] is True
+        assert result["container_deployed"] is True
+        assert result["application_url"].startswith("https://")
+        assert system.deployment_service.deployment_monitor.get_deployment_status("demo-1")["progress_percentage"] == 100
@@ -310,6 +310,137 @@ class TestCloudFormationGenerator:
             update_policy = ecs_service["UpdatePolicy"]
             assert "AutoRollbackConfiguration" in update_policy
 
+class TestTemplateFragmentCache:
+    """フラグメントキャッシュ・テンプレートハッシュのテスト"""
+    
+    @pytest.fixture
+    def app_config(self):
+        return {
+            "app_name": "altmx-demo-app",
+            "port": 3000,
+            "environment": "production",
+            "features": ["database", "cache"]
+        }
+    
+    @pytest.fixture
+    def aws_config(self):
+        return {
+            "vpc_id": "vpc-12345678",
+            "subnet_ids": ["subnet-1234", "subnet-5678"],
+            "certificate_arn": "arn:aws:acm:ap-northeast-1:123456789012:certificate/abc"
+        }
+    
+    def test_cached_output_matches_uncached(self, app_config, aws_config):
+        """キャッシュ経由のテンプレートがキャッシュなしと同一（キー順も含む）であるテスト"""
+        from cloudformation_generator import CloudFormationGenerator
+        
+        cached = CloudFormationGenerator()
+        uncached = CloudFormationGenerator(fragment_cache_size=0)
+        
+        for port in (3000, 8080, 3000):
+            config = dict(app_config, port=port)
+            expected = uncached.generate_complete_stack(config, aws_config)
+            assert json.dumps(cached.generate_complete_stack(config, aws_config)) == json.dumps(expected)
+    
+    def test_unchanged_fragments_are_reused(self, app_config, aws_config):
+        """参照しない設定の変更ではフラグメントを作り直さないテスト"""
+        from cloudformation_generator import CloudFormationGenerator
+        
+        generator = CloudFormationGenerator()
+        first = generator.render_stack(app_config, aws_config)
+        second = generator.render_stack(dict(app_config, port=8080), aws_config)
+        
+        # IAMロールはアプリ名だけに依存
+        assert second.template["Resources"]["TaskRole"] == first.template["Resources"]["TaskRole"]
+        assert second.template["Resources"]["ECSService"] != first.template["Resources"]["ECSService"]
+        assert second.template_hash != first.template_hash
+        
+        stats = generator.get_cache_stats()
+        assert stats["hits"] > 0
+        assert stats["misses"] < 2 * stats["fragments"]
+    
+    def test_returned_template_is_not_shared_with_cache(self, app_config, aws_config):
+        """返したテンプレートを変更しても次回の生成に影響しないテスト"""
+        from cloudformation_generator import CloudFormationGenerator
+        
+        generator = CloudFormationGenerator()
+        first = generator.render_stack(app_config, aws_config)
+        template = generator.generate_complete_stack(app_config, aws_config)
+        template["Resources"]["ECSCluster"]["Properties"]["ClusterName"] = "hacked"
+        template["Parameters"].clear()
+        
+        second = generator.render_stack(app_config, aws_config)
+        assert second.template["Resources"]["ECSCluster"]["Properties"]["ClusterName"] != "hacked"
+        assert second.template["Parameters"]
+        assert second.template == first.template
+        assert second.template_hash == first.template_hash
+        assert generator.get_cache_stats()["hits"] > 0
+    
+    def test_template_hash_is_stable(self, app_config, aws_config):
+        """テンプレートハッシュが生成器・辞書の順序によらず同じであるテスト"""
+        from cloudformation_generator import CloudFormationGenerator, canonical_json
+        
+        first = CloudFormationGenerator().render_stack(app_config, aws_config)
+        reordered = dict(reversed(list(app_config.items())))
+        second = CloudFormationGenerator().render_stack(reordered, dict(reversed(list(aws_config.items()))))
+        
+        assert first.template_hash == second.template_hash
+        assert first.template_hash == CloudFormationGenerator.template_hash(first.template)
+        assert first.template_body == canonical_json(first.template)
+        assert json.loads(first.template_body) == first.template
+    
+    def test_yaml_export_is_reused(self, app_config, aws_config):
+        """同じテンプレートのYAML出力を再利用するテスト"""
+        from cloudformation_generator import CloudFormationGenerator
+        
+        generator = CloudFormationGenerator()
+        template = generator.generate_complete_stack(app_config, aws_config)
+        
+        first = generator.export_to_yaml(template)
+        second = generator.export_to_yaml(generator.generate_complete_stack(app_config, aws_config))
+        
+        assert first == second == yaml.dump(template, default_flow_style=False, sort_keys=False)
+        assert generator.get_cache_stats()["yaml_hits"] == 1
+    
+    def test_repeated_generation_benchmark(self, aws_config):
+        """多数アプリの繰り返し生成（テンプレート生成 + ハッシュ計算）の性能テスト"""
+        import time
+        import hashlib
+        from cloudformation_generator import CloudFormationGenerator
+        
+        apps = [
+            {"app_name": f"altmx-app-{index}", "port": 3000 + index % 5, "features": ["database"] if index % 3 == 0 else []}
+            for index in range(100)
+        ]
+        rounds = 10
+        
+        def uncached_run():
+            generator = CloudFormationGenerator(fragment_cache_size=0)
+            hashes = []
+            for _ in range(rounds):
+                for app in apps:
+                    template = generator.generate_complete_stack(app, aws_config)
+                    body = json.dumps(template, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+                    hashes.append(hashlib.sha256(body.encode("utf-8")).hexdigest())
+            return hashes
+        
+        def cached_run():
+            generator = CloudFormationGenerator()
+            return [generator.render_stack(app, aws_config).template_hash for _ in range(rounds) for app in apps]
+        
+        start_time = time.perf_counter()
+        expected = uncached_run()
+        uncached_time = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        hashes = cached_run()
+        cached_time = time.perf_counter() - start_time
+        
+        assert hashes == expected
+        assert cached_time < uncached_time, (
+            f"{len(apps)} apps x {rounds}: uncached {uncached_time * 1000:.1f}ms, cached {cached_time * 1000:.1f}ms"
+        )
+
 if __name__ == "__main__":
     # TDD Red Phase
     import subprocess
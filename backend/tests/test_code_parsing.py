@@ -7,8 +7,9 @@ import pytest
 from unittest.mock import Mock, patch
 import ast
 import re
+import time
 from code_generation.response_parser import ResponseParser, CodeBlock, ParsedCode
-from code_generation.file_organizer import FileOrganizer, FileStructure, DependencyGraph
+from code_generation.file_organizer import FileOrganizer, FileStructure, DependencyGraph, ImportGraphIndex
 
 
 class TestCodeBlock:
@@ -61,6 +62,41 @@ class TestCodeBlock:
         assert "typescript" in features  # TypeScript
         assert "tailwind" in features or "component_imports" in features  # UIコンポーネント
 
+    
+    def test_code_block_cached_detection_invalidated_on_change(self):
+        """判定結果キャッシュと変更時の無効化テスト"""
+        block = CodeBlock(content="import React from 'react';\ninterface P { a: string }", filename="")
+        
+        assert block.detect_language() == "typescript"
+        assert "react_imports" in block.get_features()
+        assert block.get_imports() == ("react",)
+        
+        # 返されたfeaturesを変更してもキャッシュには影響しない
+        block.get_features().add("mutated")
+        assert "mutated" not in block.get_features()
+        
+        # content変更でキャッシュが破棄される
+        block.content = ".btn { color: red; }\n.a { margin: 0; }"
+        assert block.detect_language() == "css"
+        assert "react_imports" not in block.get_features()
+        assert block.get_imports() == ()
+        assert block.lines == (".btn { color: red; }", ".a { margin: 0; }")
+        assert block.line_of(block.content.index(".a")) == 2
+        
+        # language指定変更も反映される
+        block.language = "scss"
+        assert block.detect_language() == "scss"
+    
+    def test_code_block_is_slotted(self):
+        """スロット化とキャッシュ非比較テスト"""
+        block = CodeBlock(content="const a = 1;", filename="a.ts")
+        other = CodeBlock(content="const a = 1;", filename="a.ts")
+        
+        assert not hasattr(block, "__dict__")
+        block.detect_language()
+        assert block == other
+        assert "_detected_language" not in repr(block)
+
 
 class TestParsedCode:
     """ParsedCodeクラスのテスト"""
@@ -300,6 +336,84 @@ class TestResponseParser:
         assert "tailwind_css" in parsed.features
         assert "responsive_design" in parsed.features
 
+    
+    def test_extract_code_blocks_dedup_by_content(self, parser):
+        """同一内容ブロックの重複除外テスト"""
+        ai_response = (
+            "**src/Card.tsx**\n```tsx\nexport const Card = () => <div>card</div>;\n```\n\n"
+            "```tsx\nexport const Card = () => <div>card</div>;\n```\n\n"
+            "```tsx\nexport const Card = () => <div>card</div>;\nexport const Wrapper = () => <Card />;\n```\n"
+        )
+        
+        blocks = parser.extract_code_blocks(ai_response)
+        
+        # 完全一致の重複のみ除外（部分文字列を含むだけのブロックは残る）
+        assert len(blocks) == 2
+        assert blocks[0].filename == "src/Card.tsx"
+        assert "Wrapper" in blocks[1].content
+
+
+class TestResponseParserPerformance:
+    """ResponseParserパフォーマンステスト"""
+    
+    def test_large_response_with_many_blocks(self):
+        """数百KB・50ブロック以上のレスポンス解析性能テスト"""
+        parser = ResponseParser()
+        
+        sections = []
+        for i in range(80):
+            body = "\n".join(
+                f"  const value{j} = useState({j}); // className='p-4 flex'"
+                for j in range(120)
+            )
+            sections.append(
+                f"Component {i} explanation text.\n\n"
+                f"**components/Component{i}.tsx**\n"
+                f"```tsx\nimport React, {{ useState }} from 'react';\n"
+                f"import axios from 'axios';\n"
+                f"export const Component{i} = () => {{\n{body}\n}};\n```\n"
+            )
+        ai_response = "\n".join(sections)
+        assert len(ai_response) > 300_000
+        
+        start_time = time.time()
+        parsed = parser.parse_response(ai_response)
+        processing_time = time.time() - start_time
+        
+        assert processing_time < 2.0  # 2秒以内
+        assert len(parsed.code_blocks) == 80
+        assert parsed.code_blocks[79].filename == "components/Component79.tsx"
+        assert "axios" in parsed.dependencies
+        assert "react_hooks" in parsed.features
+    
+    def test_parse_to_result_many_files(self):
+        """多数ファイル応答の解析〜結果生成性能テスト"""
+        parser = ResponseParser()
+        
+        sections = []
+        for i in range(200):
+            body = "\n".join(f"  const item{j}: string = 'value{j}';" for j in range(50))
+            sections.append(
+                f"```tsx\n// components/Widget{i}.tsx\n"
+                f"import React from 'react';\nimport {{ clsx }} from 'clsx';\n"
+                f"export default function Widget{i}() {{\n{body}\n  return <div className='flex'/>;\n}}\n```\n"
+            )
+        ai_response = "\n".join(sections)
+        
+        start_time = time.time()
+        parsed = parser.parse_response(ai_response)
+        typescript_files = parsed.get_files_by_type("typescript")
+        generated = [
+            {"filename": block.filename, "language": block.detect_language(), "features": block.get_features()}
+            for block in parsed.code_blocks
+        ]
+        processing_time = time.time() - start_time
+        
+        assert processing_time < 2.0  # 2秒以内
+        assert len(typescript_files) == 200
+        assert len(generated) == 200
+        assert "clsx" in parsed.dependencies
+
 
 class TestFileOrganizer:
     """FileOrganizerクラスのテスト"""
@@ -439,6 +553,140 @@ class TestDependencyGraph:
         assert build_order.index("Button.tsx") < build_order.index("App.tsx")
         assert build_order.index("utils.ts") < build_order.index("App.tsx")
 
+    
+    def test_detects_every_independent_cycle(self):
+        """独立した複数の循環依存検知テスト"""
+        graph = DependencyGraph()
+        
+        graph.add_dependency("A.tsx", "B.tsx")
+        graph.add_dependency("B.tsx", "A.tsx")
+        graph.add_dependency("C.tsx", "D.tsx")
+        graph.add_dependency("D.tsx", "E.tsx")
+        graph.add_dependency("E.tsx", "C.tsx")
+        graph.add_dependency("F.tsx", "F.tsx")  # 自己参照
+        graph.add_dependency("G.tsx", "A.tsx")  # 循環に入るだけ
+        
+        cycles = graph.detect_circular_dependencies()
+        
+        assert len(cycles) == 3
+        assert ["A.tsx", "B.tsx", "A.tsx"] in cycles
+        assert ["C.tsx", "D.tsx", "E.tsx", "C.tsx"] in cycles
+        assert ["F.tsx", "F.tsx"] in cycles
+        assert all("G.tsx" not in cycle for cycle in cycles)
+    
+    def test_deep_chain_without_recursion_limit(self):
+        """深い依存チェーンでの循環検知テスト（再帰上限を超える深さ）"""
+        graph = DependencyGraph()
+        
+        for i in range(5000):
+            graph.add_dependency(f"m{i}.ts", f"m{i + 1}.ts")
+        
+        assert graph.detect_circular_dependencies() == []
+        build_order = graph.get_build_order()
+        assert build_order[0] == "m5000.ts"
+        assert build_order[-1] == "m0.ts"
+        
+        graph.add_dependency("m5000.ts", "m0.ts")
+        cycles = graph.detect_circular_dependencies()
+        assert len(cycles) == 1
+        assert len(cycles[0]) == 5002
+    
+    def test_reverse_dependency_queries(self):
+        """逆依存（影響範囲）クエリテスト"""
+        graph = DependencyGraph()
+        
+        graph.add_dependency("App.tsx", "Button.tsx")
+        graph.add_dependency("Button.tsx", "types.ts")
+        graph.add_dependency("Form.tsx", "types.ts")
+        graph.add_dependency("App.tsx", "utils.ts")
+        
+        assert graph.get_dependents("types.ts") == {"Button.tsx", "Form.tsx", "App.tsx"}
+        assert graph.get_dependents("utils.ts") == {"App.tsx"}
+        
+        affected = graph.get_affected_files(["Button.tsx"])
+        assert affected == ["Button.tsx", "App.tsx"]
+        
+        # 依存削除でキャッシュが更新される
+        graph.remove_dependencies("App.tsx")
+        assert graph.get_dependents("types.ts") == {"Button.tsx", "Form.tsx"}
+        assert "App.tsx" not in graph.get_build_order()
+
+
+class TestImportGraphIndex:
+    """ImportGraphIndexクラスのテスト"""
+    
+    def test_index_built_once_and_updated_incrementally(self):
+        """インデックス構築と差分更新テスト"""
+        organizer = FileOrganizer()
+        blocks = [
+            CodeBlock(content="import { Card } from './Card';\nimport { api } from './api';", filename="App.tsx"),
+            CodeBlock(content="import { Icon } from './Icon';\nexport const Card = 1;", filename="Card.tsx"),
+            CodeBlock(content="export const api = 1;", filename="api.ts")
+        ]
+        
+        index = organizer.build_import_index(blocks)
+        
+        assert isinstance(index, ImportGraphIndex)
+        assert index.unresolved_imports == {"Card.tsx": ["./Icon"]}
+        assert index.get_affected_files(["api.ts"]) == ["api.ts", "App.tsx"]
+        
+        # 新規ファイル追加で未解決importが解決される
+        affected = index.update_file(CodeBlock(content="export const Icon = 1;", filename="Icon.tsx"))
+        assert affected == ["Icon.tsx", "Card.tsx", "App.tsx"]
+        assert index.unresolved_imports == {}
+        
+        # 既存ファイル更新は当該ファイルのimportだけ再抽出
+        index.update_file(CodeBlock(content="export const Card = 2;", filename="Card.tsx"))
+        assert index.get_affected_files(["Icon.tsx"]) == ["Icon.tsx"]
+    
+    def test_update_file_does_not_recompute_full_build_order(self):
+        """単一ファイル更新で全体のビルド順序を再計算しないテスト"""
+        organizer = FileOrganizer()
+        blocks = [CodeBlock(content="export const base = 1;", filename="base.ts")]
+        for i in range(200):
+            blocks.append(CodeBlock(content=f"import {{ x }} from './base';\nexport const m{i} = 1;", filename=f"m{i}.ts"))
+        blocks.append(CodeBlock(content="import { m0 } from './m0.ts';", filename="App.tsx"))
+        
+        index = organizer.build_import_index(blocks)
+        graph = index.graph
+        computed = []
+        original = graph._compute_build_order
+        graph._compute_build_order = lambda: computed.append(1) or original()
+        graph.get_build_order()
+        assert len(computed) == 1
+        
+        # importが変わらない更新はキャッシュを残す
+        affected = index.update_file(CodeBlock(content="import { x } from './base';\nexport const m5 = 2;", filename="m5.ts"))
+        assert affected == ["m5.ts"]
+        assert len(computed) == 1
+        
+        # importが変わる更新は影響範囲だけを並べる
+        affected = index.update_file(CodeBlock(content="export const m0 = 2;", filename="m0.ts"))
+        assert affected == ["m0.ts", "App.tsx"]
+        assert len(computed) == 1
+        assert index.get_affected_files(["base.ts"])[0] == "base.ts"
+        assert len(computed) == 1
+        
+        # 全体の順序は必要になったときに1回だけ再計算
+        order = graph.get_build_order()
+        assert len(computed) == 2
+        assert order.index("m0.ts") < order.index("App.tsx")
+        assert "m0.ts" not in graph.get_dependents("base.ts")
+        assert order.index("base.ts") < order.index("m1.ts")
+    
+    def test_organize_files_exposes_index(self):
+        """organize_filesでのインデックス公開テスト"""
+        organizer = FileOrganizer()
+        blocks = [
+            CodeBlock(content="import { User } from './types';", filename="App.tsx"),
+            CodeBlock(content="export interface User {}", filename="types.ts")
+        ]
+        
+        structure = organizer.organize_files(blocks)
+        
+        assert structure.import_index is not None
+        assert structure.import_index.graph.get_dependents("types.ts") == {"App.tsx"}
+
 
 # 統合テスト
 class TestCodeParsingIntegration:
@@ -0,0 +1,524 @@
+"""
+Deploy Service Tests
+バックグラウンドデプロイ（非同期ビルド・ログストリーミング・同時実行制限）テスト
+"""
+
+import os
+import sys
+import json
+import time
+import gzip
+import socket
+import asyncio
+import tempfile
+import subprocess
+import pytest
+
+# モジュール読み込み時のシングルトン生成先を一時ディレクトリへ
+os.environ.setdefault("DEPLOY_BASE_PATH", tempfile.mkdtemp())
+
+from pathlib import Path
+
+from deploy_service import DeploymentService
+from deploy_service_simple import SimpleDeploymentService
+from deployment_registry import DeploymentRegistry
+from port_allocator import PortAllocator
+from static_host import StaticHost
+from code_generation.dependency_cache import DependencyCache
+from code_generation.transpiler import TranspileCache
+from code_generation.file_organizer import FileOrganizer
+from code_generation.response_parser import CodeBlock
+
+
+SAMPLE_FILES = [
+    {"filename": "App.tsx", "content": "export default function App() { return null; }"}
+]
+
+
+def command(script: str):
+    """テスト用コマンド（npmの代わりにPythonスクリプトを実行）"""
+    return [sys.executable, "-c", script]
+
+
+@pytest.fixture
+def service():
+    """コマンドを差し替えたデプロイサービス"""
+    service = DeploymentService(base_deploy_path=tempfile.mkdtemp(), max_concurrent_builds=1)
+    service.install_command = command("import time\nfor i in range(3):\n    print(f'install {i}', flush=True)\n    time.sleep(0.1)")
+    service.build_command = command("print('build ok')")
+    service.serve_command = command("import time; time.sleep(30)")
+    service._get_next_available_port = lambda: 3999
+    return service
+
+
+class TestAsyncDeployment:
+    """非同期デプロイテスト"""
+
+    def test_deploy_returns_immediately(self, service):
+        """deployment_idを即座に返し、バックグラウンドで完了するテスト"""
+        async def scenario():
+            start_time = time.time()
+            result = await service.deploy_app("app", SAMPLE_FILES)
+            elapsed = time.time() - start_time
+
+            # ビルド中でもステータス取得はブロックされない
+            await asyncio.sleep(0.05)
+            in_progress = dict(service.get_deployment_status(result["deployment_id"]))
+
+            final = dict(await service.wait_for_deployment(result["deployment_id"], timeout=10))
+            service.stop_deployment(result["deployment_id"])
+            return result, elapsed, in_progress, final
+
+        result, elapsed, in_progress, final = asyncio.run(scenario())
+
+        assert result["status"] == "queued"
+        assert elapsed < 0.1
+        assert in_progress["status"] in ("preparing", "installing", "building")
+        assert final["status"] == "completed"
+        assert final["url"].endswith(":3999/")
+
+    def test_build_output_streamed(self, service):
+        """ビルド出力の行単位ストリーミングテスト"""
+        async def scenario():
+            result = await service.deploy_app("app", SAMPLE_FILES)
+            deployment_id = result["deployment_id"]
+
+            seen = []
+            since = 0
+            while service.get_deployment_status(deployment_id)["status"] in ("queued", "preparing", "installing", "building"):
+                logs = service.get_deployment_logs(deployment_id, since)
+                seen.extend(logs["lines"])
+                since = logs["next"]
+                await asyncio.sleep(0.02)
+            seen.extend(service.get_deployment_logs(deployment_id, since)["lines"])
+
+            await service.wait_for_deployment(deployment_id, timeout=10)
+            service.stop_deployment(deployment_id)
+            return seen
+
+        seen = asyncio.run(scenario())
+
+        assert seen == ["install 0", "install 1", "install 2", "build ok"]
+
+    def test_concurrent_builds_bounded(self, service):
+        """同時ビルド数制限テスト"""
+        async def scenario():
+            first = await service.deploy_app("first", SAMPLE_FILES)
+            second = await service.deploy_app("second", SAMPLE_FILES)
+            await asyncio.sleep(0.1)
+            statuses = (
+                service.get_deployment_status(first["deployment_id"])["status"],
+                service.get_deployment_status(second["deployment_id"])["status"]
+            )
+            for result in (first, second):
+                await service.wait_for_deployment(result["deployment_id"], timeout=10)
+                service.stop_deployment(result["deployment_id"])
+            return statuses
+
+        first_status, second_status = asyncio.run(scenario())
+
+        assert first_status in ("preparing", "installing")
+        assert second_status == "queued"
+
+    def test_failed_and_timed_out_builds(self, service):
+        """ビルド失敗・タイムアウトテスト"""
+        async def scenario():
+            service.build_command = command("import sys; print('type error'); sys.exit(1)")
+            failed = await service.deploy_app("failed", SAMPLE_FILES)
+            failed_status = await service.wait_for_deployment(failed["deployment_id"], timeout=10)
+
+            service.build_command = command("import time; time.sleep(10)")
+            service.build_timeout = 0.2
+            timed_out = await service.deploy_app("slow", SAMPLE_FILES)
+            timed_out_status = await service.wait_for_deployment(timed_out["deployment_id"], timeout=10)
+            return failed_status, timed_out_status
+
+        failed_status, timed_out_status = asyncio.run(scenario())
+
+        assert failed_status["status"] == "failed"
+        assert "type error" in failed_status["error"]
+        assert timed_out_status["status"] == "failed"
+        assert "timed out" in timed_out_status["error"]
+
+
+class TestDependencyCache:
+    """node_modules 共有キャッシュテスト"""
+
+    def test_key_uses_normalized_dependency_set(self, tmp_path):
+        """依存集合のみでキーが決まるテスト"""
+        cache = DependencyCache(str(tmp_path))
+        base = {"name": "a", "dependencies": {"react": "^18.2.0", "react-dom": "^18.2.0"}}
+        reordered = {"name": "b", "scripts": {"build": "x"}, "dependencies": {"react-dom": "^18.2.0", "react": "^18.2.0"}}
+        changed = {"name": "a", "dependencies": {"react": "^18.3.0", "react-dom": "^18.2.0"}}
+
+        assert cache.key_for(base) == cache.key_for(reordered)
+        assert cache.key_for(base) != cache.key_for(changed)
+
+        # FileOrganizer が生成した package.json の内容もそのまま使える
+        generated = FileOrganizer()._generate_package_json([CodeBlock(content="import React from 'react';", filename="App.tsx")])
+        assert cache.key_for(generated.content) == cache.key_for(json.loads(generated.content))
+
+    def test_populate_and_materialize_with_hardlinks(self, tmp_path):
+        """登録・ハードリンク展開テスト"""
+        cache = DependencyCache(str(tmp_path / "cache"))
+        source = tmp_path / "first"
+        (source / "node_modules" / "react").mkdir(parents=True)
+        (source / "node_modules" / "react" / "index.js").write_text("module.exports = {};")
+        (source / "node_modules" / ".cache").mkdir()
+        (source / "node_modules" / ".cache" / "build.tmp").write_text("x")
+        key = cache.key_for({"dependencies": {"react": "^18.2.0"}})
+
+        assert cache.materialize(key, tmp_path / "empty") is False
+        assert cache.populate(key, source) is True
+        assert cache.populate(key, source) is False
+
+        target = tmp_path / "second"
+        target.mkdir()
+        assert cache.materialize(key, target) is True
+
+        restored = target / "node_modules" / "react" / "index.js"
+        assert restored.read_text() == "module.exports = {};"
+        assert restored.stat().st_ino == (source / "node_modules" / "react" / "index.js").stat().st_ino
+        assert not (target / "node_modules" / ".cache").exists()
+        assert cache.get_stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+    def test_prune_keeps_recent_entries(self, tmp_path):
+        """古いエントリの削除テスト"""
+        cache = DependencyCache(str(tmp_path / "cache"), max_entries=2)
+        for version in range(3):
+            project = tmp_path / f"project{version}"
+            (project / "node_modules").mkdir(parents=True)
+            cache.populate(cache.key_for({"dependencies": {"react": f"{version}"}}), project)
+            time.sleep(0.01)
+
+        assert cache.get_stats()["entries"] == 2
+        assert not cache.has(cache.key_for({"dependencies": {"react": "0"}}))
+
+    def test_prune_skips_entry_being_materialized(self, tmp_path, monkeypatch):
+        """展開中のエントリは他のビルドの prune で消されないテスト"""
+        cache = DependencyCache(str(tmp_path / "cache"), max_entries=2)
+        keys = []
+        for version in range(2):
+            project = tmp_path / f"project{version}"
+            (project / "node_modules" / "react").mkdir(parents=True)
+            (project / "node_modules" / "react" / "index.js").write_text(f"// {version}")
+            keys.append(cache.key_for({"dependencies": {"react": f"{version}"}}))
+            cache.populate(keys[-1], project)
+            time.sleep(0.01)
+
+        original_link_tree = DependencyCache._link_tree
+        newer = tmp_path / "project2"
+        (newer / "node_modules").mkdir(parents=True)
+
+        def link_while_another_build_populates(source, dest):
+            if source.parent.name == keys[0] and not cache.has(cache.key_for({"dependencies": {"react": "2"}})):
+                # 最古のエントリを展開している間に、別のビルドが新しいエントリを登録して prune する
+                cache.populate(cache.key_for({"dependencies": {"react": "2"}}), newer)
+            original_link_tree(source, dest)
+
+        monkeypatch.setattr(cache, "_link_tree", link_while_another_build_populates)
+        target = tmp_path / "target"
+        target.mkdir()
+
+        assert cache.materialize(keys[0], target) is True
+        assert (target / "node_modules" / "react" / "index.js").read_text() == "// 0"
+        assert cache.has(keys[0])
+        assert not cache.has(keys[1])
+        assert cache.get_stats()["entries"] == 2
+        assert not list((tmp_path / "cache").glob(".trash-*"))
+
+    def test_repeat_deploy_skips_install(self, service):
+        """同一依存集合の再デプロイでnpm installを省略するテスト"""
+        counter = Path(service.base_deploy_path) / "installs.txt"
+        service.install_command = command(
+            "import os\n"
+            "os.makedirs('node_modules/react', exist_ok=True)\n"
+            "open('node_modules/react/index.js', 'w').write('module.exports = {};')\n"
+            f"open({str(counter)!r}, 'a').write('x')\n"
+            "print('installed')"
+        )
+
+        async def scenario():
+            results = []
+            for _ in range(2):
+                result = await service.deploy_app("app", SAMPLE_FILES)
+                status = dict(await service.wait_for_deployment(result["deployment_id"], timeout=10))
+                service.stop_deployment(result["deployment_id"])
+                results.append(status)
+            return results
+
+        first, second = asyncio.run(scenario())
+
+        assert first["dependency_cache"] == "miss"
+        assert second["dependency_cache"] == "hit"
+        assert second["status"] == "completed"
+        assert counter.read_text() == "x"
+        assert (Path(second["project_path"]) / "node_modules" / "react" / "index.js").exists()
+
+
+def free_port_range(size: int) -> range:
+    """テスト用に空いている連続ポート範囲を探す"""
+    for start in range(40000, 60000, size):
+        ports = range(start, start + size)
+        if all(PortAllocator([port]).get_stats()["free"] == 1 for port in ports):
+            return ports
+    pytest.skip("no free port range")
+
+
+class TestPortAllocator:
+    """ポートアロケーターテスト"""
+
+    def test_existing_listener_detected_at_startup(self):
+        """起動時に既存リスナーのポートを除外するテスト"""
+        ports = free_port_range(3)
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as listener:
+            listener.bind(("0.0.0.0", ports[0]))
+            listener.listen()
+
+            allocator = PortAllocator(ports)
+
+            assert allocator.get_stats() == {"free": 2, "allocated": 0, "busy": 1}
+            assert allocator.allocate() == ports[1]
+
+    def test_allocate_release_and_reuse(self):
+        """割り当て・返却・再利用テスト"""
+        ports = free_port_range(2)
+        allocator = PortAllocator(ports)
+
+        first = allocator.allocate()
+        second = allocator.allocate()
+        with pytest.raises(RuntimeError):
+            allocator.allocate()
+
+        allocator.release(first)
+        allocator.release(first)  # 重複返却は無視
+        assert allocator.get_stats() == {"free": 1, "allocated": 1, "busy": 0}
+        assert allocator.allocate() == first
+        assert second != first
+
+    def test_no_subprocess_spawned(self, monkeypatch):
+        """ポート確認でサブプロセスを起動しないテスト"""
+        def forbidden(*args, **kwargs):
+            raise AssertionError("subprocess spawned")
+
+        monkeypatch.setattr(subprocess, "run", forbidden)
+        monkeypatch.setattr(subprocess, "Popen", forbidden)
+
+        allocator = PortAllocator(free_port_range(5))
+        ports = [allocator.allocate() for _ in range(5)]
+
+        assert len(set(ports)) == 5
+
+    def test_stop_deployment_returns_port(self):
+        """stop_deployment でポートが空きリストへ戻るテスト"""
+        service = DeploymentService(base_deploy_path=tempfile.mkdtemp())
+        service.port_allocator = PortAllocator(free_port_range(1))
+        service.install_command = command("print('installed')")
+        service.build_command = command("print('build ok')")
+        service.serve_command = command("import time; time.sleep(30)")
+
+        async def scenario():
+            first = await service.deploy_app("first", SAMPLE_FILES)
+            first_status = dict(await service.wait_for_deployment(first["deployment_id"], timeout=10))
+
+            # 範囲が1ポートのみのため、返却前の2件目は失敗する
+            blocked = await service.deploy_app("blocked", SAMPLE_FILES)
+            blocked_status = dict(await service.wait_for_deployment(blocked["deployment_id"], timeout=10))
+
+            service.stop_deployment(first["deployment_id"])
+            second = await service.deploy_app("second", SAMPLE_FILES)
+            second_status = dict(await service.wait_for_deployment(second["deployment_id"], timeout=10))
+            service.stop_deployment(second["deployment_id"])
+            return first_status, blocked_status, second_status
+
+        first_status, blocked_status, second_status = asyncio.run(scenario())
+
+        assert first_status["status"] == "completed"
+        assert blocked_status["status"] == "failed"
+        assert second_status["status"] == "completed"
+        assert second_status["port"] == first_status["port"]
+
+
+class TestStaticHost:
+    """シンプルデプロイ静的ホストテスト"""
+
+    @pytest.fixture
+    def site_root(self, tmp_path):
+        """ビルド済みアプリ相当のディレクトリ"""
+        root = tmp_path / "site"
+        (root / "assets").mkdir(parents=True)
+        (root / "index.html").write_text("<html><body><div id='root'></div></body></html>")
+        (root / "assets" / "index-3f2a9c1b.js").write_text("console.log('app');\n" * 200)
+        (root / "logo.png").write_bytes(b"\x89PNG" + b"\0" * 2000)
+        return root
+
+    def test_serve_with_cache_headers(self, site_root):
+        """パスプレフィックス配信・Cache-Controlテスト"""
+        host = StaticHost({"base_url": "http://localhost:8000/apps"})
+        url = host.mount("dep_1", site_root)
+
+        index = host.open_file("dep_1", "")
+        asset = host.open_file("dep_1", "assets/index-3f2a9c1b.js")
+        image = host.open_file("dep_1", "logo.png")
+
+        assert url == "http://localhost:8000/apps/dep_1/"
+        assert index["path"] == str(site_root / "index.html")
+        assert index["headers"]["Cache-Control"] == "no-cache"
+        assert "immutable" in asset["headers"]["Cache-Control"]
+        assert image["headers"]["Cache-Control"] == "public, max-age=300"
+        assert "Vary" not in image["headers"]
+
+    def test_precompressed_and_conditional(self, site_root):
+        """事前圧縮版の選択・304テスト"""
+        host = StaticHost()
+        host.mount("dep_1", site_root)
+
+        result = host.open_file("dep_1", "assets/index-3f2a9c1b.js", accept_encoding="gzip, deflate")
+        identity = host.open_file("dep_1", "assets/index-3f2a9c1b.js", accept_encoding="gzip;q=0")
+        not_modified = host.open_file("dep_1", "assets/index-3f2a9c1b.js", if_none_match=identity["headers"]["ETag"])
+
+        assert result["content_encoding"] == "gzip"
+        assert result["headers"]["Vary"] == "Accept-Encoding"
+        assert gzip.decompress(Path(result["path"]).read_bytes()) == (site_root / "assets" / "index-3f2a9c1b.js").read_bytes()
+        assert result["headers"]["ETag"] != identity["headers"]["ETag"]
+        assert identity["content_encoding"] is None
+        assert not_modified["status_code"] == 304
+
+    def test_spa_fallback_and_traversal(self, site_root):
+        """SPAフォールバック・パストラバーサル拒否テスト"""
+        host = StaticHost()
+        host.mount("dep_1", site_root)
+
+        assert host.open_file("dep_1", "todos/42")["path"] == str(site_root / "index.html")
+        assert host.open_file("dep_1", "missing.js")["status_code"] == 404
+        assert host.open_file("dep_1", "../site/index.html")["status_code"] == 404
+        assert host.open_file("dep_1", ".static/index.html.gz")["status_code"] == 404
+        assert host.open_file("unknown", "")["status_code"] == 404
+
+    def test_host_based_routing(self, site_root):
+        """ホスト名からのデプロイ特定テスト"""
+        host = StaticHost({"host_suffix": "apps.example.com"})
+        host.mount("dep_ab12", site_root)
+
+        assert host.site_for_host("dep_ab12.apps.example.com:8000") == "dep_ab12"
+        assert host.site_for_host("DEP_AB12.apps.example.com") == "dep_ab12"
+        assert host.site_for_host("other.apps.example.com") is None
+        assert host.site_for_host("apps.example.com") is None
+        assert StaticHost().site_for_host("dep_ab12.apps.example.com") is None
+
+    def test_many_deployments_without_processes(self, monkeypatch):
+        """多数のデプロイをプロセス・ポートなしで配信するテスト"""
+        def forbidden(*args, **kwargs):
+            raise AssertionError("subprocess spawned")
+
+        monkeypatch.setattr(subprocess, "run", forbidden)
+        monkeypatch.setattr(subprocess, "Popen", forbidden)
+
+        service = SimpleDeploymentService(base_deploy_path=tempfile.mkdtemp())
+        service._transpile_cache = type("Unavailable", (), {"available": False})()
+
+        async def scenario():
+            results = []
+            for index in range(150):
+                results.append(await service.deploy_simple_app(f"app{index}", SAMPLE_FILES))
+            return results
+
+        results = asyncio.run(scenario())
+
+        assert all(result["status"] == "completed" for result in results)
+        assert service.static_host.get_stats()["sites"] == 150
+        assert service.static_host.open_file(results[-1]["deployment_id"], "")["status_code"] == 200
+
+        assert service.stop_deployment(results[0]["deployment_id"]) is True
+        assert service.static_host.open_file(results[0]["deployment_id"], "")["status_code"] == 404
+
+
+    def test_simple_deploy_uses_compiled_bundle(self, tmp_path):
+        """変換済みバンドルでの配信と、exportのないApp.tsxのBabelフォールバックテスト"""
+        class Backend:
+            name = "stub"
+
+            def transform(self, source, loader):
+                return {"code": "var __altmx_module = (function() { return {}; })();", "warnings": []}
+
+            def close(self):
+                pass
+
+        service = SimpleDeploymentService(base_deploy_path=str(tmp_path))
+        service._transpile_cache = TranspileCache(str(tmp_path / ".transpile_cache"), backend=Backend())
+
+        compiled = asyncio.run(service.deploy_simple_app("app", SAMPLE_FILES))
+        fallback = asyncio.run(service.deploy_simple_app("plain", [
+            {"filename": "App.tsx", "content": "const App = () => <div />;"}
+        ]))
+
+        compiled_dir = Path(service.get_deployment_status(compiled["deployment_id"])["project_path"])
+        fallback_dir = Path(service.get_deployment_status(fallback["deployment_id"])["project_path"])
+        assert (compiled_dir / "app.js").exists()
+        assert "__altmx_module.default || __altmx_module.App" in (compiled_dir / "index.html").read_text()
+        assert not (fallback_dir / "app.js").exists()
+        assert "root.render(<App />)" in (fallback_dir / "index.html").read_text()
+
+
+class TestDeploymentRegistry:
+    """デプロイメントレジストリ・再起動時の突き合わせテスト"""
+
+    def test_save_and_indexed_lookup(self, tmp_path):
+        """登録・更新・ステータス絞り込みテスト"""
+        registry = DeploymentRegistry(str(tmp_path / "deployments.db"))
+        registry.save("ec2", {"id": "dep_1", "status": "building", "created_at": "2024-01-01T00:00:00"})
+        registry.save("ec2", {"id": "dep_2", "status": "completed", "port": 3001, "created_at": "2024-01-02T00:00:00"})
+        registry.save("simple", {"id": "dep_3", "status": "completed", "created_at": "2024-01-03T00:00:00"})
+        registry.save("ec2", {"id": "dep_1", "status": "completed", "port": 3000, "created_at": "2024-01-01T00:00:00"})
+
+        assert registry.get("dep_1")["port"] == 3000
+        assert [d["id"] for d in registry.list("ec2")] == ["dep_1", "dep_2"]
+        assert [d["id"] for d in registry.list("ec2", ["completed"])] == ["dep_1", "dep_2"]
+        assert registry.list("ec2", ["building"]) == []
+        assert registry.delete("dep_3") is True
+        assert registry.get("dep_3") is None
+
+    def test_restart_adopts_live_and_reaps_dead(self, tmp_path):
+        """再起動時に稼働中プロセスを引き継ぎ、終了済み・ビルド途中を片付けるテスト"""
+        first = DeploymentService(base_deploy_path=str(tmp_path))
+        first.install_command = command("print('installed')")
+        first.build_command = command("print('build ok')")
+        first.serve_command = command("import time; time.sleep(30)")
+
+        async def scenario():
+            result = await first.deploy_app("app", SAMPLE_FILES)
+            return dict(await first.wait_for_deployment(result["deployment_id"], timeout=10))
+
+        live = asyncio.run(scenario())
+
+        exited = subprocess.Popen(command("pass"))
+        exited.wait()
+        first.registry.save("ec2", {"id": "dep_dead", "status": "completed", "port": 3098,
+                                    "process_pid": exited.pid, "created_at": "2024-01-01T00:00:00"})
+        first.registry.save("ec2", {"id": "dep_building", "status": "building", "created_at": "2024-01-01T00:00:01"})
+
+        # バックエンド再起動
+        second = DeploymentService(base_deploy_path=str(tmp_path))
+
+        assert second.get_deployment_status(live["id"])["status"] == "completed"
+        assert second.port_allocator.reserve(live["port"]) is False
+        assert second.get_deployment_status("dep_dead")["status"] == "stopped"
+        assert second.get_deployment_status("dep_building")["status"] == "failed"
+        assert [d["id"] for d in second.list_deployments("completed")] == [live["id"]]
+
+        # 引き継いだプロセスを新しいインスタンスから停止できる
+        assert second.stop_deployment(live["id"]) is True
+        time.sleep(0.2)
+        assert not DeploymentRegistry.is_process_alive(live["process_pid"], live["project_path"])
+        assert second.registry.get(live["id"])["status"] == "stopped"
+
+    def test_simple_deployments_remounted(self, tmp_path):
+        """シンプルデプロイの再起動後の配信再開テスト"""
+        first = SimpleDeploymentService(base_deploy_path=str(tmp_path))
+        first._transpile_cache = type("Unavailable", (), {"available": False})()
+        result = asyncio.run(first.deploy_simple_app("app", SAMPLE_FILES))
+
+        second = SimpleDeploymentService(base_deploy_path=str(tmp_path))
+
+        assert second.get_deployment_status(result["deployment_id"])["status"] == "completed"
+        assert second.static_host.open_file(result["deployment_id"], "")["status_code"] == 200
@@ -289,6 +289,146 @@ class TestDeploymentMonitoring:
         assert 'https://' in completion_display
         assert '7分23秒' in completion_display
 
+class TestDeploymentEventHub:
+    """デプロイイベント配信ハブのテスト"""
+    
+    def test_async_listener_does_not_block_updates(self):
+        """遅い非同期リスナーが update_progress を待たせないテスト"""
+        from deployment_monitoring import DeploymentMonitor
+        
+        async def run():
+            monitor = DeploymentMonitor()
+            monitor.start_monitoring("demo-12345", "altmx-demo-stack")
+            received = []
+            
+            async def slow_listener(update):
+                await asyncio.sleep(0.05)
+                received.append(update['progress'])
+            
+            monitor.add_progress_listener("demo-12345", slow_listener)
+            
+            start = time.perf_counter()
+            for progress in (20, 60, 90):
+                monitor.update_progress("demo-12345", {'status': 'CREATE_IN_PROGRESS', 'progress': progress})
+            elapsed = time.perf_counter() - start
+            
+            monitor.mark_deployment_complete("demo-12345", {'status': 'CREATE_COMPLETE'})
+            await asyncio.gather(*monitor._listener_tasks)
+            return elapsed, received, monitor.get_stats()
+        
+        elapsed, received, stats = asyncio.run(run())
+        
+        assert elapsed < 0.05
+        assert received == [20, 60, 90]
+        assert stats['async_listeners'] == 0
+    
+    def test_bounded_queue_drops_oldest(self):
+        """キュー上限を超えたら古いイベントから捨てるテスト"""
+        from deployment_monitoring import DeploymentMonitor
+        
+        async def run():
+            monitor = DeploymentMonitor()
+            monitor.start_monitoring("demo-12345", "altmx-demo-stack")
+            subscription = monitor.subscribe("demo-12345", max_queue_size=3)
+            
+            for progress in range(10, 60, 10):
+                monitor.update_progress("demo-12345", {'progress': progress})
+            
+            events = [subscription._queue.get_nowait() for _ in range(3)]
+            return subscription.dropped, events
+        
+        dropped, events = asyncio.run(run())
+        
+        # スナップショット + 5件のうち古い3件を破棄
+        assert dropped == 3
+        assert [event['data']['progress'] for event in events] == [30, 40, 50]
+    
+    def test_completion_cleans_up_listeners(self):
+        """完了時にリスナーと購読が削除されるテスト"""
+        from deployment_monitoring import DeploymentMonitor
+        
+        async def run():
+            monitor = DeploymentMonitor()
+            monitor.start_monitoring("demo-12345", "altmx-demo-stack")
+            monitor.add_progress_listener("demo-12345", lambda update: None)
+            monitor.add_error_listener("demo-12345", lambda update: None)
+            subscription = monitor.subscribe("demo-12345")
+            
+            monitor.update_progress("demo-12345", {'progress': 50})
+            monitor.mark_deployment_complete("demo-12345", {'status': 'CREATE_COMPLETE'})
+            
+            events = [event async for event in subscription]
+            return events, monitor.get_stats()
+        
+        events, stats = asyncio.run(run())
+        
+        assert [event['type'] for event in events] == ['snapshot', 'progress', 'complete']
+        assert stats['listeners'] == 0
+        assert stats['hub']['subscribers'] == 0
+        assert stats['active'] == 0
+    
+    def test_listener_after_completion_is_not_registered(self):
+        """終了後に追加したリスナーが購読・タスクを残さないテスト"""
+        from deployment_monitoring import DeploymentMonitor
+        
+        async def run():
+            monitor = DeploymentMonitor()
+            monitor.start_monitoring("demo-12345", "altmx-demo-stack")
+            monitor.mark_deployment_complete("demo-12345", {'status': 'CREATE_COMPLETE'})
+            
+            async def on_progress(update):
+                pass
+            
+            monitor.add_progress_listener("demo-12345", on_progress)
+            monitor.add_completion_listener("demo-12345", lambda data: None)
+            await asyncio.sleep(0)
+            return monitor.get_stats(), len(monitor._listener_tasks)
+        
+        stats, tasks = asyncio.run(run())
+        
+        assert stats['listeners'] == 0
+        assert stats['hub']['subscribers'] == 0
+        assert tasks == 0
+    
+    def test_late_subscriber_receives_snapshot(self):
+        """途中参加・終了後の購読者が状態スナップショットを受け取るテスト"""
+        from deployment_monitoring import DeploymentMonitor
+        
+        async def run():
+            monitor = DeploymentMonitor()
+            monitor.start_monitoring("demo-12345", "altmx-demo-stack")
+            monitor.update_progress("demo-12345", {'progress_percentage': 70, 'current_phase': 'ALB_CREATION'})
+            
+            live = monitor.subscribe("demo-12345")
+            first = await live.get()
+            
+            monitor.mark_deployment_complete("demo-12345", {'status': 'CREATE_COMPLETE', 'progress_percentage': 100})
+            late = monitor.subscribe("demo-12345")
+            return first, [event async for event in late]
+        
+        first, late_events = asyncio.run(run())
+        
+        assert first['type'] == 'snapshot'
+        assert first['data']['progress_percentage'] == 70
+        assert first['data']['current_phase'] == 'ALB_CREATION'
+        assert len(late_events) == 1
+        assert late_events[0]['data']['status'] == 'CREATE_COMPLETE'
+    
+    def test_finished_states_are_pruned(self):
+        """終了したデプロイの状態が上限件数まで保持されるテスト"""
+        from deployment_monitoring import DeploymentMonitor
+        
+        monitor = DeploymentMonitor(max_finished=2)
+        for index in range(4):
+            monitor.start_monitoring(f"demo-{index}", "altmx-demo-stack")
+            monitor.mark_deployment_complete(f"demo-{index}", {'status': 'CREATE_COMPLETE'})
+        monitor.start_monitoring("demo-active", "altmx-demo-stack")
+        
+        assert monitor.get_deployment_status("demo-0")['success'] is False
+        assert monitor.get_deployment_status("demo-3")['status'] == 'CREATE_COMPLETE'
+        assert monitor.get_stats()['deployments'] == 3
+        assert monitor.get_stats()['active'] == 1
+
 if __name__ == "__main__":
     # TDD Red Phase
     import subprocess
@@ -7,7 +7,9 @@ import pytest
 import os
 import time
 import tempfile
+import threading
 import shutil
+import uuid
 from pathlib import Path
 from unittest.mock import Mock, patch
 from typing import List, Dict, Any
@@ -15,6 +17,9 @@ from typing import List, Dict, Any
 # 実装済みモジュールインポート
 from code_generation.file_manager import FileManager, FileEntry, PreviewSession
 from code_generation.preview_server import PreviewServer
+from code_generation.blob_store import BlobStore
+from code_generation.hot_reload import HotReloadHub
+from code_generation.transpiler import TranspileCache, TranspileError, EsbuildCli, EsbuildWorker
 
 
 @pytest.fixture
@@ -187,6 +192,233 @@ class TestFileManager:
         assert file_manager.get_session(expired_session) is None
         assert file_manager.get_session(normal_session) is not None
 
+    
+    def test_identical_files_share_blobs(self, file_manager, sample_files):
+        """セッション間の同一ファイル共有テスト"""
+        first = file_manager.create_session()
+        second = file_manager.create_session()
+        file_manager.save_files(first, sample_files)
+        file_manager.save_files(second, sample_files)
+        
+        first_entries = {f.filename: f for f in file_manager.get_session(first).files}
+        second_entries = {f.filename: f for f in file_manager.get_session(second).files}
+        
+        for filename, entry in first_entries.items():
+            assert entry.content_hash == second_entries[filename].content_hash
+            assert file_manager.blob_store.get_refcount(entry.content_hash) == 2
+        
+        # 実体は1セット分のみ
+        stats = file_manager.get_stats()
+        expected = sum(len(f["content"].encode('utf-8')) for f in sample_files)
+        assert stats["blob_store"]["blob_count"] == len(sample_files)
+        assert stats["disk_usage_bytes"] == expected
+    
+    def test_blobs_released_on_session_cleanup(self, file_manager, sample_files):
+        """セッション削除時の参照カウント返却テスト"""
+        first = file_manager.create_session()
+        second = file_manager.create_session()
+        file_manager.save_files(first, sample_files)
+        file_manager.save_files(second, sample_files)
+        digest = file_manager.get_session(first).files[0].content_hash
+        blob_path = file_manager.blob_store.path_for(digest)
+        
+        file_manager.delete_session(first)
+        assert blob_path.exists()
+        assert file_manager.blob_store.get_refcount(digest) == 1
+        
+        file_manager.delete_session(second)
+        assert not blob_path.exists()
+        assert file_manager.get_stats()["blob_store"]["blob_count"] == 0
+    
+    def test_resave_replaces_manifest_entry(self, file_manager, sample_files):
+        """同名ファイル再保存時のマニフェスト置換テスト"""
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, sample_files)
+        old_hash = file_manager.get_session(session_id).files[0].content_hash
+        
+        file_manager.save_files(session_id, [
+            {"filename": "App.tsx", "content": "export default () => null;", "language": "typescript"}
+        ])
+        
+        session = file_manager.get_session(session_id)
+        assert len(session.files) == len(sample_files)
+        app_entry = next(f for f in session.files if f.filename == "App.tsx")
+        assert app_entry.content == "export default () => null;"
+        assert file_manager.blob_store.get_refcount(old_hash) == 0
+    
+    def test_file_entry_does_not_hold_content(self, file_manager, sample_files):
+        """ファイルエントリが内容をメモリ保持しないことのテスト"""
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, sample_files)
+        
+        entry = file_manager.get_session(session_id).files[0]
+        assert "content" not in vars(entry)
+        assert entry.content == sample_files[0]["content"]
+
+
+    def test_expiry_is_event_driven(self, temp_dir, sample_files):
+        """期限到来時の自動削除テスト（定期全件走査なし）"""
+        manager = FileManager({"temp_root": temp_dir, "default_ttl": 1, "expiry_resolution": 0.1})
+        session_id = manager.create_session()
+        manager.save_files(session_id, sample_files)
+        
+        deadline = time.time() + 5
+        while session_id in manager._sessions and time.time() < deadline:
+            time.sleep(0.05)
+        
+        assert session_id not in manager._sessions
+        assert not (Path(temp_dir) / session_id).exists()
+        assert manager.get_stats()["total_files"] == 0
+    
+    def test_expiry_heap_skips_stale_entries(self, file_manager, sample_files):
+        """削除済み・期限延長済みセッションの期限エントリ読み捨てテスト"""
+        deleted = file_manager.create_session()
+        extended = file_manager.create_session()
+        file_manager.delete_session(deleted)
+        
+        session = file_manager.get_session(extended)
+        session.created_at = time.time() - 7200
+        session.ttl = 3 * 3600  # 期限延長
+        
+        assert file_manager.cleanup_expired() == 0
+        assert file_manager.get_session(extended) is not None
+    
+    def test_startup_reclaims_crashed_sessions(self, temp_dir, sample_files):
+        """起動時に前回プロセスの期限切れセッションとそのblobを回収し、有効なセッションは残すテスト"""
+        config = {"temp_root": temp_dir, "orphan_grace": 60}
+        crashed = FileManager(config)
+        expired_id = crashed.create_session(ttl=1)
+        crashed.save_files(expired_id, sample_files[:1])
+        live_id = crashed.create_session()
+        crashed.save_files(live_id, sample_files[1:2])
+        crashed._expiry.stop()
+        
+        # 期限切れから猶予時間を過ぎた状態にする
+        expired_dir = Path(temp_dir) / expired_id
+        old = time.time() - 600
+        os.utime(expired_dir / ".lease", (old, old))
+        expired_blob = crashed.blob_store.path_for(crashed._sessions[expired_id].files[0].content_hash)
+        os.utime(expired_blob, (old, old))
+        legacy_dir = Path(temp_dir) / str(uuid.uuid4())
+        legacy_dir.mkdir()
+        os.utime(legacy_dir, (old - 3600, old - 3600))
+        
+        restarted = FileManager(config)
+        
+        assert not expired_dir.exists()
+        assert not legacy_dir.exists()
+        assert not expired_blob.exists()
+        live_file = Path(temp_dir) / live_id / sample_files[1]["filename"]
+        assert live_file.read_text(encoding="utf-8") == sample_files[1]["content"]
+        assert (Path(temp_dir) / ".blobs").exists()
+        assert restarted.reclaim_orphans() == {"sessions": 0, "blob_files": 0}
+    
+    def test_stats_maintained_incrementally(self, file_manager, sample_files):
+        """統計情報の増分集計テスト"""
+        first = file_manager.create_session()
+        second = file_manager.create_session()
+        file_manager.save_files(first, sample_files)
+        file_manager.save_files(second, sample_files)
+        file_manager.save_files(first, [{"filename": "App.tsx", "content": "x", "language": "tsx"}])
+        
+        single_copy = sum(len(f["content"].encode('utf-8')) for f in sample_files)
+        stats = file_manager.get_stats()
+        assert stats["total_files"] == 6
+        assert stats["total_size_bytes"] == single_copy * 2 - len(sample_files[0]["content"]) + 1
+        
+        file_manager.delete_session(first)
+        stats = file_manager.get_stats()
+        assert stats["total_files"] == 3
+        assert stats["total_size_bytes"] == single_copy
+        assert stats["blob_store"]["total_references"] == 3
+
+
+class TestBlobStore:
+    """BlobStoreテスト"""
+    
+    def test_put_is_idempotent_and_atomic(self, temp_dir):
+        """重複書き込み排除と一時ファイル非残存テスト"""
+        store = BlobStore(os.path.join(temp_dir, "blobs"))
+        
+        first = store.put(b"hello")
+        second = store.put(b"hello")
+        
+        assert first == second == BlobStore.hash_bytes(b"hello")
+        assert store.read_bytes(first) == b"hello"
+        assert store.get_refcount(first) == 2
+        assert list((Path(temp_dir) / "blobs" / "tmp").iterdir()) == []
+    
+    def test_shared_root_keeps_other_instances_blobs(self, temp_dir):
+        """同じルートを共有する別インスタンスの起動でblob・一時ファイルを消さないテスト"""
+        root = os.path.join(temp_dir, "blobs")
+        store = BlobStore(root)
+        digest = store.put(b"shared")
+        in_flight = Path(root) / "tmp" / "other-worker.tmp"
+        in_flight.write_bytes(b"partial")
+        
+        BlobStore(root)
+        
+        assert store.read_bytes(digest) == b"shared"
+        assert in_flight.exists()
+    
+    def test_reclaim_orphans_respects_grace_and_links(self, temp_dir):
+        """古く・どこからもリンクされていないblobと一時ファイルだけを回収するテスト"""
+        root = os.path.join(temp_dir, "blobs")
+        crashed = BlobStore(root)
+        orphan = crashed.put(b"orphan")
+        linked = crashed.put(b"linked")
+        crashed.link_into(linked, Path(temp_dir) / "linked.txt")
+        stale_tmp = Path(root) / "tmp" / "crashed-write.tmp"
+        stale_tmp.write_bytes(b"partial")
+        old = time.time() - 600
+        for path in (crashed.path_for(orphan), crashed.path_for(linked), stale_tmp):
+            os.utime(path, (old, old))
+        
+        store = BlobStore(root)
+        recent = store.put(b"recent")
+        other = Path(root) / "tmp" / "other-worker.tmp"
+        other.write_bytes(b"partial")
+        
+        assert store.reclaim_orphans(min_age=300) == 2
+        assert not crashed.path_for(orphan).exists()
+        assert not stale_tmp.exists()
+        assert store.read_bytes(linked) == b"linked"
+        assert store.read_bytes(recent) == b"recent"
+        assert other.exists()
+    
+    def test_put_rewrites_missing_blob(self, temp_dir):
+        """参照中のblobが外部で削除されていても put で書き直すテスト"""
+        store = BlobStore(os.path.join(temp_dir, "blobs"))
+        digest = store.put(b"content")
+        store.path_for(digest).unlink()
+        
+        store.put(b"content")
+        
+        assert store.read_bytes(digest) == b"content"
+    
+    def test_put_during_last_release(self, temp_dir, monkeypatch):
+        """最後の release の削除中に同じ内容を put しても、blobが残るテスト"""
+        store = BlobStore(os.path.join(temp_dir, "blobs"))
+        digest = store.put(b"shared content")
+        original_unlink = Path.unlink
+        results = []
+        thread = threading.Thread(target=lambda: results.append(store.put(b"shared content")))
+        
+        def unlink_with_concurrent_put(path, *args, **kwargs):
+            # 削除の直前に別スレッドが同じ内容を put する
+            thread.start()
+            thread.join(timeout=0.2)
+            original_unlink(path, *args, **kwargs)
+        
+        monkeypatch.setattr(Path, "unlink", unlink_with_concurrent_put)
+        store.release(digest)
+        monkeypatch.setattr(Path, "unlink", original_unlink)
+        thread.join()
+        
+        assert results == [digest]
+        assert store.get_refcount(digest) == 1
+        assert store.read_bytes(digest) == b"shared content"
+
 
 class TestPreviewServer:
     """プレビューサーバーテスト"""
@@ -248,6 +480,315 @@ class TestPreviewServer:
         assert notfound_response["success"] is False
 
 
+    def test_etag_conditional_request(self, preview_server, file_manager, sample_files):
+        """ETag / If-None-Match による304応答テスト"""
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, sample_files)
+        
+        first = preview_server.serve_file(session_id, "App.tsx")
+        assert first["status_code"] == 200
+        assert first["headers"]["ETag"] == first["etag"]
+        assert first["body"] == first["content"].encode('utf-8')
+        
+        revalidated = preview_server.serve_file(session_id, "App.tsx", if_none_match=first["etag"])
+        assert revalidated["status_code"] == 304
+        assert revalidated["not_modified"] is True
+        assert "content" not in revalidated
+        
+        stale = preview_server.serve_file(session_id, "App.tsx", if_none_match='"stale"')
+        assert stale["status_code"] == 200
+
+    def test_index_keeps_no_body_in_memory(self, preview_server, file_manager, sample_files):
+        """配信インデックスは本文を持たず、ファイルから配信するテスト"""
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, sample_files)
+        response = preview_server.serve_file(session_id, "App.tsx")
+
+        served = preview_server._session_index[session_id]["App.tsx"]
+        assert not hasattr(served, "content") and not hasattr(served, "body")
+        assert served.size == response["size"] == len(response["body"])
+        assert served.path.read_bytes() == response["body"]
+
+    def test_index_updated_on_resave(self, preview_server, file_manager, sample_files):
+        """再保存時の配信インデックス更新テスト"""
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, sample_files)
+        before = preview_server.serve_file(session_id, "App.tsx")
+        
+        file_manager.save_files(session_id, [
+            {"filename": "App.tsx", "content": "export default () => null;", "language": "tsx"}
+        ])
+        after = preview_server.serve_file(session_id, "App.tsx")
+        
+        assert after["content"] == "export default () => null;"
+        assert after["etag"] != before["etag"]
+        assert preview_server.serve_file(session_id, "App.tsx", if_none_match=before["etag"])["status_code"] == 200
+    
+    def test_index_shared_and_dropped_on_cleanup(self, preview_server, file_manager, sample_files):
+        """同一内容の配信物共有とセッション削除時の破棄テスト"""
+        first = file_manager.create_session()
+        second = file_manager.create_session()
+        file_manager.save_files(first, sample_files)
+        file_manager.save_files(second, sample_files)
+        
+        preview_server.serve_file(first, "App.tsx")
+        assert len(preview_server._artifacts) == len(sample_files)
+        
+        file_manager.delete_session(first)
+        assert first not in preview_server._session_index
+        assert preview_server.serve_file(second, "App.tsx")["success"] is True
+        
+        file_manager.delete_session(second)
+        assert preview_server._artifacts == {}
+    
+    def test_index_built_for_existing_sessions(self, file_manager, sample_files):
+        """PreviewServer生成前に保存されたセッションの配信テスト"""
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, sample_files)
+        
+        preview_server = PreviewServer(file_manager)
+        response = preview_server.serve_file(session_id, "App.tsx")
+        
+        assert response["success"] is True
+        assert response["content"] == sample_files[0]["content"]
+
+
+    def test_open_file_returns_blob_path(self, preview_server, file_manager, sample_files):
+        """sendfile用パス返却テスト（非エスケープ本文はblobを直接配信）"""
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, sample_files)
+        
+        result = preview_server.open_file(session_id, "styles.css")
+        
+        assert result["status_code"] == 200
+        assert result["content_encoding"] is None
+        assert Path(result["path"]).read_text() == sample_files[1]["content"]
+        assert result["path"] == str(file_manager.blob_store.path_for(
+            BlobStore.hash_bytes(sample_files[1]["content"].encode('utf-8'))
+        ))
+    
+    def test_open_file_precompressed_variant(self, preview_server, file_manager):
+        """gzip事前圧縮とエンコーディング別ETagテスト"""
+        import gzip
+        
+        content = ".row { display: flex; }\n" * 200
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, [{"filename": "app.css", "content": content, "language": "css"}])
+        
+        identity = preview_server.open_file(session_id, "app.css")
+        compressed = preview_server.open_file(session_id, "app.css", accept_encoding="gzip, deflate")
+        
+        assert compressed["content_encoding"] == "gzip"
+        assert compressed["headers"]["Content-Encoding"] == "gzip"
+        assert compressed["headers"]["Vary"] == "Accept-Encoding"
+        assert compressed["size"] < identity["size"]
+        assert compressed["etag"] != identity["etag"]
+        assert gzip.decompress(Path(compressed["path"]).read_bytes()).decode('utf-8') == content
+        
+        # 圧縮はblobごとに1回
+        again = preview_server.open_file(session_id, "app.css", accept_encoding="gzip")
+        assert again["path"] == compressed["path"]
+        
+        refused = preview_server.open_file(session_id, "app.css", accept_encoding="gzip;q=0")
+        assert refused["content_encoding"] is None
+        
+        revalidated = preview_server.open_file(
+            session_id, "app.css", if_none_match=compressed["etag"], accept_encoding="gzip"
+        )
+        assert revalidated["status_code"] == 304
+        
+        file_manager.delete_session(session_id)
+        assert not Path(compressed["path"]).exists()
+    
+    def test_open_file_escaped_body_materialized(self, preview_server, file_manager):
+        """エスケープ済み本文の派生ファイル配信テスト"""
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, [
+            {"filename": "index.html", "content": "<script>alert(1)</script>", "language": "html"}
+        ])
+        
+        result = preview_server.open_file(session_id, "index.html")
+        
+        assert Path(result["path"]).read_text() == "&lt;script&gt;alert(1)&lt;/script&gt;"
+        assert result["etag"] == preview_server.serve_file(session_id, "index.html")["etag"]
+
+
+class TestHotReloadHub:
+    """ホットリロード配信テスト"""
+    
+    @pytest.fixture
+    def app_files(self):
+        return [
+            {"filename": "App.tsx", "content": "import Button from './Button';\nexport default App;", "language": "tsx"},
+            {"filename": "Button.tsx", "content": "export default function Button() {}", "language": "tsx"},
+            {"filename": "styles.css", "content": ".app {}", "language": "css"}
+        ]
+    
+    def test_broadcasts_changed_files_and_dependents(self, file_manager, app_files):
+        """変更ファイル・内容ハッシュ・依存元の配信テスト"""
+        import asyncio
+        
+        hub = HotReloadHub(file_manager)
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, app_files)
+        
+        async def scenario():
+            queue = hub.subscribe(session_id)
+            snapshot = hub.snapshot(session_id)
+            
+            # 同一内容の再保存は配信しない
+            await asyncio.to_thread(file_manager.save_files, session_id, app_files[1:2])
+            await asyncio.to_thread(file_manager.save_files, session_id, [
+                {"filename": "Button.tsx", "content": "export default function Button() { return 1; }", "language": "tsx"}
+            ])
+            message = await asyncio.wait_for(queue.get(), 1)
+            return snapshot, message, queue.qsize()
+        
+        snapshot, message, remaining = asyncio.run(scenario())
+        
+        assert [f["path"] for f in snapshot["files"]] == ["App.tsx", "Button.tsx", "styles.css"]
+        assert message["type"] == "files_changed"
+        assert [f["path"] for f in message["changed"]] == ["Button.tsx"]
+        assert message["changed"][0]["hash"] == file_manager.get_session(session_id).files[1].content_hash
+        assert message["affected"] == ["App.tsx"]
+        assert message["version"] == snapshot["version"] + 1
+        assert remaining == 0
+    
+    def test_session_closed_and_overflow(self, file_manager, app_files):
+        """セッション削除通知とキュー溢れ時の全体再読込テスト"""
+        import asyncio
+        
+        hub = HotReloadHub(file_manager, queue_size=2)
+        session_id = file_manager.create_session()
+        file_manager.save_files(session_id, app_files)
+        
+        async def scenario():
+            queue = hub.subscribe(session_id)
+            for i in range(5):
+                file_manager.save_files(session_id, [
+                    {"filename": "styles.css", "content": f".app {{ z-index: {i}; }}", "language": "css"}
+                ])
+            await asyncio.sleep(0)
+            overflowed = [queue.get_nowait() for _ in range(queue.qsize())]
+            
+            file_manager.delete_session(session_id)
+            closed = await asyncio.wait_for(queue.get(), 1)
+            return overflowed, closed
+        
+        overflowed, closed = asyncio.run(scenario())
+        
+        assert overflowed[0]["type"] == "full_reload"
+        assert closed["type"] == "session_closed"
+        assert hub.get_subscriber_count(session_id) == 0
+
+
+class CountingBackend:
+    """変換回数を数えるテスト用変換器"""
+    name = "counting"
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def transform(self, source, loader):
+        self.calls += 1
+        if "syntax error" in source:
+            raise TranspileError("1:0 Unexpected token")
+        return {"code": f"/* {loader} */ var __altmx_module = (function() {{ return {{}}; }})();", "warnings": []}
+    
+    def close(self):
+        pass
+
+
+class TestTranspileCache:
+    """TSX→JS変換キャッシュテスト"""
+    
+    def test_transpiles_once_per_content(self, temp_dir):
+        """同一内容は1回だけ変換（ディスクキャッシュは再起動後も有効）"""
+        backend = CountingBackend()
+        cache = TranspileCache(os.path.join(temp_dir, "transpile"), backend=backend)
+        
+        first = cache.transpile("const App = () => <div />;", "App.tsx")
+        second = cache.transpile("const App = () => <div />;", "App.tsx")
+        restarted = TranspileCache(os.path.join(temp_dir, "transpile"), backend=backend).transpile(
+            "const App = () => <div />;", "App.tsx"
+        )
+        
+        assert backend.calls == 1
+        assert first.cached is False
+        assert second.cached is True and restarted.cached is True
+        assert first.code == second.code == restarted.code
+        assert "/* tsx */" in first.code
+        assert cache.path_for(first.cache_key).exists()
+    
+    def test_errors_not_cached(self, temp_dir):
+        """変換エラーはキャッシュしない"""
+        backend = CountingBackend()
+        cache = TranspileCache(os.path.join(temp_dir, "transpile"), backend=backend)
+        
+        for _ in range(2):
+            with pytest.raises(TranspileError):
+                cache.transpile("syntax error", "App.tsx")
+        
+        assert backend.calls == 2
+        assert cache.get_stats()["errors"] == 2
+    
+    def test_memory_cache_is_bounded(self, temp_dir):
+        """メモリ上の変換結果は上限件数まで、溢れた分はディスクから返すテスト"""
+        backend = CountingBackend()
+        cache = TranspileCache(os.path.join(temp_dir, "transpile"), backend=backend, max_memory_entries=2)
+        
+        for index in range(3):
+            cache.transpile(f"const App{index} = () => <div />;", "App.tsx")
+        evicted = cache.transpile("const App0 = () => <div />;", "App.tsx")
+        
+        assert cache.get_stats()["memory_entries"] == 2
+        assert evicted.cached is True
+        assert backend.calls == 3
+    
+    def test_preview_serves_compiled_companion(self, file_manager, sample_files, temp_dir):
+        """プレビューの変換済みJS配信テスト"""
+        backend = CountingBackend()
+        cache = TranspileCache(os.path.join(temp_dir, "transpile"), backend=backend)
+        preview_server = PreviewServer(file_manager, config={"content_escaping": False}, transpiler=cache)
+        
+        first = file_manager.create_session()
+        second = file_manager.create_session()
+        file_manager.save_files(first, sample_files)
+        file_manager.save_files(second, sample_files)
+        
+        response = preview_server.serve_file(second, "App.tsx.js")
+        
+        assert response["success"] is True
+        assert response["mimetype"] == "application/javascript"
+        assert "__altmx_module" in response["content"]
+        assert backend.calls == 1
+        
+        # エスケープ有効でも変換器の出力はそのまま配信
+        escaping_server = PreviewServer(file_manager, transpiler=cache)
+        compiled = escaping_server.serve_file(first, "App.tsx.js")
+        assert compiled["escaped"] is False
+        assert compiled["content"] == cache.transpile(sample_files[0]["content"], "App.tsx").code
+        assert "// SECURITY" not in compiled["content"]
+        assert preview_server.open_file(second, "App.tsx.js")["path"] == str(
+            cache.path_for(cache.cache_key(sample_files[0]["content"], "App.tsx"))
+        )
+    
+    @pytest.mark.skipif(
+        not (EsbuildCli.is_available() or EsbuildWorker.is_available()),
+        reason="esbuild not installed"
+    )
+    def test_real_esbuild_transpile(self, temp_dir, sample_files):
+        """esbuildによる実変換テスト"""
+        cache = TranspileCache(os.path.join(temp_dir, "transpile"))
+        try:
+            result = cache.transpile(sample_files[0]["content"], "App.tsx")
+        finally:
+            cache.close()
+        
+        assert "React.createElement" in result.code
+        assert "__altmx_module" in result.code
+
+
 class TestFileIntegration:
     """ファイル管理統合テスト"""
     
@@ -419,6 +960,40 @@ class TestFilePerformance:
         assert cleaned_count >= 10
         assert cleanup_time < 5.0  # 5秒以内
 
+    
+    def test_many_previews_of_same_app(self, file_manager, sample_files):
+        """同一アプリの多数同時プレビュー時のディスク使用量テスト"""
+        start_time = time.time()
+        
+        session_ids = []
+        for _ in range(100):
+            session_id = file_manager.create_session()
+            file_manager.save_files(session_id, sample_files)
+            session_ids.append(session_id)
+        
+        processing_time = time.time() - start_time
+        stats = file_manager.get_stats()
+        
+        single_copy = sum(len(f["content"].encode('utf-8')) for f in sample_files)
+        assert processing_time < 10.0  # 10秒以内
+        assert stats["active_sessions"] == 100
+        assert stats["total_size_bytes"] == single_copy * 100
+        assert stats["disk_usage_bytes"] == single_copy  # 重複排除
+
+
+    def test_cleanup_cost_independent_of_session_count(self, file_manager):
+        """期限未到来セッションが多数あってもクリーンアップが走査しないことのテスト"""
+        for _ in range(2000):
+            file_manager.create_session()
+        
+        start_time = time.time()
+        for _ in range(1000):
+            assert file_manager.cleanup_expired() == 0
+            file_manager.get_stats()
+        elapsed = time.time() - start_time
+        
+        assert elapsed < 0.5
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+GitHub APIクライアントテスト
+共有セッション（keep-alive）・レート制限ヘッダー・セカンダリレート制限の再試行・レイテンシ計測
+"""
+import pytest
+import time
+import asyncio
+from aiohttp import web
+
+from github_service import GitHubAPI, GitHubRateLimiter, GitHubAPIError, GitHubRateLimitError
+
+
+class MockRateLimitedGitHub:
+    """レスポンスを順に返すモック（接続元ポートを記録）"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.peers = set()
+        self.request_times = []
+
+    async def handle(self, request):
+        self.peers.add(request.transport.get_extra_info("peername"))
+        self.request_times.append(time.time())
+        status, headers, body = self.responses.pop(0) if self.responses else (200, {}, {"login": "altmx"})
+        return web.json_response(body, status=status, headers=headers)
+
+
+async def start_mock(mock):
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", mock.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+def make_api(url):
+    api = GitHubAPI("test_token", url, GitHubRateLimiter(reserve=1, max_wait=5))
+    api.retry_base_delay = 0.01
+    return api
+
+
+class TestGitHubAPIClient:
+    """GitHub APIクライアントテスト"""
+
+    @pytest.mark.asyncio
+    async def test_session_reused_across_requests(self):
+        """複数リクエストで接続を再利用するテスト"""
+        mock = MockRateLimitedGitHub([])
+        runner, url = await start_mock(mock)
+        try:
+            async with make_api(url) as api:
+                for _ in range(5):
+                    await api.get_user()
+        finally:
+            await runner.cleanup()
+
+        assert len(mock.request_times) == 5
+        assert len(mock.peers) == 1
+
+    def test_session_closed_when_loop_changes(self):
+        """別のイベントループで使うと前のループのセッションを閉じるテスト"""
+        mock = MockRateLimitedGitHub([])
+        api = make_api("http://127.0.0.1:1")
+        sessions = []
+
+        async def request_once():
+            runner, url = await start_mock(mock)
+            api.base_url = url
+            try:
+                await api.get_user()
+                sessions.append(api._session)
+            finally:
+                await runner.cleanup()
+
+        asyncio.run(request_once())
+        asyncio.run(request_once())
+
+        assert sessions[0] is not sessions[1]
+        assert sessions[0].closed
+        assert not sessions[1].closed
+        asyncio.run(api.close())
+
+    @pytest.mark.asyncio
+    async def test_proactive_wait_before_limit(self):
+        """残量がreserve以下ならリセットまで待つテスト"""
+        reset_at = int(time.time()) + 1
+        mock = MockRateLimitedGitHub([
+            (200, {"X-RateLimit-Remaining": "1", "X-RateLimit-Limit": "5000", "X-RateLimit-Reset": str(reset_at)}, {}),
+        ])
+        runner, url = await start_mock(mock)
+        try:
+            async with make_api(url) as api:
+                await api.get_user()
+                await api.get_user()
+                state = api.get_metrics()["rate_limit"]
+        finally:
+            await runner.cleanup()
+
+        assert mock.request_times[1] >= reset_at - 0.05
+        assert state["waits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_secondary_limit_retried_with_retry_after(self):
+        """Retry-After付きセカンダリレート制限の再試行テスト"""
+        mock = MockRateLimitedGitHub([
+            (403, {"Retry-After": "0"}, {"message": "You have exceeded a secondary rate limit"}),
+            (429, {"Retry-After": "0"}, {"message": "Too many requests"}),
+        ])
+        runner, url = await start_mock(mock)
+        try:
+            async with make_api(url) as api:
+                user = await api.get_user()
+                metrics = api.get_metrics()
+        finally:
+            await runner.cleanup()
+
+        assert user == {"login": "altmx"}
+        assert metrics["endpoints"]["GET /user"]["requests"] == 3
+        assert metrics["endpoints"]["GET /user"]["rate_limited"] == 2
+
+    @pytest.mark.asyncio
+    async def test_exhausted_and_permission_errors(self):
+        """一次レート制限の枯渇・権限不足403の区別テスト"""
+        mock = MockRateLimitedGitHub([
+            (403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(time.time()) + 3600)}, {"message": "API rate limit exceeded"}),
+            (403, {}, {"message": "Resource not accessible by integration"}),
+        ])
+        runner, url = await start_mock(mock)
+        try:
+            async with make_api(url) as api:
+                with pytest.raises(GitHubRateLimitError):
+                    await api.get_user()
+                api.rate_limiter.remaining = None
+                with pytest.raises(GitHubAPIError) as excinfo:
+                    await api.delete_repository("test-org", "demo")
+        finally:
+            await runner.cleanup()
+
+        assert not isinstance(excinfo.value, GitHubRateLimitError)
+
+    def test_latency_metric_keys(self):
+        """計測キーからリポジトリ名等を伏せるテスト"""
+        assert GitHubAPI._metric_key("get", "/repos/org/demo/branches/main") == "GET /repos/:owner/:repo/branches/:name"
+        assert GitHubAPI._metric_key("PUT", "repos/org/demo/contents/src/App.tsx") == "PUT /repos/:owner/:repo/contents/:name"
+        assert GitHubAPI._metric_key("POST", "/orgs/org/repos") == "POST /orgs/:org/repos"
@@ -0,0 +1,258 @@
+"""
+GitHub 一括プッシュテスト
+Git Data API（Blob並列作成 → Tree → Commit → Ref更新）をローカルのモックGitHubサーバーで検証
+"""
+import pytest
+import asyncio
+import base64
+import hashlib
+from datetime import datetime
+from aiohttp import web
+
+from github_service import GitHubService, GitHubRepository, GitHubAPIError
+
+
+class MockGitHub:
+    """Git Data API の最小モック（リクエスト記録・同時実行数計測付き）"""
+
+    def __init__(self, blob_delay: float = 0.02, fail_tree: bool = False, fail_ref: bool = False):
+        self.blob_delay = blob_delay
+        self.fail_tree = fail_tree
+        self.fail_ref = fail_ref
+        self.requests = []
+        self.blobs = {}
+        self.trees = {"tree0": {}}
+        self.commits = {"commit0": {"tree": "tree0", "parents": [], "message": "Initial commit"}}
+        self.refs = {"heads/main": "commit0"}
+        self.deleted = False
+        self.active_blobs = 0
+        self.max_active_blobs = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/repos/{org}/{repo}/branches/{branch}", self.get_branch)
+        app.router.add_post("/repos/{org}/{repo}/git/blobs", self.create_blob)
+        app.router.add_post("/repos/{org}/{repo}/git/trees", self.create_tree)
+        app.router.add_post("/repos/{org}/{repo}/git/commits", self.create_commit)
+        app.router.add_patch("/repos/{org}/{repo}/git/refs/heads/{branch}", self.update_ref)
+        app.router.add_delete("/repos/{org}/{repo}", self.delete_repository)
+        app.middlewares.append(self.record)
+        return app
+
+    @web.middleware
+    async def record(self, request, handler):
+        self.requests.append((request.method, request.path))
+        return await handler(request)
+
+    async def get_branch(self, request):
+        sha = self.refs.get(f"heads/{request.match_info['branch']}")
+        if sha is None:
+            return web.json_response({"message": "Branch not found"}, status=404)
+        return web.json_response({"commit": {"sha": sha, "commit": {"tree": {"sha": self.commits[sha]["tree"]}}}})
+
+    async def create_blob(self, request):
+        self.active_blobs += 1
+        self.max_active_blobs = max(self.max_active_blobs, self.active_blobs)
+        try:
+            data = await request.json()
+            content = base64.b64decode(data["content"]).decode("utf-8")
+            if "FAIL" in content:
+                return web.json_response({"message": "Server Error"}, status=500)
+            await asyncio.sleep(self.blob_delay)
+            sha = hashlib.sha1(content.encode("utf-8")).hexdigest()
+            self.blobs[sha] = content
+            return web.json_response({"sha": sha}, status=201)
+        finally:
+            self.active_blobs -= 1
+
+    async def create_tree(self, request):
+        if self.fail_tree:
+            return web.json_response({"message": "Server Error"}, status=500)
+        data = await request.json()
+        entries = dict(self.trees[data["base_tree"]]) if data.get("base_tree") else {}
+        entries.update({entry["path"]: entry["sha"] for entry in data["tree"]})
+        sha = f"tree{len(self.trees)}"
+        self.trees[sha] = entries
+        return web.json_response({"sha": sha}, status=201)
+
+    async def create_commit(self, request):
+        data = await request.json()
+        sha = f"commit{len(self.commits)}"
+        self.commits[sha] = data
+        return web.json_response({"sha": sha}, status=201)
+
+    async def update_ref(self, request):
+        data = await request.json()
+        self.refs[f"heads/{request.match_info['branch']}"] = data["sha"]
+        if self.fail_ref:
+            # 更新は反映されたがゲートウェイがエラーを返したケース
+            return web.json_response({"message": "Bad Gateway"}, status=502)
+        return web.json_response({"object": {"sha": data["sha"]}})
+
+    async def delete_repository(self, request):
+        self.deleted = True
+        return web.json_response({})
+
+
+async def start_mock(mock: MockGitHub):
+    runner = web.AppRunner(mock.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture
+def repository():
+    return GitHubRepository(
+        id=123456,
+        name="altmx-demo",
+        full_name="test-org/altmx-demo",
+        html_url="https://github.com/test-org/altmx-demo",
+        clone_url="https://github.com/test-org/altmx-demo.git",
+        created_at=datetime.now()
+    )
+
+
+def code_data(file_count: int):
+    return {
+        "project_name": "altmx-demo",
+        "description": "Bulk push test",
+        "files": [
+            {"path": f"src/components/Component{i}.tsx", "content": f"export const C{i} = () => null;\n"}
+            for i in range(file_count)
+        ]
+    }
+
+
+class TestBulkPush:
+    """Git Data API 一括プッシュテスト"""
+
+    @pytest.mark.asyncio
+    async def test_single_commit_for_all_files(self, repository):
+        """30ファイルを1コミットでプッシュするテスト"""
+        mock = MockGitHub()
+        runner, url = await start_mock(mock)
+        try:
+            service = GitHubService({
+                "token": "test_token", "organization": "test-org",
+                "api_url": url, "push_mode": "bulk", "blob_concurrency": 5
+            })
+            result = await service.push_generated_code(repository, code_data(30))
+        finally:
+            await service.close()
+            await runner.cleanup()
+
+        assert result["success"] is True
+        assert result["files_pushed"] == 30
+        assert mock.refs["heads/main"] == result["commit_sha"]
+
+        commit = mock.commits[result["commit_sha"]]
+        assert commit["parents"] == ["commit0"]
+        tree = mock.trees[commit["tree"]]
+        assert len(tree) == 30
+        # .tsx にはヘッダーを付けない（逐次プッシュと同じサニタイズ）
+        assert mock.blobs[tree["src/components/Component0.tsx"]] == "export const C0 = () => null;\n"
+
+        # Blob以外の逐次呼び出しは4回（ブランチ・Tree・Commit・Ref）
+        sequential = [request for request in mock.requests if not request[1].endswith("/git/blobs")]
+        assert [method for method, _ in sequential] == ["GET", "POST", "POST", "PATCH"]
+        assert len(mock.requests) == 34
+
+    @pytest.mark.asyncio
+    async def test_blob_uploads_bounded_and_parallel(self, repository):
+        """Blob作成の並列度がセマフォで制限されるテスト"""
+        mock = MockGitHub(blob_delay=0.05)
+        runner, url = await start_mock(mock)
+        try:
+            service = GitHubService({
+                "token": "test_token", "organization": "test-org",
+                "api_url": url, "push_mode": "bulk", "blob_concurrency": 4
+            })
+            start_time = asyncio.get_running_loop().time()
+            await service.push_generated_code(repository, code_data(16))
+            elapsed = asyncio.get_running_loop().time() - start_time
+        finally:
+            await service.close()
+            await runner.cleanup()
+
+        assert mock.max_active_blobs == 4
+        # 逐次なら 16 × 0.05 = 0.8秒
+        assert elapsed < 0.6
+
+    @pytest.mark.asyncio
+    async def test_failure_before_ref_update_rolls_back(self, repository):
+        """Tree作成失敗時にRefを更新せずロールバックするテスト"""
+        mock = MockGitHub(fail_tree=True)
+        runner, url = await start_mock(mock)
+        try:
+            service = GitHubService({
+                "token": "test_token", "organization": "test-org",
+                "api_url": url, "push_mode": "bulk"
+            })
+            with pytest.raises(GitHubAPIError):
+                await service.push_generated_code(repository, code_data(3))
+        finally:
+            await service.close()
+            await runner.cleanup()
+
+        assert mock.refs["heads/main"] == "commit0"
+        assert mock.deleted is True
+
+    @pytest.mark.asyncio
+    async def test_failed_blob_cancels_siblings_before_rollback(self, repository):
+        """Blob作成失敗時に残りのアップロードを止めてからリポジトリを削除するテスト"""
+        mock = MockGitHub(blob_delay=0.2)
+        runner, url = await start_mock(mock)
+        events = []
+        try:
+            service = GitHubService({
+                "token": "test_token", "organization": "test-org",
+                "api_url": url, "push_mode": "bulk", "blob_concurrency": 5
+            })
+            create_blob, delete_repository = service.api.create_blob, service.api.delete_repository
+
+            async def recording_create_blob(*args, **kwargs):
+                result = await create_blob(*args, **kwargs)
+                events.append("blob")
+                return result
+
+            async def recording_delete_repository(*args, **kwargs):
+                events.append("delete")
+                return await delete_repository(*args, **kwargs)
+
+            service.api.create_blob = recording_create_blob
+            service.api.delete_repository = recording_delete_repository
+
+            data = code_data(5)
+            data["files"][0]["content"] = "FAIL"
+            with pytest.raises(GitHubAPIError):
+                await service.push_generated_code(repository, data)
+            await asyncio.sleep(0.3)
+        finally:
+            await service.close()
+            await runner.cleanup()
+
+        assert events == ["delete"]
+        assert mock.deleted is True
+
+    @pytest.mark.asyncio
+    async def test_ref_update_failure_keeps_repository(self, repository):
+        """Ref更新のエラーではリポジトリを削除しないテスト"""
+        mock = MockGitHub(fail_ref=True)
+        runner, url = await start_mock(mock)
+        try:
+            service = GitHubService({
+                "token": "test_token", "organization": "test-org",
+                "api_url": url, "push_mode": "bulk"
+            })
+            service.api.retry_base_delay = 0
+            with pytest.raises(GitHubAPIError):
+                await service.push_generated_code(repository, code_data(3))
+        finally:
+            await service.close()
+            await runner.cleanup()
+
+        assert mock.refs["heads/main"] != "commit0"
+        assert mock.deleted is False
@@ -0,0 +1,252 @@
+"""
+差分デプロイテスト
+内容ハッシュによる変更なしデプロイのスキップ・変更セットによる更新・置換リソースの報告を検証
+（AWSはmotoで代替）
+"""
+import os
+import json
+import copy
+import asyncio
+import pytest
+
+import boto3
+from moto import mock_aws
+
+from aws_deployment_system import AWSDeploymentService, AWSDeploymentSystem
+from stack_template_store import StackTemplateStore, deployment_hash, diff_templates
+
+REGION = "ap-northeast-1"
+
+QUEUE_TEMPLATE = {
+    "AWSTemplateFormatVersion": "2010-09-09",
+    "Resources": {
+        "DemoQueue": {"Type": "AWS::SQS::Queue", "Properties": {"QueueName": "altmx-demo-queue"}}
+    }
+}
+
+
+@pytest.fixture
+def aws():
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        yield
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "aws_templates.db")
+
+
+class FakeCloudFormation:
+    """変更セット系APIのスタブ（既定は既存スタックへの更新、stack_status=None でスタックなし）"""
+
+    def __init__(self, status="CREATE_COMPLETE", reason="", changes=None, stack_status="CREATE_COMPLETE"):
+        self.status = status
+        self.reason = reason
+        self.changes = changes or []
+        self.stack_status = stack_status
+        self.calls = []
+
+    def describe_stacks(self, StackName):
+        self.calls.append("describe_stacks")
+        if self.stack_status is None:
+            raise Exception(f"Stack with id {StackName} does not exist")
+        return {"Stacks": [{"StackName": StackName, "StackStatus": self.stack_status}]}
+
+    def delete_stack(self, StackName):
+        self.calls.append("delete_stack")
+        self.stack_status = None
+
+    def create_change_set(self, **kwargs):
+        self.calls.append("create_change_set")
+        self.change_set_request = kwargs
+        return {"Id": "arn:aws:cloudformation:change-set/altmx-1"}
+
+    def describe_change_set(self, ChangeSetName, StackName, NextToken=None):
+        self.calls.append("describe_change_set")
+        # 2ページに分けて返す
+        if NextToken is None:
+            return {"Status": self.status, "StatusReason": self.reason,
+                    "Changes": self.changes[:1], "NextToken": "page-2" if len(self.changes) > 1 else None}
+        return {"Status": self.status, "Changes": self.changes[1:]}
+
+    def delete_change_set(self, ChangeSetName, StackName):
+        self.calls.append("delete_change_set")
+
+    def execute_change_set(self, ChangeSetName, StackName):
+        self.calls.append("execute_change_set")
+
+
+def resource_change(logical_id, resource_type, replacement, action="Modify"):
+    return {"Type": "Resource", "ResourceChange": {
+        "Action": action, "LogicalResourceId": logical_id,
+        "ResourceType": resource_type, "Replacement": replacement
+    }}
+
+
+class TestStackTemplateStore:
+    """デプロイ済みテンプレートストアのテスト"""
+
+    def test_record_and_diff(self, store_path):
+        """記録したテンプレートとのリソース差分テスト"""
+        store = StackTemplateStore(store_path)
+        store.record("altmx-demo-stack", "hash-1", json.dumps(QUEUE_TEMPLATE), "deploy-1")
+
+        updated = copy.deepcopy(QUEUE_TEMPLATE)
+        updated["Resources"]["DemoQueue"]["Properties"]["VisibilityTimeout"] = 60
+        updated["Resources"]["DemoTopic"] = {"Type": "AWS::SNS::Topic"}
+
+        previous = store.get_template(store.get("altmx-demo-stack")["template_hash"])
+        assert diff_templates(previous, updated) == {"added": ["DemoTopic"], "removed": [], "modified": ["DemoQueue"]}
+        assert diff_templates(None, QUEUE_TEMPLATE)["added"] == ["DemoQueue"]
+
+        # 再起動後も残る
+        store.close()
+        assert StackTemplateStore(store_path).get("altmx-demo-stack")["deployment_hash"] == "deploy-1"
+
+    def test_deployment_hash_includes_parameters(self):
+        """パラメータ・タグの変更でデプロイハッシュが変わるテスト"""
+        parameters = [{"ParameterKey": "ContainerImage", "ParameterValue": "nginx:1.25"}]
+        assert deployment_hash("hash-1", parameters, []) == deployment_hash("hash-1", list(parameters), [])
+        assert deployment_hash("hash-1", parameters, []) != deployment_hash("hash-1", [], [])
+
+
+class TestIncrementalDeploy:
+    """変更セットによる差分デプロイのテスト"""
+
+    def test_create_skip_and_update_with_moto(self, aws, store_path):
+        """初回は作成、同じ内容はスキップ、変更時は更新するテスト"""
+        service = AWSDeploymentService(region=REGION, template_store_path=store_path)
+        config = {"stack_name": "altmx-demo-stack", "template": QUEUE_TEMPLATE, "tags": {"Project": "AltMX"}}
+
+        created = asyncio.run(service.deploy_stack_incremental(config))
+        assert created["success"] is True
+        assert created["action"] == "create"
+        assert created["template_diff"]["added"] == ["DemoQueue"]
+
+        skipped = asyncio.run(service.deploy_stack_incremental(config))
+        assert skipped["action"] == "skipped"
+        assert skipped["template_hash"] == created["template_hash"]
+
+        updated_template = copy.deepcopy(QUEUE_TEMPLATE)
+        updated_template["Resources"]["DemoQueue"]["Properties"]["VisibilityTimeout"] = 60
+        updated = asyncio.run(service.deploy_stack_incremental(dict(config, template=updated_template)))
+        assert updated["success"] is True
+        assert updated["action"] == "update"
+        assert updated["template_diff"]["modified"] == ["DemoQueue"]
+
+        stack = boto3.client("cloudformation", region_name=REGION).describe_stacks(StackName="altmx-demo-stack")
+        assert stack["Stacks"][0]["StackStatus"] == "UPDATE_COMPLETE"
+
+    def test_skipped_deploy_makes_no_aws_calls(self, aws, store_path):
+        """前回と同じ内容ならAWSを呼ばないテスト"""
+        service = AWSDeploymentService(region=REGION, template_store_path=store_path)
+        config = {"stack_name": "altmx-demo-stack", "template": QUEUE_TEMPLATE}
+        asyncio.run(service.deploy_stack_incremental(config))
+
+        service.cf_client = FakeCloudFormation()
+        result = asyncio.run(service.deploy_stack_incremental(config))
+
+        assert result["action"] == "skipped"
+        assert service.cf_client.calls == []
+
+    def test_replacements_reported_before_execution(self, aws, store_path):
+        """置換されるリソース（遅い置換を含む）を実行前に報告するテスト"""
+        service = AWSDeploymentService(region=REGION, template_store_path=store_path)
+        service.cf_client = FakeCloudFormation(changes=[
+            resource_change("TaskDefinition", "AWS::ECS::TaskDefinition", "True"),
+            resource_change("ALB", "AWS::ElasticLoadBalancingV2::LoadBalancer", "Conditional"),
+            resource_change("LogGroup", "AWS::Logs::LogGroup", "False")
+        ])
+
+        result = asyncio.run(service.deploy_stack_incremental(
+            {"stack_name": "altmx-demo-stack", "template": QUEUE_TEMPLATE}, execute=False
+        ))
+
+        assert result["action"] == "planned"
+        assert result["change_set_type"] == "UPDATE"
+        assert len(result["changes"]) == 3
+        assert [(change["logical_id"], change["slow"]) for change in result["replacements"]] == [
+            ("TaskDefinition", False), ("ALB", True)
+        ]
+        assert "execute_change_set" not in service.cf_client.calls
+        # 計画だけでは記録しない
+        assert service.template_store.get("altmx-demo-stack") is None
+
+    def test_empty_change_set_is_skipped(self, aws, store_path):
+        """AWS側と同じ内容の変更セットを削除してスキップするテスト"""
+        service = AWSDeploymentService(region=REGION, template_store_path=store_path)
+        service.cf_client = FakeCloudFormation(
+            status="FAILED",
+            reason="The submitted information didn't contain changes. Submit different information to create a change set."
+        )
+        config = {"stack_name": "altmx-demo-stack", "template": QUEUE_TEMPLATE}
+
+        result = asyncio.run(service.deploy_stack_incremental(config))
+
+        assert result["success"] is True
+        assert result["action"] == "skipped"
+        assert "delete_change_set" in service.cf_client.calls
+        # 以降はローカルの記録でスキップ
+        assert asyncio.run(service.deploy_stack_incremental(config))["action"] == "skipped"
+        assert service.cf_client.calls.count("create_change_set") == 1
+
+    def test_failed_create_change_set_is_cleaned_up(self, aws, store_path):
+        """変更なし以外で失敗した CREATE 変更セットと空のスタックを削除するテスト"""
+        service = AWSDeploymentService(region=REGION, template_store_path=store_path)
+        service.cf_client = FakeCloudFormation(
+            status="FAILED", reason="Template format error: Unresolved resource dependencies", stack_status=None
+        )
+
+        result = asyncio.run(service.deploy_stack_incremental({"stack_name": "altmx-demo-stack", "template": QUEUE_TEMPLATE}))
+
+        assert result["success"] is False
+        assert result["action"] == "failed"
+        assert "Unresolved" in result["error_message"]
+        assert service.cf_client.change_set_request["ChangeSetType"] == "CREATE"
+        assert service.cf_client.calls[-2:] == ["delete_change_set", "delete_stack"]
+        assert service.template_store.get("altmx-demo-stack") is None
+
+    def test_failed_update_change_set_keeps_stack(self, aws, store_path):
+        """失敗した UPDATE 変更セットは削除し、既存スタックは残すテスト"""
+        service = AWSDeploymentService(region=REGION, template_store_path=store_path)
+        service.cf_client = FakeCloudFormation(status="FAILED", reason="Parameter validation failed")
+
+        result = asyncio.run(service.deploy_stack_incremental({"stack_name": "altmx-demo-stack", "template": QUEUE_TEMPLATE}))
+
+        assert result["success"] is False
+        assert "delete_change_set" in service.cf_client.calls
+        assert "delete_stack" not in service.cf_client.calls
+
+    def test_rollback_complete_stack_is_recreated(self, aws, store_path):
+        """作成失敗で ROLLBACK_COMPLETE のスタックを削除してから CREATE するテスト"""
+        service = AWSDeploymentService(region=REGION, template_store_path=store_path)
+        service.cf_client = FakeCloudFormation(stack_status="ROLLBACK_COMPLETE")
+
+        result = asyncio.run(service.deploy_stack_incremental(
+            {"stack_name": "altmx-demo-stack", "template": QUEUE_TEMPLATE}, execute=False
+        ))
+
+        assert result["success"] is True
+        assert result["change_set_type"] == "CREATE"
+        assert result["deleted_failed_stack"] is True
+        calls = service.cf_client.calls
+        assert calls.index("delete_stack") < calls.index("create_change_set")
+
+    def test_system_skips_container_redeploy_without_force(self, aws, store_path):
+        """変更がなければECSの強制再デプロイも行わないテスト"""
+        system = AWSDeploymentSystem(region=REGION)
+        system.deployment_service.template_store_path = store_path
+        config = {
+            "stack_name": "altmx-demo-stack",
+            "template": QUEUE_TEMPLATE,
+            "container_config": {"cluster_name": "altmx-demo-cluster", "service_name": "altmx-demo-service"}
+        }
+
+        first = asyncio.run(system.deploy_incremental(config))
+        second = asyncio.run(system.deploy_incremental(config))
+
+        assert first["action"] == "create"
+        assert second["action"] == "skipped"
+        assert second["container_deployed"] is False
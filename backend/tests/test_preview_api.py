@@ -0,0 +1,169 @@
+"""
+Preview API Tests
+プレビューファイル配信ルート（sendfile・Range・事前圧縮・ETag）テスト
+"""
+
+import time
+import shutil
+import tempfile
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.preview as preview_api
+import websocket.preview as preview_websocket
+from code_generation.file_manager import FileManager
+from code_generation.preview_server import PreviewServer
+from code_generation.hot_reload import HotReloadHub
+
+
+@pytest.fixture
+def preview_app(monkeypatch):
+    """一時ディレクトリを使うプレビュールート"""
+    temp_dir = tempfile.mkdtemp()
+    file_manager = FileManager({"temp_root": temp_dir, "cleanup_interval": 3600})
+    monkeypatch.setattr(preview_api, "file_manager", file_manager)
+    monkeypatch.setattr(preview_api, "preview_server", PreviewServer(file_manager))
+    hub = HotReloadHub(file_manager)
+    monkeypatch.setattr(preview_websocket, "file_manager", file_manager)
+    monkeypatch.setattr(preview_websocket, "hot_reload_hub", hub)
+
+    app = FastAPI()
+    app.include_router(preview_api.router, prefix="/preview")
+    app.include_router(preview_websocket.router, prefix="/ws")
+    yield app, file_manager
+
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def client(preview_app):
+    """テストクライアント"""
+    return TestClient(preview_app[0])
+
+
+@pytest.fixture
+def session_id(client):
+    """サンプルファイル入りプレビューセッション"""
+    response = client.post("/preview/sessions", json={
+        "files": [
+            {"filename": "App.tsx", "content": "export default function App() { return null; }", "language": "tsx"},
+            {"filename": "styles.css", "content": ".row { display: flex; }\n" * 200, "language": "css"}
+        ]
+    })
+    assert response.status_code == 200
+    return response.json()["session_id"]
+
+
+class TestPreviewRoute:
+    """プレビュールートテスト"""
+
+    def test_serve_file(self, client, session_id):
+        """ファイル配信テスト"""
+        response = client.get(f"/preview/{session_id}/App.tsx", headers={"Accept-Encoding": "identity"})
+
+        assert response.status_code == 200
+        assert response.text == "export default function App() { return null; }"
+        assert response.headers["etag"].startswith('"')
+        assert response.headers["x-content-type-options"] == "nosniff"
+
+    def test_not_found_and_forbidden(self, client, session_id):
+        """存在しないセッション・ファイルテスト"""
+        assert client.get("/preview/unknown/App.tsx").status_code == 404
+        assert client.get(f"/preview/{session_id}/missing.ts").status_code == 404
+
+    def test_conditional_request(self, client, session_id):
+        """If-None-Match による304テスト"""
+        first = client.get(f"/preview/{session_id}/App.tsx")
+        second = client.get(f"/preview/{session_id}/App.tsx", headers={"If-None-Match": first.headers["etag"]})
+
+        assert second.status_code == 304
+        assert second.content == b""
+
+    def test_range_request(self, client, session_id):
+        """Range要求テスト（非圧縮本文の部分取得）"""
+        response = client.get(
+            f"/preview/{session_id}/styles.css",
+            headers={"Range": "bytes=0-9", "Accept-Encoding": "gzip"}
+        )
+
+        assert response.status_code == 206
+        assert response.content == b".row { dis"
+        assert "content-encoding" not in response.headers
+
+    def test_precompressed_response(self, client, session_id):
+        """gzip事前圧縮配信テスト"""
+        response = client.get(f"/preview/{session_id}/styles.css", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.text == ".row { display: flex; }\n" * 200
+        assert int(response.headers["content-length"]) < len(response.text)
+
+    def test_list_session_files(self, client, session_id):
+        """ファイル一覧テスト"""
+        response = client.get(f"/preview/{session_id}")
+
+        assert response.status_code == 200
+        assert response.json()["total_files"] == 2
+
+
+class TestHotReloadWebSocket:
+    """ホットリロードWebSocketテスト"""
+
+    def test_snapshot_and_change_push(self, client, preview_app, session_id):
+        """接続時スナップショットと変更プッシュテスト"""
+        file_manager = preview_app[1]
+
+        with client.websocket_connect(f"/ws/preview/{session_id}") as websocket:
+            snapshot = websocket.receive_json()
+            assert snapshot["type"] == "snapshot"
+            assert {f["path"] for f in snapshot["files"]} == {"App.tsx", "styles.css"}
+
+            file_manager.save_files(session_id, [
+                {"filename": "styles.css", "content": ".row { display: grid; }", "language": "css"}
+            ])
+            message = websocket.receive_json()
+
+            assert message["type"] == "files_changed"
+            assert [f["path"] for f in message["changed"]] == ["styles.css"]
+
+            websocket.send_text("ping")
+            assert websocket.receive_json()["type"] == "pong"
+
+    def test_unknown_session_rejected(self, client):
+        """存在しないセッションの接続拒否テスト"""
+        from starlette.websockets import WebSocketDisconnect
+
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect("/ws/preview/unknown") as websocket:
+                websocket.receive_json()
+
+
+class TestPreviewLoad:
+    """プレビュー同時閲覧負荷テスト"""
+
+    def test_many_concurrent_viewers(self, client, session_id):
+        """同一プレビューの同時閲覧スループットテスト"""
+        viewers = 50
+        requests_per_viewer = 20
+
+        def view(_):
+            statuses = []
+            for _ in range(requests_per_viewer):
+                response = client.get(f"/preview/{session_id}/styles.css", headers={"Accept-Encoding": "gzip"})
+                statuses.append((response.status_code, response.headers.get("content-encoding")))
+            return statuses
+
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=viewers) as executor:
+            results = list(executor.map(view, range(viewers)))
+        elapsed = time.time() - start_time
+
+        total = viewers * requests_per_viewer
+        throughput = total / elapsed
+
+        assert all(status == (200, "gzip") for statuses in results for status in statuses)
+        assert throughput > 100, f"{total} requests in {elapsed:.2f}s ({throughput:.0f} req/s)"
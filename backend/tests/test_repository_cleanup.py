@@ -0,0 +1,277 @@
+"""
+一時リポジトリ削除スケジューラーテスト
+SQLite時刻インデックス・再起動後の継続・冪等な再試行・レート制限時の一時停止
+"""
+import pytest
+import asyncio
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from github_service import GitHubService, GitHubRepository, GitHubNotFoundError, GitHubRateLimitError, GitHubAPIError
+from repository_cleanup import RepositoryCleanupScheduler
+
+
+class FakeGitHubAPI:
+    """delete_repository の結果をリポジトリ名ごとに差し替えるモック"""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.deleted = []
+
+    async def delete_repository(self, org, repo):
+        error = self.errors.get(repo)
+        if error is not None:
+            raise error
+        self.deleted.append(repo)
+        return {}
+
+
+def make_scheduler(tmp_path, api, **kwargs):
+    kwargs.setdefault("delete_interval", 0)
+    return RepositoryCleanupScheduler(str(tmp_path / "cleanup.db"), api, **kwargs)
+
+
+class TestRepositoryCleanupScheduler:
+    """リポジトリ削除スケジューラーテスト"""
+
+    @pytest.mark.asyncio
+    async def test_only_due_repositories_deleted_in_order(self, tmp_path):
+        """期限到来分のみ期限順・バッチ単位で削除するテスト"""
+        api = FakeGitHubAPI()
+        scheduler = make_scheduler(tmp_path, api, batch_size=2)
+        now = datetime.now()
+        scheduler.schedule("test-org", "repo-b", now - timedelta(minutes=1))
+        scheduler.schedule("test-org", "repo-a", now - timedelta(minutes=2))
+        scheduler.schedule("test-org", "repo-c", now - timedelta(seconds=1))
+        scheduler.schedule("test-org", "repo-later", now + timedelta(days=30))
+
+        assert scheduler.get_queue_depth() == 4
+        assert await scheduler.run_once() == 2
+        assert api.deleted == ["repo-a", "repo-b"]
+        assert await scheduler.run_once() == 1
+        assert api.deleted == ["repo-a", "repo-b", "repo-c"]
+        assert scheduler.get_stats()["queue_depth"] == 1
+        assert scheduler.get_stats()["due"] == 0
+
+    @pytest.mark.asyncio
+    async def test_schedule_survives_restart(self, tmp_path):
+        """再起動後も削除予定が残るテスト"""
+        first = make_scheduler(tmp_path, FakeGitHubAPI())
+        first.schedule("test-org", "repo-a", datetime.now() - timedelta(seconds=1), repository_id=1)
+        first.close()
+
+        api = FakeGitHubAPI()
+        second = make_scheduler(tmp_path, api)
+
+        assert second.get("test-org", "repo-a")["repository_id"] == 1
+        assert await second.run_once() == 1
+        assert api.deleted == ["repo-a"]
+
+    @pytest.mark.asyncio
+    async def test_idempotent_retry_and_give_up(self, tmp_path):
+        """削除済みは成功扱い・失敗は再試行後にfailedとするテスト"""
+        api = FakeGitHubAPI({
+            "repo-gone": GitHubNotFoundError("Not found"),
+            "repo-broken": GitHubAPIError("GitHub API error (500)")
+        })
+        scheduler = make_scheduler(tmp_path, api, max_attempts=2, retry_delay=0)
+        scheduler.schedule("test-org", "repo-gone", datetime.now() - timedelta(seconds=1))
+        scheduler.schedule("test-org", "repo-broken", datetime.now() - timedelta(seconds=1))
+
+        await scheduler.run_once()
+        assert scheduler.get("test-org", "repo-gone") is None
+        assert scheduler.get("test-org", "repo-broken")["attempts"] == 1
+
+        await scheduler.run_once()
+        job = scheduler.get("test-org", "repo-broken")
+        assert job["status"] == "failed"
+        assert "500" in job["last_error"]
+        assert scheduler.get_stats()["queue_depth"] == 0
+        assert scheduler.get_stats()["failed_jobs"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_pauses_batch(self, tmp_path):
+        """レート制限でバッチを打ち切り、試行回数を増やさないテスト"""
+        api = FakeGitHubAPI({"repo-a": GitHubRateLimitError("Rate limit exceeded")})
+        scheduler = make_scheduler(tmp_path, api, retry_delay=60)
+        scheduler.schedule("test-org", "repo-a", datetime.now() - timedelta(seconds=2))
+        scheduler.schedule("test-org", "repo-b", datetime.now() - timedelta(seconds=1))
+
+        assert await scheduler.run_once() == 0
+        assert await scheduler.run_once() == 0
+        assert api.deleted == []
+        assert scheduler.get("test-org", "repo-a")["attempts"] == 0
+        assert scheduler.get_stats()["paused"] is True
+
+    @pytest.mark.asyncio
+    async def test_worker_deletes_when_due(self, tmp_path):
+        """ワーカーが期限到来時に削除するテスト"""
+        api = FakeGitHubAPI()
+        scheduler = make_scheduler(tmp_path, api, poll_interval=5)
+        scheduler.start()
+        try:
+            scheduler.schedule("test-org", "repo-a", datetime.now() + timedelta(seconds=0.2))
+            await asyncio.sleep(0.6)
+        finally:
+            await scheduler.stop()
+
+        assert api.deleted == ["repo-a"]
+        assert scheduler.get_queue_depth() == 0
+
+    @pytest.mark.asyncio
+    async def test_worker_backs_off_after_errors(self, tmp_path):
+        """run_once が失敗し続けてもワーカーが空回りせず、倍々に待つテスト"""
+        scheduler = make_scheduler(tmp_path, FakeGitHubAPI(), poll_interval=0.1)
+        calls = []
+
+        async def failing_run_once():
+            calls.append(time.monotonic())
+            raise sqlite3.OperationalError("database is locked")
+
+        scheduler.run_once = failing_run_once
+        scheduler.schedule("test-org", "repo-a", datetime.now() - timedelta(seconds=1))
+        scheduler.start()
+        try:
+            await asyncio.sleep(0.5)
+        finally:
+            await scheduler.stop()
+
+        # 0s・0.1s・0.3s（次は 0.7s）
+        assert len(calls) == 3
+        assert calls[2] - calls[1] > calls[1] - calls[0]
+        assert scheduler.get_stats()["worker_errors"] == 3
+
+    @pytest.mark.asyncio
+    async def test_service_persists_schedule(self, tmp_path):
+        """GitHubService.schedule_repository_cleanup の永続化テスト"""
+        service = GitHubService({
+            "token": "test_token",
+            "organization": "test-org",
+            "cleanup_days": 30,
+            "cleanup_db_path": str(tmp_path / "service.db")
+        })
+        repository = GitHubRepository(
+            id=123456,
+            name="altmx-demo",
+            full_name="test-org/altmx-demo",
+            html_url="https://github.com/test-org/altmx-demo",
+            clone_url="https://github.com/test-org/altmx-demo.git",
+            created_at=datetime.now()
+        )
+
+        cleanup_date = await service.schedule_repository_cleanup(repository)
+
+        scheduler = service.cleanup_scheduler
+        await service.close()
+
+        job = scheduler.get("test-org", "altmx-demo")
+        assert job["repository_id"] == 123456
+        assert abs(job["due_at"] - cleanup_date.timestamp()) < 1
+        assert scheduler.get_queue_depth() == 1
+
+    @pytest.mark.asyncio
+    async def test_service_starts_worker(self, tmp_path):
+        """GitHubService 経由の予定が start() を呼ばずに期限到来で削除されるテスト"""
+        service = GitHubService({
+            "token": "test_token",
+            "organization": "test-org",
+            "cleanup_days": 0,
+            "cleanup_db_path": str(tmp_path / "service.db")
+        })
+        deleted = []
+
+        async def delete_repository(org, repo):
+            deleted.append(f"{org}/{repo}")
+            return {}
+
+        service.api.delete_repository = delete_repository
+        repository = GitHubRepository(
+            id=123456,
+            name="altmx-demo",
+            full_name="test-org/altmx-demo",
+            html_url="https://github.com/test-org/altmx-demo",
+            clone_url="https://github.com/test-org/altmx-demo.git",
+            created_at=datetime.now()
+        )
+
+        try:
+            await service.schedule_repository_cleanup(repository)
+            scheduler = service.cleanup_scheduler
+            assert scheduler.is_running() is True
+            await asyncio.sleep(0.2)
+        finally:
+            await service.close()
+
+        assert deleted == ["test-org/altmx-demo"]
+        assert scheduler.get_queue_depth() == 0
+        assert scheduler.is_running() is False
+
+    @pytest.mark.asyncio
+    async def test_app_startup_processes_persisted_schedule(self, tmp_path, monkeypatch):
+        """アプリ起動時に、再起動前に登録された期限到来分をリクエストなしで削除するテスト"""
+        import api.github as github_lifecycle
+
+        db_path = str(tmp_path / "service.db")
+        RepositoryCleanupScheduler(db_path, FakeGitHubAPI()).schedule(
+            "test-org", "repo-before-restart", datetime.now() - timedelta(seconds=1)
+        )
+        deleted = []
+
+        async def delete_repository(self, org, repo):
+            deleted.append(f"{org}/{repo}")
+            return {}
+
+        monkeypatch.setattr("github_service.GitHubAPI.delete_repository", delete_repository)
+        monkeypatch.setenv("GITHUB_TOKEN", "test_token")
+        monkeypatch.setenv("GITHUB_ORGANIZATION", "test-org")
+        monkeypatch.setenv("GITHUB_CLEANUP_DB_PATH", db_path)
+
+        await github_lifecycle.start_github_service()
+        scheduler = github_lifecycle.github_service._cleanup_scheduler
+        try:
+            assert scheduler.is_running() is True
+            await asyncio.sleep(0.2)
+        finally:
+            await github_lifecycle.stop_github_service()
+
+        assert deleted == ["test-org/repo-before-restart"]
+        assert scheduler.is_running() is False
+        assert github_lifecycle.github_service is None
+
+    @pytest.mark.asyncio
+    async def test_app_startup_without_configuration(self, monkeypatch):
+        """GitHub未設定なら起動時に何もしないテスト"""
+        import api.github as github_lifecycle
+
+        monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+        monkeypatch.delenv("GITHUB_ORGANIZATION", raising=False)
+
+        await github_lifecycle.start_github_service()
+        assert github_lifecycle.github_service is None
+        await github_lifecycle.stop_github_service()
+
+    @pytest.mark.asyncio
+    async def test_github_status_exposes_metrics(self, tmp_path, monkeypatch):
+        """状態APIが稼働中サービスのレート制限・削除キューを返すテスト"""
+        import api.github as github_lifecycle
+
+        monkeypatch.setenv("GITHUB_TOKEN", "test_token")
+        monkeypatch.setenv("GITHUB_ORGANIZATION", "test-org")
+        monkeypatch.setenv("GITHUB_CLEANUP_DB_PATH", str(tmp_path / "service.db"))
+
+        await github_lifecycle.start_github_service()
+        try:
+            github_lifecycle.github_service.cleanup_scheduler.schedule(
+                "test-org", "repo-later", datetime.now() + timedelta(days=30)
+            )
+            status = github_lifecycle.get_github_status()
+        finally:
+            await github_lifecycle.stop_github_service()
+
+        assert status["configured"] is True
+        assert status["organization"] == "test-org"
+        assert status["endpoints"] == {}
+        assert "remaining" in status["rate_limit"]
+        assert status["cleanup"]["queue_depth"] == 1
+        assert github_lifecycle.get_github_status() == {"configured": False}
@@ -0,0 +1,260 @@
+"""
+非同期スタック監視テスト
+EventIdカーソルによる新着イベント取得・増分フェーズ計算・DeploymentMonitorへの通知を検証
+（AWSはmotoで代替）
+"""
+import os
+import json
+import asyncio
+import pytest
+from datetime import datetime, timezone, timedelta
+
+import boto3
+from moto import mock_aws
+
+from deployment_monitoring import (
+    AdaptivePollInterval,
+    CloudFormationEventMonitor,
+    DeploymentMonitor,
+    DeploymentPhaseCalculator,
+    DeploymentPhaseState,
+    StackWatcher
+)
+
+REGION = "ap-northeast-1"
+
+QUEUE_TEMPLATE = {
+    "AWSTemplateFormatVersion": "2010-09-09",
+    "Resources": {
+        "DemoQueue": {"Type": "AWS::SQS::Queue", "Properties": {"QueueName": "altmx-demo-queue"}}
+    }
+}
+
+
+@pytest.fixture
+def aws():
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        yield boto3.client("cloudformation", region_name=REGION)
+
+
+def fast_poll():
+    return AdaptivePollInterval(initial=0.01, maximum=0.05)
+
+
+def stack_event(event_id, logical_id, status, resource_type=None, reason=""):
+    event = {
+        "EventId": event_id,
+        "StackName": "altmx-demo-stack",
+        "LogicalResourceId": logical_id,
+        "ResourceStatus": status,
+        "ResourceStatusReason": reason,
+        "Timestamp": datetime.now(timezone.utc)
+    }
+    if resource_type:
+        event["ResourceType"] = resource_type
+    return event
+
+
+class ScriptedCloudFormation:
+    """ポーリングごとに新着イベントが増える describe_stack_events のスタブ（新しい順・ページング付き）"""
+
+    def __init__(self, batches, page_size=2):
+        self.batches = list(batches)
+        self.events = []
+        self.page_size = page_size
+        self.calls = []
+
+    def describe_stack_events(self, StackName, NextToken=None):
+        if NextToken is None and self.batches:
+            self.events = list(reversed(self.batches.pop(0))) + self.events
+        start = int(NextToken or 0)
+        self.calls.append(start)
+        page = self.events[start:start + self.page_size]
+        response = {"StackEvents": page}
+        if start + self.page_size < len(self.events):
+            response["NextToken"] = str(start + self.page_size)
+        return response
+
+
+class TestStackWatcher:
+    """非同期スタック監視のテスト"""
+
+    def test_cursor_fetches_only_new_events(self):
+        """カーソル以降のイベントだけを古い順に返し、カーソル到達でページングを打ち切るテスト"""
+        client = ScriptedCloudFormation([
+            [stack_event(f"e{i}", f"Resource{i}", "CREATE_COMPLETE") for i in range(5)],
+            [stack_event("e5", "Resource5", "CREATE_COMPLETE")]
+        ])
+        event_monitor = CloudFormationEventMonitor(region=REGION, cf_client=client)
+
+        first = event_monitor.get_new_stack_events("altmx-demo-stack")
+        assert [event["EventId"] for event in first] == ["e0", "e1", "e2", "e3", "e4"]
+
+        client.calls.clear()
+        second = event_monitor.get_new_stack_events("altmx-demo-stack", after_event_id="e4")
+        assert [event["EventId"] for event in second] == ["e5"]
+        assert client.calls == [0]  # 1ページ目でカーソルに到達
+
+    def test_since_skips_previous_history(self):
+        """since より前の履歴を読まないテスト"""
+        old = stack_event("old", "Resource0", "CREATE_COMPLETE")
+        old["Timestamp"] = datetime.now(timezone.utc) - timedelta(days=1)
+        client = ScriptedCloudFormation([[old, stack_event("new", "Resource0", "UPDATE_IN_PROGRESS")]])
+        event_monitor = CloudFormationEventMonitor(region=REGION, cf_client=client)
+
+        events = event_monitor.get_new_stack_events(
+            "altmx-demo-stack", since=datetime.now(timezone.utc) - timedelta(hours=1)
+        )
+        assert [event["EventId"] for event in events] == ["new"]
+
+    def test_incremental_phase_matches_full_recompute(self):
+        """1件ずつ反映した結果が一括計算と一致するテスト"""
+        calculator = DeploymentPhaseCalculator()
+        events = [
+            stack_event("e1", "ECSCluster", "CREATE_IN_PROGRESS", "AWS::ECS::Cluster"),
+            stack_event("e2", "ECSCluster", "CREATE_COMPLETE", "AWS::ECS::Cluster"),
+            stack_event("e3", "ALB", "CREATE_IN_PROGRESS", "AWS::ElasticLoadBalancingV2::LoadBalancer"),
+        ]
+
+        state = DeploymentPhaseState()
+        for event in events:
+            calculator.apply_event(state, event)
+
+        incremental = calculator.summarize(state)
+        assert incremental == calculator.calculate_current_phase(list(reversed(events)))
+        assert incremental["current_phase"] == "ALB_CREATION"
+        assert incremental["progress_percentage"] == 40
+        assert incremental["completed_resources"] == 1
+
+        # 同じステータスの再送は変化なし
+        assert calculator.apply_event(state, events[-1]) is False
+
+    def test_adaptive_poll_interval(self):
+        """変化がないほど間隔が伸び、変化があれば短く戻るテスト"""
+        interval = AdaptivePollInterval(initial=2.0, maximum=15.0, backoff=2.0)
+
+        assert interval.next(activity=True) == 2.0
+        assert [interval.next(activity=False) for _ in range(4)] == [4.0, 8.0, 15.0, 15.0]
+        assert interval.next(activity=True) == 2.0
+
+    def test_watch_reports_failure_reason_to_error_listeners(self):
+        """リソース失敗時に原因を返し、エラーリスナーへ通知するテスト"""
+        client = ScriptedCloudFormation([
+            [stack_event("s1", "altmx-demo-stack", "CREATE_IN_PROGRESS", "AWS::CloudFormation::Stack")],
+            [],
+            [stack_event("r1", "ECSService", "CREATE_FAILED", "AWS::ECS::Service", "Resource limit exceeded")],
+            [stack_event("s2", "altmx-demo-stack", "ROLLBACK_COMPLETE", "AWS::CloudFormation::Stack")]
+        ], page_size=10)
+        monitor = DeploymentMonitor()
+        errors = []
+        monitor.add_error_listener("demo-1", errors.append)
+
+        watcher = StackWatcher(CloudFormationEventMonitor(cf_client=client), monitor=monitor, poll_interval=fast_poll())
+        result = asyncio.run(watcher.watch("altmx-demo-stack", deployment_id="demo-1", max_wait_time=5))
+
+        assert result["success"] is False
+        assert result["final_status"] == "ROLLBACK_COMPLETE"
+        assert result["error_message"] == "Resource limit exceeded"
+        assert result["polls"] == 4
+        assert len(errors) == 1
+
+    def test_polling_errors_finish_deployment(self):
+        """ポーリング失敗が続いて打ち切ると、エラー通知して購読・リスナーを閉じるテスト"""
+        class FailingCloudFormation:
+            def describe_stack_events(self, StackName, NextToken=None):
+                raise ConnectionError("endpoint unreachable")
+
+        monitor = DeploymentMonitor()
+        errors = []
+        monitor.add_error_listener("demo-1", errors.append)
+        watcher = StackWatcher(
+            CloudFormationEventMonitor(cf_client=FailingCloudFormation()), monitor=monitor,
+            poll_interval=fast_poll(), max_consecutive_errors=2
+        )
+
+        async def run():
+            subscription = monitor.subscribe("demo-1")
+            result = await watcher.watch("altmx-demo-stack", deployment_id="demo-1", max_wait_time=5)
+            received = [event async for event in subscription]
+            late = [event async for event in monitor.subscribe("demo-1")]
+            return result, received, late
+
+        result, received, late = asyncio.run(asyncio.wait_for(run(), 5))
+
+        assert result["success"] is False
+        assert "endpoint unreachable" in result["error_message"]
+        assert len(errors) == 1
+        assert "endpoint unreachable" in errors[0]["error_details"]
+        assert [event["type"] for event in received][-1] == "error"
+        assert [event["type"] for event in late] == ["snapshot"]
+        stats = monitor.get_stats()
+        assert (stats["active"], stats["listeners"], stats["hub"]["subscribers"]) == (0, 0, 0)
+
+    def test_timeout_finishes_deployment(self):
+        """タイムアウトで打ち切ると、エラー通知して監視を終えるテスト"""
+        client = ScriptedCloudFormation([
+            [stack_event("s1", "altmx-demo-stack", "CREATE_IN_PROGRESS", "AWS::CloudFormation::Stack")]
+        ])
+        monitor = DeploymentMonitor()
+        errors = []
+        monitor.add_error_listener("demo-1", errors.append)
+
+        watcher = StackWatcher(CloudFormationEventMonitor(cf_client=client), monitor=monitor, poll_interval=fast_poll())
+        result = asyncio.run(watcher.watch("altmx-demo-stack", deployment_id="demo-1", max_wait_time=0.1))
+
+        assert result["success"] is False
+        assert "timed out" in result["error_message"]
+        assert [error["status"] for error in errors] == ["CREATE_IN_PROGRESS"]
+        assert "timed out" in monitor.get_deployment_status("demo-1")["error_details"]
+        assert (monitor.get_stats()["active"], monitor.get_stats()["listeners"]) == (0, 0)
+
+    def test_watch_stack_with_moto(self, aws):
+        """motoのスタックを完了まで監視し、リスナーへ通知するテスト"""
+        aws.create_stack(StackName="altmx-demo-stack", TemplateBody=json.dumps(QUEUE_TEMPLATE))
+
+        monitor = DeploymentMonitor()
+        updates, completions = [], []
+        monitor.add_progress_listener("demo-1", updates.append)
+        monitor.add_completion_listener("demo-1", completions.append)
+
+        event_monitor = CloudFormationEventMonitor(region=REGION, cf_client=aws)
+        watcher = StackWatcher(event_monitor, monitor=monitor, poll_interval=fast_poll())
+        result = asyncio.run(watcher.watch("altmx-demo-stack", deployment_id="demo-1", max_wait_time=5))
+
+        assert result["success"] is True
+        assert result["final_status"] == "CREATE_COMPLETE"
+        assert result["events_processed"] > 0
+        assert updates and updates[-1]["status"] == "CREATE_COMPLETE"
+        assert len(completions) == 1
+        assert monitor.get_deployment_status("demo-1")["progress_percentage"] == 100
+
+        # 最新イベント以降は何も返らない
+        latest = aws.describe_stack_events(StackName="altmx-demo-stack")["StackEvents"][0]["EventId"]
+        assert event_monitor.get_new_stack_events("altmx-demo-stack", after_event_id=latest) == []
+
+    def test_service_watch_does_not_block_event_loop(self, aws):
+        """AWSDeploymentService.watch_stack_progress が監視中もイベントループを止めないテスト"""
+        from aws_deployment_system import AWSDeploymentService
+
+        service = AWSDeploymentService(region=REGION)
+        service.create_stack({"stack_name": "altmx-demo-stack", "template": QUEUE_TEMPLATE})
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.001)
+
+            task = asyncio.create_task(ticker())
+            result = await service.watch_stack_progress("altmx-demo-stack", max_wait_time=5)
+            task.cancel()
+            return result, ticks
+
+        result, ticks = asyncio.run(run())
+        assert result["success"] is True
+        assert ticks > 0
@@ -0,0 +1,177 @@
+"""
+テンプレート静的解析テスト
+依存グラフ（Ref / GetAtt / Sub / DependsOn）・クリティカルパス・リント・価格表によるコスト見積もりを検証
+"""
+import pytest
+
+from cloudformation_generator import CloudFormationGenerator
+from template_analyzer import TemplateAnalyzer, PRICING, MAX_TEMPLATE_BODY_BYTES
+
+
+def resource(resource_type, properties=None, depends_on=None):
+    body = {"Type": resource_type, "Properties": properties or {}}
+    if depends_on:
+        body["DependsOn"] = depends_on
+    return body
+
+
+def template(resources, **sections):
+    return {"AWSTemplateFormatVersion": "2010-09-09", "Resources": resources, **sections}
+
+
+@pytest.fixture
+def aws_config():
+    return {
+        "vpc_id": "vpc-12345678",
+        "subnet_ids": ["subnet-1234", "subnet-5678"],
+        "certificate_arn": "arn:aws:acm:ap-northeast-1:123456789012:certificate/abc"
+    }
+
+
+def generated_stack(aws_config, features):
+    app_config = {"app_name": "altmx-demo-app", "port": 3000, "environment": "production", "features": features}
+    return CloudFormationGenerator().generate_complete_stack(app_config, aws_config)
+
+
+class TestTemplateAnalyzer:
+    """テンプレート静的解析のテスト"""
+
+    def test_dependency_graph_resolves_all_reference_forms(self):
+        """Ref・GetAtt（配列/文字列）・Sub・DependsOn を依存として解決し、パラメータは除外するテスト"""
+        analysis = TemplateAnalyzer().analyze(template({
+            "Role": resource("AWS::IAM::Role"),
+            "Group": resource("AWS::EC2::SecurityGroup"),
+            "Logs": resource("AWS::Logs::LogGroup"),
+            "Queue": resource("AWS::SQS::Queue"),
+            "Task": resource("AWS::ECS::TaskDefinition", {
+                "ExecutionRoleArn": {"Fn::GetAtt": ["Role", "Arn"]},
+                "Group": {"Fn::GetAtt": "Group.GroupId"},
+                "LogGroup": {"Fn::Sub": "${Logs}-${AWS::Region}-${!Literal}"},
+                "Queue": {"Fn::Sub": ["${QueueUrl}/${Env}", {"QueueUrl": {"Fn::GetAtt": ["Queue", "QueueUrl"]}}]},
+                "Env": {"Ref": "Env"}
+            }, depends_on="Role")
+        }, Parameters={"Env": {"Type": "String"}}))
+
+        assert sorted(analysis.dependencies["Task"]) == ["Group", "Logs", "Queue", "Role"]
+        assert analysis.is_valid
+        assert not [issue for issue in analysis.issues if issue.code == "unused_parameter"]
+
+    def test_critical_path_of_generated_stack(self, aws_config):
+        """生成スタックのクリティカルパスが ALB → ECSサービス → オートスケーリングになるテスト"""
+        analysis = TemplateAnalyzer().analyze(generated_stack(aws_config, []))
+
+        assert analysis.critical_path[:2] == ["ALBSecurityGroup", "ALB"]
+        assert "ECSService" in analysis.critical_path
+        assert analysis.critical_path[-1].endswith("ScalingPolicy")
+        assert analysis.critical_path_seconds == 403
+
+    def test_database_dominates_critical_path(self, aws_config):
+        """RDS を含むとデータベース作成がクリティカルパスに入るテスト"""
+        analysis = TemplateAnalyzer().analyze(generated_stack(aws_config, ["database"]))
+
+        assert "RDSInstance" in analysis.critical_path
+        assert analysis.critical_path.index("RDSInstance") < analysis.critical_path.index("ECSService")
+        assert analysis.critical_path_seconds > 600
+
+    def test_unresolved_references_fail_validation(self, aws_config):
+        """未定義のリソースへの参照をエラーとして検出するテスト"""
+        generator = CloudFormationGenerator()
+        stack = generated_stack(aws_config, ["database", "cache"])
+
+        analysis = generator.analyze_template(stack)
+        unresolved = [issue.message for issue in analysis.issues if issue.code == "unresolved_reference"]
+
+        assert any("ElastiCacheCluster" in message for message in unresolved)
+        assert not any("DatabaseURL" in message for message in unresolved)
+        assert generator.validate_template(stack) is False
+        assert generator.validate_template(generated_stack(aws_config, [])) is True
+
+    def test_generated_database_stack_is_valid(self, aws_config):
+        """database 機能付きの生成スタックが検証を通り、DATABASE_URL が RDS を参照するテスト"""
+        generator = CloudFormationGenerator()
+        stack = generated_stack(aws_config, ["database"])
+
+        assert generator.validate_template(stack) is True
+        environment = stack["Resources"]["ECSTaskDefinition"]["Properties"]["ContainerDefinitions"][0]["Environment"]
+        database_url = next(variable["Value"] for variable in environment if variable["Name"] == "DATABASE_URL")
+        assert "${RDSInstance.Endpoint.Address}" in database_url["Fn::Sub"]
+        assert "RDSInstance" in TemplateAnalyzer().analyze(stack).dependencies["ECSTaskDefinition"]
+
+    def test_circular_dependency(self):
+        """循環依存を検出し、循環外のリソースはクリティカルパスに残るテスト"""
+        analysis = TemplateAnalyzer().analyze(template({
+            "A": resource("AWS::SQS::Queue", {"Peer": {"Ref": "B"}}),
+            "B": resource("AWS::SQS::Queue", depends_on=["A"]),
+            "Cluster": resource("AWS::ECS::Cluster")
+        }))
+
+        cycles = [issue for issue in analysis.issues if issue.code == "circular_dependency"]
+        assert len(cycles) == 1
+        assert "A, B" in cycles[0].message
+        assert analysis.critical_path == ["Cluster"]
+        assert analysis.is_valid is False
+
+    def test_size_and_secret_lint(self):
+        """テンプレートサイズ超過（S3経由が必要）と NoEcho パラメータの既定値を警告するテスト"""
+        resources = {
+            f"Queue{i}": resource("AWS::SQS::Queue", {"QueueName": f"altmx-{i}-" + "x" * 200})
+            for i in range(250)
+        }
+        analysis = TemplateAnalyzer().analyze(template(resources, Parameters={
+            "DatabasePassword": {"Type": "String", "NoEcho": True, "Default": "TempPassword123"}
+        }))
+
+        codes = {issue.code: issue.severity for issue in analysis.issues}
+        assert analysis.body_size > MAX_TEMPLATE_BODY_BYTES
+        assert codes["template_body_too_large"] == "warning"
+        assert codes["secret_default"] == "warning"
+        assert codes["unused_parameter"] == "info"
+        assert analysis.is_valid
+
+    def test_resource_costs_from_pricing_table(self, aws_config):
+        """タスク定義の CPU・メモリ × タスク数と ALB の料金を積算するテスト"""
+        stack = generated_stack(aws_config, [])
+        analysis = TemplateAnalyzer().analyze(stack)
+
+        task = stack["Resources"]["ECSTaskDefinition"]["Properties"]
+        desired_count = stack["Resources"]["ECSService"]["Properties"]["DesiredCount"]
+        expected_service = (
+            int(task["Cpu"]) / 1024 * PRICING["fargate_vcpu_hour"]
+            + int(task["Memory"]) / 1024 * PRICING["fargate_gb_hour"]
+        ) * desired_count
+
+        assert analysis.resource_costs["ECSService"] == pytest.approx(expected_service, abs=1e-5)
+        assert analysis.resource_costs["ALB"] == PRICING["alb_hour"]
+        assert analysis.resource_costs["ECSCluster"] == 0.0
+        assert analysis.hourly_cost == pytest.approx(expected_service + PRICING["alb_hour"], abs=1e-4)
+        assert analysis.unpriced_resources == []
+
+    def test_parameter_defaults_and_unpriced_resources(self):
+        """パラメータ参照は既定値で見積もり、価格表にないリソースを一覧するテスト"""
+        analysis = TemplateAnalyzer().analyze(template({
+            "Database": resource("AWS::RDS::DBInstance", {
+                "DBInstanceClass": {"Ref": "InstanceClass"}, "AllocatedStorage": "20", "MultiAZ": True
+            }),
+            "Queue": resource("AWS::SQS::Queue")
+        }, Parameters={"InstanceClass": {"Type": "String", "Default": "db.t3.small"}}))
+
+        expected = PRICING["rds_instance_hour"]["db.t3.small"] * 2 + 20 * PRICING["rds_storage_gb_month"] / 730
+        assert analysis.resource_costs["Database"] == pytest.approx(expected, abs=1e-5)
+        assert analysis.unpriced_resources == ["Queue"]
+
+    def test_intrinsic_values_are_unpriced(self):
+        """Fn::If・Fn::FindInMap 等で決まる値は例外にせず見積もり対象外にするテスト"""
+        conditional = {"Fn::If": ["IsProduction", "db.t3.small", "db.t3.micro"]}
+        mapped = {"Fn::FindInMap": ["Sizes", {"Ref": "Env"}, "Value"]}
+        analysis = TemplateAnalyzer().analyze(template({
+            "Database": resource("AWS::RDS::DBInstance", {"DBInstanceClass": conditional, "AllocatedStorage": "20"}),
+            "Storage": resource("AWS::RDS::DBInstance", {"DBInstanceClass": "db.t3.micro", "AllocatedStorage": mapped}),
+            "Cache": resource("AWS::ElastiCache::CacheCluster", {"CacheNodeType": mapped}),
+            "Nodes": resource("AWS::ElastiCache::CacheCluster", {"CacheNodeType": "cache.t3.micro", "NumCacheNodes": mapped}),
+            "Server": resource("AWS::EC2::Instance", {"InstanceType": conditional}),
+            "Task": resource("AWS::ECS::TaskDefinition", {"Cpu": mapped, "Memory": "512"}),
+            "Service": resource("AWS::ECS::Service", {"TaskDefinition": {"Ref": "Task"}, "DesiredCount": 1})
+        }, Parameters={"Env": {"Type": "String", "Default": "dev"}}))
+
+        assert sorted(analysis.unpriced_resources) == ["Cache", "Database", "Nodes", "Server", "Service", "Storage"]
+        assert analysis.resource_costs == {"Task": 0.0}
@@ -198,7 +198,8 @@ async def handle_generation_request(request_data: dict, tracker: ProgressTracker
             "generated_files": result.generated_files,
             "errors": result.errors,
             "warnings": result.warnings,
-            "performance_metrics": result.performance_metrics
+            "performance_metrics": result.performance_metrics,
+            "corrections": result.corrections
         }
         
         await tracker.send_completion(result_data)
@@ -0,0 +1,68 @@
+"""
+Preview Hot Reload WebSocket
+プレビューセッションの変更プッシュ（変更ファイルと内容ハッシュのみ送信）
+"""
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import json
+import asyncio
+import logging
+
+from api.preview import file_manager, hot_reload_hub
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.websocket("/preview/{session_id}")
+async def websocket_preview(websocket: WebSocket, session_id: str):
+    """
+    プレビューホットリロードWebSocketエンドポイント
+
+    接続直後に現在のファイル一覧（snapshot）を送り、以降は保存ごとに
+    files_changed（変更パス・内容ハッシュ・再評価が必要な依存元）を送る。
+    """
+    if file_manager.get_session(session_id) is None:
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    queue = hot_reload_hub.subscribe(session_id)
+    logger.info(f"Hot reload subscriber connected: {session_id}")
+
+    async def push():
+        while True:
+            message = await queue.get()
+            await websocket.send_text(json.dumps(message))
+            if message["type"] == "session_closed":
+                return
+
+    async def receive():
+        while True:
+            data = await websocket.receive_text()
+            if data == "ping":
+                await websocket.send_text(json.dumps({"type": "pong"}))
+
+    try:
+        await websocket.send_text(json.dumps(hot_reload_hub.snapshot(session_id)))
+
+        tasks = [asyncio.create_task(push()), asyncio.create_task(receive())]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                raise error
+
+        if tasks[0] in done:
+            await websocket.close()
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Hot reload WebSocket error: {e}")
+    finally:
+        hot_reload_hub.unsubscribe(session_id, queue)
+        logger.info(f"Hot reload subscriber disconnected: {session_id}")